@@ -25,9 +25,21 @@ MIN_POTENTIAL_SCORE = 120
 # 闲鱼卖家超过此数量则视为红海，不推送
 MAX_COMPETITION = 300
 
+# 评级分档：[(蓝海指数下限, 评级)]，按分数降序；低于最后一档但 ≥ MIN_POTENTIAL_SCORE 为"潜在蓝海"
+RATING_THRESHOLDS = (
+    (1000, "⭐⭐⭐⭐⭐ 顶级蓝海"),
+    (500, "⭐⭐⭐⭐ 优质蓝海"),
+    (200, "⭐⭐⭐ 良好蓝海"),
+    (100, "⭐⭐ 一般蓝海"),
+)
+
+# 时间衰减档位：[(数据距今小时数上限, 加成系数)]，按小时升序；超过最后一档无加成
+TIME_DECAY_STEPS = ((6, 1.8), (24, 1.5), (48, 1.25), (72, 1.1))
+
 # ==================== 数据文件配置 ====================
-XHS_DATA_FILE = "xhs_data.json"      # 小红书数据文件
-FISH_DATA_FILE = "fish_data.json"    # 闲鱼数据文件
+DATASTORE_DB = "niche_data.db"       # 词条/观测/分析结果数据库（SQLite），下面的 JSON 文件只用于导入导出
+XHS_DATA_FILE = "xhs_data.json"      # 小红书数据文件（数据库为空时自动导入）
+FISH_DATA_FILE = "fish_data.json"    # 闲鱼数据文件（数据库为空时自动导入）
 REPORT_FILE = "niche_report.json"    # 分析报告文件
 
 # ==================== 爬虫配置 ====================
@@ -48,12 +60,100 @@ NO_PROXY = '*'                       # 所有域名都不使用代理
 REQUIRE_CHINA_NETWORK = True
 CHINA_NETWORK_STRICT = True
 CHINA_PROXY_SERVER = os.getenv("CHINA_PROXY_SERVER", "").strip()  # 例如 http://127.0.0.1:7890
+EGRESS_CHECK_TTL = 1800              # 出口检测结论缓存时间（秒），按代理配置分别缓存
+EGRESS_CACHE_FILE = ".egress_cache.json"  # 出口检测结论磁盘缓存（多进程共享）
 
 # ==================== 推送配置 ====================
 # 未配置 webhook 时默认关闭推送，避免运行时报错/避免误提交敏感信息
 ENABLE_WECOM_PUSH = bool(WECOM_WEBHOOK)  # 是否启用企业微信推送
 TOP_N_RESULTS = 5                    # 推送前N个最佳赛道
 PUSH_INTERVAL = 3600                 # 推送间隔（秒），避免频繁打扰
+INSTANT_PUSH_SCORE = 1000            # 蓝海指数达到此值立即推送（无需等待任务结束）
+WECOM_RATE_LIMIT_PER_MINUTE = 20     # 企业微信机器人限频：每分钟最多20条消息
+WECOM_MARKDOWN_MAX_BYTES = 4096      # 企业微信 markdown 消息内容上限（UTF-8字节）
+PUSH_OUTBOX_DB = "push_outbox.db"    # 推送发件箱（SQLite），任务只入队，后台投递
+OUTBOX_MAX_ATTEMPTS = 8              # 单条消息最大投递次数，超过后放弃
+OUTBOX_FLUSH_TIMEOUT = 10            # 任务结束时最多等待投递的秒数（Webhook故障不拖住任务）
+
+# ==================== 限速配置 ====================
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "rate_limits.db")  # 按平台共享的令牌桶状态（多进程、多爬虫实例共用同一限速预算；环境变量 RATE_LIMIT_DB 可改路径）
+AIMD_RATE_BOUNDS = {                 # 各平台令牌补充速率上下限（次/秒），自适应限速只在此范围内调整
+    "xiaohongshu": (0.5, 5.0),
+    "xianyu": (0.4, 4.0),
+}
+AIMD_INCREASE_STEP = 0.05            # 每次成功获取数据后速率增加量（次/秒）
+AIMD_DECREASE_FACTOR = 0.5           # 出现拦截/验证码/限流/超时时速率乘以该系数
+AIMD_DECREASE_COOLDOWN = 30          # 两次降速的最小间隔（秒），同一波拦截只降一次
+
+# ==================== 重试配置 ====================
+KEYWORD_DEADLINE_SEC = 120           # 单个词条（含全部重试和退避）的总时限（秒）
+CIRCUIT_BREAKER_THRESHOLD = 3        # 同一平台连续被拦截/限流多少次后熔断
+CIRCUIT_BREAKER_COOLDOWN = 600       # 熔断持续时间（秒），之后放行一次试探请求
+
+# ==================== 调度配置 ====================
+SCHEDULE_STATE_FILE = ".scheduler_state.json"  # 各任务上次运行时间（重启后补跑错过的任务）
+SCHEDULE_JITTER_SEC = 300            # 触发时间随机延后上限（秒），避免每天固定时刻访问
+SCHEDULE_CATCHUP_WINDOW = 6 * 3600   # 错过的任务在此时间内补跑一次，超出则等待下次触发
+SCHEDULE_MISSION_MAX_SECONDS = 90 * 60  # 定时挖掘任务总时限上限（秒），实际取值不超过距下次挖掘触发的时间
+SCHEDULE_SLOT_MARGIN = 300           # 为下一次挖掘任务预留的间隔（秒），任务不会拖进下一个时段
+
+# ==================== 重访计划配置 ====================
+REVISIT_STATE_FILE = ".revisit_state.json"  # 每个 (平台, 词条) 的变化率与下次到期时间
+REVISIT_MIN_INTERVAL = 2 * 3600      # 最短重访间隔（秒），波动剧烈的词条
+REVISIT_MAX_INTERVAL = 7 * 24 * 3600 # 最长重访间隔（秒），长期平稳的词条
+REVISIT_TARGET_CHANGE = 0.15         # 预计相对变化达到15%时重新抓取
+REVISIT_EWMA_ALPHA = 0.3             # 变化率EWMA平滑系数
+
+# ==================== 抓取预算配置 ====================
+MISSION_MAX_REQUESTS = None          # 单次任务最多抓取请求数（None 表示不限），按期望价值从高到低消耗
+MISSION_MAX_SECONDS = None           # 单次任务最长抓取时间（秒，None 表示不限）
+UNKNOWN_VALUE_DISCOUNT = 0.5         # 没有历史蓝海指数时，按上界的该比例估计期望价值
+MISSION_XHS_TIME_SHARE = 0.3         # 设定总时限时，小红书阶段最多使用的时间比例（其余留给闲鱼）
+MIN_KEYWORD_SLICE_SEC = 20           # 单个词条时间片下限（秒），剩余时间不足一个时间片即停止抓取新词条
+
+# ==================== 关键词发现配置 ====================
+DISCOVERY_DB = "keyword_discovery.db"  # 已知词集合 + 前沿队列（SQLite）
+DISCOVERY_FRONTIER_MAX = 5000        # 前沿队列容量上限，超出时淘汰优先级最低的候选
+DISCOVERY_BLOOM_CAPACITY = 100000    # 布隆过滤器预期容量
+DISCOVERY_EXPANSIONS_PER_RUN = 20    # 每次发现任务最多展开的词条数
+
+# ==================== 静态资源缓存配置 ====================
+ENABLE_ASSET_CACHE = True            # 平台 JS/CSS bundle 存到本地磁盘，命中时直接 route.fulfill，不再每次导航都下载
+ASSET_CACHE_DIR = ".asset_cache"     # 缓存目录（按内容哈希存储 + SQLite 索引，多进程共享）
+ASSET_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 缓存总大小上限（字节），超出按最近最少使用淘汰
+ASSET_CACHE_MAX_TTL = 7 * 24 * 3600  # 本地副本免校验使用的最长时间（秒），过期后带 ETag 回源，304 继续使用
+
+# ==================== 原始响应归档配置 ====================
+ENABLE_PAYLOAD_ARCHIVE = True        # 嗅探到的 API JSON 和 DOM 提取结果压缩归档，改进解析器后可在归档上重跑
+PAYLOAD_ARCHIVE_DIR = ".payload_archive"  # 归档目录（分段文件 + SQLite 偏移索引）
+PAYLOAD_SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # 单个分段文件上限（字节），超出后切换新分段
+PAYLOAD_REPARSE_WORKERS = None       # 重新解析的并行进程数（None 表示 CPU 核数）
+
+# ==================== 时间序列配置 ====================
+TIMESERIES_DIR = ".timeseries"       # 每次观测的热度/竞争数/平均想要按列追加存储，并维护 EWMA 速度与加速度
+TIMESERIES_EWMA_ALPHA = 0.3          # 速度/加速度 EWMA 平滑系数
+TIMESERIES_MIN_GAP = 30 * 60         # 同一指标两次观测间隔不足该秒数时只写入列文件，不参与速度估计
+ENABLE_GROWTH_RATE = False           # 蓝海指数按真实热度增长率修正：热度 × (1 + 日增长率)，至少需两次观测
+GROWTH_FACTOR_RANGE = (0.5, 3.0)     # 增长修正系数的上下限，避免单次跳变放大过度
+
+# ==================== 关键词匹配配置 ====================
+ENABLE_FUZZY_JOIN = True             # 离线分析时把小红书词条模糊匹配到闲鱼的变体词条，汇总竞争数据
+KEYWORD_JOIN_THRESHOLD = 0.5         # 字符 n-gram Dice 相似度阈值（"复古相机" vs "复古胶片相机" = 0.5）
+KEYWORD_JOIN_NGRAM = 2               # n-gram 长度（中文词条用二元组）
+ALIAS_CACHE_FILE = ".keyword_aliases.json"  # 别名表缓存，下次只计算新增词条涉及的配对
+
+# ==================== 离线流式分析配置 ====================
+STREAM_CHUNK_SIZE = 50000            # 流式分析每块行数（每块在一个工作进程中解析+评分）
+STREAM_WORKERS = None                # 流式分析并行进程数（None 表示 CPU 核数，1 表示单进程）
+
+# ==================== 监控指标配置 ====================
+ENABLE_METRICS = True                # 任务结束时导出指标（各层耗时直方图、降级率、限速信号、推送结果）
+METRICS_TEXTFILE = "niche_metrics.prom"  # Prometheus textfile 格式（放在 node_exporter textfile 目录下即可采集）
+METRICS_SNAPSHOT_FILE = "niche_metrics.json"  # JSON 快照（附各直方图的 p50/p95 估计）
+METRICS_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)  # 耗时直方图桶上界（秒）
+
+# ==================== 网络流量记账配置 ====================
+ENABLE_NETWORK_ACCOUNTING = True     # 按页面/词条统计请求数、传输字节（按资源类型/主机）、路由层拦截数、首个 API 响应时间，写入报告 network 段
 
 # ==================== 日志配置 ====================
 LOG_LEVEL = "INFO"                   # 日志级别：DEBUG, INFO, WARNING, ERROR
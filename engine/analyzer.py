@@ -4,19 +4,25 @@
 
 核心升级：
 - 引入时间衰减系数：24小时内新热搜 × 1.5倍权重加成
-- 支持时间戳分析：从xhs_data.json提取发布时间
+- 支持时间戳分析：从数据库提取最近观测时间
+- 可选真实增长率：按时间序列的热度日增长率修正 XHS_Heat
 - 动态调整：热点越新，权重越高
 
 更新日志：
 - 2025-12-31: 实现时间衰减系数机制
 """
 
-from typing import Dict, Tuple, Any, List, Optional
-from config import MIN_POTENTIAL_SCORE, MAX_COMPETITION
+from typing import Dict, Tuple, List, Optional
+from config import (
+    MIN_POTENTIAL_SCORE, MAX_COMPETITION, INSTANT_PUSH_SCORE, DATASTORE_DB, XHS_DATA_FILE,
+    TIMESERIES_DIR, ENABLE_GROWTH_RATE, GROWTH_FACTOR_RANGE, RATING_THRESHOLDS, TIME_DECAY_STEPS
+)
+from utils.datastore import get_store
+from engine.timeseries import get_series
+from utils.records import FishListing
 from datetime import datetime, timedelta
-import json
+import bisect
 import os
-import re
 
 
 class BlueOceanAnalyzer:
@@ -44,11 +50,62 @@ class BlueOceanAnalyzer:
         return datetime.now()
     
     @staticmethod
-    def _calculate_time_decay_factor(timestamp: str = None, data_file: str = "xhs_data.json") -> float:
+    def _latest_data_time(data_file: str = XHS_DATA_FILE) -> Optional[datetime]:
+        """数据最近一次更新的时间：优先取数据库中最新的小红书观测，没有数据库时退回数据文件修改时间"""
+        if os.path.exists(DATASTORE_DB):
+            latest = get_store().latest_observed_at('xhs')
+            if latest:
+                return datetime.fromtimestamp(latest)
+        if data_file and os.path.exists(data_file):
+            return datetime.fromtimestamp(os.path.getmtime(data_file))
+        return None
+
+    @staticmethod
+    def heat_growth_rate(keyword: str) -> Optional[float]:
+        """词条热度的相对日增长率（来自时间序列的 EWMA 速度；观测不足两次或没有时间序列时返回 None）"""
+        if not os.path.isdir(TIMESERIES_DIR):
+            return None
+        return get_series().growth_rate(keyword, 'heat')
+
+    @staticmethod
+    def growth_factor(growth_rate: Optional[float]) -> float:
+        """
+        增长修正系数：1 + 日增长率，限制在 GROWTH_FACTOR_RANGE 内
+
+        Args:
+            growth_rate: 相对日增长率（None 表示未知，不修正）
+
+        Returns:
+            热度乘数
+        """
+        if growth_rate is None:
+            return 1.0
+        low, high = GROWTH_FACTOR_RANGE
+        return min(high, max(low, 1.0 + growth_rate))
+
+    @staticmethod
+    def decay_for_age(hours_ago: float, steps=TIME_DECAY_STEPS) -> float:
+        """
+        按数据距今小时数查时间衰减系数
+
+        Args:
+            hours_ago: 数据距今小时数
+            steps: [(小时上限, 系数)]，按小时升序；超过最后一档为 1.0
+
+        Returns:
+            时间衰减系数
+        """
+        for max_hours, factor in steps:
+            if hours_ago <= max_hours:
+                return factor
+        return 1.0
+
+    @staticmethod
+    def _calculate_time_decay_factor(timestamp: str = None, data_file: str = XHS_DATA_FILE) -> float:
         """
         计算时间衰减系数
         
-        规则（更强时间敏感度）：
+        规则（更强时间敏感度，档位见 TIME_DECAY_STEPS）：
         - 0-6小时：1.8倍加成
         - 6-24小时：1.5倍加成
         - 24-48小时：1.25倍加成
@@ -57,7 +114,7 @@ class BlueOceanAnalyzer:
         
         Args:
             timestamp: 数据时间戳（ISO格式）
-            data_file: 数据文件路径（自动提取时间）
+            data_file: 没有数据库时用其修改时间作为数据时间
         
         Returns:
             时间衰减系数（1.0-1.5）
@@ -68,43 +125,20 @@ class BlueOceanAnalyzer:
                 data_time = BlueOceanAnalyzer._parse_timestamp(timestamp)
                 if not data_time:
                     return 1.0
-            # 2. 否则尝试从文件读取
-            elif os.path.exists(data_file):
-                with open(data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # 查找时间戳字段
-                    if isinstance(data, dict):
-                        timestamp_str = data.get('timestamp') or data.get('crawl_time') or data.get('update_time')
-                        if timestamp_str:
-                            data_time = BlueOceanAnalyzer._parse_timestamp(timestamp_str) or datetime.fromtimestamp(os.path.getmtime(data_file))
-                        else:
-                            # 使用文件修改时间
-                            file_mtime = os.path.getmtime(data_file)
-                            data_time = datetime.fromtimestamp(file_mtime)
-                    else:
-                        # 使用文件修改时间
-                        file_mtime = os.path.getmtime(data_file)
-                        data_time = datetime.fromtimestamp(file_mtime)
+            # 2. 否则取最近一次观测时间（索引查询，不再整文件读取）
             else:
-                # 无法获取时间，返回默认值
-                return 1.0
+                data_time = BlueOceanAnalyzer._latest_data_time(data_file)
+                if not data_time:
+                    # 无法获取时间，返回默认值
+                    return 1.0
             
             # 计算时间差
             now = BlueOceanAnalyzer._now_like(data_time)
             time_diff = now - data_time
             hours_ago = time_diff.total_seconds() / 3600
             
-            # 应用衰减规则
-            if hours_ago <= 6:
-                return 1.8
-            elif hours_ago <= 24:
-                return 1.5
-            elif hours_ago <= 48:
-                return 1.25
-            elif hours_ago <= 72:
-                return 1.1
-            else:
-                return 1.0  # 72小时以上：无加成
+            # 应用衰减规则（72小时以上：无加成）
+            return BlueOceanAnalyzer.decay_for_age(hours_ago)
         
         except Exception as e:
             print(f"⚠️ 时间衰减计算失败: {e}，使用默认系数1.0")
@@ -126,7 +160,7 @@ class BlueOceanAnalyzer:
         $$Index = \\frac{XHS_Heat \\times Average_Wants}{Competition_Count + 1} \\times Time_Decay$$
         
         其中：
-        - XHS_Heat: 小红书笔记互动增长率（热度值）
+        - XHS_Heat: 小红书笔记互动热度（calculate_detailed_index 开启 ENABLE_GROWTH_RATE 时按日增长率修正）
         - Average_Wants: 闲鱼搜索结果前5名的平均"想要"人数
         - Competition_Count: 闲鱼同标题商品总数
         - Time_Decay: 时间衰减系数（24h内 × 1.5）
@@ -205,6 +239,12 @@ class BlueOceanAnalyzer:
             or xhs_data.get('publish_time')
         )
 
+        # 真实增长率：调用方可直接携带，否则开启后从时间序列读取
+        growth_rate = xhs_data.get('growth_rate')
+        if growth_rate is None and ENABLE_GROWTH_RATE:
+            growth_rate = BlueOceanAnalyzer.heat_growth_rate(keyword)
+        growth_factor = BlueOceanAnalyzer.growth_factor(growth_rate)
+
         cleaned_fish = BlueOceanAnalyzer._sanitize_fish_data(keyword, fish_data)
         competition_count = int(cleaned_fish.get('商品数', 0))
         wants_list = cleaned_fish.get('想要数列表', [])
@@ -212,7 +252,7 @@ class BlueOceanAnalyzer:
         
         # 计算蓝海指数
         index = BlueOceanAnalyzer.calculate_index(
-            xhs_heat=xhs_heat,
+            xhs_heat=xhs_heat * growth_factor,
             competition_count=competition_count,
             average_wants=average_wants,
             wants_list=wants_list,
@@ -236,12 +276,43 @@ class BlueOceanAnalyzer:
             '热度评估': BlueOceanAnalyzer.assess_heat(xhs_heat)
         }
 
+        if growth_rate is not None:
+            analysis['热度日增长率'] = round(growth_rate, 4)
+            analysis['增长系数'] = round(growth_factor, 3)
+
         # 附加数据纯净度信息（若有）
         if cleaned_fish.get('_purity'):
             analysis.update(cleaned_fish['_purity'])
         
         return index, analysis
 
+    @staticmethod
+    def summarize_fish_observation(keyword: str, fish_data: Dict) -> Dict:
+        """
+        把爬虫返回的闲鱼明细清洗汇总为一次竞争观测（写入数据库的格式）
+
+        Args:
+            keyword: 词条
+            fish_data: 爬虫结果（明细或已汇总格式）
+
+        Returns:
+            {'商品数', '想要总数', '想要数列表', '平均想要'}
+        """
+        clean = BlueOceanAnalyzer._sanitize_fish_data(keyword, fish_data)
+        wants_list = [int(float(w or 0)) for w in clean.get('想要数列表', [])]
+        raw = fish_data if isinstance(fish_data, dict) else {}
+        if isinstance(raw.get(keyword), dict):
+            raw = raw[keyword]
+        total_wants = sum(
+            int(float(it.get('wants') or 0)) for it in (raw.get('items') or []) if isinstance(it, (dict, FishListing))
+        )
+        return {
+            '商品数': clean.get('商品数', 0),
+            '想要总数': total_wants or sum(wants_list),
+            '想要数列表': wants_list,
+            '平均想要': clean.get('平均想要', 0)
+        }
+
     @staticmethod
     def _sanitize_fish_data(keyword: str, fish_data: Dict) -> Dict:
         """清洗闲鱼数据：过滤无头像/低信誉卖家，并对重复铺货去重。
@@ -275,119 +346,39 @@ class BlueOceanAnalyzer:
         if not isinstance(items, list) or not items:
             return {'商品数': 0, '平均想要': 0, '想要数列表': [], '_purity': {}}
 
-        def norm_title(t: str) -> str:
-            t = (t or '').lower()
-            t = re.sub(r"\s+", "", t)
-            t = re.sub(r"[^0-9a-z\u4e00-\u9fff]", "", t)
-            return t[:80]
-
-        def get_seller_blob(it: Dict) -> Dict:
-            seller = it.get('seller')
-            return seller if isinstance(seller, dict) else {}
-
-        def has_avatar(it: Dict) -> Optional[bool]:
-            seller = get_seller_blob(it)
-            for k in ('avatar_url', 'avatar', 'head_url', 'head', 'icon'):
-                v = seller.get(k) or it.get(k) or it.get('seller_' + k)
-                if v is None:
-                    continue
-                if isinstance(v, bool):
-                    return v
-                if isinstance(v, str):
-                    return bool(v.strip())
-            return None
-
-        def is_low_reputation(it: Dict) -> Optional[bool]:
-            seller = get_seller_blob(it)
-            candidates = [
-                seller.get('credit_level'), seller.get('seller_level'), seller.get('level'),
-                seller.get('rating'), seller.get('good_rate'), seller.get('reputation'),
-                it.get('credit_level'), it.get('seller_level'), it.get('rating'), it.get('good_rate'),
-            ]
-            for v in candidates:
-                if v is None:
-                    continue
-                try:
-                    if isinstance(v, str):
-                        vv = v.strip().replace('%', '')
-                        if vv.replace('.', '', 1).isdigit():
-                            v = float(vv)
-                        else:
-                            continue
-                    if isinstance(v, (int, float)):
-                        # rating: 0-5
-                        if 0 <= float(v) <= 5:
-                            return float(v) < 3.0
-                        # good_rate: 0-1 or 0-100
-                        if 0 <= float(v) <= 1:
-                            return float(v) < 0.6
-                        if 1 < float(v) <= 100:
-                            return float(v) < 60
-                        # level: 1..N
-                        if float(v).is_integer() and 1 <= int(v) <= 10:
-                            return int(v) < 2
-                except Exception:
-                    continue
-            return None
-
-        def seller_id(it: Dict) -> str:
-            seller = get_seller_blob(it)
-            for k in ('seller_id', 'user_id', 'id', 'uid', 'nick', 'nickname'):
-                v = seller.get(k) or it.get(k)
-                if v:
-                    return str(v)
-            return 'unknown_seller'
-
-        def item_id(it: Dict) -> Optional[str]:
-            for k in ('id', 'item_id', 'trade_id', 'goods_id', 'listing_id'):
-                v = it.get(k)
-                if v:
-                    return str(v)
-            return None
+        # 每个商品只规范化一次（已是 FishListing 的直接复用），之后按属性访问
+        listings = [
+            FishListing.from_raw(it, keyword=keyword)
+            for it in items if isinstance(it, (dict, FishListing))
+        ]
 
         filtered_no_avatar = 0
         filtered_low_rep = 0
-        kept: List[Dict[str, Any]] = []
-        for it in items:
-            if not isinstance(it, dict):
-                continue
-            av = has_avatar(it)
-            if av is False:
+        kept: List[FishListing] = []
+        for it in listings:
+            if it.has_avatar is False:
                 filtered_no_avatar += 1
                 continue
-            low = is_low_reputation(it)
-            if low is True:
+            if it.low_reputation is True:
                 filtered_low_rep += 1
                 continue
             kept.append(it)
 
         # 去重：同一卖家 + 同标题 或 相同item_id
-        dedup_map: Dict[str, Dict] = {}
+        dedup_map: Dict[str, FishListing] = {}
         dedup_dropped = 0
         for it in kept:
-            sid = seller_id(it)
-            tid = item_id(it)
-            title = norm_title(it.get('title') or it.get('name') or '')
-            sig = tid or f"{sid}:{title}"
-            wants = float(it.get('wants') or it.get('want') or it.get('想要人数') or 0)
-
+            sig = it.dedup_key()
             if sig not in dedup_map:
                 dedup_map[sig] = it
                 continue
             # 选择 wants 更高的那个作为代表
-            prev = dedup_map[sig]
-            prev_wants = float(prev.get('wants') or prev.get('want') or prev.get('想要人数') or 0)
-            if wants > prev_wants:
+            if it.wants > dedup_map[sig].wants:
                 dedup_map[sig] = it
             dedup_dropped += 1
 
         unique_items = list(dedup_map.values())
-        wants_values = []
-        for it in unique_items:
-            try:
-                wants_values.append(float(it.get('wants') or it.get('want') or it.get('想要人数') or 0))
-            except Exception:
-                wants_values.append(0.0)
+        wants_values = [float(it.wants or 0) for it in unique_items]
 
         wants_values.sort(reverse=True)
         top_wants = wants_values[:5]
@@ -408,28 +399,24 @@ class BlueOceanAnalyzer:
         }
     
     @staticmethod
-    def get_rating(index: float) -> str:
+    def get_rating(index: float, thresholds=RATING_THRESHOLDS, min_score: float = MIN_POTENTIAL_SCORE) -> str:
         """
         根据蓝海指数给出评级
         
         Args:
             index: 蓝海指数
+            thresholds: [(分数下限, 评级)]，按分数降序
+            min_score: 潜在蓝海的分数下限
             
         Returns:
             评级文本
         """
-        if index >= 1000:
-            return "⭐⭐⭐⭐⭐ 顶级蓝海"
-        elif index >= 500:
-            return "⭐⭐⭐⭐ 优质蓝海"
-        elif index >= 200:
-            return "⭐⭐⭐ 良好蓝海"
-        elif index >= 100:
-            return "⭐⭐ 一般蓝海"
-        elif index >= MIN_POTENTIAL_SCORE:
+        for min_index, rating in thresholds:
+            if index >= min_index:
+                return rating
+        if index >= min_score:
             return "⭐ 潜在蓝海"
-        else:
-            return "❌ 不推荐"
+        return "❌ 不推荐"
     
     @staticmethod
     def assess_competition(count: int) -> str:
@@ -478,22 +465,29 @@ class BlueOceanAnalyzer:
             return "❌ 极低热度"
     
     @staticmethod
-    def is_qualified(index: float, competition: int) -> bool:
+    def is_qualified(
+        index: float,
+        competition: int,
+        min_score: float = MIN_POTENTIAL_SCORE,
+        max_competition: int = MAX_COMPETITION
+    ) -> bool:
         """
         判断词条是否符合推送条件
         
         规则：
-        1. 蓝海指数 >= MIN_POTENTIAL_SCORE
-        2. 竞争数 <= MAX_COMPETITION
+        1. 蓝海指数 >= min_score（默认 MIN_POTENTIAL_SCORE）
+        2. 竞争数 <= max_competition（默认 MAX_COMPETITION）
         
         Args:
             index: 蓝海指数
             competition: 竞争对手数
+            min_score: 蓝海指数下限（回测时可替换）
+            max_competition: 竞争数上限（回测时可替换）
             
         Returns:
             是否符合条件
         """
-        return index >= MIN_POTENTIAL_SCORE and competition <= MAX_COMPETITION
+        return index >= min_score and competition <= max_competition
     
     @staticmethod
     def rank_results(results: list, top_n: int = 5) -> list:
@@ -518,6 +512,80 @@ class BlueOceanAnalyzer:
         return sorted_results[:top_n]
 
 
+class ProvisionalLeaderboard:
+    """流式临时排行榜：边分析边判断词条能否提前推送（缩短告警时延）。
+
+    满足 is_qualified 的词条，在以下任一条件成立时立即放行：
+    1. 蓝海指数 ≥ instant_score（顶级蓝海，直接推送）
+    2. 已稳居 Top N：已出现的不低于它的词条数 + 尚未分析的词条数 < N
+       （剩余词条即使全部高于它，也无法把它挤出 Top N）
+
+    同分词条按保守口径视为排在前面，保证"稳居 Top N"的判断不会误报。
+    """
+
+    def __init__(self, total: int, top_n: int = 5, instant_score: float = INSTANT_PUSH_SCORE):
+        """
+        Args:
+            total: 本次任务计划分析的词条总数
+            top_n: 最终推送的 Top N
+            instant_score: 立即推送的蓝海指数阈值
+        """
+        self.total = max(0, int(total))
+        self.top_n = max(1, int(top_n))
+        self.instant_score = instant_score
+        self._scores: List[float] = []      # 已出现的蓝海指数（升序）
+        self._pending: List[Dict] = []      # 合格但尚未确定名次的词条
+        self.released: Dict[str, str] = {}  # 已放行词条 -> 放行原因
+
+    def offer(self, analysis: Optional[Dict], remaining: int) -> List[Tuple[Dict, str]]:
+        """
+        提交一个新的分析结果，并返回本次可以提前推送的词条
+
+        Args:
+            analysis: calculate_detailed_index 的分析结果（None 表示词条被跳过）
+            remaining: 尚未分析的词条数
+
+        Returns:
+            [(分析结果, 放行原因)]，原因为 'instant' 或 'top_n_locked'
+        """
+        if analysis is not None:
+            score = float(analysis.get('蓝海指数', 0))
+            bisect.insort(self._scores, score)
+            keyword = analysis.get('词条')
+            if keyword not in self.released and BlueOceanAnalyzer.is_qualified(
+                score, int(analysis.get('闲鱼商品数', 0))
+            ):
+                self._pending.append(analysis)
+
+        return self._release(max(0, int(remaining)))
+
+    def _release(self, remaining: int) -> List[Tuple[Dict, str]]:
+        released = []
+        still_pending = []
+
+        for analysis in self._pending:
+            keyword = analysis.get('词条')
+            if keyword in self.released:
+                continue
+            score = float(analysis.get('蓝海指数', 0))
+            # 不低于当前分数的其它词条数（不含自身）
+            not_lower = len(self._scores) - bisect.bisect_left(self._scores, score) - 1
+
+            if score >= self.instant_score:
+                reason = 'instant'
+            elif not_lower + remaining < self.top_n:
+                reason = 'top_n_locked'
+            else:
+                still_pending.append(analysis)
+                continue
+
+            self.released[keyword] = reason
+            released.append((analysis, reason))
+
+        self._pending = still_pending
+        return released
+
+
 def calculate_index(xhs_heat: float, competition_count: int, average_wants: float) -> float:
     """便捷函数：计算蓝海指数"""
     return BlueOceanAnalyzer.calculate_index(xhs_heat, competition_count, average_wants)
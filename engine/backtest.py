@@ -0,0 +1,361 @@
+"""
+🧪 评分参数回测
+MIN_POTENTIAL_SCORE、MAX_COMPETITION、评级分档和时间衰减档位都是手工设定的常量，
+以前评估一次调整只能重新跑任务。这里把数据库里的历史观测按时间点回放
+（每个时间点只使用当时已有的数据，不偷看未来），在参数网格上一次性重算蓝海指数：
+
+- 每个参数组合：各时间点的合格集合、Top N、实际会推送的词条（Top N ∩ 合格）
+- 与基准参数（当前配置）对比：推送集合的平均 Jaccard 相似度、新增/移除次数
+- 事后验证：推送词条在下一次观测时热度是否上涨（命中率、平均涨幅）
+
+安装了 numpy 时按参数组合做向量化计算，否则使用纯 Python 实现（结果一致）。
+
+用法：python -m engine.backtest --min-score 80,120,200 --max-competition 200,300 --decay-scale 0,1,1.5
+"""
+
+import argparse
+import bisect
+import heapq
+import itertools
+import json
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import (
+    MIN_POTENTIAL_SCORE, MAX_COMPETITION, TOP_N_RESULTS, RATING_THRESHOLDS, TIME_DECAY_STEPS
+)
+from engine.analyzer import BlueOceanAnalyzer
+
+# 尝试导入numpy（用于向量化回测）
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+class SnapshotTable:
+    """按时间点回放得到的列式数据：每行是 (时间点, 词条) 当时最新的热度与竞争数据"""
+
+    def __init__(self):
+        self.times: List[float] = []        # 时间点（升序）
+        self.snap: List[int] = []           # 行所属时间点下标（升序）
+        self.keyword: List[str] = []
+        self.heat: List[float] = []
+        self.competition: List[float] = []
+        self.wants: List[float] = []
+        self.age_hours: List[float] = []    # 时间点距该词条最近一次小红书观测的小时数
+        self.future: List[Optional[float]] = []  # 下一次小红书观测的热度相对变化（没有后续观测为 None）
+
+    def __len__(self) -> int:
+        return len(self.keyword)
+
+    @classmethod
+    def build(cls, observations: Sequence[tuple], times: Sequence[float]) -> 'SnapshotTable':
+        """
+        回放历史观测
+
+        Args:
+            observations: [(观测时间, 词条, {'heat'} 或 {'competition', 'wants'})]，按时间升序
+            times: 回放时间点
+
+        Returns:
+            列式数据（同时有小红书和闲鱼观测的词条才会出现）
+        """
+        table = cls()
+        table.times = sorted(times)
+
+        # 每个词条的小红书观测序列，用于查“下一次观测”
+        heat_history: Dict[str, Tuple[List[float], List[float]]] = defaultdict(lambda: ([], []))
+        for at, keyword, values in observations:
+            if values.get('heat') is not None:
+                heat_history[keyword][0].append(at)
+                heat_history[keyword][1].append(float(values['heat']))
+
+        latest_xhs: Dict[str, Tuple[float, float]] = {}
+        latest_fish: Dict[str, Tuple[float, float]] = {}
+        cursor = 0
+        for snap_id, moment in enumerate(table.times):
+            while cursor < len(observations) and observations[cursor][0] <= moment:
+                at, keyword, values = observations[cursor]
+                if values.get('heat') is not None:
+                    latest_xhs[keyword] = (at, float(values['heat']))
+                if values.get('competition') is not None:
+                    latest_fish[keyword] = (float(values['competition']), float(values.get('wants') or 0))
+                cursor += 1
+
+            for keyword, (seen_at, heat) in latest_xhs.items():
+                fish = latest_fish.get(keyword)
+                if fish is None:
+                    continue
+                times_seen, heats = heat_history[keyword]
+                nxt = bisect.bisect_right(times_seen, moment)
+                table.snap.append(snap_id)
+                table.keyword.append(keyword)
+                table.heat.append(heat)
+                table.competition.append(fish[0])
+                table.wants.append(fish[1])
+                table.age_hours.append((moment - seen_at) / 3600)
+                table.future.append(
+                    (heats[nxt] - heat) / max(abs(heat), 1.0) if nxt < len(heats) else None
+                )
+        return table
+
+
+def snapshot_times(
+    observations: Sequence[tuple],
+    step_hours: float = 24,
+    since: Optional[float] = None,
+    until: Optional[float] = None
+) -> List[float]:
+    """在观测时间范围内按固定步长生成回放时间点（包含最后一次观测时间）"""
+    if not observations:
+        return []
+    start = observations[0][0] if since is None else since
+    end = observations[-1][0] if until is None else until
+    step = max(step_hours, 1e-6) * 3600
+    times = []
+    moment = start
+    while moment < end:
+        times.append(moment)
+        moment += step
+    times.append(end)
+    return times
+
+
+def parameter_grid(
+    min_score: Iterable[float] = (MIN_POTENTIAL_SCORE,),
+    max_competition: Iterable[int] = (MAX_COMPETITION,),
+    decay_steps: Iterable[tuple] = (TIME_DECAY_STEPS,),
+    top_n: Iterable[int] = (TOP_N_RESULTS,),
+    rating_thresholds: Iterable[tuple] = (RATING_THRESHOLDS,)
+) -> List[Dict]:
+    """参数网格（笛卡尔积）"""
+    return [
+        {
+            'min_score': score, 'max_competition': competition, 'decay_steps': tuple(steps),
+            'top_n': n, 'rating_thresholds': tuple(thresholds)
+        }
+        for score, competition, steps, n, thresholds in itertools.product(
+            min_score, max_competition, decay_steps, top_n, rating_thresholds
+        )
+    ]
+
+
+def scale_decay_steps(scale: float, steps=TIME_DECAY_STEPS) -> tuple:
+    """按比例缩放时间加成（0 表示关闭时间衰减，1 为当前配置）"""
+    return tuple((hours, round(1 + (factor - 1) * scale, 4)) for hours, factor in steps)
+
+
+def baseline_params() -> Dict:
+    """当前配置对应的参数"""
+    return parameter_grid()[0]
+
+
+class Backtester:
+    """在同一份回放数据上评估多组参数"""
+
+    def __init__(self, table: SnapshotTable, use_numpy: bool = HAS_NUMPY):
+        """
+        Args:
+            table: SnapshotTable.build 的结果
+            use_numpy: 是否使用 numpy 向量化（未安装时自动退回纯 Python）
+        """
+        self.table = table
+        self.use_numpy = use_numpy and HAS_NUMPY
+        # 与时间衰减无关的部分只算一次：热度 × 平均想要 / (竞争数 + 1)
+        self._base = [
+            h * w / (c + 1) for h, w, c in zip(table.heat, table.wants, table.competition)
+        ]
+        # 每个时间点的行区间（行已按时间点排序）
+        self._bounds = [
+            (bisect.bisect_left(table.snap, i), bisect.bisect_right(table.snap, i))
+            for i in range(len(table.times))
+        ]
+        if self.use_numpy:
+            self._np_base = np.asarray(self._base, dtype=float)
+            self._np_age = np.asarray(table.age_hours, dtype=float)
+            self._np_comp = np.asarray(table.competition, dtype=float)
+            self._np_snap = np.asarray(table.snap, dtype=np.int64)
+        self._index_cache: Dict[tuple, object] = {}
+
+    # ------------------------------------------------------------------ 计算
+
+    def _index(self, decay_steps: tuple):
+        """某组衰减档位下每行的蓝海指数（同一档位只算一次）"""
+        cached = self._index_cache.get(decay_steps)
+        if cached is not None:
+            return cached
+        if self.use_numpy:
+            bounds = np.asarray([hours for hours, _ in decay_steps], dtype=float)
+            factors = np.asarray([factor for _, factor in decay_steps] + [1.0], dtype=float)
+            decay = factors[np.searchsorted(bounds, self._np_age, side='left')]
+            index = np.round(self._np_base * decay, 2)
+        else:
+            index = [
+                round(base * BlueOceanAnalyzer.decay_for_age(age, decay_steps), 2)
+                for base, age in zip(self._base, self.table.age_hours)
+            ]
+        self._index_cache[decay_steps] = index
+        return index
+
+    def _select(self, params: Dict) -> Tuple[List[int], List[int], object]:
+        """
+        Returns:
+            (合格行号, Top N 行号, 蓝海指数)
+        """
+        index = self._index(params['decay_steps'])
+        top_n = max(1, int(params['top_n']))
+
+        if self.use_numpy:
+            eligible = (self._np_comp <= params['max_competition']) & (index > 0)
+            qualified = eligible & (index >= params['min_score'])
+            masked = np.where(eligible, index, -np.inf)
+            order = np.lexsort((-masked, self._np_snap))
+            starts = np.searchsorted(self._np_snap[order], self._np_snap[order], side='left')
+            rank = np.arange(len(order)) - starts
+            top = order[(rank < top_n) & eligible[order]]
+            return np.nonzero(qualified)[0].tolist(), sorted(top.tolist()), index.tolist()
+
+        competition = self.table.competition
+        qualified, top = [], []
+        for lo, hi in self._bounds:
+            eligible = [
+                row for row in range(lo, hi)
+                if competition[row] <= params['max_competition'] and index[row] > 0
+            ]
+            qualified.extend(row for row in eligible if index[row] >= params['min_score'])
+            top.extend(sorted(heapq.nlargest(top_n, eligible, key=lambda row: index[row])))
+        return qualified, top, index
+
+    # ------------------------------------------------------------------ 评估
+
+    def evaluate(self, params: Dict) -> Dict:
+        """
+        评估一组参数
+
+        Returns:
+            {'params', 'snapshots', 'pushed', 'qualified', 'top', 'avg_pushed', 'avg_qualified',
+             'hit_rate', 'avg_future_growth', 'ratings'}
+            其中 pushed / qualified / top 为每个时间点的词条列表（Top N 按指数降序，
+            与 NicheFinder.analyze 口径一致：先剔除竞争数超限的词条再取前 N）
+        """
+        table = self.table
+        qualified_rows, top_rows, index = self._select(params)
+        qualified_set = set(qualified_rows)
+
+        snapshots = len(table.times)
+        qualified = [[] for _ in range(snapshots)]
+        top = [[] for _ in range(snapshots)]
+        pushed = [[] for _ in range(snapshots)]
+        for row in qualified_rows:
+            qualified[table.snap[row]].append(table.keyword[row])
+        for row in sorted(top_rows, key=lambda r: (table.snap[r], -index[r], r)):
+            top[table.snap[row]].append(table.keyword[row])
+
+        ratings: Counter = Counter()
+        outcomes = []
+        for row in sorted(top_rows, key=lambda r: (table.snap[r], -index[r], r)):
+            if row not in qualified_set:
+                continue
+            pushed[table.snap[row]].append(table.keyword[row])
+            ratings[BlueOceanAnalyzer.get_rating(index[row], params['rating_thresholds'], params['min_score'])] += 1
+            if table.future[row] is not None:
+                outcomes.append(table.future[row])
+
+        return {
+            'params': params,
+            'snapshots': snapshots,
+            'qualified': qualified,
+            'top': top,
+            'pushed': pushed,
+            'avg_qualified': sum(map(len, qualified)) / snapshots if snapshots else 0.0,
+            'avg_pushed': sum(map(len, pushed)) / snapshots if snapshots else 0.0,
+            'hit_rate': sum(1 for o in outcomes if o > 0) / len(outcomes) if outcomes else None,
+            'avg_future_growth': sum(outcomes) / len(outcomes) if outcomes else None,
+            'ratings': dict(ratings),
+        }
+
+    def sweep(self, grid: Sequence[Dict], baseline: Optional[Dict] = None) -> List[Dict]:
+        """
+        评估整个参数网格，并与基准参数对比推送集合
+
+        Args:
+            grid: parameter_grid 的结果
+            baseline: 基准参数（默认当前配置）
+
+        Returns:
+            每组参数的评估结果（附 'vs_baseline': {'jaccard', 'added', 'removed'}），顺序同 grid
+        """
+        reference = self.evaluate(baseline or baseline_params())
+        reports = []
+        for params in grid:
+            report = self.evaluate(params)
+            jaccards, added, removed = [], 0, 0
+            for ours, theirs in zip(report['pushed'], reference['pushed']):
+                ours, theirs = set(ours), set(theirs)
+                union = ours | theirs
+                jaccards.append(len(ours & theirs) / len(union) if union else 1.0)
+                added += len(ours - theirs)
+                removed += len(theirs - ours)
+            report['vs_baseline'] = {
+                'jaccard': sum(jaccards) / len(jaccards) if jaccards else 1.0,
+                'added': added,
+                'removed': removed,
+            }
+            reports.append(report)
+        return reports
+
+
+def _floats(text: str) -> List[float]:
+    return [float(part) for part in text.split(',') if part.strip()]
+
+
+def _parse_date(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评分参数回测：在历史观测上扫描阈值组合")
+    parser.add_argument('--min-score', default=str(MIN_POTENTIAL_SCORE), help='蓝海指数下限，逗号分隔多个取值')
+    parser.add_argument('--max-competition', default=str(MAX_COMPETITION), help='竞争数上限，逗号分隔')
+    parser.add_argument('--decay-scale', default='1', help='时间加成缩放比例，逗号分隔（0 关闭，1 为当前档位）')
+    parser.add_argument('--top-n', default=str(TOP_N_RESULTS), help='Top N，逗号分隔')
+    parser.add_argument('--step-hours', type=float, default=24, help='回放时间点间隔（小时）')
+    parser.add_argument('--since', help='起始时间（ISO 格式）')
+    parser.add_argument('--until', help='结束时间（ISO 格式）')
+    parser.add_argument('--json', help='把完整结果写入该文件')
+    args = parser.parse_args()
+
+    from utils.datastore import get_store
+    observations = get_store().iter_observations()
+    times = snapshot_times(observations, args.step_hours, _parse_date(args.since), _parse_date(args.until))
+    table = SnapshotTable.build(observations, times)
+    grid = parameter_grid(
+        min_score=_floats(args.min_score),
+        max_competition=[int(v) for v in _floats(args.max_competition)],
+        decay_steps=[scale_decay_steps(scale) for scale in _floats(args.decay_scale)],
+        top_n=[int(v) for v in _floats(args.top_n)]
+    )
+    backtester = Backtester(table)
+    reports = backtester.sweep(grid)
+
+    print(f"🧪 回测：{len(times)} 个时间点，{len(table)} 行，{len(grid)} 组参数"
+          f"（{'numpy' if backtester.use_numpy else '纯 Python'}）")
+    print(f"{'指数下限':>8} {'竞争上限':>8} {'TopN':>5} {'衰减档位':<28} {'平均推送':>8} {'命中率':>7} {'Jaccard':>8}")
+    for report in sorted(reports, key=lambda r: (r['hit_rate'] or 0, r['avg_pushed']), reverse=True):
+        p = report['params']
+        hit = f"{report['hit_rate']:.0%}" if report['hit_rate'] is not None else '-'
+        steps = ','.join(f"{h}h×{f}" for h, f in p['decay_steps'])
+        print(f"{p['min_score']:>8g} {p['max_competition']:>8} {p['top_n']:>5} {steps:<28} "
+              f"{report['avg_pushed']:>8.2f} {hit:>7} {report['vs_baseline']['jaccard']:>8.2f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"✓ 完整结果已写入：{args.json}")
+
+
+if __name__ == '__main__':
+    main()
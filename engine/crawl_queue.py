@@ -0,0 +1,201 @@
+"""
+按期望价值排序的抓取队列 + 任务预算
+
+任务被拦截或超时提前结束时，已抓取的应当是最可能胜出的词条：
+- 期望价值 = 历史蓝海指数（无历史时取上界的折扣值）× 数据陈旧度加权
+- 上界 = 热度 × 最高想要数 ÷ (当前竞争数 + 1) × 最大时间加成（乐观估计，计算极廉价）
+- 上界都达不到推送门槛的词条排到最后
+
+预算（请求数 / 秒数）按价值从高到低消耗；设定秒数时，剩余时间平均切成每个词条的时间片。
+"""
+
+import heapq
+import time
+from typing import Dict, Iterable, List, Optional
+
+from config import (
+    MIN_POTENTIAL_SCORE,
+    REVISIT_MAX_INTERVAL,
+    UNKNOWN_VALUE_DISCOUNT,
+    KEYWORD_DEADLINE_SEC,
+    MIN_KEYWORD_SLICE_SEC,
+    TIME_DECAY_STEPS
+)
+
+
+# 时间衰减系数的最大值（与分析器使用同一张系数表）
+_MAX_TIME_DECAY = max(factor for _, factor in TIME_DECAY_STEPS)
+
+
+class MissionBudget:
+    """单次任务的抓取预算（请求数和/或秒数，None 表示不限）"""
+
+    def __init__(self, max_requests: Optional[int] = None, max_seconds: Optional[float] = None):
+        """
+        Args:
+            max_requests: 最多发起的抓取请求数
+            max_seconds: 最长抓取时间（秒）
+        """
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.requests_used = 0
+        self.started_at = time.monotonic()
+
+    def charge(self, requests: int = 1) -> None:
+        """记录消耗的请求数"""
+        self.requests_used += requests
+
+    def remaining_requests(self) -> Optional[int]:
+        if self.max_requests is None:
+            return None
+        return max(0, self.max_requests - self.requests_used)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.max_seconds is None:
+            return None
+        return max(0.0, self.max_seconds - self.elapsed())
+
+    def out_of_time(self) -> bool:
+        """剩余时间是否已不足一个最小时间片"""
+        remaining = self.remaining_seconds()
+        if remaining is None:
+            return False
+        return remaining <= 0 or remaining < min(MIN_KEYWORD_SLICE_SEC, self.max_seconds)
+
+    def time_slice(self, items_left: int, share: float = 1.0) -> Optional[float]:
+        """
+        剩余时间平均分给剩余词条的时间片
+        
+        Args:
+            items_left: 尚未处理的词条数
+            share: 本阶段可使用的剩余时间比例
+            
+        Returns:
+            时间片（秒，介于 MIN_KEYWORD_SLICE_SEC 与 KEYWORD_DEADLINE_SEC 之间，
+            且不超过本阶段剩余时间）；未设定总时限时为 None
+        """
+        remaining = self.remaining_seconds()
+        if remaining is None:
+            return None
+        phase = remaining * share
+        per_item = phase / max(1, items_left)
+        return min(KEYWORD_DEADLINE_SEC, max(MIN_KEYWORD_SLICE_SEC, per_item), phase)
+
+    def exhausted(self) -> bool:
+        """预算是否已用尽"""
+        if self.max_requests is not None and self.requests_used >= self.max_requests:
+            return True
+        return self.out_of_time()
+
+    def to_dict(self) -> Dict:
+        return {
+            'max_requests': self.max_requests,
+            'max_seconds': self.max_seconds,
+            'requests_used': self.requests_used,
+            'elapsed_seconds': round(self.elapsed(), 1),
+            'exhausted': self.exhausted(),
+            'deadline_hit': self.out_of_time()
+        }
+
+
+class CrawlQueue:
+    """按期望价值出队的抓取队列（最大堆）"""
+
+    def __init__(
+        self,
+        fish_cache: Optional[Dict[str, Dict]] = None,
+        prior_index: Optional[Dict[str, float]] = None,
+        last_seen: Optional[Dict[str, float]] = None,
+        now: Optional[float] = None
+    ):
+        """
+        Args:
+            fish_cache: 本地闲鱼数据 {词条: {'商品数', '想要数列表', ...}}
+            prior_index: 历史蓝海指数 {词条: 指数}
+            last_seen: 词条数据上次抓取时间戳 {词条: timestamp}
+            now: 当前时间戳
+        """
+        self.fish_cache = fish_cache or {}
+        self.prior_index = prior_index or {}
+        self.last_seen = last_seen or {}
+        self.now = time.time() if now is None else now
+        self._heap: List = []
+        self._counter = 0
+
+        # 没有闲鱼数据的词条，想要数按已知最大值乐观估计
+        known_wants = [
+            max(self._wants_list(data), default=0) for data in self.fish_cache.values()
+        ]
+        self._optimistic_wants = max(known_wants, default=0) or 1.0
+
+    @staticmethod
+    def _wants_list(data: Dict) -> List[float]:
+        wants = data.get('想要数列表') if isinstance(data, dict) else None
+        try:
+            return [float(w or 0) for w in (wants or [])]
+        except (TypeError, ValueError):
+            return []
+
+    def upper_bound(self, keyword: str, heat: float) -> float:
+        """在当前竞争数下可能达到的最高蓝海指数"""
+        data = self.fish_cache.get(keyword)
+        if isinstance(data, dict):
+            wants = max(self._wants_list(data), default=0) or self._optimistic_wants
+            competition = int(data.get('商品数', 0) or 0)
+        else:
+            wants = self._optimistic_wants
+            competition = 0
+        return float(heat) * wants / (competition + 1) * _MAX_TIME_DECAY
+
+    def score(self, keyword: str, heat: float) -> Dict[str, float]:
+        """
+        计算词条的期望价值
+
+        Returns:
+            {'value', 'upper_bound', 'expected', 'staleness_h'}
+        """
+        upper = self.upper_bound(keyword, heat)
+        prior = self.prior_index.get(keyword)
+        expected = float(prior) if prior is not None else upper * UNKNOWN_VALUE_DISCOUNT
+
+        # 从未抓取过视为最陈旧；陈旧度加权 1.0 ~ 2.0（满一天封顶）
+        seen = self.last_seen.get(keyword)
+        staleness_h = (self.now - seen) / 3600 if seen else REVISIT_MAX_INTERVAL / 3600
+        value = expected * (1 + min(staleness_h / 24, 1.0))
+
+        # 乐观估计都达不到推送门槛：几乎没有价值，排到最后
+        if upper < MIN_POTENTIAL_SCORE:
+            value *= 0.1
+
+        return {
+            'value': round(value, 2),
+            'upper_bound': round(upper, 2),
+            'expected': round(expected, 2),
+            'staleness_h': round(staleness_h, 1)
+        }
+
+    def push(self, item: Dict) -> None:
+        """加入词条（item 需包含 'word' 和 'heat'）"""
+        priority = self.score(item.get('word', ''), item.get('heat', 0) or 0)
+        self._counter += 1
+        # 同价值按热度、再按加入顺序
+        heapq.heappush(
+            self._heap,
+            (-priority['value'], -float(item.get('heat', 0) or 0), self._counter, item)
+        )
+
+    def pop(self) -> Dict:
+        """取出期望价值最高的词条"""
+        return heapq.heappop(self._heap)[-1]
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def ordered(self, items: Iterable[Dict]) -> List[Dict]:
+        """把一批词条按期望价值从高到低排序"""
+        for item in items:
+            self.push(item)
+        return [self.pop() for _ in range(len(self._heap))]
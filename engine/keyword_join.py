@@ -0,0 +1,226 @@
+"""
+🔗 跨平台关键词模糊匹配
+小红书与闲鱼的词条措辞常有差异（"复古相机" vs "复古胶片相机"），按字典键精确匹配时
+一边有热度、另一边没有竞争数据。两两比较在几千个词条以上无法扩展，这里：
+
+- 规范化：NFKC、统一小写、去掉空白/标点/符号
+- 字符 n-gram + 倒排索引，按全局稀有度排序的前缀过滤生成候选，再精确计算 Dice 相似度
+- 别名表缓存到 ALIAS_CACHE_FILE：右侧词表只追加，每个左侧词条记下已比较到词表的哪个位置，
+  下次只计算没比较过的配对（两次运行的词条集合不同也不会漏配）
+
+用法：KeywordJoiner().join(小红书词条, 闲鱼词条) -> {小红书词条: [(闲鱼词条, 相似度)]}
+"""
+
+import json
+import math
+import os
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import ALIAS_CACHE_FILE, KEYWORD_JOIN_THRESHOLD, KEYWORD_JOIN_NGRAM
+
+
+def normalize_keyword(text: str) -> str:
+    """规范化词条：全半角统一、小写，去掉空白、标点和符号"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return ''.join(ch for ch in text if unicodedata.category(ch)[0] not in 'PZSC')
+
+
+def keyword_grams(text: str, n: int = KEYWORD_JOIN_NGRAM) -> Set[str]:
+    """规范化后的字符 n-gram 集合（短于 n 的词条整体作为一个 gram）"""
+    norm = normalize_keyword(text)
+    if len(norm) <= n:
+        return {norm} if norm else set()
+    return {norm[i:i + n] for i in range(len(norm) - n + 1)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    """Dice 相似度：2|A∩B| / (|A| + |B|)"""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def _match(
+    probes: Dict[str, Set[str]],
+    targets: Dict[str, Set[str]],
+    threshold: float
+) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    前缀过滤 + 倒排索引的相似连接
+
+    Dice ≥ t 时，|A∩B| ≥ t·|A| / (2 - t)；按全局稀有度排序后，两个词条的
+    前 |A| - ⌈t·|A|/(2-t)⌉ + 1 个 gram 中必有一个相同，只索引/探测这些前缀。
+
+    Returns:
+        {probe 词条: [(target 词条, 相似度)]}（只含相似度 ≥ threshold 的配对）
+    """
+    df: Counter = Counter()
+    for grams in list(probes.values()) + list(targets.values()):
+        df.update(grams)
+
+    def prefix(grams: Set[str]) -> List[str]:
+        ordered = sorted(grams, key=lambda g: (df[g], g))
+        required = math.ceil(threshold * len(ordered) / (2 - threshold) - 1e-9)
+        return ordered[:max(1, len(ordered) - required + 1)]
+
+    index: Dict[str, List[str]] = defaultdict(list)
+    for keyword, grams in targets.items():
+        if grams:
+            for gram in prefix(grams):
+                index[gram].append(keyword)
+
+    matches: Dict[str, List[Tuple[str, float]]] = {}
+    for keyword, grams in probes.items():
+        if not grams:
+            continue
+        candidates = {target for gram in prefix(grams) for target in index.get(gram, ())}
+        found = []
+        for target in candidates:
+            # 长度过滤：Dice 上界 2·min / (|A| + |B|)
+            size = len(targets[target])
+            if 2 * min(size, len(grams)) / (size + len(grams)) < threshold:
+                continue
+            score = dice(grams, targets[target])
+            if score >= threshold:
+                found.append((target, round(score, 4)))
+        if found:
+            matches[keyword] = found
+    return matches
+
+
+class KeywordJoiner:
+    """带缓存的关键词模糊连接（别名表持久化到 cache_file）"""
+
+    def __init__(
+        self,
+        threshold: float = KEYWORD_JOIN_THRESHOLD,
+        n: int = KEYWORD_JOIN_NGRAM,
+        cache_file: Optional[str] = ALIAS_CACHE_FILE
+    ):
+        """
+        Args:
+            threshold: Dice 相似度阈值
+            n: n-gram 长度
+            cache_file: 别名表缓存文件（None 表示不缓存）
+        """
+        self.threshold = threshold
+        self.n = n
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._cache = self._load()
+
+    def _load(self) -> Dict:
+        # left: {左侧词条: 已比较过的右侧词表长度}；right: 右侧词表（只追加）
+        empty = {'threshold': self.threshold, 'n': self.n, 'left': {}, 'right': [], 'aliases': {}}
+        if not self.cache_file:
+            return empty
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return empty
+        # 阈值或 n-gram 长度变化后缓存失效
+        if not isinstance(cache, dict) or cache.get('threshold') != self.threshold or cache.get('n') != self.n:
+            return empty
+        # 旧格式只记录了见过的左侧词条，无法知道哪些配对真正比较过，整体重建
+        if not isinstance(cache.get('left'), dict):
+            return empty
+        return cache
+
+    def save(self) -> None:
+        """原子写入别名表缓存"""
+        if not self.cache_file:
+            return
+        with self._lock:
+            snapshot = json.dumps(self._cache, ensure_ascii=False)
+        tmp = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(snapshot)
+        os.replace(tmp, self.cache_file)
+
+    def join(self, left: Iterable[str], right: Iterable[str]) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        把左侧词条匹配到右侧的相似词条
+
+        Args:
+            left: 左侧词条（如小红书）
+            right: 右侧词条（如闲鱼）
+
+        Returns:
+            {左侧词条: [(右侧词条, 相似度)]}，按相似度降序；没有匹配的词条不出现
+        """
+        left = list(dict.fromkeys(left))
+        right = list(dict.fromkeys(right))
+        right_set = set(right)
+
+        with self._lock:
+            scored: Dict[str, int] = self._cache['left']
+            vocabulary: List[str] = self._cache['right']
+            aliases: Dict[str, List] = self._cache['aliases']
+
+            known_right = set(vocabulary)
+            vocabulary.extend(kw for kw in right if kw not in known_right)
+
+            # 每个左侧词条只和词表中它还没比较过的部分计算（新词条从 0 开始，即与全部历史右侧词条比较）
+            pending: Dict[int, List[str]] = defaultdict(list)
+            for keyword in left:
+                if scored.get(keyword, 0) < len(vocabulary):
+                    pending[scored.get(keyword, 0)].append(keyword)
+
+            grams: Dict[str, Set[str]] = {}
+
+            def grams_of(keywords: Iterable[str]) -> Dict[str, Set[str]]:
+                for kw in keywords:
+                    if kw not in grams:
+                        grams[kw] = keyword_grams(kw, self.n)
+                return {kw: grams[kw] for kw in keywords}
+
+            for start, probes in pending.items():
+                update = _match(grams_of(probes), grams_of(vocabulary[start:]), self.threshold)
+                for keyword, found in update.items():
+                    merged = dict(map(tuple, aliases.get(keyword, [])))
+                    merged.update(found)
+                    aliases[keyword] = [[target, score] for target, score in merged.items()]
+                for keyword in probes:
+                    scored[keyword] = len(vocabulary)
+
+            result = {}
+            for keyword in left:
+                found = [(target, score) for target, score in aliases.get(keyword, []) if target in right_set]
+                if found:
+                    result[keyword] = sorted(found, key=lambda item: (-item[1], item[0]))
+            return result
+
+
+def aggregate_fish(fish_data: Dict[str, Dict], matches: List[Tuple[str, float]]) -> Optional[Dict]:
+    """
+    汇总多个变体词条的闲鱼数据
+
+    变体词条的搜索结果大量重叠（搜"复古相机"也会返回"复古胶片相机"的商品），
+    商品数取最大值而不是求和；想要数合并后重新求平均。
+
+    Args:
+        fish_data: {词条: {'商品数', '想要总数', '想要数列表', ...}}
+        matches: join 返回的 [(闲鱼词条, 相似度)]
+
+    Returns:
+        汇总后的闲鱼数据（附 '匹配词条'），没有可用数据时返回 None
+    """
+    entries = [(kw, fish_data[kw]) for kw, _ in matches if isinstance(fish_data.get(kw), dict)]
+    if not entries:
+        return None
+    if len(entries) == 1:
+        return entries[0][1]
+
+    wants_list: List[float] = []
+    for _, entry in entries:
+        wants_list.extend(entry.get('想要数列表') or [])
+    return {
+        '商品数': max(int(entry.get('商品数', 0) or 0) for _, entry in entries),
+        '想要总数': sum(int(entry.get('想要总数', 0) or 0) for _, entry in entries),
+        '想要数列表': wants_list,
+        '匹配词条': [kw for kw, _ in entries],
+    }
@@ -0,0 +1,196 @@
+"""
+自适应重访计划
+按 (平台, 词条) 记录历史观测值，用 EWMA 估计每小时相对变化率，
+据此计算下次应重新抓取的时间：波动大的词条短间隔，平稳的词条长间隔。
+
+固定请求预算下，抓取资源优先投向数据真正在变化的词条。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from config import (
+    REVISIT_STATE_FILE,
+    REVISIT_MIN_INTERVAL,
+    REVISIT_MAX_INTERVAL,
+    REVISIT_TARGET_CHANGE,
+    REVISIT_EWMA_ALPHA
+)
+
+
+class RevisitPlanner:
+    """重访计划器（状态持久化到 REVISIT_STATE_FILE）"""
+
+    def __init__(
+        self,
+        state_file: str = REVISIT_STATE_FILE,
+        min_interval: float = REVISIT_MIN_INTERVAL,
+        max_interval: float = REVISIT_MAX_INTERVAL,
+        target_change: float = REVISIT_TARGET_CHANGE,
+        alpha: float = REVISIT_EWMA_ALPHA
+    ):
+        """
+        Args:
+            state_file: 状态文件路径
+            min_interval: 最短重访间隔（秒）
+            max_interval: 最长重访间隔（秒）
+            target_change: 预计相对变化达到该比例时重访
+            alpha: EWMA 平滑系数（越大越看重最新观测）
+        """
+        self.state_file = state_file
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_change = target_change
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.state: Dict[str, Dict] = self._load()
+
+    @staticmethod
+    def _key(platform: str, keyword: str) -> str:
+        return f"{platform}|{keyword}"
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        """原子写入状态文件"""
+        with self._lock:
+            snapshot = json.dumps(self.state, ensure_ascii=False, indent=2)
+        tmp = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(snapshot)
+        os.replace(tmp, self.state_file)
+
+    @staticmethod
+    def _relative_change(old: Sequence[float], new: Sequence[float]) -> float:
+        """多个指标中最大的相对变化"""
+        changes = [
+            abs(float(n) - float(o)) / max(abs(float(o)), 1.0)
+            for o, n in zip(old, new)
+        ]
+        return max(changes) if changes else 0.0
+
+    def interval_for(self, rate: float) -> float:
+        """根据每小时相对变化率计算重访间隔（秒）"""
+        if rate <= 0:
+            return self.max_interval
+        interval = self.target_change / rate * 3600
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def observe(
+        self,
+        platform: str,
+        keyword: str,
+        values: Sequence[float],
+        at: Optional[float] = None
+    ) -> Dict:
+        """
+        记录一次观测并更新下次到期时间
+
+        Args:
+            platform: 平台（'xhs' / 'fish'）
+            keyword: 词条
+            values: 观测指标（如小红书热度；闲鱼商品数、平均想要数）
+            at: 观测时间戳（默认当前时间）
+
+        Returns:
+            更新后的词条状态
+        """
+        at = time.time() if at is None else at
+        values = [float(v or 0) for v in values]
+        key = self._key(platform, keyword)
+
+        with self._lock:
+            entry = self.state.get(key)
+            if entry is None:
+                # 首次观测：变化率未知，按最短间隔尽快复查
+                entry = {'rate': None, 'observations': 0}
+                interval = self.min_interval
+            else:
+                hours = max((at - entry['last_seen']) / 3600, 1 / 60)
+                observed_rate = self._relative_change(entry['values'], values) / hours
+                if entry['rate'] is None:
+                    rate = observed_rate
+                else:
+                    rate = self.alpha * observed_rate + (1 - self.alpha) * entry['rate']
+                entry['rate'] = rate
+                interval = self.interval_for(rate)
+
+            entry['values'] = values
+            entry['last_seen'] = at
+            entry['next_due'] = at + interval
+            entry['observations'] += 1
+            self.state[key] = entry
+            return dict(entry)
+
+    def is_due(self, platform: str, keyword: str, now: Optional[float] = None) -> bool:
+        """是否到期（从未观测过的词条视为到期）"""
+        now = time.time() if now is None else now
+        entry = self.state.get(self._key(platform, keyword))
+        return entry is None or entry.get('next_due', 0) <= now
+
+    def due(
+        self,
+        platform: str,
+        keywords: Iterable[str],
+        limit: Optional[int] = None,
+        now: Optional[float] = None
+    ) -> List[str]:
+        """
+        筛选到期词条，按紧迫程度排序
+
+        排序：从未观测过的词条优先，其余按超期时长占重访间隔的比例降序。
+
+        Args:
+            platform: 平台
+            keywords: 候选词条
+            limit: 最多返回的词条数（请求预算）
+            now: 当前时间戳
+
+        Returns:
+            到期词条列表
+        """
+        now = time.time() if now is None else now
+        scored = []
+        for order, keyword in enumerate(keywords):
+            entry = self.state.get(self._key(platform, keyword))
+            if entry is None:
+                scored.append((float('inf'), -order, keyword))
+                continue
+            if entry.get('next_due', 0) > now:
+                continue
+            interval = max(entry['next_due'] - entry['last_seen'], 1.0)
+            scored.append(((now - entry['last_seen']) / interval, -order, keyword))
+        scored.sort(reverse=True)
+        keywords_due = [keyword for _, _, keyword in scored]
+        return keywords_due[:limit] if limit else keywords_due
+
+    def last_seen(self, platform: str) -> Dict[str, float]:
+        """平台内各词条上次观测的时间戳"""
+        prefix = f"{platform}|"
+        with self._lock:
+            return {
+                key[len(prefix):]: entry['last_seen']
+                for key, entry in self.state.items() if key.startswith(prefix)
+            }
+
+    def summary(self, platform: str) -> Dict[str, float]:
+        """平台重访统计（用于日志）"""
+        now = time.time()
+        entries = [v for k, v in self.state.items() if k.startswith(f"{platform}|")]
+        if not entries:
+            return {'tracked': 0, 'due': 0, 'median_interval_h': 0.0}
+        intervals = sorted(e['next_due'] - e['last_seen'] for e in entries)
+        return {
+            'tracked': len(entries),
+            'due': sum(1 for e in entries if e['next_due'] <= now),
+            'median_interval_h': round(intervals[len(intervals) // 2] / 3600, 1)
+        }
@@ -0,0 +1,203 @@
+"""
+🌊 大数据量离线评分
+NicheFinder.load_data 把两个 JSON 文件整体读入内存，再在单核上逐词条调用
+calculate_detailed_index（每个词条都会打印、并可能重新查询数据时间）。
+百万级词条时这里改为：
+
+- 流式读取：NDJSON 逐行读取，SQLite 只读连接逐批取行，不整体加载
+- 分块并行：每块在进程池中解析+评分，只把块内 Top N 传回主进程；在途块数有上限，内存占用恒定
+- Top N 堆：主进程用大小为 N 的小顶堆合并各块结果
+- 时间衰减系数只计算一次，评分过程中不打印、不读文件
+
+NDJSON 每行一个词条：{"词条", "热度", "商品数", "想要数列表" 或 "平均想要"}
+（python -m utils.datastore export --ndjson 可从数据库导出）
+"""
+
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import DATASTORE_DB, MAX_COMPETITION, TOP_N_RESULTS, STREAM_CHUNK_SIZE, STREAM_WORKERS
+from engine.analyzer import BlueOceanAnalyzer
+from utils import jsonio
+from utils.datastore import iter_latest_joined
+from utils.records import AnalysisRecord
+
+
+# 块内评分结果：(蓝海指数, -行号, 词条, 热度, 商品数, 想要数列表, 平均想要)
+Scored = Tuple[float, int, str, float, int, list, float]
+
+
+def iter_ndjson(path: str) -> Iterator[bytes]:
+    """逐行读取 NDJSON 原始字节（不解码、不解析，在工作进程中一次完成）"""
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def iter_sqlite(db_path: str = DATASTORE_DB) -> Iterator[tuple]:
+    """逐批读取数据库中两个平台都有数据的词条"""
+    return iter_latest_joined(db_path)
+
+
+def _parse_row(item) -> Optional[Tuple[str, float, int, list, float]]:
+    """
+    把一行原始数据统一为 (词条, 热度, 商品数, 想要数列表, 平均想要)
+
+    兼容 NDJSON 行（字节或文本）和 iter_latest_joined 的元组
+    """
+    if isinstance(item, (bytes, str)):
+        try:
+            record = jsonio.loads(item)
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        keyword = record.get('词条') or record.get('keyword')
+        heat = record.get('热度', 0)
+        competition = record.get('商品数', 0)
+        wants_list = record.get('想要数列表') or []
+        average = record.get('平均想要')
+    else:
+        keyword, heat, competition, wants_list = item
+        wants_list = jsonio.loads(wants_list) if isinstance(wants_list, str) else (wants_list or [])
+        average = None
+    if not keyword:
+        return None
+    try:
+        heat = float(heat or 0)
+        competition = int(competition or 0)
+        if wants_list:
+            average = sum(float(w or 0) for w in wants_list) / len(wants_list)
+        average = float(average or 0)
+    except (TypeError, ValueError):
+        return None
+    return keyword, heat, competition, wants_list, average
+
+
+def score_chunk(
+    start: int,
+    rows: List,
+    time_decay: float,
+    max_competition: int,
+    top_n: int
+) -> Tuple[int, List[Scored]]:
+    """
+    对一块数据评分，只返回块内 Top N（在工作进程中执行）
+
+    Args:
+        start: 块内第一行的全局行号（同分时按行号先后排序）
+        rows: 原始行
+        time_decay: 时间衰减系数
+        max_competition: 商品数上限（超过视为红海，不参与排名）
+        top_n: 返回块内前 N 个
+
+    Returns:
+        (本块行数, 块内 Top N)
+    """
+    scored = []
+    for offset, item in enumerate(rows):
+        parsed = _parse_row(item)
+        if parsed is None:
+            continue
+        keyword, heat, competition, wants_list, average = parsed
+        if competition > max_competition:
+            continue
+        # 与 calculate_index 相同的公式（参数修正 + 衰减 + 保留两位小数）
+        index = round(max(heat, 0) * max(average, 0) / (max(competition, 0) + 1) * time_decay, 2)
+        if index > 0:
+            scored.append((index, -(start + offset), keyword, heat, competition, wants_list, average))
+    return len(rows), heapq.nlargest(top_n, scored)
+
+
+def _analysis(entry: Scored, time_decay: float) -> Dict:
+    """把评分结果转成与 calculate_detailed_index 相同格式的分析信息"""
+    index, _, keyword, heat, competition, wants_list, average = entry
+    return AnalysisRecord(
+        keyword=keyword,
+        heat=heat,
+        competition=competition,
+        wants_list=wants_list,
+        avg_wants=round(average, 2),
+        index=index,
+        time_decay=time_decay,
+        rating=BlueOceanAnalyzer.get_rating(index),
+        competition_label=BlueOceanAnalyzer.assess_competition(competition),
+        heat_label=BlueOceanAnalyzer.assess_heat(heat),
+    ).to_dict()
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[Tuple[int, List]]:
+    iterator = iter(rows)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def stream_top_n(
+    rows: Iterable,
+    top_n: int = TOP_N_RESULTS,
+    max_competition: int = MAX_COMPETITION,
+    time_decay: Optional[float] = None,
+    workers: Optional[int] = STREAM_WORKERS,
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> Tuple[List[Dict], Dict]:
+    """
+    流式评分并取 Top N
+
+    Args:
+        rows: iter_ndjson / iter_sqlite 的结果（或同格式的任意可迭代对象）
+        top_n: 返回前 N 个
+        max_competition: 商品数上限
+        time_decay: 时间衰减系数（None 表示按最近一次观测时间计算一次）
+        workers: 并行进程数（1 表示在当前进程内执行，None 表示 CPU 核数）
+        chunk_size: 每块行数
+
+    Returns:
+        (按蓝海指数降序的分析结果, {'rows', 'chunks', 'seconds'})
+    """
+    if time_decay is None:
+        time_decay = BlueOceanAnalyzer._calculate_time_decay_factor()
+    top_n = max(1, int(top_n))
+    started = time.monotonic()
+    heap: List[Scored] = []
+    stats = {'rows': 0, 'chunks': 0}
+
+    def merge(result: Tuple[int, List[Scored]]) -> None:
+        count, scored = result
+        stats['rows'] += count
+        stats['chunks'] += 1
+        for entry in scored:
+            if len(heap) < top_n:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    chunks = _chunks(rows, max(1, chunk_size))
+    if workers == 1:
+        for start, chunk in chunks:
+            merge(score_chunk(start, chunk, time_decay, max_competition, top_n))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # 在途块数有上限：读取速度超过评分速度时不会把整个数据集堆进内存
+            limit = 2 * (workers or os.cpu_count() or 1)
+            pending = set()
+            for start, chunk in chunks:
+                pending.add(pool.submit(score_chunk, start, chunk, time_decay, max_competition, top_n))
+                if len(pending) >= limit:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        merge(future.result())
+            for future in pending:
+                merge(future.result())
+
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    return [_analysis(entry, time_decay) for entry in sorted(heap, reverse=True)], stats
@@ -0,0 +1,392 @@
+"""
+📈 词条时间序列
+数据库里每个词条只能取到最新快照，算不出 XHS_Heat 真正的增长率。
+这里按列存储每次观测（定长 array 文件，读取时 mmap 零拷贝），并为每个词条维护流式统计：
+
+- 列文件：t / kid / heat / competition / wants，每行一次观测，缺失的指标记 NaN
+- 流式统计：每次观测 O(1) 更新 EWMA 水平、速度（每小时变化量）、加速度
+- 区间扫描：时间列单调时二分定位，数千词条的时间窗口一次顺序读出
+
+用法：python -m engine.timeseries rebuild   # 从数据库的历史观测重建
+"""
+
+import argparse
+import bisect
+import json
+import math
+import mmap
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from config import TIMESERIES_DIR, TIMESERIES_EWMA_ALPHA, TIMESERIES_MIN_GAP
+
+
+# 列名 → array 类型码（定长）
+_COLUMNS = (('t', 'd'), ('kid', 'I'), ('heat', 'd'), ('competition', 'd'), ('wants', 'd'))
+METRICS = ('heat', 'competition', 'wants')
+_NAN = float('nan')
+
+
+def _update_stats(entry: Optional[Dict], t: float, x: float, alpha: float, min_gap: float) -> Optional[Dict]:
+    """
+    用一次观测更新单个指标的流式统计（O(1)）
+
+    Returns:
+        新的统计；距上次观测不足 min_gap 秒（含乱序数据）时返回 None，不参与速度估计
+    """
+    if entry is None:
+        return {'n': 1, 't': t, 'value': x, 'level': x, 'velocity': None, 'acceleration': None}
+    if t - entry['t'] < max(min_gap, 1e-9):
+        return None
+
+    hours = (t - entry['t']) / 3600
+    prev_velocity = entry['velocity']
+    observed_velocity = (x - entry['value']) / hours
+    velocity = observed_velocity if prev_velocity is None else (
+        alpha * observed_velocity + (1 - alpha) * prev_velocity
+    )
+
+    acceleration = entry['acceleration']
+    if prev_velocity is not None:
+        observed_acceleration = (velocity - prev_velocity) / hours
+        acceleration = observed_acceleration if acceleration is None else (
+            alpha * observed_acceleration + (1 - alpha) * acceleration
+        )
+
+    return {
+        'n': entry['n'] + 1,
+        't': t,
+        'value': x,
+        'level': alpha * x + (1 - alpha) * entry['level'],
+        'velocity': velocity,
+        'acceleration': acceleration,
+    }
+
+
+class TimeSeriesStore:
+    """按列存储的词条时间序列（单写入进程；流式统计定期落盘，启动时回放未落盘的尾部）"""
+
+    def __init__(
+        self,
+        root: str = TIMESERIES_DIR,
+        alpha: float = TIMESERIES_EWMA_ALPHA,
+        min_gap: float = TIMESERIES_MIN_GAP
+    ):
+        """
+        Args:
+            root: 存储目录
+            alpha: EWMA 平滑系数（越大越看重最新观测）
+            min_gap: 同一指标两次观测至少间隔多少秒才参与速度估计（间隔过短的变化率全是噪声）
+        """
+        self.root = str(root)
+        self.alpha = alpha
+        self.min_gap = min_gap
+        Path(self.root).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._state_file = os.path.join(self.root, 'state.json')
+        self._keywords_file = os.path.join(self.root, 'keywords.txt')
+        self._load_state()
+        self._rows = self._repair_columns()
+        self._replay_tail()
+
+    # ------------------------------------------------------------------ 持久化
+
+    def _path(self, column: str) -> str:
+        return os.path.join(self.root, f"{column}.col")
+
+    def _load_state(self) -> None:
+        try:
+            with open(self._state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        # 词条 ID 表单独追加写入：状态文件未落盘时列文件里的 kid 仍可解析
+        try:
+            with open(self._keywords_file, 'r', encoding='utf-8') as f:
+                self._keywords: List[str] = [line[:-1] for line in f if line.endswith('\n')]
+        except OSError:
+            self._keywords = []
+        self._kid: Dict[str, int] = {kw: i for i, kw in enumerate(self._keywords)}
+        self._stats: Dict[str, Dict[str, Dict]] = state.get('stats', {})
+        self._folded: int = state.get('rows', 0)
+        self._last_t: float = state.get('last_t', 0.0)
+        self._ordered: bool = state.get('ordered', True)
+
+    def _repair_columns(self) -> int:
+        """各列行数对齐（写入中途崩溃时截掉多出的半行），返回行数"""
+        counts = []
+        for column, code in _COLUMNS:
+            path = self._path(column)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            counts.append(size // array(code).itemsize)
+        rows = min(counts)
+        for column, code in _COLUMNS:
+            path = self._path(column)
+            expected = rows * array(code).itemsize
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+            elif os.path.getsize(path) != expected:
+                os.truncate(path, expected)
+        return rows
+
+    def _replay_tail(self) -> None:
+        """把状态文件之后追加的行重新折算进流式统计"""
+        if self._folded > self._rows:
+            # 状态比列文件新（列文件被删改过）：全部重算
+            self._stats, self._folded, self._last_t, self._ordered = {}, 0, 0.0, True
+        if self._folded == self._rows:
+            return
+        with self._columns() as cols:
+            tail = {name: cols[name][self._folded:self._rows].tolist() for name, _ in _COLUMNS}
+        for i, (t, kid) in enumerate(zip(tail['t'], tail['kid'])):
+            self._fold(self._keywords[kid], t, {m: tail[m][i] for m in METRICS})
+        self._folded = self._rows
+
+    def flush(self) -> None:
+        """原子写入流式统计（列文件在 record 时已直接追加）"""
+        with self._lock:
+            snapshot = json.dumps({
+                'stats': self._stats,
+                'rows': self._folded,
+                'last_t': self._last_t,
+                'ordered': self._ordered,
+            }, ensure_ascii=False)
+        tmp = f"{self._state_file}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(snapshot)
+        os.replace(tmp, self._state_file)
+
+    @contextmanager
+    def _columns(self) -> Iterator[Dict[str, memoryview]]:
+        """只读 mmap 所有列（按类型码转换的 memoryview，不复制数据）"""
+        files, maps, views = [], [], {}
+        try:
+            for column, code in _COLUMNS:
+                f = open(self._path(column), 'rb')
+                files.append(f)
+                if self._rows == 0:
+                    views[column] = memoryview(array(code))
+                    continue
+                mm = mmap.mmap(f.fileno(), self._rows * array(code).itemsize, access=mmap.ACCESS_READ)
+                maps.append(mm)
+                views[column] = memoryview(mm).cast(code)
+            yield views
+        finally:
+            for view in views.values():
+                view.release()
+            for mm in maps:
+                mm.close()
+            for f in files:
+                f.close()
+
+    # ------------------------------------------------------------------ 写入
+
+    def _fold(self, keyword: str, t: float, values: Dict[str, float]) -> None:
+        if t < self._last_t:
+            self._ordered = False
+        self._last_t = max(self._last_t, t)
+        stats = self._stats.setdefault(keyword, {})
+        for metric, value in values.items():
+            if value is None or math.isnan(value):
+                continue
+            updated = _update_stats(stats.get(metric), t, float(value), self.alpha, self.min_gap)
+            if updated is not None:
+                stats[metric] = updated
+
+    def record(self, observations: Dict[str, Dict[str, float]], at: Optional[float] = None) -> int:
+        """
+        追加一批观测并更新流式统计
+
+        Args:
+            observations: {词条: {'heat' / 'competition' / 'wants': 值}}（缺少的指标记为 NaN）
+            at: 观测时间戳（默认当前时间）
+
+        Returns:
+            写入的行数
+        """
+        at = time.time() if at is None else float(at)
+        with self._lock:
+            columns = {column: array(code) for column, code in _COLUMNS}
+            new_keywords = []
+            for keyword, values in observations.items():
+                if not keyword or not isinstance(values, dict):
+                    continue
+                kid = self._kid.get(keyword)
+                if kid is None:
+                    kid = self._kid[keyword] = len(self._keywords)
+                    self._keywords.append(keyword)
+                    new_keywords.append(keyword)
+                columns['t'].append(at)
+                columns['kid'].append(kid)
+                for metric in METRICS:
+                    value = values.get(metric)
+                    columns[metric].append(_NAN if value is None else float(value))
+
+            count = len(columns['t'])
+            if not count:
+                return 0
+            if new_keywords:
+                with open(self._keywords_file, 'a', encoding='utf-8') as f:
+                    f.write(''.join(f"{kw}\n" for kw in new_keywords))
+            for column, _ in _COLUMNS:
+                with open(self._path(column), 'ab') as f:
+                    columns[column].tofile(f)
+            self._rows += count
+            for i in range(count):
+                self._fold(
+                    self._keywords[columns['kid'][i]], at,
+                    {metric: columns[metric][i] for metric in METRICS}
+                )
+            self._folded = self._rows
+        return count
+
+    # ------------------------------------------------------------------ 查询
+
+    def stats(self, keyword: str, metric: str = 'heat') -> Optional[Dict]:
+        """
+        单个指标的流式统计
+
+        Returns:
+            {'n', 't', 'value', 'level', 'velocity'（每小时）, 'acceleration'（每小时²）}，没有观测时返回 None
+        """
+        with self._lock:
+            entry = self._stats.get(keyword, {}).get(metric)
+            return dict(entry) if entry else None
+
+    def growth_rate(self, keyword: str, metric: str = 'heat') -> Optional[float]:
+        """
+        相对日增长率：EWMA 速度 × 24 / EWMA 水平（0.2 表示每天增长 20%）
+
+        Returns:
+            增长率；观测不足两次时返回 None
+        """
+        entry = self.stats(keyword, metric)
+        if not entry or entry['velocity'] is None:
+            return None
+        return entry['velocity'] * 24 / max(abs(entry['level']), 1.0)
+
+    def scan(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        keywords: Optional[Iterable[str]] = None
+    ) -> Dict[str, Dict[str, List[float]]]:
+        """
+        区间扫描
+
+        Args:
+            since: 起始时间戳（含）
+            until: 结束时间戳（不含）
+            keywords: 只返回这些词条（None 表示全部）
+
+        Returns:
+            {词条: {'t': [...], 'heat': [...], 'competition': [...], 'wants': [...]}}，按写入顺序
+        """
+        with self._lock:
+            rows, ordered, names = self._rows, self._ordered, list(self._keywords)
+        wanted = None
+        if keywords is not None:
+            wanted = {self._kid[kw] for kw in keywords if kw in self._kid}
+
+        result: Dict[str, Dict[str, List[float]]] = {}
+        with self._columns() as cols:
+            t_col = cols['t']
+            lo, hi = 0, rows
+            if ordered:
+                if since is not None:
+                    lo = bisect.bisect_left(t_col, since, 0, rows)
+                if until is not None:
+                    hi = bisect.bisect_left(t_col, until, lo, rows)
+            window = {name: cols[name][lo:hi].tolist() for name, _ in _COLUMNS}
+
+        for i, (t, kid) in enumerate(zip(window['t'], window['kid'])):
+            if wanted is not None and kid not in wanted:
+                continue
+            if not ordered and ((since is not None and t < since) or (until is not None and t >= until)):
+                continue
+            series = result.get(names[kid])
+            if series is None:
+                series = result[names[kid]] = {'t': [], **{m: [] for m in METRICS}}
+            series['t'].append(t)
+            for metric in METRICS:
+                series[metric].append(window[metric][i])
+        return result
+
+    def keywords(self) -> List[str]:
+        """所有出现过的词条（按首次写入顺序）"""
+        with self._lock:
+            return list(self._keywords)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {'rows': self._rows, 'keywords': len(self._keywords), 'ordered': self._ordered}
+
+    def rebuild(self, observations: Iterable[tuple]) -> int:
+        """
+        清空后按时间顺序重新写入（用于从数据库历史回填）
+
+        Args:
+            observations: [(观测时间, 词条, {'heat' / 'competition' / 'wants': 值})]
+
+        Returns:
+            写入的行数
+        """
+        with self._lock:
+            for path in [self._path(column) for column, _ in _COLUMNS] + [self._keywords_file]:
+                open(path, 'wb').close()
+            self._keywords, self._kid, self._stats = [], {}, {}
+            self._rows, self._folded, self._last_t, self._ordered = 0, 0, 0.0, True
+        total, batch, batch_at = 0, {}, None
+        for at, keyword, values in sorted(observations, key=lambda row: row[0]):
+            # 同一时间点的观测合并成一批写入
+            if batch and (at != batch_at or keyword in batch):
+                total += self.record(batch, at=batch_at)
+                batch = {}
+            batch_at = at
+            batch[keyword] = values
+        if batch:
+            total += self.record(batch, at=batch_at)
+        self.flush()
+        return total
+
+
+_series: Dict[str, TimeSeriesStore] = {}
+_series_lock = threading.Lock()
+
+
+def get_series(root: str = TIMESERIES_DIR) -> TimeSeriesStore:
+    """获取进程内共享的时间序列存储（按目录复用）"""
+    with _series_lock:
+        series = _series.get(root)
+        if series is None:
+            series = _series[root] = TimeSeriesStore(root)
+        return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="词条时间序列：重建 / 统计")
+    parser.add_argument('action', choices=['rebuild', 'stats'])
+    parser.add_argument('--top', type=int, default=10, help='stats 时列出增长最快的词条数')
+    args = parser.parse_args()
+
+    series = get_series()
+    if args.action == 'rebuild':
+        from utils.datastore import get_store
+        count = series.rebuild(get_store().iter_observations())
+        print(f"✓ 已从数据库重建 {count} 行观测：{series.summary()}")
+        return
+
+    print(f"📈 时间序列：{series.summary()}")
+    rates = [(kw, series.growth_rate(kw)) for kw in series.keywords()]
+    rates = sorted(((kw, r) for kw, r in rates if r is not None), key=lambda item: item[1], reverse=True)
+    for keyword, rate in rates[:args.top]:
+        print(f"   • {keyword}：热度日增长 {rate:+.1%}")
+
+
+if __name__ == '__main__':
+    main()
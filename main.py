@@ -5,15 +5,21 @@
 
 import time
 import random
-import json
 import logging
 from datetime import datetime
-from typing import List, Dict
-from pathlib import Path
+from typing import List, Dict, Optional
 
-from scrapers.spider import get_xhs_trends, get_fish_data, SessionInvalidError
-from engine.analyzer import BlueOceanAnalyzer
+from scrapers.spider import get_xhs_trends, get_fish_data, discover_xhs_keywords, SessionInvalidError, CircuitOpenError
+from scrapers.network_ledger import get_network_ledger
+from engine.analyzer import BlueOceanAnalyzer, ProvisionalLeaderboard
+from engine.revisit_planner import RevisitPlanner
+from engine.timeseries import get_series
+from engine.crawl_queue import CrawlQueue, MissionBudget
 from utils.logic import NichePushLogic
+from utils.wecom_sender import AsyncWeComSender
+from utils.push_outbox import PushOutbox, OutboxDrainer
+from utils import jsonio, metrics
+from utils.datastore import get_store
 from utils.network_guard import ensure_china_network
 from config import (
     DELAY_BETWEEN_REQUESTS, 
@@ -22,11 +28,19 @@ from config import (
     LOG_FILE,
     REPORT_FILE,
     ENABLE_WECOM_PUSH,
+    OUTBOX_FLUSH_TIMEOUT,
+    MISSION_MAX_REQUESTS,
+    MISSION_MAX_SECONDS,
+    MISSION_XHS_TIME_SHARE,
+    DISCOVERY_EXPANSIONS_PER_RUN,
     MIN_POTENTIAL_SCORE,
     MAX_COMPETITION,
-    XHS_DATA_FILE
+    DATASTORE_DB
     ,REQUIRE_CHINA_NETWORK
     ,CHINA_NETWORK_STRICT
+    ,ENABLE_METRICS
+    ,METRICS_TEXTFILE
+    ,METRICS_SNAPSHOT_FILE
 )
 
 
@@ -42,6 +56,20 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _load_json_dict(path: str) -> Dict:
+    """读取 {词条: 数据} 格式的数据文件（不存在或损坏时返回空字典）"""
+    try:
+        data = jsonio.load(path)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_mock_source(data: Dict) -> bool:
+    """降级生成的模拟数据不写回数据文件"""
+    return 'mock' in str(data.get('source', '')) or bool(data.get('error'))
+
+
 class NicheHunterEngine:
     """蓝海赛道猎人引擎"""
     
@@ -54,29 +82,50 @@ class NicheHunterEngine:
         """
         self.silent_mode = silent_mode
         self.pusher = NichePushLogic() if ENABLE_WECOM_PUSH else None
+        self.sender = AsyncWeComSender(self.pusher) if self.pusher else None
+        self.outbox = PushOutbox() if self.pusher else None
+        self.drainer = OutboxDrainer(self.outbox, self.sender) if self.outbox else None
+        if self.drainer:
+            # 启动即投递：上次进程退出时未送达的消息在后台继续发送
+            self.drainer.start()
         self.results = []
         self.push_records = []
+        self.mission_enqueued: List[str] = []
+        self.leaderboard: Optional[ProvisionalLeaderboard] = None
+        self._alert_cursor = 0
+        self.planner = RevisitPlanner()
+        self.store = get_store()
+        self.series = get_series()
+        self.budget: Optional[MissionBudget] = None
+        self.budget_skipped: List[str] = []
+        self.timed_out: Dict[str, List[str]] = {'xhs': [], 'fish': []}
         
     def run_mission(
         self,
         top_trends_n: int = 15,
         top_results_n: int = 5,
-        enable_push: bool = ENABLE_WECOM_PUSH
+        enable_push: bool = ENABLE_WECOM_PUSH,
+        max_requests: Optional[int] = MISSION_MAX_REQUESTS,
+        max_seconds: Optional[float] = MISSION_MAX_SECONDS
     ) -> Dict:
         """
         执行完整蓝海挖掘任务
         
         流程：
-        1. 🔍 抓取小红书热搜词条（前15个）
-        2. 🛍️ 查询闲鱼数据（每个词间隔20-30秒）
+        1. 🔍 抓取小红书热搜词条（按期望价值选前15个）
+        2. 🛍️ 查询闲鱼数据（每个词间隔20-30秒，按期望价值从高到低消耗预算）
+           ⚡ 边分析边推送：顶级蓝海 / 已稳居Top N 的词条立即推送
         3. 📊 计算蓝海指数并排序
-        4. 📤 推送符合条件的词条到企业微信
+        4. 📤 推送剩余符合条件的词条到企业微信（与提前推送对账去重）
         5. 💾 保存分析报告
         
         Args:
             top_trends_n: 抓取的热搜词条数量
             top_results_n: 返回的最佳赛道数
             enable_push: 是否推送到企业微信
+            max_requests: 本次任务最多抓取请求数（None 表示不限）
+            max_seconds: 本次任务最长抓取时间（秒，None 表示不限）；
+                剩余时间按词条平分为时间片，超时的词条沿用缓存或跳过，结果标记为 partial
             
         Returns:
             执行结果字典
@@ -88,6 +137,12 @@ class NicheHunterEngine:
         
         start_time = datetime.now()
         logger.info("任务开始")
+        self.budget = MissionBudget(max_requests=max_requests, max_seconds=max_seconds)
+        self.budget_skipped = []
+        self.timed_out = {'xhs': [], 'fish': []}
+        self.mission_enqueued = []
+        # 网络流量账本按任务统计（闲鱼每个词条一个爬虫实例，都记到这里）
+        get_network_ledger().reset()
         
         try:
             # 1️⃣ 第一步：抓取小红书热搜词条
@@ -96,6 +151,7 @@ class NicheHunterEngine:
             
             if not keywords:
                 logger.warning("未能成功获取热搜词条")
+                self._export_metrics('failed', (datetime.now() - start_time).total_seconds())
                 return {
                     'status': 'failed',
                     'message': '未能获取热搜词条',
@@ -106,10 +162,17 @@ class NicheHunterEngine:
             
             # 2️⃣ 第二步：查询闲鱼数据并计算指数
             print("【第2步】🛍️ 查询闲鱼数据并计算蓝海指数...")
-            self.results = self._analyze_keywords(keywords)
+            self.leaderboard = (
+                ProvisionalLeaderboard(total=len(keywords), top_n=top_results_n)
+                if enable_push and self.pusher
+                else None
+            )
+            # 热度刷新后重新估值，预算优先花在最可能胜出的词条上
+            self.results = self._analyze_keywords(self._crawl_queue().ordered(keywords))
             
             if not self.results:
                 logger.warning("未能分析任何词条")
+                self._export_metrics('partial_failed', (datetime.now() - start_time).total_seconds())
                 return {
                     'status': 'partial_failed',
                     'message': '数据分析失败',
@@ -140,10 +203,22 @@ class NicheHunterEngine:
             for i, result in enumerate(top_results[:5], 1):
                 self._print_result(i, result)
             
-            # 4️⃣ 第四步：推送到企业微信
-            if enable_push and qualified_results:
+            # 4️⃣ 第四步：推送到企业微信（跳过已提前推送的词条）
+            early_pushed = self.leaderboard.released if self.leaderboard else {}
+            remaining_results = [r for r in qualified_results if r['词条'] not in early_pushed]
+            if early_pushed:
+                print(f"\n⚡ 已提前推送 {len(early_pushed)} 个词条，最终对账后剩余 {len(remaining_results)} 个待推送")
+                final_ranks = {r['词条']: i for i, r in enumerate(top_results, 1)}
+                for keyword, reason in early_pushed.items():
+                    if keyword not in final_ranks:
+                        logger.info(f"提前推送词条 '{keyword}'（{reason}）最终未进入 Top {top_results_n}")
+            if enable_push and remaining_results:
                 print("\n【第4步】📤 推送蓝海词条到企业微信...")
-                self._push_results(qualified_results)
+                self._push_results(remaining_results)
+            if self.drainer:
+                # 推送由后台投递器发送，此处只等待本次入队的词条（有上限）；未送达的消息留在发件箱稍后重试
+                if not self.drainer.wait_idle(self.mission_enqueued, timeout=OUTBOX_FLUSH_TIMEOUT):
+                    print(f"⏳ 仍有 {self.outbox.pending_count()} 条推送在发件箱中等待投递")
             
             # 5️⃣ 第五步：保存报告
             print("\n【第5步】💾 保存分析报告...")
@@ -158,34 +233,220 @@ class NicheHunterEngine:
             print(f"📊 统计信息：")
             print(f"  • 处理词条：{len(self.results)} 个")
             print(f"  • 优质词条：{len(qualified_results)} 个")
-            print(f"  • 推送成功：{len(self.push_records)} 个")
+            print(f"  • 推送入队：{len(self.push_records)} 个")
+            if self.budget_skipped:
+                print(f"  • 预算用尽跳过：{len(self.budget_skipped)} 个低价值词条")
+            timed_out_count = sum(len(v) for v in self.timed_out.values())
+            if timed_out_count:
+                print(f"  • 超出时间片：{timed_out_count} 个词条（沿用缓存或跳过）")
             print(f"  • 执行耗时：{duration}")
+            network_summary = get_network_ledger().summary()
+            if network_summary:
+                print(network_summary)
             
             logger.info(f"任务成功完成，耗时 {duration}")
             
+            partial = bool(self.budget_skipped or timed_out_count)
+            self._export_metrics('partial' if partial else 'success', duration.total_seconds())
             return {
-                'status': 'success',
+                'status': 'partial' if partial else 'success',
                 'keywords_analyzed': len(self.results),
                 'qualified_keywords': len(qualified_results),
                 'push_count': len(self.push_records),
                 'top_results': top_results,
+                'truncated': bool(self.budget_skipped),
+                'partial': partial,
+                'timed_out': self.timed_out,
+                'budget': self.budget.to_dict(),
                 'duration': str(duration)
             }
         
         except Exception as e:
             logger.error(f"任务执行出错：{e}", exc_info=True)
+            self._export_metrics('error', (datetime.now() - start_time).total_seconds())
             return {
                 'status': 'error',
                 'message': str(e),
                 'duration': str(datetime.now() - start_time)
             }
     
+    def refresh_xhs_trends(self, top_n: Optional[int] = None) -> Dict:
+        """
+        独立刷新小红书热度并写入数据库（成本低，可高频运行）
+        
+        只抓取重访计划中已到期的词条（最紧迫的优先）。
+        
+        Args:
+            top_n: 本次最多刷新的词条数（None 表示全部到期词条）
+            
+        Returns:
+            刷新统计 {'status', 'refreshed', 'skipped', 'duration'}
+        """
+        start_time = datetime.now()
+        all_keywords = list(self.store.latest_xhs().keys())
+        if not all_keywords:
+            return {'status': 'failed', 'message': f'{DATASTORE_DB} 中没有词条', 'refreshed': 0}
+        keywords = self.planner.due('xhs', all_keywords, limit=top_n)
+        if not keywords:
+            logger.info("小红书热度刷新：没有到期词条")
+            return {'status': 'success', 'refreshed': 0, 'skipped': 0, 'duration': str(datetime.now() - start_time)}
+        
+        try:
+            trends_data = get_xhs_trends(keywords, headless=self.silent_mode)
+        except Exception as e:
+            logger.warning(f"小红书热度刷新失败：{e}")
+            return {'status': 'error', 'message': str(e), 'refreshed': 0}
+        
+        refreshed = self._persist_xhs_trends(trends_data)
+        logger.info(f"小红书热度刷新：{refreshed}/{len(keywords)} 个到期词条已更新（共 {len(all_keywords)} 个）")
+        return {
+            'status': 'success',
+            'refreshed': refreshed,
+            'skipped': len(keywords) - refreshed,
+            'duration': str(datetime.now() - start_time)
+        }
+    
+    def refresh_fish_competition(self, keywords: Optional[List[str]] = None) -> Dict:
+        """
+        独立刷新闲鱼竞争数据并写入数据库（成本高，低频运行）
+        
+        所有词条共用一次浏览器启动，只写回清洗后的汇总字段。
+        
+        Args:
+            keywords: 要刷新的词条（None 表示数据库中重访计划已到期的词条）
+            
+        Returns:
+            刷新统计 {'status', 'refreshed', 'skipped', 'duration'}
+        """
+        start_time = datetime.now()
+        if keywords is None:
+            keywords = self.planner.due('fish', self.store.latest_xhs().keys())
+        if not keywords:
+            logger.info("闲鱼竞争数据刷新：没有到期词条")
+            return {'status': 'success', 'refreshed': 0, 'skipped': 0, 'duration': str(datetime.now() - start_time)}
+        
+        try:
+            fish_results = get_fish_data(keywords, headless=self.silent_mode, silent_mode=self.silent_mode)
+        except Exception as e:
+            logger.warning(f"闲鱼竞争数据刷新失败：{e}")
+            return {'status': 'error', 'message': str(e), 'refreshed': 0}
+        
+        refreshed = self._persist_fish_results(fish_results)
+        logger.info(f"闲鱼竞争数据刷新：{refreshed}/{len(keywords)} 个词条已更新")
+        return {
+            'status': 'success',
+            'refreshed': refreshed,
+            'skipped': len(keywords) - refreshed,
+            'duration': str(datetime.now() - start_time)
+        }
+    
+    def discover_keywords(self, max_expansions: int = DISCOVERY_EXPANSIONS_PER_RUN) -> Dict:
+        """
+        关键词发现：从现有词条出发收集相关搜索词，新词写入数据库进入挖掘流程
+        
+        Args:
+            max_expansions: 本次最多展开的词条数
+            
+        Returns:
+            发现统计 {'status', 'expanded', 'new_keywords', 'duration'}
+        """
+        start_time = datetime.now()
+        xhs_data = self.store.latest_xhs()
+        seeds = {
+            keyword: float(data.get('热度', 0) or 0) if isinstance(data, dict) else 0.0
+            for keyword, data in xhs_data.items()
+        }
+        
+        try:
+            discovered = discover_xhs_keywords(seeds, max_expansions=max_expansions, headless=self.silent_mode)
+        except Exception as e:
+            logger.warning(f"关键词发现失败：{e}")
+            return {'status': 'error', 'message': str(e), 'expanded': 0}
+        
+        new_keywords = [k for k in discovered if k not in xhs_data]
+        self._persist_xhs_trends(discovered)
+        logger.info(f"关键词发现：展开 {len(discovered)} 个词条，新增 {len(new_keywords)} 个候选词")
+        return {
+            'status': 'success',
+            'expanded': len(discovered),
+            'new_keywords': new_keywords,
+            'duration': str(datetime.now() - start_time)
+        }
+    
+    def _load_prior_index(self) -> Dict[str, float]:
+        """读取各词条最近一次的蓝海指数（用于估计期望价值）"""
+        snapshot = self.store.index_snapshot()
+        if snapshot:
+            return snapshot
+        report = _load_json_dict(REPORT_FILE)
+        snapshot = report.get('index_snapshot')
+        if isinstance(snapshot, dict):
+            return snapshot
+        return {
+            r.get('词条'): r.get('蓝海指数', 0)
+            for r in report.get('top_results', []) if isinstance(r, dict) and r.get('词条')
+        }
+    
+    def _crawl_queue(self) -> CrawlQueue:
+        """构建按期望价值排序的抓取队列"""
+        return CrawlQueue(
+            fish_cache=self.store.latest_fish(),
+            prior_index=self._load_prior_index(),
+            last_seen=self.planner.last_seen('fish')
+        )
+    
+    def _persist_xhs_trends(self, trends_data: Dict) -> int:
+        """
+        把抓取到的小红书热度写入数据库和时间序列，并记录到重访计划
+        
+        Returns:
+            写入的词条数（模拟数据不写入）
+        """
+        observations = {}
+        for keyword, data in trends_data.items():
+            if not isinstance(data, dict) or _is_mock_source(data) or not data.get('trend_score'):
+                continue
+            observations[keyword] = {'热度': data['trend_score'], '笔记数': data.get('count', 0)}
+            self.planner.observe('xhs', keyword, [data['trend_score']])
+        
+        if observations:
+            # 只追加本次观测（批量写入），不会覆盖其他任务同时写入的词条
+            self.store.record_xhs(observations)
+            self.series.record({kw: {'heat': obs['热度']} for kw, obs in observations.items()})
+            self.series.flush()
+            self.planner.save()
+        return len(observations)
+    
+    def _persist_fish_results(self, fish_results: Dict) -> int:
+        """
+        把抓取到的闲鱼数据清洗汇总后写入数据库和时间序列，并记录到重访计划
+        
+        Returns:
+            写入的词条数（模拟数据不写入）
+        """
+        fish_data = {}
+        for keyword, data in fish_results.items():
+            if not isinstance(data, dict) or _is_mock_source(data):
+                continue
+            observation = BlueOceanAnalyzer.summarize_fish_observation(keyword, data)
+            fish_data[keyword] = observation
+            self.planner.observe('fish', keyword, [observation['商品数'], observation['平均想要']])
+        
+        if fish_data:
+            self.store.record_fish(fish_data)
+            self.series.record({
+                kw: {'competition': obs['商品数'], 'wants': obs['平均想要']} for kw, obs in fish_data.items()
+            })
+            self.series.flush()
+            self.planner.save()
+        return len(fish_data)
+    
     def _fetch_xhs_trends(self, top_n: int = 15) -> List[Dict]:
         """
         获取小红书热搜词条
         
         流程：
-        1. 从 xhs_data.json 读取初始关键词列表
+        1. 从数据库读取初始关键词列表（各词条最新热度）
         2. 使用 Playwright 爬虫获取这些关键词的热搜数据
         3. 返回前 N 个热搜词条
         
@@ -196,17 +457,10 @@ class NicheHunterEngine:
             热搜词条列表
         """
         try:
-            # 步骤1：从 xhs_data.json 读取初始关键词
+            # 步骤1：从数据库读取初始关键词
             print("📖 正在加载初始关键词列表...")
             
-            xhs_file = Path(XHS_DATA_FILE)
-            if not xhs_file.exists():
-                logger.error(f"文件不存在：{XHS_DATA_FILE}")
-                print(f"❌ 找不到文件：{XHS_DATA_FILE}")
-                return []
-            
-            with open(xhs_file, 'r', encoding='utf-8') as f:
-                xhs_data = json.load(f)
+            xhs_data = self.store.latest_xhs()
             
             # 转换数据格式：从 {keyword: {热度: value}} 转为 [{word: keyword, heat: value}, ...]
             keywords_list = [
@@ -218,27 +472,63 @@ class NicheHunterEngine:
             ]
             
             if not keywords_list:
-                logger.warning("xhs_data.json 中没有有效数据")
-                print("❌ xhs_data.json 中没有有效数据")
+                logger.warning(f"{DATASTORE_DB} 中没有小红书数据")
+                print(f"❌ {DATASTORE_DB} 中没有小红书数据（可运行 python -m utils.datastore import 导入 xhs_data.json）")
                 return []
             
             print(f"✓ 已加载 {len(keywords_list)} 个初始关键词")
             
+            # 按期望价值排序：任务提前结束时，已覆盖的是最有希望的词条
+            keywords_list = self._crawl_queue().ordered(keywords_list)
+            
             # 步骤2：使用 Playwright 爬虫获取热搜数据
             print("🚀 启动 Playwright 爬虫获取热搜数据...")
             
-            # 提取关键词文本列表用于爬虫
-            keyword_texts = [item['word'] for item in keywords_list[:top_n]]
+            # 重访计划：只抓取到期词条，其余沿用上次抓取写回的热度
+            candidate_texts = [item['word'] for item in keywords_list[:top_n]]
+            due_texts = set(self.planner.due('xhs', candidate_texts))
+            keyword_texts = [k for k in candidate_texts if k in due_texts]
+            remaining = self.budget.remaining_requests() if self.budget else None
+            if remaining is not None:
+                # 小红书最多用掉一半预算，其余留给成本更高的闲鱼查询
+                allowance = (remaining + 1) // 2
+                if len(keyword_texts) > allowance:
+                    print(f"💰 请求预算剩余 {remaining}，小红书只抓取价值最高的 {allowance} 个到期词条")
+                    keyword_texts = keyword_texts[:allowance]
+            if self.budget:
+                self.budget.charge(len(keyword_texts))
+            print(f"🗓️ 重访计划：{len(keyword_texts)} 个词条到期，{len(candidate_texts) - len(keyword_texts)} 个沿用缓存热度")
             
             try:
                 # 调用 Playwright 爬虫
-                trends_data = get_xhs_trends(keyword_texts, headless=self.silent_mode)
+                # 设定总时限时：小红书阶段只用其中一部分，每个词条再分到一个时间片
+                phase_timeout = keyword_timeout = None
+                if self.budget and self.budget.remaining_seconds() is not None:
+                    phase_timeout = self.budget.remaining_seconds() * MISSION_XHS_TIME_SHARE
+                    keyword_timeout = self.budget.time_slice(len(keyword_texts), share=MISSION_XHS_TIME_SHARE)
+                trends_data = get_xhs_trends(
+                    keyword_texts,
+                    headless=self.silent_mode,
+                    timeout=phase_timeout,
+                    keyword_timeout=keyword_timeout
+                ) if keyword_texts else {}
+                self._persist_xhs_trends(trends_data)
+                if phase_timeout:
+                    self.timed_out['xhs'].extend(k for k in keyword_texts if k not in trends_data)
                 
                 # 合并结果：使用爬虫获取的热搜数据，如果爬虫失败则使用本地数据
                 result_trends = []
                 for item in keywords_list[:top_n]:
                     keyword = item['word']
-                    if keyword in trends_data:
+                    if keyword not in keyword_texts:
+                        # 未到期：上次抓取的热度仍可信
+                        result_trends.append({
+                            'word': keyword,
+                            'heat': item['heat'],
+                            'note_count': 0,
+                            'source': 'cached'
+                        })
+                    elif keyword in trends_data:
                         # 使用爬虫数据
                         result_trends.append({
                             'word': keyword,
@@ -269,7 +559,7 @@ class NicheHunterEngine:
             except Exception as e:
                 # Session失效/被拦截等：明确提示并回退本地数据
                 logger.warning(f"在线爬取热搜失败，回退本地数据：{e}")
-                print("⚠️  在线爬取热搜失败，将回退到本地 xhs_data.json")
+                print("⚠️  在线爬取热搜失败，将回退到数据库中的热度")
                 msg = str(e)
                 if "Session无效" in msg or "login" in msg.lower() or "登录" in msg:
                     print("🔐 检测到登录/Session问题：")
@@ -294,8 +584,13 @@ class NicheHunterEngine:
         """
         results = []
         total = len(keywords)
+        self._alert_cursor = 0
+        fish_cache = self.store.latest_fish(k.get('word', '') for k in keywords)
         
         for idx, keyword_item in enumerate(keywords, 1):
+            # 上一个词条可能被跳过：剩余数变化后重新评估待定词条
+            self._stream_alerts(results, remaining=total - idx + 1)
+
             keyword = keyword_item.get('word', '')
             xhs_heat = keyword_item.get('heat', 0)
             
@@ -304,9 +599,53 @@ class NicheHunterEngine:
             
             print(f"\n[{idx}/{total}] 正在分析：{keyword}")
             
+            # 重访计划：闲鱼数据未到期时直接复用缓存，不发请求也无需冷却
+            # 预算用尽：有缓存的词条仍用缓存分析，没有缓存的跳过（队列按价值排序，跳过的是低价值词条）
+            out_of_budget = bool(self.budget and self.budget.exhausted())
+            if out_of_budget and keyword not in fish_cache:
+                print("💰 抓取预算已用尽，跳过")
+                self.budget_skipped.append(keyword)
+                continue
+            if keyword in fish_cache and (out_of_budget or not self.planner.is_due('fish', keyword)):
+                print("💰 抓取预算已用尽，沿用缓存" if out_of_budget else "🗓️ 闲鱼数据未到期，沿用缓存")
+                index, analysis = BlueOceanAnalyzer.calculate_detailed_index(
+                    xhs_data={'word': keyword, 'heat': xhs_heat},
+                    fish_data=fish_cache[keyword]
+                )
+                results.append(analysis)
+                self._stream_alerts(results, remaining=total - idx)
+                continue
+            
             try:
                 # 查询闲鱼数据（需要传递列表）
-                fish_info = get_fish_data([keyword], headless=self.silent_mode, silent_mode=self.silent_mode)
+                if self.budget:
+                    self.budget.charge()
+                # 设定总时限时：剩余时间平分给剩余词条，超出时间片即取消
+                time_slice = self.budget.time_slice(total - idx + 1) if self.budget else None
+                fish_info = get_fish_data(
+                    [keyword],
+                    headless=self.silent_mode,
+                    silent_mode=self.silent_mode,
+                    timeout=time_slice,
+                    keyword_timeout=time_slice
+                )
+                if keyword not in fish_info:
+                    # 超出时间片被取消或抓取失败：有缓存的沿用缓存，不按空数据计算（否则竞争数为0会虚高）
+                    if time_slice is not None:
+                        print(f"⏰ 超出时间片 {time_slice:.0f} 秒")
+                        self.timed_out['fish'].append(keyword)
+                    else:
+                        # 没有时间片就不存在超时，按抓取失败处理（不把任务标记为 partial）
+                        logger.warning(f"分析词条 '{keyword}' 失败：未返回闲鱼数据")
+                    if keyword in fish_cache:
+                        index, analysis = BlueOceanAnalyzer.calculate_detailed_index(
+                            xhs_data={'word': keyword, 'heat': xhs_heat},
+                            fish_data=fish_cache[keyword]
+                        )
+                        results.append(analysis)
+                        self._stream_alerts(results, remaining=total - idx)
+                    continue
+                self._persist_fish_results(fish_info)
                 
                 # 计算蓝海指数
                 index, analysis = BlueOceanAnalyzer.calculate_detailed_index(
@@ -315,12 +654,31 @@ class NicheHunterEngine:
                 )
                 
                 results.append(analysis)
+                self._stream_alerts(results, remaining=total - idx)
                 
                 # 强制冷却（防止IP封禁）
                 wait_time = random.uniform(*DELAY_BETWEEN_REQUESTS)
+                remaining_sec = self.budget.remaining_seconds() if self.budget else None
+                if remaining_sec is not None:
+                    # 冷却不拖过任务总时限
+                    wait_time = min(wait_time, remaining_sec)
                 print(f"⏳ 冷却 {wait_time:.1f} 秒...")
                 time.sleep(wait_time)
 
+            except CircuitOpenError as e:
+                # 闲鱼连续被拦截已熔断：不再发请求，有缓存的词条沿用缓存
+                print(f"🔌 {e}")
+                if keyword in fish_cache:
+                    index, analysis = BlueOceanAnalyzer.calculate_detailed_index(
+                        xhs_data={'word': keyword, 'heat': xhs_heat},
+                        fish_data=fish_cache[keyword]
+                    )
+                    results.append(analysis)
+                    self._stream_alerts(results, remaining=total - idx)
+                else:
+                    self.budget_skipped.append(keyword)
+                continue
+
             except SessionInvalidError as e:
                 # 闲鱼Session失效：给出指引 + 回退本地数据（避免空结果/静默失败）
                 if not self.silent_mode:
@@ -328,23 +686,19 @@ class NicheHunterEngine:
                     print(f"  - {e}")
                     print("  1) 运行：python login_helper.py（可见窗口完成登录/验证）")
                     print("  2) 若仍失败：先删除 browser_profile 后再登录")
-                    print("⚠️  将尝试使用本地 fish_data.json 继续分析")
+                    print("⚠️  将尝试使用数据库中的闲鱼数据继续分析")
 
                 try:
-                    fish_file = Path('fish_data.json')
-                    if fish_file.exists():
-                        with open(fish_file, 'r', encoding='utf-8') as f:
-                            fish_data_dict = json.load(f)
-
-                        fish_info = fish_data_dict.get(keyword, {
-                            '商品数': 0,
-                            '想要人数': 0
-                        })
-                        index, analysis = BlueOceanAnalyzer.calculate_detailed_index(
-                            xhs_data={'word': keyword, 'heat': xhs_heat},
-                            fish_data=fish_info
-                        )
-                        results.append(analysis)
+                    fish_info = fish_cache.get(keyword, {
+                        '商品数': 0,
+                        '想要人数': 0
+                    })
+                    index, analysis = BlueOceanAnalyzer.calculate_detailed_index(
+                        xhs_data={'word': keyword, 'heat': xhs_heat},
+                        fish_data=fish_info
+                    )
+                    results.append(analysis)
+                    self._stream_alerts(results, remaining=total - idx)
                 except Exception as local_e:
                     logger.warning(f"使用本地闲鱼数据回退失败：{local_e}")
                 continue
@@ -354,23 +708,19 @@ class NicheHunterEngine:
                 logger.warning(f"Playwright 不可用，跳过关键词 '{keyword}'：{e}")
                 print(f"⚠️  Playwright 不可用，使用本地数据分析")
                 
-                # 尝试从本地数据中获取闲鱼数据
+                # 尝试从数据库中获取闲鱼数据
                 try:
-                    fish_file = Path('fish_data.json')
-                    if fish_file.exists():
-                        with open(fish_file, 'r', encoding='utf-8') as f:
-                            fish_data_dict = json.load(f)
-                        
-                        fish_info = fish_data_dict.get(keyword, {
-                            '商品数': 0,
-                            '想要人数': 0
-                        })
-                        
-                        index, analysis = BlueOceanAnalyzer.calculate_detailed_index(
-                            xhs_data={'word': keyword, 'heat': xhs_heat},
-                            fish_data=fish_info
-                        )
-                        results.append(analysis)
+                    fish_info = fish_cache.get(keyword, {
+                        '商品数': 0,
+                        '想要人数': 0
+                    })
+                    
+                    index, analysis = BlueOceanAnalyzer.calculate_detailed_index(
+                        xhs_data={'word': keyword, 'heat': xhs_heat},
+                        fish_data=fish_info
+                    )
+                    results.append(analysis)
+                    self._stream_alerts(results, remaining=total - idx)
                 except Exception as local_e:
                     logger.warning(f"使用本地数据分析失败：{local_e}")
                     continue
@@ -379,7 +729,34 @@ class NicheHunterEngine:
                 logger.warning(f"分析词条 '{keyword}' 失败：{e}")
                 continue
         
+        self._stream_alerts(results, remaining=0)
         return results
+
+    def _stream_alerts(self, results: List[Dict], remaining: int) -> None:
+        """
+        把新产生的分析结果送入临时排行榜，立即推送可以确定的蓝海词条
+        
+        Args:
+            results: 当前已累计的分析结果
+            remaining: 尚未分析的词条数
+        """
+        if not self.leaderboard:
+            return
+        
+        new_results = results[self._alert_cursor:]
+        self._alert_cursor = len(results)
+        
+        released = []
+        for analysis in new_results:
+            released.extend(self.leaderboard.offer(analysis, remaining))
+        if not new_results:
+            released.extend(self.leaderboard.offer(None, remaining))
+        
+        for analysis, reason in released:
+            label = '顶级蓝海' if reason == 'instant' else '已稳居Top榜'
+            print(f"⚡ 提前推送（{label}）：{analysis['词条']} - 蓝海指数{analysis['蓝海指数']:.2f}")
+            logger.info(f"提前推送词条：{analysis['词条']}（{reason}）")
+            self._push_results([analysis], mode='early')
     
     def _print_result(self, rank: int, result: Dict) -> None:
         """
@@ -395,38 +772,52 @@ class NicheHunterEngine:
         print(f"  🛍️ 竞争对手：{result['闲鱼商品数']} {result['竞争度评估']}")
         print(f"  ❤️ 平均想要数：{result['平均想要数']:.1f} 人")
     
-    def _push_results(self, results: List[Dict]) -> None:
+    def _push_results(self, results: List[Dict], mode: str = 'final') -> None:
         """
         推送结果到企业微信
         
         Args:
             results: 要推送的结果列表
+            mode: 推送方式（'early' 边分析边推送 / 'final' 任务结束后推送）
         """
-        if not self.pusher or not results:
+        if not self.outbox or not results:
             return
         
-        success_count = 0
+        # 只写入发件箱（PUSH_INTERVAL 内推送过的词条自动跳过），由后台投递器合并发送
+        enqueued = self.outbox.enqueue(results, mode=mode)
+        self.mission_enqueued.extend(enqueued)
+        self.drainer.notify()
         
-        for result in results:
-            success = self.pusher.push_to_wecom(
-                keyword=result['词条'],
-                score=result['蓝海指数'],
-                fish_count=result['闲鱼商品数'],
-                avg_wants=result['平均想要数'],
-                xhs_heat=int(result['小红书热度'])
-            )
-            
-            if success:
-                success_count += 1
-                self.push_records.append({
-                    'keyword': result['词条'],
-                    'timestamp': datetime.now().isoformat()
-                })
-            
-            # 推送之间的间隔
-            time.sleep(2)
+        for keyword in enqueued:
+            self.push_records.append({
+                'keyword': keyword,
+                'timestamp': datetime.now().isoformat(),
+                'mode': mode
+            })
         
-        print(f"✓ 推送完成：{success_count}/{len(results)} 成功")
+        suppressed = len(results) - len(enqueued)
+        if suppressed:
+            print(f"⏭️  {suppressed} 个词条在推送间隔（{PUSH_INTERVAL}秒）内已推送过，跳过")
+        if mode == 'final':
+            print(f"✓ 已入队推送：{len(enqueued)} 个词条（后台合并发送）")
+    
+    def _export_metrics(self, status: str, seconds: float) -> None:
+        """
+        任务结束时写出监控指标（Prometheus textfile + JSON 快照）
+        
+        Args:
+            status: 任务状态（success / partial / failed / partial_failed / error）
+            seconds: 任务耗时
+        """
+        if not ENABLE_METRICS:
+            return
+        try:
+            metrics.mission_duration().set(seconds)
+            metrics.mission_runs().inc(status=status)
+            metrics.get_metrics().write()
+            print(f"✓ 监控指标已保存到：{METRICS_TEXTFILE}、{METRICS_SNAPSHOT_FILE}")
+        except Exception as e:
+            logger.error(f"写出监控指标失败：{e}")
     
     def _save_report(self, results: List[Dict]) -> None:
         """
@@ -440,6 +831,28 @@ class NicheHunterEngine:
             'total_analyzed': len(self.results),
             'top_results': results,
             'push_records': self.push_records,
+            # 全部已分析词条的指数，下次任务据此估计期望价值
+            'index_snapshot': {
+                **self._load_prior_index(),
+                **{r['词条']: r['蓝海指数'] for r in self.results}
+            },
+            'budget': self.budget.to_dict() if self.budget else None,
+            'skipped_by_budget': self.budget_skipped,
+            # 超出时间片的词条：小红书沿用上次热度，闲鱼沿用缓存或跳过
+            'timed_out': self.timed_out,
+            'partial': bool(self.budget_skipped or any(self.timed_out.values())),
+            # 各平台请求数/传输字节（按资源类型、主机、页面、词条）、路由层拦截数、首个 API 响应时间
+            'network': get_network_ledger().to_dict(),
+            'early_alerts': [
+                {
+                    'keyword': keyword,
+                    'reason': reason,
+                    'final_rank': next(
+                        (i for i, r in enumerate(results, 1) if r['词条'] == keyword), None
+                    )
+                }
+                for keyword, reason in (self.leaderboard.released.items() if self.leaderboard else [])
+            ],
             'config': {
                 'min_potential_score': MIN_POTENTIAL_SCORE,
                 'max_competition': MAX_COMPETITION
@@ -447,8 +860,13 @@ class NicheHunterEngine:
         }
         
         try:
-            with open(REPORT_FILE, 'w', encoding='utf-8') as f:
-                json.dump(report, f, ensure_ascii=False, indent=2)
+            # 分析结果写入数据库（下次任务的期望价值估计从这里读取），报告 JSON 作为导出
+            self.store.record_analysis(self.results)
+        except Exception as e:
+            logger.error(f"写入分析结果失败：{e}")
+        
+        try:
+            jsonio.dump(report, REPORT_FILE)
             logger.info(f"报告已保存到 {REPORT_FILE}")
             print(f"✓ 报告已保存到：{REPORT_FILE}")
         except Exception as e:
@@ -3,18 +3,25 @@
 分析小红书热度和闲鱼商品数据，找出最具潜力的投入方向
 """
 
-import json
+import argparse
 import logging
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from datetime import datetime
 
 from config import (
-    XHS_DATA_FILE, FISH_DATA_FILE, REPORT_FILE,
+    XHS_DATA_FILE, FISH_DATA_FILE, REPORT_FILE, DATASTORE_DB, STREAM_WORKERS,
     MAX_COMPETITION, MIN_POTENTIAL_SCORE, TOP_N_RESULTS,
-    ENABLE_WECOM_PUSH
+    ENABLE_WECOM_PUSH, OUTBOX_FLUSH_TIMEOUT, ENABLE_FUZZY_JOIN
 )
 from engine.analyzer import BlueOceanAnalyzer
+from engine.keyword_join import KeywordJoiner, aggregate_fish
+from engine.stream_scoring import iter_ndjson, iter_sqlite, stream_top_n
 from utils.logic import NichePushLogic
+from utils.wecom_sender import AsyncWeComSender
+from utils.push_outbox import PushOutbox, OutboxDrainer
+from utils import jsonio
+from utils.datastore import get_store
+from utils.records import AnalysisRecord, to_dicts
 
 
 # 日志配置
@@ -24,19 +31,26 @@ logger = logging.getLogger(__name__)
 class NicheFinder:
     """蓝海赛道发现器（离线版本）"""
     
-    def __init__(self, xhs_file: str = XHS_DATA_FILE, fish_file: str = FISH_DATA_FILE):
+    def __init__(self, xhs_file: Optional[str] = None, fish_file: Optional[str] = None):
         """
         初始化分析器
         
         Args:
-            xhs_file: 小红书数据文件路径
-            fish_file: 闲鱼数据文件路径
+            xhs_file: 小红书数据文件路径（None 表示从数据库读取各词条最新数据）
+            fish_file: 闲鱼数据文件路径（None 表示从数据库读取各词条最新数据）
         """
         self.xhs_file = xhs_file
         self.fish_file = fish_file
         self.xhs_data = {}
         self.fish_data = {}
         self.notifier = NichePushLogic() if ENABLE_WECOM_PUSH else None
+        self.outbox = PushOutbox() if self.notifier else None
+        self.drainer = (
+            OutboxDrainer(self.outbox, AsyncWeComSender(self.notifier)) if self.outbox else None
+        )
+        if self.drainer:
+            # 启动即投递：上次进程退出时未送达的消息在后台继续发送
+            self.drainer.start()
         
     def load_data(self) -> bool:
         """
@@ -47,55 +61,102 @@ class NicheFinder:
         """
         success = True
         
+        if self.xhs_file is None and self.fish_file is None:
+            store = get_store()
+            self.xhs_data = store.latest_xhs()
+            self.fish_data = store.latest_fish()
+            print(f"✓ 已从数据库加载：小红书 {len(self.xhs_data)} 个词条，闲鱼 {len(self.fish_data)} 个词条")
+            logger.info(f"从数据库加载数据：小红书 {len(self.xhs_data)}，闲鱼 {len(self.fish_data)}")
+            return bool(self.xhs_data or self.fish_data)
+        
+        xhs_file = self.xhs_file or XHS_DATA_FILE
+        fish_file = self.fish_file or FISH_DATA_FILE
         try:
-            with open(self.xhs_file, 'r', encoding='utf-8') as f:
-                self.xhs_data = json.load(f)
+            self.xhs_data = jsonio.load(xhs_file)
             print(f"✓ 已加载小红书数据：{len(self.xhs_data)} 个词条")
             logger.info(f"加载小红书数据成功：{len(self.xhs_data)} 个词条")
         except FileNotFoundError:
-            print(f"⚠ 警告：未找到文件 {self.xhs_file}")
-            logger.warning(f"文件不存在：{self.xhs_file}")
+            print(f"⚠ 警告：未找到文件 {xhs_file}")
+            logger.warning(f"文件不存在：{xhs_file}")
             self.xhs_data = {}
             success = False
-        except json.JSONDecodeError as e:
-            print(f"✗ 错误：{self.xhs_file} 格式错误 - {e}")
+        except jsonio.JSONDecodeError as e:
+            print(f"✗ 错误：{xhs_file} 格式错误 - {e}")
             logger.error(f"JSON解析错误：{e}")
             self.xhs_data = {}
             success = False
             
         try:
-            with open(self.fish_file, 'r', encoding='utf-8') as f:
-                self.fish_data = json.load(f)
+            self.fish_data = jsonio.load(fish_file)
             print(f"✓ 已加载闲鱼数据：{len(self.fish_data)} 个词条")
             logger.info(f"加载闲鱼数据成功：{len(self.fish_data)} 个词条")
         except FileNotFoundError:
-            print(f"⚠ 警告：未找到文件 {self.fish_file}")
-            logger.warning(f"文件不存在：{self.fish_file}")
+            print(f"⚠ 警告：未找到文件 {fish_file}")
+            logger.warning(f"文件不存在：{fish_file}")
             self.fish_data = {}
             success = False
-        except json.JSONDecodeError as e:
-            print(f"✗ 错误：{self.fish_file} 格式错误 - {e}")
+        except jsonio.JSONDecodeError as e:
+            print(f"✗ 错误：{fish_file} 格式错误 - {e}")
             logger.error(f"JSON解析错误：{e}")
             self.fish_data = {}
             success = False
         
         return success
     
-    def analyze(self, max_fish_count: int = MAX_COMPETITION, top_n: int = TOP_N_RESULTS) -> List[Dict]:
+    def _join_fish(self, fuzzy: bool) -> Dict[str, Dict]:
+        """
+        把小红书词条对应到闲鱼数据
+        
+        Args:
+            fuzzy: 是否模糊匹配措辞不同的变体词条（否则按词条精确匹配）
+            
+        Returns:
+            {词条: 闲鱼数据}：小红书词条对应其全部变体的汇总数据；没有被匹配的闲鱼词条保持原样
+        """
+        if not fuzzy:
+            return dict(self.fish_data)
+        
+        joiner = KeywordJoiner()
+        aliases = joiner.join(self.xhs_data.keys(), self.fish_data.keys())
+        joiner.save()
+        
+        joined = {}
+        matched = set()
+        for keyword, matches in aliases.items():
+            merged = aggregate_fish(self.fish_data, matches)
+            if merged is not None:
+                joined[keyword] = merged
+                matched.update(kw for kw, _ in matches)
+        variants = sum(1 for info in joined.values() if len(info.get('匹配词条', [])) > 1)
+        if variants:
+            print(f"🔗 {variants} 个词条合并了闲鱼变体词条的竞争数据")
+        for keyword, info in self.fish_data.items():
+            if keyword not in matched and keyword not in joined:
+                joined[keyword] = info
+        return joined
+    
+    def analyze(
+        self,
+        max_fish_count: int = MAX_COMPETITION,
+        top_n: int = TOP_N_RESULTS,
+        fuzzy_join: bool = ENABLE_FUZZY_JOIN
+    ) -> List[Dict]:
         """
         执行蓝海分析
         
         Args:
             max_fish_count: 闲鱼商品数上限（超过此值视为竞争过于激烈）
             top_n: 返回前 N 个最佳赛道
+            fuzzy_join: 是否把小红书词条模糊匹配到闲鱼的变体词条
             
         Returns:
             潜力赛道列表
         """
         results = []
+        fish_data = self._join_fish(fuzzy_join)
         
-        # 获取所有词条（取并集）
-        all_keywords = set(self.xhs_data.keys()) | set(self.fish_data.keys())
+        # 获取所有词条（取并集；已并入小红书词条的闲鱼变体不再单独分析）
+        all_keywords = set(self.xhs_data.keys()) | set(fish_data.keys())
         
         print(f"\n正在分析 {len(all_keywords)} 个词条...\n")
         
@@ -105,7 +166,7 @@ class NicheFinder:
             xhs_heat = xhs_info.get('热度', 0) if isinstance(xhs_info, dict) else 0
             
             # 获取闲鱼数据
-            fish_info = self.fish_data.get(keyword, {})
+            fish_info = fish_data.get(keyword, {})
             fish_count = fish_info.get('商品数', 0) if isinstance(fish_info, dict) else 0
             
             # 过滤：剔除商品数超过上限的词条
@@ -118,13 +179,42 @@ class NicheFinder:
                 fish_data=fish_info if isinstance(fish_info, dict) else {'商品数': 0, '平均想要': 0}
             )
             
-            # 只保留有效数据
+            if isinstance(fish_info, dict) and len(fish_info.get('匹配词条', [])) > 1:
+                info['闲鱼匹配词条'] = fish_info['匹配词条']
+            
+            # 只保留有效数据（紧凑记录，只有进入 Top N 的才转回 dict）
             if index > 0:
-                results.append(info)
+                results.append(AnalysisRecord.from_dict(info))
         
         # 排序和筛选
-        results = BlueOceanAnalyzer.rank_results(results, top_n)
+        return to_dicts(BlueOceanAnalyzer.rank_results(results, top_n))
+    
+    def analyze_stream(
+        self,
+        source: str = DATASTORE_DB,
+        max_fish_count: int = MAX_COMPETITION,
+        top_n: int = TOP_N_RESULTS,
+        workers: Optional[int] = STREAM_WORKERS
+    ) -> List[Dict]:
+        """
+        大数据量流式分析：不整体加载数据，分块并行评分后合并 Top N
+        
+        只按词条精确匹配两个平台（模糊匹配需要完整词表，见 analyze）
         
+        Args:
+            source: 数据来源，.ndjson / .jsonl 文件或 SQLite 数据库路径
+            max_fish_count: 闲鱼商品数上限
+            top_n: 返回前 N 个最佳赛道
+            workers: 并行进程数（None 表示 CPU 核数）
+            
+        Returns:
+            潜力赛道列表
+        """
+        rows = iter_ndjson(source) if source.endswith(('.ndjson', '.jsonl')) else iter_sqlite(source)
+        print(f"\n正在流式分析：{source}\n")
+        results, stats = stream_top_n(rows, top_n=top_n, max_competition=max_fish_count, workers=workers)
+        print(f"✓ 已扫描 {stats['rows']:,} 行（{stats['chunks']} 块），用时 {stats['seconds']:.2f} 秒")
+        logger.info(f"流式分析完成：{stats}")
         return results
     
     def print_report(self, results: List[Dict]) -> None:
@@ -193,8 +283,7 @@ class NicheFinder:
             })
         
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(report, f, ensure_ascii=False, indent=2)
+            jsonio.dump(report, output_file)
             print(f"✓ 报告已保存至：{output_file}")
             logger.info(f"报告已保存：{output_file}")
         except Exception as e:
@@ -203,34 +292,37 @@ class NicheFinder:
     
     def push_results(self, results: List[Dict]) -> int:
         """
-        推送符合条件的结果到企业微信
+        推送符合条件的结果到企业微信（写入发件箱，由后台投递器发送）
         
         Args:
             results: 分析结果列表
             
         Returns:
-            成功推送的个数
+            入队推送的个数（推送间隔内已推送过的词条不计入）
         """
-        if not self.notifier or not results:
+        if not self.outbox or not results:
             return 0
         
         # 过滤符合推送条件的结果
-        qualified = [
-            r for r in results
-            if r['蓝海指数'] >= MIN_POTENTIAL_SCORE 
-            and r['闲鱼商品数'] <= MAX_COMPETITION
-        ]
+        qualified = NichePushLogic.filter_qualified(results)
         
         if not qualified:
             print(f"⚠ 没有符合推送条件的赛道（蓝海指数 ≥ {MIN_POTENTIAL_SCORE}）")
             return 0
         
         print(f"\n📤 准备推送 {len(qualified)} 个优质赛道到企业微信...")
-        return self.notifier.batch_push(qualified)
+        enqueued = self.outbox.enqueue(qualified)
+        self.drainer.notify()
+        if len(enqueued) < len(qualified):
+            print(f"⏭️  {len(qualified) - len(enqueued)} 个赛道在推送间隔内已推送过，跳过")
+        if enqueued and not self.drainer.wait_idle(enqueued, timeout=OUTBOX_FLUSH_TIMEOUT):
+            print(f"⏳ 仍有 {self.outbox.pending_count()} 条推送在发件箱中等待投递")
+        return len(enqueued)
     
     def run(self, max_fish_count: int = MAX_COMPETITION, top_n: int = TOP_N_RESULTS, 
             save_json: bool = True, output_file: str = REPORT_FILE,
-            push_to_wecom: bool = ENABLE_WECOM_PUSH) -> List[Dict]:
+            push_to_wecom: bool = ENABLE_WECOM_PUSH,
+            stream_source: Optional[str] = None) -> List[Dict]:
         """
         运行完整分析流程
         
@@ -240,6 +332,7 @@ class NicheFinder:
             save_json: 是否保存 JSON 报告
             output_file: JSON 报告文件名
             push_to_wecom: 是否推送到企业微信
+            stream_source: 流式分析的数据来源（NDJSON 或 SQLite 路径；None 表示整体加载后分析）
             
         Returns:
             分析结果列表
@@ -251,12 +344,16 @@ class NicheFinder:
         print(f"   • 返回结果数：前 {top_n} 名")
         print(f"   • 企业微信推送：{'开启' if push_to_wecom else '关闭'}\n")
         
-        # 1. 加载数据
-        if not self.load_data():
-            print("⚠ 数据加载失败，部分功能可能受影响")
-        
-        # 2. 执行分析
-        results = self.analyze(max_fish_count=max_fish_count, top_n=top_n)
+        if stream_source:
+            # 1-2. 流式读取并分析（数据量大时不整体加载）
+            results = self.analyze_stream(stream_source, max_fish_count=max_fish_count, top_n=top_n)
+        else:
+            # 1. 加载数据
+            if not self.load_data():
+                print("⚠ 数据加载失败，部分功能可能受影响")
+            
+            # 2. 执行分析
+            results = self.analyze(max_fish_count=max_fish_count, top_n=top_n)
         
         # 3. 打印报告
         self.print_report(results)
@@ -274,6 +371,11 @@ class NicheFinder:
 
 def main():
     """主函数：演示模块使用"""
+    parser = argparse.ArgumentParser(description="蓝海赛道离线分析")
+    parser.add_argument('--stream', nargs='?', const=DATASTORE_DB, metavar='SOURCE',
+                        help='流式分析（NDJSON 或 SQLite 路径，缺省为数据库），适合百万级词条')
+    args = parser.parse_args()
+    
     # 创建分析器实例（使用配置文件中的默认值）
     finder = NicheFinder()
     
@@ -283,7 +385,8 @@ def main():
         top_n=TOP_N_RESULTS,
         save_json=True,
         output_file=REPORT_FILE,
-        push_to_wecom=ENABLE_WECOM_PUSH
+        push_to_wecom=ENABLE_WECOM_PUSH,
+        stream_source=args.stream
     )
     
     return results
@@ -1,13 +1,33 @@
 """
 分时调度器
 根据时间表自动执行蓝海赛道挖掘任务（无代理单IP环保模式）
+
+基于 asyncio：
+- 每个任务独立的 cron 式触发器 + 随机抖动
+- 同一任务不重叠运行；共用浏览器配置目录的任务串行执行
+- 重启后补跑错过的任务（状态写入 SCHEDULE_STATE_FILE）
+- 小红书热度刷新 / 闲鱼竞争刷新 / 完整挖掘任务各自独立节奏
 """
 
-import schedule
-import time
+import asyncio
+import json
+import os
+import random
 import logging
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
 from main import NicheHunterEngine
+from scrapers.retry_policy import get_breaker
+from config import (
+    SCHEDULE_STATE_FILE,
+    SCHEDULE_JITTER_SEC,
+    SCHEDULE_CATCHUP_WINDOW,
+    SCHEDULE_MISSION_MAX_SECONDS,
+    SCHEDULE_SLOT_MARGIN,
+    MIN_KEYWORD_SLICE_SEC
+)
 
 
 # 日志配置
@@ -18,101 +38,406 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class CronTrigger:
+    """
+    简化版 cron 触发器
+
+    表达式格式：分 时 日 月 周（周日为0或7），支持 * , - /；
+    可传入多个表达式，取最近的触发时间。
+    """
+
+    FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, *expressions: str):
+        if not expressions:
+            raise ValueError("至少需要一个 cron 表达式")
+        self.expressions = expressions
+        self._specs = [self._parse(expr) for expr in expressions]
+
+    @classmethod
+    def _parse(cls, expression: str) -> Tuple[FrozenSet[int], ...]:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式需要5个字段：{expression!r}")
+        parsed = []
+        for index, (text, (lo, hi)) in enumerate(zip(fields, cls.FIELD_RANGES)):
+            values = set()
+            for part in text.split(','):
+                body, _, step = part.partition('/')
+                if body == '*':
+                    start, end = lo, hi
+                elif '-' in body:
+                    start, end = (int(x) for x in body.split('-', 1))
+                else:
+                    start = end = int(body)
+                values.update(range(start, end + 1, int(step or 1)))
+            if not values or min(values) < lo or max(values) > hi:
+                raise ValueError(f"cron 字段超出范围：{text!r}")
+            if index == 4:
+                # 周字段：7 与 0 都表示周日
+                values = {v % 7 for v in values}
+            parsed.append(frozenset(values))
+        return tuple(parsed)
+
+    @staticmethod
+    def _day_matches(spec: Tuple[FrozenSet[int], ...], day: datetime) -> bool:
+        _, _, doms, months, dows = spec
+        if day.month not in months:
+            return False
+        dom_ok = day.day in doms
+        dow_ok = (day.weekday() + 1) % 7 in dows
+        # 与 cron 一致：日、周同时受限时满足其一即可
+        if len(doms) < 31 and len(dows) < 7:
+            return dom_ok or dow_ok
+        return dom_ok and dow_ok
+
+    def _next_for_spec(self, spec: Tuple[FrozenSet[int], ...], after: datetime) -> Optional[datetime]:
+        minutes, hours = sorted(spec[0]), sorted(spec[1])
+        day = after.replace(hour=0, minute=0, second=0, microsecond=0)
+        for _ in range(366 * 5):
+            if self._day_matches(spec, day):
+                for hour in hours:
+                    for minute in minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate > after:
+                            return candidate
+            day += timedelta(days=1)
+        return None
+
+    def next_after(self, after: datetime) -> datetime:
+        """返回严格晚于 after 的下一次触发时间"""
+        candidates = [c for c in (self._next_for_spec(s, after) for s in self._specs) if c]
+        if not candidates:
+            raise ValueError(f"cron 表达式永不触发：{self.expressions}")
+        return min(candidates)
+
+    def __str__(self) -> str:
+        return ' | '.join(self.expressions)
+
+
+# 这些状态才记为一次成功运行（failed / partial_failed / error 不记录，重启后补跑）
+_SUCCESS_STATUSES = ('success', 'partial')
+
+
+@dataclass
+class ScheduledJob:
+    """调度任务"""
+    name: str
+    trigger: CronTrigger
+    func: Callable[[], Any]                   # 同步函数，在线程池中执行；返回 {'status': ...}
+    description: str = ''
+    jitter: float = SCHEDULE_JITTER_SEC       # 触发后随机延后 0~jitter 秒
+    resources: Tuple[str, ...] = ('browser_profile',)  # 需要独占的共享资源
+    platforms: Tuple[str, ...] = ()           # 依赖的平台：任一平台熔断中则跳过本次触发
+    running: bool = field(default=False, repr=False)
+
+
+class AsyncScheduler:
+    """asyncio 任务调度器（不重叠、共享资源串行、错过补跑）"""
+
+    def __init__(
+        self,
+        state_file: str = SCHEDULE_STATE_FILE,
+        catchup_window: float = SCHEDULE_CATCHUP_WINDOW
+    ):
+        """
+        Args:
+            state_file: 调度状态文件（记录各任务上次成功运行时间）
+            catchup_window: 错过的触发在此秒数内会补跑一次
+        """
+        self.state_file = state_file
+        self.catchup_window = catchup_window
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self.state: Dict[str, str] = self._load_state()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: set = set()
+        self._stop: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add_job(self, job: ScheduledJob) -> None:
+        self.jobs[job.name] = job
+
+    # ==================== 状态持久化 ====================
+
+    def _load_state(self) -> Dict[str, str]:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self) -> None:
+        tmp = f"{self.state_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            logger.warning(f"调度状态保存失败：{e}")
+
+    def last_run(self, name: str) -> Optional[datetime]:
+        try:
+            return datetime.fromisoformat(self.state[name])
+        except (KeyError, ValueError):
+            return None
+
+    def missed_jobs(self, now: Optional[datetime] = None) -> List[ScheduledJob]:
+        """
+        找出停机期间错过、且仍在补跑窗口内的任务（多次错过只补跑一次）
+
+        从未运行过的任务不补跑，等待下一次正常触发。
+        """
+        now = now or datetime.now()
+        missed = []
+        for job in self.jobs.values():
+            last = self.last_run(job.name)
+            if last is None:
+                continue
+            # 取 now 之前最近一次应触发的时间
+            due = job.trigger.next_after(last)
+            if due > now:
+                continue
+            while True:
+                following = job.trigger.next_after(due)
+                if following > now:
+                    break
+                due = following
+            if (now - due).total_seconds() <= self.catchup_window:
+                missed.append(job)
+        return missed
+
+    # ==================== 执行 ====================
+
+    def _lock(self, resource: str) -> asyncio.Lock:
+        if resource not in self._locks:
+            self._locks[resource] = asyncio.Lock()
+        return self._locks[resource]
+
+    async def run_job(self, job: ScheduledJob) -> bool:
+        """
+        执行一次任务
+
+        Returns:
+            是否执行（上一次仍在运行时跳过，返回False）
+        """
+        if job.running:
+            logger.warning(f"⏭️ 任务 {job.name} 上一次仍在运行，跳过本次触发")
+            return False
+
+        tripped = [p for p in job.platforms if get_breaker(p).state == 'open']
+        if tripped:
+            logger.warning(f"⏭️ 任务 {job.name} 依赖的平台 {', '.join(tripped)} 连续被拦截熔断中，跳过本次触发")
+            return False
+
+        job.running = True
+        try:
+            # 固定顺序获取资源锁，避免多资源任务互相等待
+            locks = [self._lock(r) for r in sorted(job.resources)]
+            for lock in locks:
+                await lock.acquire()
+            try:
+                started = datetime.now()
+                logger.info(f"⏰ 执行任务 {job.name}：{job.description}")
+                try:
+                    result = await asyncio.to_thread(job.func)
+                except Exception as e:
+                    logger.error(f"任务 {job.name} 执行出错：{e}", exc_info=True)
+                    return True
+                status = result.get('status') if isinstance(result, dict) else None
+                if status not in _SUCCESS_STATUSES:
+                    # 失败的运行不记为上次运行时间，重启后仍会补跑
+                    logger.warning(f"⚠️ 任务 {job.name} 未成功（状态：{status}），不记录运行时间")
+                    return True
+                self.state[job.name] = started.isoformat()
+                self._save_state()
+                logger.info(f"✅ 任务 {job.name} 完成，耗时 {datetime.now() - started}")
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+        finally:
+            job.running = False
+        return True
+
+    def _spawn(self, job: ScheduledJob) -> None:
+        task = asyncio.create_task(self.run_job(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _job_loop(self, job: ScheduledJob) -> None:
+        while True:
+            now = datetime.now()
+            fire_at = job.trigger.next_after(now)
+            delay = (fire_at - now).total_seconds() + random.uniform(0, job.jitter)
+            await asyncio.sleep(delay)
+            # 触发后立即计算下一次，执行放到独立任务中，长任务不会推迟其他触发
+            self._spawn(job)
+
+    async def serve(self, run_now: Tuple[str, ...] = ()) -> None:
+        """
+        运行调度循环直到 stop() 被调用
+
+        Args:
+            run_now: 启动时立即执行一次的任务名
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+
+        for job in self.missed_jobs():
+            logger.info(f"🔁 补跑错过的任务 {job.name}（上次运行：{self.state.get(job.name)}）")
+            self._spawn(job)
+        for name in run_now:
+            if name in self.jobs:
+                self._spawn(self.jobs[name])
+
+        loops = [asyncio.create_task(self._job_loop(job)) for job in self.jobs.values()]
+        try:
+            await self._stop.wait()
+        finally:
+            for task in loops:
+                task.cancel()
+            await asyncio.gather(*loops, return_exceptions=True)
+            # 正在执行的任务在线程中运行，无法强制中断，等待其自然结束
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stop(self) -> None:
+        """停止调度（可从其他线程调用）"""
+        if self._loop and self._stop:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+
 class NicheScheduler:
     """蓝海赛道任务调度器"""
-    
+
     def __init__(self):
         """初始化调度器"""
         self.engine = NicheHunterEngine()
+        self.scheduler = AsyncScheduler()
         self.is_running = False
-    
-    def job_morning(self):
-        """早高峰任务（9:30）"""
-        logger.info("⏰ 执行早高峰任务")
-        self.engine.run_mission(
-            top_trends_n=15,
-            top_results_n=5,
-            enable_push=True
-        )
-    
-    def job_afternoon(self):
-        """午间任务（14:00）"""
-        logger.info("⏰ 执行午间任务")
-        self.engine.run_mission(
-            top_trends_n=15,
-            top_results_n=5,
-            enable_push=True
-        )
-    
-    def job_evening(self):
-        """晚间任务（21:30）"""
-        logger.info("⏰ 执行晚间任务")
-        self.engine.run_mission(
+
+    def mission_time_budget(self, now: Optional[datetime] = None) -> float:
+        """
+        本次挖掘任务的总时限：不超过上限，且在下一次挖掘触发前留出间隔
+        
+        Returns:
+            秒数
+        """
+        now = now or datetime.now()
+        budget = float(SCHEDULE_MISSION_MAX_SECONDS)
+        mission = self.scheduler.jobs.get('mission')
+        if mission:
+            until_next = (mission.trigger.next_after(now) - now).total_seconds() - SCHEDULE_SLOT_MARGIN
+            budget = min(budget, until_next)
+        return max(budget, float(MIN_KEYWORD_SLICE_SEC))
+
+    def job_mission(self):
+        """完整挖掘任务（小红书热搜 → 闲鱼 → 分析 → 推送），限时在下一个时段开始前结束"""
+        max_seconds = self.mission_time_budget()
+        logger.info(f"挖掘任务总时限 {max_seconds / 60:.0f} 分钟")
+        return self.engine.run_mission(
             top_trends_n=15,
             top_results_n=5,
-            enable_push=True
+            enable_push=True,
+            max_seconds=max_seconds
         )
-    
+
+    def job_xhs_refresh(self):
+        """小红书热度刷新（成本低）"""
+        return self.engine.refresh_xhs_trends()
+
+    def job_fish_refresh(self):
+        """闲鱼竞争数据刷新（成本高）"""
+        return self.engine.refresh_fish_competition()
+
+    def job_discovery(self):
+        """关键词发现（扩展候选词库）"""
+        return self.engine.discover_keywords()
+
     def setup_schedule(self):
         """设置任务日程"""
+        jobs = [
+            ScheduledJob(
+                name='mission',
+                trigger=CronTrigger("30 9 * * *", "0 14 * * *", "30 21 * * *"),
+                func=self.job_mission,
+                description='完整蓝海挖掘（早高峰 / 午间 / 晚间）'
+            ),
+            ScheduledJob(
+                name='xhs_refresh',
+                trigger=CronTrigger("0 8-22/2 * * *"),
+                func=self.job_xhs_refresh,
+                description='小红书热度刷新',
+                platforms=('xiaohongshu',)
+            ),
+            ScheduledJob(
+                name='fish_refresh',
+                trigger=CronTrigger("15 12 * * *"),
+                func=self.job_fish_refresh,
+                description='闲鱼竞争数据刷新',
+                platforms=('xianyu',)
+            ),
+            ScheduledJob(
+                name='xhs_discovery',
+                trigger=CronTrigger("40 10 * * *"),
+                func=self.job_discovery,
+                description='小红书关键词发现',
+                platforms=('xiaohongshu',)
+            ),
+        ]
+        for job in jobs:
+            self.scheduler.add_job(job)
+
         print("\n" + "="*60)
         print("📅 蓝海赛道分时调度器")
         print("="*60)
         print("\n已设置以下定时任务：")
-        
-        # 早高峰（9:30）
-        schedule.every().day.at("09:30").do(self.job_morning)
-        print("  • 09:30 早高峰扫描（小红书流量活跃）")
-        
-        # 午间（14:00）
-        schedule.every().day.at("14:00").do(self.job_afternoon)
-        print("  • 14:00 午间扫描（用户需求高峰）")
-        
-        # 晚间（21:30）
-        schedule.every().day.at("21:30").do(self.job_evening)
-        print("  • 21:30 晚间扫描（流量最强期）")
-        
+        now = datetime.now()
+        for job in jobs:
+            next_run = job.trigger.next_after(now).strftime('%m-%d %H:%M')
+            print(f"  • [{job.trigger}] {job.description}（下次：{next_run}）")
+
         print("\n💡 设计理由：")
         print("  → 避免24小时狂刷，降低被检测风险")
         print("  → 抓取时段与用户活跃时段重合，数据质量高")
-        print("  → 三次任务间隔均衡，数据更新及时")
+        print("  → 小红书热度高频刷新，闲鱼竞争数据成本高、低频刷新")
+        print("  → 每天从相关搜索中发现新词，候选词库持续扩展")
+        print(f"  → 触发时间随机延后 0-{SCHEDULE_JITTER_SEC // 60} 分钟，共用浏览器的任务串行执行")
         print("\n" + "="*60 + "\n")
-    
+
     def run(self, test_mode: bool = False):
         """
         启动调度器
-        
+
         Args:
             test_mode: 测试模式（立即执行一次任务）
         """
         self.is_running = True
         self.setup_schedule()
-        
+
         if test_mode:
-            print("🧪 测试模式：立即执行一次任务\n")
-            self.job_morning()
-            print("\n✅ 测试任务完成，正式调度器已启动\n")
-        
+            print("🧪 测试模式：立即执行一次挖掘任务\n")
+
         logger.info("调度器已启动，等待任务触发...")
-        
+
         try:
-            while self.is_running:
-                schedule.run_pending()
-                time.sleep(60)  # 每分钟检查一次
+            asyncio.run(self.scheduler.serve(run_now=('mission',) if test_mode else ()))
         except KeyboardInterrupt:
             logger.info("调度器已停止")
-            self.stop()
-    
+        finally:
+            self.is_running = False
+
     def stop(self):
         """停止调度器"""
         self.is_running = False
+        self.scheduler.stop()
         logger.info("调度器停止")
 
 
 def main():
     """主程序"""
     scheduler = NicheScheduler()
-    
+
     # 启动调度器
     # test_mode=True 时会立即执行一次任务作为测试
     scheduler.run(test_mode=False)
@@ -5,15 +5,29 @@
 更新日志：
 - 2025-12-31: 增加完整浏览器指纹配置、时区语言池
 - 2025-12-31: 实现令牌桶限流算法和正态分布延迟
+- 跨进程共享令牌桶（SQLite持久化，按平台共享同一限速预算）
+- AIMD 自适应限速（成功加性提速，拦截乘性降速，学到的速率持久化）
 """
 
 import random
+import sqlite3
+import threading
 import time
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Set
 from datetime import datetime
 import asyncio
 from dataclasses import dataclass
 
+from config import (
+    RATE_LIMIT_DB,
+    AIMD_RATE_BOUNDS,
+    AIMD_INCREASE_STEP,
+    AIMD_DECREASE_FACTOR,
+    AIMD_DECREASE_COOLDOWN
+)
+from utils import metrics
+from .retry_policy import RetryManager  # 兼容旧导入路径
+
 # 尝试导入numpy（用于正态分布）
 try:
     import numpy as np
@@ -274,6 +288,7 @@ class TokenBucket:
                 self._tokens = float(capacity)
                 self._last_refill = time.monotonic()
                 self._lock = asyncio.Lock()
+                self.last_decrease = 0.0  # 上次降速的时间戳（time.time()），用于降速冷却
 
         def _refill(self) -> None:
                 now = time.monotonic()
@@ -298,6 +313,20 @@ class TokenBucket:
                                 wait_sec = needed / max(1e-6, self.fill_rate)
                                 await asyncio.sleep(min(wait_sec, 5.0))
 
+        def adjust_fill_rate(self, transform: Callable[[float], float]) -> float:
+                """按 transform(当前速率) 调整补充速率，返回新速率（调整前先按旧速率结算令牌）。"""
+                self._refill()
+                self.fill_rate = float(transform(self.fill_rate))
+                return self.fill_rate
+
+        def decrease_fill_rate(self, transform: Callable[[float], float], cooldown: float) -> Optional[float]:
+                """距上次降速超过 cooldown 秒才调整速率，返回新速率；冷却期内不调整，返回 None。"""
+                now = time.time()
+                if self.last_decrease and now - self.last_decrease < cooldown:
+                        return None
+                self.last_decrease = now
+                return self.adjust_fill_rate(transform)
+
         def status(self) -> Dict[str, float]:
                 self._refill()
                 return {
@@ -307,6 +336,159 @@ class TokenBucket:
                 }
 
 
+class SharedTokenBucket(TokenBucket):
+        """跨进程共享的令牌桶（状态保存在 SQLite，按平台区分）。
+
+        同一平台的所有爬虫实例、所有进程共用一个限速预算；
+        令牌余量随数据库持久化，重启后不会重新从满桶开始。
+        数据库不可用时退化为进程内令牌桶。
+        """
+
+        _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS buckets (
+                platform TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                capacity REAL NOT NULL,
+                fill_rate REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_decrease REAL NOT NULL DEFAULT 0
+        )
+        """
+
+        def __init__(self, platform: str, capacity: float = 10.0, fill_rate: float = 2.0, db_path: Optional[str] = None):
+                super().__init__(capacity=capacity, fill_rate=fill_rate)
+                self.platform = platform
+                # 缺省路径在构造时读取，测试可改 RATE_LIMIT_DB 指向临时目录
+                db_path = db_path or RATE_LIMIT_DB
+                self.db_path = db_path
+                self._db_lock = threading.Lock()
+                try:
+                        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+                        self._conn.execute("PRAGMA journal_mode=WAL")
+                        self._conn.execute(self._SCHEMA)
+                        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(buckets)")}
+                        if 'last_decrease' not in columns:
+                                self._conn.execute("ALTER TABLE buckets ADD COLUMN last_decrease REAL NOT NULL DEFAULT 0")
+                        # 首次使用时满桶、速率取配置值；之后沿用已持久化的余量和（自适应学到的）速率，只同步容量
+                        self._conn.execute(
+                                "INSERT INTO buckets (platform, tokens, capacity, fill_rate, updated_at) VALUES (?, ?, ?, ?, ?) "
+                                "ON CONFLICT(platform) DO UPDATE SET capacity = excluded.capacity",
+                                (platform, self.capacity, self.capacity, self.fill_rate, time.time())
+                        )
+                except sqlite3.Error as e:
+                        print(f"⚠️ 共享限速数据库不可用，使用进程内令牌桶: {e}")
+                        self._conn = None
+
+        def _try_take(self, cost: float) -> float:
+                """在一个写事务里补充并尝试扣除令牌，返回还需等待的秒数（0表示已扣除）。"""
+                with self._db_lock:
+                        self._conn.execute("BEGIN IMMEDIATE")
+                        try:
+                                tokens, capacity, fill_rate, updated_at = self._conn.execute(
+                                        "SELECT tokens, capacity, fill_rate, updated_at FROM buckets WHERE platform = ?",
+                                        (self.platform,)
+                                ).fetchone()
+                                now = time.time()
+                                tokens = min(capacity, tokens + max(0.0, now - updated_at) * fill_rate)
+                                wait_sec = 0.0
+                                if tokens >= cost:
+                                        tokens -= cost
+                                else:
+                                        wait_sec = (cost - tokens) / max(1e-6, fill_rate)
+                                self._conn.execute(
+                                        "UPDATE buckets SET tokens = ?, updated_at = ? WHERE platform = ?",
+                                        (tokens, now, self.platform)
+                                )
+                                self._conn.execute("COMMIT")
+                        except Exception:
+                                self._conn.execute("ROLLBACK")
+                                raise
+                self._tokens, self.capacity, self.fill_rate = tokens, capacity, fill_rate
+                return wait_sec
+
+        def adjust_fill_rate(self, transform: Callable[[float], float]) -> float:
+                """在写事务里调整共享速率（其他进程下次取令牌即生效），返回新速率。"""
+                if self._conn is None:
+                        return super().adjust_fill_rate(transform)
+                with self._db_lock:
+                        self._conn.execute("BEGIN IMMEDIATE")
+                        try:
+                                tokens, capacity, fill_rate, updated_at = self._conn.execute(
+                                        "SELECT tokens, capacity, fill_rate, updated_at FROM buckets WHERE platform = ?",
+                                        (self.platform,)
+                                ).fetchone()
+                                now = time.time()
+                                tokens = min(capacity, tokens + max(0.0, now - updated_at) * fill_rate)
+                                fill_rate = float(transform(fill_rate))
+                                self._conn.execute(
+                                        "UPDATE buckets SET tokens = ?, fill_rate = ?, updated_at = ? WHERE platform = ?",
+                                        (tokens, fill_rate, now, self.platform)
+                                )
+                                self._conn.execute("COMMIT")
+                        except Exception:
+                                self._conn.execute("ROLLBACK")
+                                raise
+                self._tokens, self.fill_rate = tokens, fill_rate
+                return fill_rate
+
+        def decrease_fill_rate(self, transform: Callable[[float], float], cooldown: float) -> Optional[float]:
+                """降速冷却记在共享行里，与调整在同一写事务中判断：所有实例、所有进程的同一波拦截只降一次。"""
+                if self._conn is None:
+                        return super().decrease_fill_rate(transform, cooldown)
+                with self._db_lock:
+                        self._conn.execute("BEGIN IMMEDIATE")
+                        try:
+                                tokens, capacity, fill_rate, updated_at, last_decrease = self._conn.execute(
+                                        "SELECT tokens, capacity, fill_rate, updated_at, last_decrease FROM buckets WHERE platform = ?",
+                                        (self.platform,)
+                                ).fetchone()
+                                now = time.time()
+                                if last_decrease and now - last_decrease < cooldown:
+                                        self._conn.execute("COMMIT")
+                                        self.fill_rate, self.last_decrease = fill_rate, last_decrease
+                                        return None
+                                tokens = min(capacity, tokens + max(0.0, now - updated_at) * fill_rate)
+                                fill_rate = float(transform(fill_rate))
+                                self._conn.execute(
+                                        "UPDATE buckets SET tokens = ?, fill_rate = ?, updated_at = ?, last_decrease = ? WHERE platform = ?",
+                                        (tokens, fill_rate, now, now, self.platform)
+                                )
+                                self._conn.execute("COMMIT")
+                        except Exception:
+                                self._conn.execute("ROLLBACK")
+                                raise
+                self._tokens, self.fill_rate, self.last_decrease = tokens, fill_rate, now
+                return fill_rate
+
+        async def acquire(self, cost: float = 1.0) -> None:
+                if self._conn is None:
+                        return await super().acquire(cost)
+                cost = float(cost)
+                if cost <= 0:
+                        return
+                async with self._lock:
+                        while True:
+                                wait_sec = await asyncio.to_thread(self._try_take, cost)
+                                if wait_sec <= 0:
+                                        return
+                                await asyncio.sleep(min(wait_sec, 5.0))
+
+        def status(self) -> Dict[str, float]:
+                if self._conn is None:
+                        return super().status()
+                with self._db_lock:
+                        tokens, capacity, fill_rate, updated_at = self._conn.execute(
+                                "SELECT tokens, capacity, fill_rate, updated_at FROM buckets WHERE platform = ?",
+                                (self.platform,)
+                        ).fetchone()
+                tokens = min(capacity, tokens + max(0.0, time.time() - updated_at) * fill_rate)
+                return {
+                        "tokens": round(tokens, 2),
+                        "capacity": round(capacity, 2),
+                        "fill_rate": round(fill_rate, 2),
+                }
+
+
 @dataclass(frozen=True)
 class JitterProfile:
         """正态分布抖动配置（截断到[min_s, max_s]）。"""
@@ -326,6 +508,79 @@ class JitterProfile:
                 return max(self.min_s, min(val, self.max_s))
 
 
+class AimdRateController:
+        """AIMD 自适应限速：请求成功时加性提速，出现拦截信号时乘性降速。
+
+        调整的是令牌桶的补充速率，并限制在平台上下限之内；
+        共享令牌桶会把学到的速率写回数据库，下次运行从该速率继续。
+        """
+
+        # 触发降速的信号
+        BLOCK_SIGNALS = ("blocked", "captcha", "rate_limited", "timeout")
+
+        def __init__(
+                self,
+                bucket: TokenBucket,
+                floor: float,
+                ceiling: float,
+                increase: float = AIMD_INCREASE_STEP,
+                decrease: float = AIMD_DECREASE_FACTOR,
+                cooldown: float = AIMD_DECREASE_COOLDOWN,
+                platform: Optional[str] = None,
+        ):
+                self.bucket = bucket
+                self.floor = float(floor)
+                self.ceiling = float(ceiling)
+                self.increase = float(increase)
+                self.decrease = float(decrease)
+                self.cooldown = float(cooldown)
+                self.signals: Dict[str, int] = {}
+                self.platform = platform or getattr(bucket, 'platform', 'unknown')
+                # 反馈在线程中执行（见 ActionRateController），串行化同一控制器的调整
+                self._lock = threading.Lock()
+                # 配置上下限变化后，把已学到的速率拉回范围内
+                self._publish(self.bucket.adjust_fill_rate(self._clamp))
+
+        def _clamp(self, rate: float) -> float:
+                return max(self.floor, min(self.ceiling, rate))
+
+        def _publish(self, rate: float) -> float:
+                metrics.rate_limit_fill_rate().set(rate, platform=self.platform)
+                return rate
+
+        @classmethod
+        def for_platform(cls, bucket: TokenBucket, platform: str) -> "AimdRateController":
+                floor, ceiling = AIMD_RATE_BOUNDS.get(platform, (bucket.fill_rate, bucket.fill_rate))
+                return cls(bucket, floor=floor, ceiling=ceiling, platform=platform)
+
+        @property
+        def rate(self) -> float:
+                return self.bucket.fill_rate
+
+        def on_success(self) -> float:
+                """请求成功：速率加性增加。"""
+                with self._lock:
+                        return self._publish(self.bucket.adjust_fill_rate(lambda r: self._clamp(r + self.increase)))
+
+        def on_signal(self, signal: str) -> float:
+                """收到拦截/验证码/限流/超时信号：速率乘性降低。
+
+                冷却时间记在令牌桶上（共享令牌桶记在数据库里），同一波拦截无论来自哪个实例/进程只降一次。
+                """
+                with self._lock:
+                        self.signals[signal] = self.signals.get(signal, 0) + 1
+                        metrics.rate_limit_signals().inc(platform=self.platform, signal=signal)
+                        if signal not in self.BLOCK_SIGNALS:
+                                return self.rate
+                        old = self.rate
+                        new = self.bucket.decrease_fill_rate(lambda r: self._clamp(r * self.decrease), self.cooldown)
+                        if new is None:
+                                return self._publish(self.rate)
+                        self._publish(new)
+                print(f"  🐢 检测到{signal}，限速 {old:.2f} → {new:.2f} 次/秒")
+                return new
+
+
 class ActionRateController:
         """对 click/scroll/request 统一做：令牌桶节流 + 正态抖动延迟。"""
 
@@ -338,52 +593,94 @@ class ActionRateController:
                 request_cost: float = 1.0,
                 click_cost: float = 0.8,
                 scroll_cost: float = 0.25,
+                aimd: Optional[AimdRateController] = None,
+                platform: str = "unknown",
         ):
                 self.bucket = bucket
+                self.aimd = aimd
+                self.platform = platform
                 self.request_jitter = request_jitter
                 self.click_jitter = click_jitter
                 self.scroll_jitter = scroll_jitter
                 self.request_cost = request_cost
                 self.click_cost = click_cost
                 self.scroll_cost = scroll_cost
+                self._pending_feedback: Set["asyncio.Task"] = set()
 
         @staticmethod
-        def for_xhs() -> "ActionRateController":
-                bucket = TokenBucket(capacity=12.0, fill_rate=2.5)
+        def for_xhs(db_path: Optional[str] = None) -> "ActionRateController":
+                bucket = SharedTokenBucket("xiaohongshu", capacity=12.0, fill_rate=2.5, db_path=db_path)
                 return ActionRateController(
                         bucket=bucket,
+                        aimd=AimdRateController.for_platform(bucket, "xiaohongshu"),
+                        platform="xiaohongshu",
                         request_jitter=JitterProfile(min_s=0.9, max_s=2.8),
                         click_jitter=JitterProfile(min_s=0.25, max_s=1.2),
                         scroll_jitter=JitterProfile(min_s=0.05, max_s=0.22),
                 )
 
         @staticmethod
-        def for_fish() -> "ActionRateController":
-                bucket = TokenBucket(capacity=10.0, fill_rate=2.0)
+        def for_fish(db_path: Optional[str] = None) -> "ActionRateController":
+                bucket = SharedTokenBucket("xianyu", capacity=10.0, fill_rate=2.0, db_path=db_path)
                 return ActionRateController(
                         bucket=bucket,
+                        aimd=AimdRateController.for_platform(bucket, "xianyu"),
+                        platform="xianyu",
                         request_jitter=JitterProfile(min_s=1.2, max_s=3.6),
                         click_jitter=JitterProfile(min_s=0.3, max_s=1.5),
                         scroll_jitter=JitterProfile(min_s=0.06, max_s=0.25),
                 )
 
-        async def before_request(self) -> float:
-                await self.bucket.acquire(self.request_cost)
-                delay = self.request_jitter.sample()
+        async def _throttle(self, action: str, cost: float, jitter: JitterProfile) -> float:
+                started = time.monotonic()
+                await self.bucket.acquire(cost)
+                delay = jitter.sample()
                 await asyncio.sleep(delay)
+                metrics.rate_limit_wait().observe(time.monotonic() - started, platform=self.platform, action=action)
                 return delay
 
+        async def before_request(self) -> float:
+                return await self._throttle("request", self.request_cost, self.request_jitter)
+
         async def before_click(self) -> float:
-                await self.bucket.acquire(self.click_cost)
-                delay = self.click_jitter.sample()
-                await asyncio.sleep(delay)
-                return delay
+                return await self._throttle("click", self.click_cost, self.click_jitter)
 
         async def before_scroll_step(self) -> float:
-                await self.bucket.acquire(self.scroll_cost)
-                delay = self.scroll_jitter.sample()
-                await asyncio.sleep(delay)
-                return delay
+                return await self._throttle("scroll", self.scroll_cost, self.scroll_jitter)
+
+        def _feedback(self, func: Callable, *args) -> None:
+                """把 AIMD 反馈交给线程执行：共享令牌桶的调整是 SQLite 写事务，不能阻塞事件循环。
+
+                没有运行中的事件循环时直接同步执行。
+                """
+                try:
+                        loop = asyncio.get_running_loop()
+                except RuntimeError:
+                        func(*args)
+                        return
+                task = loop.create_task(asyncio.to_thread(func, *args))
+                self._pending_feedback.add(task)
+                task.add_done_callback(self._feedback_done)
+
+        def _feedback_done(self, task: "asyncio.Task") -> None:
+                self._pending_feedback.discard(task)
+                if not task.cancelled() and task.exception() is not None:
+                        print(f"⚠️ 限速反馈写入失败: {task.exception()}")
+
+        async def flush_feedback(self) -> None:
+                """等待已提交的 AIMD 反馈写入完成。"""
+                if self._pending_feedback:
+                        await asyncio.gather(*list(self._pending_feedback), return_exceptions=True)
+
+        def on_success(self) -> None:
+                """反馈一次成功获取数据（用于自适应提速）。"""
+                if self.aimd:
+                        self._feedback(self.aimd.on_success)
+
+        def on_block(self, signal: str = "blocked") -> None:
+                """反馈拦截信号：blocked / captcha / rate_limited / timeout。"""
+                if self.aimd:
+                        self._feedback(self.aimd.on_signal, signal)
 
 
 def build_webgl_canvas_noise_script(seed: int) -> str:
@@ -475,34 +772,6 @@ def build_webgl_canvas_noise_script(seed: int) -> str:
 """
 
 
-# 🔄 重试管理器
-class RetryManager:
-    """智能重试管理器"""
-    
-    def __init__(self, max_retries: int = 5, backoff_factor: float = 2.0):
-        self.max_retries = max_retries
-        self.backoff_factor = backoff_factor
-    
-    async def execute_with_retry(self, func, *args, **kwargs):
-        """执行函数，自动重试"""
-        last_exception = None
-        
-        for attempt in range(self.max_retries):
-            try:
-                return await func(*args, **kwargs)
-            except Exception as e:
-                last_exception = e
-                
-                if attempt < self.max_retries - 1:
-                    wait_time = (self.backoff_factor ** attempt) * (1 + random.random())
-                    print(f"⚠️ 第 {attempt + 1} 次重试失败，{wait_time:.1f} 秒后重试...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"❌ 重试 {self.max_retries} 次后仍失败")
-        
-        raise last_exception
-
-
 # 🎨 响应验证器
 class ResponseValidator:
     """验证爬虫响应的有效性"""
@@ -556,28 +825,71 @@ class IPRotationManager:
 
 # 📊 请求统计
 class RequestStats:
-    """请求统计"""
+    """请求统计（本实例的计数用于打印；同时写入进程内指标注册表，见 utils.metrics）"""
     
-    def __init__(self):
+    def __init__(self, platform: str = "unknown"):
+        """
+        Args:
+            platform: 平台标签（xiaohongshu / xianyu）
+        """
+        self.platform = platform
         self.total_requests = 0
         self.successful_requests = 0
         self.failed_requests = 0
         self.blocked_requests = 0
         self.retry_count = 0
+        self.mock_fallbacks = 0
     
-    def record_success(self):
+    def record_success(self, layer: str = "unknown", seconds: Optional[float] = None):
+        """
+        记录一个词条获取成功
+
+        Args:
+            layer: 最终提供数据的层（sniff / api / xpath / page）
+            seconds: 该词条的总耗时（含重试）
+        """
         self.total_requests += 1
         self.successful_requests += 1
+        self._record_keyword(layer, "success", seconds)
     
-    def record_failure(self):
+    def record_failure(self, layer: str = "none", seconds: Optional[float] = None):
+        """
+        记录一个词条获取失败
+
+        Args:
+            layer: 降级为模拟数据时为 mock，否则为 none
+            seconds: 该词条的总耗时（含重试）
+        """
         self.total_requests += 1
         self.failed_requests += 1
+        if layer == "mock":
+            self.mock_fallbacks += 1
+        self._record_keyword(layer, "failure", seconds)
     
-    def record_blocked(self):
+    def record_blocked(self, signal: str = "blocked"):
         self.blocked_requests += 1
+        metrics.block_signals().inc(platform=self.platform, signal=signal)
     
     def record_retry(self):
         self.retry_count += 1
+        metrics.retries().inc(platform=self.platform)
+    
+    def record_layer(self, layer: str, outcome: str, seconds: float):
+        """
+        记录一层获取策略的单次尝试
+
+        Args:
+            layer: sniff / api / xpath / page
+            outcome: success（有数据）/ empty（无数据）/ timeout（超出时间片）/ error
+            seconds: 耗时
+        """
+        metrics.layer_attempts().inc(platform=self.platform, layer=layer, outcome=outcome)
+        metrics.layer_latency().observe(seconds, platform=self.platform, layer=layer, outcome=outcome)
+    
+    def _record_keyword(self, layer: str, outcome: str, seconds: Optional[float]):
+        metrics.keyword_results().inc(platform=self.platform, layer=layer, outcome=outcome)
+        if seconds is not None:
+            metrics.keyword_latency().observe(seconds, platform=self.platform, outcome=outcome)
     
     def get_success_rate(self) -> float:
         """获取成功率"""
@@ -585,6 +897,12 @@ class RequestStats:
             return 0.0
         return self.successful_requests / self.total_requests * 100
     
+    def get_mock_fallback_rate(self) -> float:
+        """模拟数据降级率"""
+        if self.total_requests == 0:
+            return 0.0
+        return self.mock_fallbacks / self.total_requests * 100
+    
     def __str__(self):
         return f"""
 📊 请求统计:
@@ -594,6 +912,7 @@ class RequestStats:
   • 被拦截: {self.blocked_requests}
   • 重试次数: {self.retry_count}
   • 成功率: {self.get_success_rate():.1f}%
+  • 模拟数据降级率: {self.get_mock_fallback_rate():.1f}%
 """
 
 
@@ -0,0 +1,322 @@
+"""
+📦 静态脚本本地缓存
+小红书/闲鱼每次导航都会重新拉取（或重新校验）数 MB 的 JS bundle。
+这里把脚本按内容寻址存到磁盘，通过 route.fulfill 直接返回：
+
+- 索引：SQLite，按 URL 记录内容哈希、回放用的响应头、校验信息（ETag / Last-Modified）和过期时间
+- 内容：blobs/<sha256>，同一内容只存一份（不同 URL 指向同一 bundle 时共享）
+- 新鲜度：Cache-Control max-age / immutable / Expires；带指纹的文件名视为不可变
+- 过期但有校验信息：带 If-None-Match / If-Modified-Since 回源，304 时继续使用本地内容
+- 总大小超出上限时按最近最少使用淘汰
+"""
+
+import asyncio
+import email.utils
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from config import ASSET_CACHE_DIR, ASSET_CACHE_MAX_BYTES, ASSET_CACHE_MAX_TTL
+
+
+# 需要缓存的资源类型（图片/字体/样式在轻量模式下直接拦截，不经过缓存）
+CACHEABLE_TYPES = ('script', 'stylesheet')
+
+# 回放时保留的响应头（跨域脚本需要 CORS 头，否则 crossorigin 脚本会加载失败）
+_REPLAY_HEADERS = (
+    'content-type',
+    'access-control-allow-origin',
+    'access-control-allow-credentials',
+    'timing-allow-origin',
+    'etag',
+    'last-modified',
+)
+
+# 带内容指纹的文件名：main.3f9a8c1d.js / vendor-5b2e9f0a7c.js
+_FINGERPRINT = re.compile(r'[.\-_][0-9a-f]{8,}\.(?:js|css)$', re.I)
+_MAX_AGE = re.compile(r'(?:^|[,\s])(?:s-maxage|max-age)=(\d+)')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    sha TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_sha ON entries(sha);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_access ON blobs(last_access);
+"""
+
+
+def freshness_ttl(url: str, headers: Dict[str, str], now: Optional[float] = None) -> Optional[float]:
+    """
+    根据响应头计算可直接使用本地副本的时长
+
+    Args:
+        url: 资源地址
+        headers: 响应头（小写键）
+
+    Returns:
+        秒数；0 表示可以缓存但每次都要回源校验；None 表示不可缓存
+    """
+    now = time.time() if now is None else now
+    cache_control = headers.get('cache-control', '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0.0
+    if 'immutable' in cache_control:
+        return float(ASSET_CACHE_MAX_TTL)
+
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return float(min(int(match.group(1)), ASSET_CACHE_MAX_TTL))
+
+    expires = headers.get('expires')
+    if expires:
+        try:
+            return float(min(max(0.0, email.utils.parsedate_to_datetime(expires).timestamp() - now), ASSET_CACHE_MAX_TTL))
+        except (TypeError, ValueError):
+            return 0.0
+
+    if _FINGERPRINT.search(url.split('?', 1)[0]):
+        return float(ASSET_CACHE_MAX_TTL)
+
+    # 启发式：上次修改距今时间的 10%（RFC 9111 4.2.2）
+    last_modified = headers.get('last-modified')
+    if last_modified:
+        try:
+            age = now - email.utils.parsedate_to_datetime(last_modified).timestamp()
+            return float(min(max(0.0, age * 0.1), ASSET_CACHE_MAX_TTL))
+        except (TypeError, ValueError):
+            pass
+    return 0.0
+
+
+@dataclass
+class CachedAsset:
+    """一条缓存记录"""
+    url: str
+    sha: str
+    headers: Dict[str, str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """回源校验用的条件请求头"""
+        conditional = {}
+        if self.etag:
+            conditional['if-none-match'] = self.etag
+        if self.last_modified:
+            conditional['if-modified-since'] = self.last_modified
+        return conditional
+
+
+class AssetCache:
+    """按内容寻址的静态脚本磁盘缓存（LRU 淘汰，多进程共享）"""
+
+    def __init__(self, root: str = ASSET_CACHE_DIR, max_bytes: int = ASSET_CACHE_MAX_BYTES):
+        """
+        Args:
+            root: 缓存目录
+            max_bytes: 内容总大小上限（字节）
+        """
+        self.root = Path(root)
+        self.blob_dir = self.root / 'blobs'
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'bytes_saved': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.root / 'index.db'), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _blob_path(self, sha: str) -> Path:
+        return self.blob_dir / sha
+
+    def lookup(self, url: str) -> Optional[CachedAsset]:
+        """查找缓存记录（不判断是否新鲜；内容文件丢失时视为未命中）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha, headers, etag, last_modified, expires_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if not row or not self._blob_path(row[0]).exists():
+            return None
+        return CachedAsset(url, row[0], json.loads(row[1]), row[2], row[3], row[4])
+
+    def read(self, entry: CachedAsset) -> Optional[bytes]:
+        """读取内容并更新最近使用时间"""
+        try:
+            body = self._blob_path(entry.sha).read_bytes()
+        except OSError:
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE blobs SET last_access = ? WHERE sha = ?", (time.time(), entry.sha))
+        return body
+
+    def refresh(self, entry: CachedAsset, headers: Dict[str, str]) -> None:
+        """304 校验通过：按新的响应头延长有效期"""
+        ttl = freshness_ttl(entry.url, {**entry.headers, **headers}) or 0.0
+        entry.expires_at = time.time() + ttl
+        with self._lock:
+            self._conn.execute("UPDATE entries SET expires_at = ? WHERE url = ?", (entry.expires_at, entry.url))
+
+    def store(self, url: str, body: bytes, headers: Dict[str, str]) -> Optional[CachedAsset]:
+        """
+        保存响应内容
+
+        Args:
+            url: 资源地址
+            body: 响应体
+            headers: 响应头（小写键）
+
+        Returns:
+            缓存记录；不可缓存时为 None
+        """
+        ttl = freshness_ttl(url, headers)
+        if ttl is None or not body or len(body) > self.max_bytes:
+            return None
+
+        sha = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(sha)
+        if not path.exists():
+            tmp = path.with_name(f"{sha}.{os.getpid()}.tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+
+        replay = {k: v for k, v in headers.items() if k in _REPLAY_HEADERS}
+        entry = CachedAsset(url, sha, replay, headers.get('etag'), headers.get('last-modified'), time.time() + ttl)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO blobs (sha, size, last_access) VALUES (?, ?, ?) "
+                    "ON CONFLICT(sha) DO UPDATE SET last_access = excluded.last_access",
+                    (sha, len(body), now)
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (url, sha, headers, etag, last_modified, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, sha, json.dumps(replay), entry.etag, entry.last_modified, entry.expires_at)
+                )
+                evicted = self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        for old_sha in evicted:
+            self._blob_path(old_sha).unlink(missing_ok=True)
+        return entry
+
+    def _evict(self):
+        """超出总大小时淘汰最近最少使用的内容（需在写事务内调用），返回待删除的内容哈希"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        evicted = []
+        if total <= self.max_bytes:
+            return evicted
+        for sha, size in self._conn.execute("SELECT sha, size FROM blobs ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE sha = ?", (sha,))
+            self._conn.execute("DELETE FROM blobs WHERE sha = ?", (sha,))
+            total -= size
+            evicted.append(sha)
+        return evicted
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    async def handle(
+        self,
+        route,
+        headers: Optional[Dict[str, str]] = None,
+        on_local: Optional[Callable[[], None]] = None
+    ) -> bool:
+        """
+        在 Playwright 路由中处理一个请求
+
+        Args:
+            route: Playwright Route
+            headers: 回源时使用的请求头（缺省用原请求头）
+            on_local: 即将用本地副本 fulfill 时调用（命中或 304 复用；流量记账据此区分缓存返回和回源）
+
+        Returns:
+            是否已处理（已 fulfill）；返回 False 时调用方照常 continue_
+        """
+        request = route.request
+        if request.method != 'GET' or request.resource_type not in CACHEABLE_TYPES:
+            return False
+
+        # SQLite（写事务最长等 30 秒）和文件读写放到线程里，不阻塞 Playwright 事件循环
+        url = request.url
+        entry = await asyncio.to_thread(self.lookup, url)
+        if entry and entry.is_fresh():
+            body = await asyncio.to_thread(self.read, entry)
+            if body is not None:
+                self.stats['hits'] += 1
+                self.stats['bytes_saved'] += len(body)
+                if on_local:
+                    on_local()
+                await route.fulfill(status=200, headers=entry.headers, body=body)
+                return True
+
+        headers = dict(headers) if headers is not None else await request.all_headers()
+        try:
+            response = await route.fetch(headers={**headers, **entry.validators()} if entry else headers)
+            if response.status == 304 and entry:
+                body = await asyncio.to_thread(self.read, entry)
+                if body is not None:
+                    await asyncio.to_thread(self.refresh, entry, response.headers)
+                    self.stats['revalidated'] += 1
+                    self.stats['bytes_saved'] += len(body)
+                    if on_local:
+                        on_local()
+                    await route.fulfill(status=200, headers=entry.headers, body=body)
+                    return True
+                # 校验期间本地内容被淘汰：浏览器并没有发条件请求，不能把 304 交给它，去掉校验头重新回源
+                response = await route.fetch(headers=headers)
+        except Exception:
+            # 回源失败交给浏览器按原流程请求（错误会照常暴露给页面）
+            return False
+
+        self.stats['misses'] += 1
+        if response.status == 200:
+            body = await response.body()
+            await asyncio.to_thread(self.store, url, body, response.headers)
+            await route.fulfill(response=response, body=body)
+        else:
+            await route.fulfill(response=response)
+        return True
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"📦 脚本缓存：命中 {s['hits']}，304复用 {s['revalidated']}，回源 {s['misses']}，"
+            f"节省 {s['bytes_saved'] / 1024 / 1024:.1f} MB"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
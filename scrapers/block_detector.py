@@ -0,0 +1,282 @@
+"""
+🚫 响应层拦截检测
+在响应到达时就判断是否被拦截，而不是等导航、嗅探、选择器逐个超时后再降级到模拟数据：
+- 状态码：429 频率限制、403/418 拦截、401 需要登录、461/471 小红书验证码
+- 主框架导航/重定向目标：验证码页、滑块页、登录页
+- 平台 API 错误码：小红书 code、闲鱼 mtop ret
+- 拦截页文案：ResponseValidator.is_blocked
+
+命中后 BlockWatcher 立即取消该词条正在进行的导航和提取，抛出 BlockDetectedError。
+"""
+
+import asyncio
+import re
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from .advanced_config import ResponseValidator
+from .retry_policy import CrawlFailure, FailureReason
+
+
+# 检测信号 → 失败原因
+SIGNAL_REASONS = {
+    'blocked': FailureReason.BLOCKED,
+    'captcha': FailureReason.BLOCKED,
+    'rate_limited': FailureReason.RATE_LIMITED,
+    'login': FailureReason.LOGIN_REQUIRED,
+}
+
+_STATUS_SIGNALS = {
+    401: 'login',
+    403: 'blocked',
+    418: 'blocked',
+    429: 'rate_limited',
+    461: 'captcha',   # 小红书：需要滑块验证
+    471: 'captcha',
+}
+
+# 主框架导航到这些地址即视为被拦截（XHR 不检查：页面正常加载也会调用登录相关接口）
+_NAVIGATION_PATTERNS = (
+    ('captcha', re.compile(r'captcha|/verify|punish|x5sec|_____tmd_____|/sec\b|slide', re.I)),
+    ('login', re.compile(r'/login|login\.taobao\.com|passport\.|website-login', re.I)),
+)
+
+# 小红书 API 错误码
+_XHS_ERROR_CODES = {
+    300012: 'blocked',        # IP 存在风险
+    300013: 'rate_limited',   # 访问频次异常
+    300015: 'blocked',        # 浏览器环境异常
+    461: 'captcha',
+    -100: 'login',            # 登录已过期
+    -101: 'login',            # 无登录信息
+}
+
+# 闲鱼 mtop ret 前缀（FAIL_SYS_TOKEN_* 由页面脚本自动刷新，不算拦截）
+_MTOP_RET_SIGNALS = (
+    ('FAIL_SYS_USER_VALIDATE', 'captcha'),
+    ('RGV587_ERROR', 'blocked'),
+    ('FAIL_SYS_ILLEGAL_ACCESS', 'blocked'),
+    ('FAIL_SYS_FLOWLIMIT', 'rate_limited'),
+    ('FAIL_SYS_TRAFFIC_LIMIT', 'rate_limited'),
+    ('FAIL_SYS_SESSION_EXPIRED', 'login'),
+)
+
+# 只检查小页面的文案（拦截页通常很小，正常页面的脚本里也可能出现同样的字样）
+_HTML_SCAN_LIMIT = 50 * 1024
+_SCRIPT_STYLE = re.compile(r'<(script|style)\b.*?</\1>', re.I | re.S)
+_TAGS = re.compile(r'<[^>]+>')
+
+
+@dataclass(frozen=True)
+class BlockSignal:
+    """一次拦截检测结果"""
+
+    signal: str    # blocked / captcha / rate_limited / login
+    url: str
+    detail: str
+
+    @property
+    def reason(self) -> FailureReason:
+        return SIGNAL_REASONS.get(self.signal, FailureReason.BLOCKED)
+
+
+class BlockDetectedError(CrawlFailure):
+    """响应层检测到拦截（验证码、登录跳转、错误码）"""
+
+    def __init__(self, block: BlockSignal):
+        super().__init__(f"检测到{block.signal}：{block.detail}（{block.url[:80]}）", block.reason)
+        self.block = block
+
+
+def inspect_status(url: str, status: int) -> Optional[BlockSignal]:
+    """按状态码判断"""
+    signal = _STATUS_SIGNALS.get(int(status or 0))
+    return BlockSignal(signal, url, f"HTTP {status}") if signal else None
+
+
+def inspect_navigation(url: str) -> Optional[BlockSignal]:
+    """主框架导航（含重定向目标）是否落到验证码页或登录页"""
+    parsed = urlparse(url or '')
+    target = f"{parsed.netloc}{parsed.path}"
+    for signal, pattern in _NAVIGATION_PATTERNS:
+        if pattern.search(target):
+            return BlockSignal(signal, url, f"跳转到 {target[:60]}")
+    return None
+
+
+def inspect_payload(url: str, payload) -> Optional[BlockSignal]:
+    """
+    检查平台 API 返回的 JSON 是否为错误响应
+
+    Args:
+        url: 接口地址
+        payload: 解析后的 JSON
+
+    Returns:
+        BlockSignal 或 None
+    """
+    if not isinstance(payload, dict):
+        return None
+
+    code = payload.get('code')
+    if isinstance(code, int) and code in _XHS_ERROR_CODES and not payload.get('success'):
+        return BlockSignal(_XHS_ERROR_CODES[code], url, f"code={code} {str(payload.get('msg', ''))[:40]}")
+
+    ret = payload.get('ret')
+    if isinstance(ret, list):
+        for item in ret:
+            for prefix, signal in _MTOP_RET_SIGNALS:
+                if isinstance(item, str) and item.startswith(prefix):
+                    return BlockSignal(signal, url, item[:60])
+
+    message = str(payload.get('msg') or payload.get('message') or '')
+    if message and ResponseValidator.is_blocked(message):
+        return BlockSignal('blocked', url, message[:40])
+    return None
+
+
+def inspect_html(url: str, html: str) -> Optional[BlockSignal]:
+    """小页面的可见文案是否为拦截页"""
+    if not html or len(html) > _HTML_SCAN_LIMIT:
+        return None
+    text = _TAGS.sub(' ', _SCRIPT_STYLE.sub(' ', html))
+    if ResponseValidator.is_blocked(text):
+        return BlockSignal('blocked', url, '拦截页文案')
+    return None
+
+
+class BlockWatcher:
+    """
+    挂在页面上的拦截监听器
+
+    用法：result = await watcher.guard(self._fetch_layers(keyword))
+    监听期间任一响应命中拦截规则，立即取消该协程并抛出 BlockDetectedError。
+    """
+
+    def __init__(
+        self,
+        page,
+        api_predicate: Callable[[str], bool],
+        on_block: Optional[Callable[[BlockSignal], None]] = None
+    ):
+        """
+        Args:
+            page: Playwright Page
+            api_predicate: 判断 URL 是否为需要检查错误码的平台 API
+            on_block: 检测到拦截时的回调（反馈限速、记录统计等）
+        """
+        self.page = page
+        self.api_predicate = api_predicate
+        self.on_block = on_block
+        self.detected: Optional[BlockSignal] = None
+        self._event: Optional[asyncio.Event] = None
+        self._tasks = set()
+        self._attached = False
+
+    def _trigger(self, block: Optional[BlockSignal]) -> None:
+        if block is None or self._event is None or self._event.is_set():
+            return
+        self.detected = block
+        self._event.set()
+
+    def _on_response(self, resp) -> None:
+        if self._event is None or self._event.is_set():
+            return
+        try:
+            url = resp.url
+            request = resp.request
+            is_document = request.resource_type == 'document' and resp.frame == self.page.main_frame
+        except Exception:
+            return
+        # 第三方资源（统计、CDN）的错误码与平台拦截无关
+        is_api = not is_document and self.api_predicate(url)
+        if not (is_document or is_api):
+            return
+
+        block = inspect_status(url, resp.status)
+        if block is None and is_document:
+            block = inspect_navigation(url)
+            location = (resp.headers or {}).get('location')
+            if block is None and location:
+                block = inspect_navigation(location)
+        if block is not None:
+            self._trigger(block)
+            return
+
+        # 需要读取响应体的检查放到任务里，避免阻塞事件分发
+        if resp.status == 200:
+            task = asyncio.create_task(self._inspect_body(resp, is_document))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _on_frame_navigated(self, frame) -> None:
+        if frame == self.page.main_frame:
+            self._trigger(inspect_navigation(frame.url))
+
+    async def _inspect_body(self, resp, is_document: bool) -> None:
+        try:
+            if is_document:
+                self._trigger(inspect_html(resp.url, await resp.text()))
+            else:
+                self._trigger(inspect_payload(resp.url, await resp.json()))
+        except Exception:
+            return
+
+    def attach(self) -> None:
+        if not self._attached:
+            self.page.on("response", self._on_response)
+            self.page.on("framenavigated", self._on_frame_navigated)
+            self._attached = True
+
+    def detach(self) -> None:
+        if self._attached:
+            with suppress(Exception):
+                self.page.off("response", self._on_response)
+                self.page.off("framenavigated", self._on_frame_navigated)
+            self._attached = False
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def guard(self, coro):
+        """
+        执行协程，期间检测到拦截则立即取消
+
+        Returns:
+            协程的返回值
+
+        Raises:
+            BlockDetectedError: 检测到拦截
+        """
+        self.detected = None
+        self._event = asyncio.Event()
+        self.attach()
+
+        task = asyncio.ensure_future(coro)
+        waiter = asyncio.ensure_future(self._event.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await task
+            self._event = None
+
+        # 协程先结束：成功则返回结果；失败且未检测到拦截则原样抛出
+        if not task.cancelled() and (task.exception() is None or self.detected is None):
+            return task.result()
+        # 协程被取消（不是因为拦截）：传播取消
+        if self.detected is None:
+            raise asyncio.CancelledError()
+
+        block = self.detected
+        print(f"  🚫 {block.signal}：{block.detail}，立即放弃该词条")
+        # 停止页面继续加载验证码/登录页
+        with suppress(Exception):
+            await asyncio.wait_for(self.page.evaluate("() => window.stop()"), timeout=2.0)
+        if self.on_block:
+            self.on_block(block)
+        raise BlockDetectedError(block)
@@ -0,0 +1,226 @@
+"""
+🌱 关键词发现
+从小红书搜索页嗅探到的 API 响应中收集「相关搜索 / 大家都在搜 / 联想词」，
+按观测热度放入优先级前沿队列，逐步把候选词从几十个扩展到上千个。
+
+- 布隆过滤器（内存）+ SQLite 已知集合（磁盘）：已入队过的词不会重复入队
+- 前沿队列有容量上限，超出时淘汰优先级最低的候选
+- 状态持久化，多次运行接力扩展
+"""
+
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import DISCOVERY_DB, DISCOVERY_FRONTIER_MAX, DISCOVERY_BLOOM_CAPACITY
+
+
+# 相关搜索词所在的容器字段（不含 'items'，避免把笔记标题当作搜索词）
+_RELATED_CONTAINERS = ('queries', 'sug_items', 'suggestions', 'rec_query', 'hot_list', 'related_search', 'query_list')
+# 搜索词文本字段（按优先级）
+_QUERY_TEXT_KEYS = ('search_word', 'query', 'word', 'text', 'name')
+# 可能携带热度的字段
+_HEAT_KEYS = ('hot_value', 'score', 'search_count', 'view_count', 'heat')
+
+
+def _clean_query(text: str) -> Optional[str]:
+    text = (text or '').strip()
+    if not (2 <= len(text) <= 20) or text.startswith(('http', '#')):
+        return None
+    return text
+
+
+def extract_related_queries(payload) -> List[Tuple[str, float]]:
+    """
+    从搜索相关的 API JSON 中提取相关搜索词
+
+    Args:
+        payload: 嗅探到的 JSON（dict / list）
+
+    Returns:
+        [(搜索词, 热度提示)]，按出现顺序去重；没有热度字段时热度提示为0
+    """
+    found: Dict[str, float] = {}
+
+    def take(node: Dict) -> None:
+        for key in _QUERY_TEXT_KEYS:
+            value = node.get(key)
+            if isinstance(value, str):
+                query = _clean_query(value)
+                if query and query not in found:
+                    heat = 0.0
+                    for heat_key in _HEAT_KEYS:
+                        try:
+                            heat = float(node.get(heat_key) or 0)
+                        except (TypeError, ValueError):
+                            continue
+                        if heat:
+                            break
+                    found[query] = heat
+                return
+
+    def walk(node, in_container: bool) -> None:
+        if isinstance(node, dict):
+            if in_container:
+                take(node)
+            for key, value in node.items():
+                walk(value, key in _RELATED_CONTAINERS)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value, in_container)
+
+    walk(payload, False)
+    return list(found.items())
+
+
+class BloomFilter:
+    """布隆过滤器（bytearray 位图 + blake2b 双重哈希）"""
+
+    def __init__(self, capacity: int = DISCOVERY_BLOOM_CAPACITY, error_rate: float = 0.001):
+        """
+        Args:
+            capacity: 预期元素数量
+            error_rate: 目标误判率
+        """
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS known (
+    keyword TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frontier (
+    keyword TEXT PRIMARY KEY,
+    priority REAL NOT NULL,
+    parent TEXT,
+    discovered_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_frontier_priority ON frontier(priority);
+"""
+
+
+class KeywordFrontier:
+    """关键词发现前沿队列（按优先级出队，容量有上限）"""
+
+    # 没有热度字段时，按父词热度和位置衰减估计
+    POSITION_DECAY = 0.9
+
+    def __init__(self, db_path: str = DISCOVERY_DB, max_size: int = DISCOVERY_FRONTIER_MAX):
+        """
+        Args:
+            db_path: 状态数据库路径
+            max_size: 前沿队列最大候选数
+        """
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+        # 已知集合载入布隆过滤器：新词绝大多数情况下无需查磁盘
+        known_count = self._conn.execute("SELECT COUNT(*) FROM known").fetchone()[0]
+        self._bloom = BloomFilter(capacity=max(DISCOVERY_BLOOM_CAPACITY, known_count * 2))
+        for (keyword,) in self._conn.execute("SELECT keyword FROM known"):
+            self._bloom.add(keyword)
+
+    def is_known(self, keyword: str) -> bool:
+        """是否曾经入队过（布隆过滤器判否即确定为新词，判是再查磁盘确认）"""
+        if keyword not in self._bloom:
+            return False
+        row = self._conn.execute("SELECT 1 FROM known WHERE keyword = ?", (keyword,)).fetchone()
+        return row is not None
+
+    def offer(self, candidates: Iterable[Tuple[str, float]], parent: Optional[str] = None, parent_heat: float = 0) -> List[str]:
+        """
+        加入候选词（已知的词跳过）
+
+        Args:
+            candidates: [(词条, 热度提示)]，热度提示为0时按父词热度和位置估计
+            parent: 来源词条
+            parent_heat: 来源词条的热度
+
+        Returns:
+            新入队的词条
+        """
+        now = time.time()
+        added = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for position, (keyword, heat_hint) in enumerate(candidates):
+                    if not keyword or keyword == parent or self.is_known(keyword):
+                        continue
+                    priority = heat_hint or parent_heat * (self.POSITION_DECAY ** position)
+                    self._conn.execute("INSERT INTO known (keyword, first_seen) VALUES (?, ?)", (keyword, now))
+                    self._conn.execute(
+                        "INSERT INTO frontier (keyword, priority, parent, discovered_at) VALUES (?, ?, ?, ?)",
+                        (keyword, float(priority), parent, now)
+                    )
+                    self._bloom.add(keyword)
+                    added.append(keyword)
+                self._evict_overflow()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def _evict_overflow(self) -> None:
+        """超出容量时淘汰优先级最低的候选（仍记为已知，不会再次入队）"""
+        overflow = self._conn.execute("SELECT COUNT(*) FROM frontier").fetchone()[0] - self.max_size
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM frontier WHERE keyword IN "
+                "(SELECT keyword FROM frontier ORDER BY priority ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def pop(self) -> Optional[Tuple[str, float, Optional[str]]]:
+        """取出优先级最高的候选，返回 (词条, 优先级, 来源词条)"""
+        with self._lock:
+            # 查询和删除在同一写事务中：多个进程共用状态库时同一候选只会被取出一次
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT keyword, priority, parent FROM frontier ORDER BY priority DESC LIMIT 1"
+                ).fetchone()
+                if row:
+                    self._conn.execute("DELETE FROM frontier WHERE keyword = ?", (row[0],))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return tuple(row) if row else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM frontier").fetchone()[0]
+
+    def known_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM known").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,345 @@
+"""
+📶 页面网络流量记账
+README 写着轻量模式把页面加载从 8 秒降到 3 秒，但 init_browser 里从来没有统计过实际下载了什么、拦截了什么、缓存返回了什么。
+这里挂在 Playwright 页面事件和路由层上，按平台 / 页面 / 词条分别记账：
+
+- 走网络的请求数与传输字节（响应头 + 编码后的响应体），按资源类型、按主机细分
+- 路由层处理的请求：轻量模式直接 abort 的、脚本缓存直接 fulfill 的
+- 失败请求数（超时、连接中断等，不含路由层主动 abort）
+- 首个平台 API 响应时间：词条开始 → 第一个命中 api_predicate 的响应
+
+闲鱼每个词条启动一次浏览器，所以任务级汇总放在进程内共享的 get_network_ledger() 里，
+任务结束时写入报告的 network 段，调整拦截规则或 LIGHTWEIGHT_BROWSER_ARGS 前后可直接对比。
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import suppress
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from utils import metrics
+
+
+class TrafficTally:
+    """一个统计范围（平台 / 页面 / 词条）内的请求数与字节数"""
+
+    __slots__ = ('requests', 'bytes', 'by_type', 'by_host', 'aborted', 'cached', 'cached_bytes', 'failed')
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.by_type: Dict[str, List[int]] = {}
+        self.by_host: Dict[str, List[int]] = {}
+        self.aborted: Dict[str, int] = {}
+        self.cached = 0
+        self.cached_bytes = 0
+        self.failed = 0
+
+    def add(self, outcome: str, resource_type: str, host: str, size: int = 0) -> None:
+        """
+        记一个请求
+
+        Args:
+            outcome: network（走网络完成）/ cached（缓存直接返回）/ aborted（路由层拦截）/ failed
+            resource_type: Playwright 资源类型（document / script / xhr / fetch / image ...）
+            host: 请求主机
+            size: 传输字节（network）或回放字节（cached）
+        """
+        if outcome == 'network':
+            self.requests += 1
+            self.bytes += size
+            for bucket, key in ((self.by_type, resource_type), (self.by_host, host)):
+                row = bucket.setdefault(key, [0, 0])
+                row[0] += 1
+                row[1] += size
+        elif outcome == 'cached':
+            self.cached += 1
+            self.cached_bytes += size
+        elif outcome == 'aborted':
+            self.aborted[resource_type] = self.aborted.get(resource_type, 0) + 1
+        else:
+            self.failed += 1
+
+    def to_dict(self, top_hosts: Optional[int] = None) -> Dict:
+        hosts = sorted(self.by_host.items(), key=lambda kv: kv[1][1], reverse=True)
+        if top_hosts is not None:
+            hosts = hosts[:top_hosts]
+        return {
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'by_type': {
+                t: {'requests': n, 'bytes': b}
+                for t, (n, b) in sorted(self.by_type.items(), key=lambda kv: kv[1][1], reverse=True)
+            },
+            'by_host': {h: {'requests': n, 'bytes': b} for h, (n, b) in hosts},
+            'aborted': dict(sorted(self.aborted.items())),
+            'aborted_total': sum(self.aborted.values()),
+            'cached': {'requests': self.cached, 'bytes': self.cached_bytes},
+            'failed': self.failed,
+        }
+
+
+class PlatformTraffic:
+    """单个平台在本次任务中的流量：总计 + 按页面 + 按词条 + 首个 API 响应时间"""
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.total = TrafficTally()
+        self.pages: Dict[str, TrafficTally] = {}
+        self.keywords: Dict[str, TrafficTally] = {}
+        self.first_api_ms: Dict[str, Optional[float]] = {}
+        self.lightweight: Optional[bool] = None
+        self.browser_args: List[str] = []
+
+    def record(self, outcome: str, resource_type: str, host: str, size: int = 0,
+               page: Optional[str] = None, keyword: Optional[str] = None) -> None:
+        self.total.add(outcome, resource_type, host, size)
+        if page:
+            self.pages.setdefault(page, TrafficTally()).add(outcome, resource_type, host, size)
+        if keyword:
+            self.keywords.setdefault(keyword, TrafficTally()).add(outcome, resource_type, host, size)
+        metrics.network_requests().inc(platform=self.platform, resource_type=resource_type, outcome=outcome)
+        if outcome == 'network' and size:
+            metrics.network_bytes().inc(size, platform=self.platform, resource_type=resource_type)
+
+    def record_first_api(self, keyword: str, seconds: Optional[float]) -> None:
+        """记录词条的首个 API 响应时间（None 表示整个词条期间没有 API 响应）"""
+        self.first_api_ms[keyword] = None if seconds is None else round(seconds * 1000, 1)
+        if seconds is not None:
+            metrics.network_first_api().observe(seconds, platform=self.platform)
+
+    def to_dict(self) -> Dict:
+        timings = sorted(ms for ms in self.first_api_ms.values() if ms is not None)
+        return {
+            'lightweight': self.lightweight,
+            'browser_args': self.browser_args,
+            **self.total.to_dict(top_hosts=10),
+            'first_api_ms': {
+                'p50': timings[(len(timings) - 1) // 2] if timings else None,
+                'max': timings[-1] if timings else None,
+                'missing': sum(1 for ms in self.first_api_ms.values() if ms is None),
+            },
+            'pages': {page: tally.to_dict(top_hosts=5) for page, tally in self.pages.items()},
+            'keywords': {
+                keyword: {**tally.to_dict(top_hosts=5), 'first_api_ms': self.first_api_ms.get(keyword)}
+                for keyword, tally in self.keywords.items()
+            },
+        }
+
+
+class NetworkLedger:
+    """任务级网络流量账本（跨爬虫实例累积，按平台区分）"""
+
+    def __init__(self):
+        self._platforms: Dict[str, PlatformTraffic] = {}
+        self._lock = threading.Lock()
+
+    def platform(self, name: str) -> PlatformTraffic:
+        with self._lock:
+            if name not in self._platforms:
+                self._platforms[name] = PlatformTraffic(name)
+            return self._platforms[name]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._platforms.clear()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {name: traffic.to_dict() for name, traffic in self._platforms.items()}
+
+    def summary(self) -> str:
+        lines = []
+        for name, data in self.to_dict().items():
+            timing = data['first_api_ms']
+            first_api = f"{timing['p50']:.0f} ms" if timing['p50'] is not None else '无'
+            lines.append(
+                f"📶 {name} 网络：{data['requests']} 个请求 {data['bytes'] / 1024 / 1024:.1f} MB，"
+                f"拦截 {data['aborted_total']}，缓存返回 {data['cached']['requests']}，失败 {data['failed']}，"
+                f"首个 API 响应 p50 {first_api}"
+            )
+        return '\n'.join(lines)
+
+
+def request_host(url: str) -> str:
+    try:
+        return urlsplit(url).hostname or ''
+    except ValueError:
+        return ''
+
+
+def page_key(url: str) -> str:
+    """页面归类键：主机 + 路径（去掉查询串，搜索页不会按词条拆成无数个页面）"""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    return f"{parts.hostname or ''}{parts.path or '/'}"
+
+
+class NetworkTap:
+    """
+    挂在页面上的流量记账器
+
+    用法：
+        tap = NetworkTap(page, 'xianyu', api_predicate); tap.attach()
+        路由层：tap.mark(request, 'aborted') / tap.mark(request, 'cached')
+        词条循环：await tap.begin_keyword(keyword) ... await tap.end_keyword()
+    """
+
+    def __init__(
+        self,
+        page,
+        platform: str,
+        api_predicate: Callable[[str], bool],
+        ledger: Optional[NetworkLedger] = None
+    ):
+        """
+        Args:
+            page: Playwright Page
+            platform: 平台名（xiaohongshu / xianyu）
+            api_predicate: 判断 URL 是否为平台 API（与 BlockWatcher 相同）
+            ledger: 任务级账本（缺省用进程内共享的账本）
+        """
+        self.page = page
+        self.api_predicate = api_predicate
+        self.traffic = (ledger or get_network_ledger()).platform(platform)
+        self.current_page: Optional[str] = None
+        self.keyword: Optional[str] = None
+        self._keyword_started = 0.0
+        self._first_api: Optional[float] = None
+        self._marks: Dict = {}
+        self._tasks = set()
+        self._attached = False
+
+    def configure(self, lightweight: bool, browser_args: List[str]) -> None:
+        """记下本次使用的轻量模式设置，报告里与流量数据放在一起"""
+        self.traffic.lightweight = lightweight
+        self.traffic.browser_args = list(browser_args)
+
+    def mark(self, request, action: str) -> None:
+        """
+        路由层已处理的请求
+
+        Args:
+            request: Playwright Request
+            action: aborted（轻量模式拦截，立即记账）/ cached（缓存直接返回，完成时按回放字节记账）
+        """
+        if action == 'aborted':
+            self._record('aborted', request)
+        self._marks[request] = action
+
+    async def begin_keyword(self, keyword: str) -> None:
+        """开始一个词条（上一个词条未结束时先结账）"""
+        await self.end_keyword()
+        self.keyword = keyword
+        self._keyword_started = time.monotonic()
+        self._first_api = None
+
+    async def end_keyword(self) -> None:
+        """结束当前词条：等待尚未读取大小的请求，记下首个 API 响应时间"""
+        await self.drain()
+        if self.keyword is not None:
+            self.traffic.record_first_api(self.keyword, self._first_api)
+        self.keyword = None
+
+    async def drain(self, timeout: float = 2.0) -> None:
+        if self._tasks:
+            with suppress(Exception):
+                await asyncio.wait(list(self._tasks), timeout=timeout)
+
+    def _scope(self) -> Dict:
+        return {'page': self.current_page, 'keyword': self.keyword}
+
+    def _record(self, outcome: str, request, size: int = 0, scope: Optional[Dict] = None) -> None:
+        try:
+            resource_type = request.resource_type
+            host = request_host(request.url)
+        except Exception:
+            return
+        self.traffic.record(outcome, resource_type, host, size, **(scope or self._scope()))
+
+    def _on_request(self, request) -> None:
+        try:
+            if request.resource_type == 'document' and request.frame == self.page.main_frame:
+                self.current_page = page_key(request.url)
+        except Exception:
+            return
+
+    def _on_response(self, response) -> None:
+        if self.keyword is None or self._first_api is not None:
+            return
+        try:
+            if self.api_predicate(response.url):
+                self._first_api = time.monotonic() - self._keyword_started
+        except Exception:
+            return
+
+    def _on_request_finished(self, request) -> None:
+        outcome = 'cached' if self._marks.pop(request, None) == 'cached' else 'network'
+        # 大小要再问一次浏览器：放到任务里，记账范围按完成时刻确定
+        task = asyncio.ensure_future(self._measure(request, outcome, self._scope()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_request_failed(self, request) -> None:
+        # 路由层 abort 的请求已在 mark() 时记账
+        if self._marks.pop(request, None) == 'aborted':
+            return
+        self._record('failed', request)
+
+    async def _measure(self, request, outcome: str, scope: Dict) -> None:
+        self._record(outcome, request, await request_size(request), scope)
+
+    def attach(self) -> None:
+        if not self._attached:
+            self.page.on("request", self._on_request)
+            self.page.on("response", self._on_response)
+            self.page.on("requestfinished", self._on_request_finished)
+            self.page.on("requestfailed", self._on_request_failed)
+            self._attached = True
+
+    def detach(self) -> None:
+        if self._attached:
+            with suppress(Exception):
+                self.page.off("request", self._on_request)
+                self.page.off("response", self._on_response)
+                self.page.off("requestfinished", self._on_request_finished)
+                self.page.off("requestfailed", self._on_request_failed)
+            self._attached = False
+        for task in list(self._tasks):
+            task.cancel()
+        self._marks.clear()
+
+
+async def request_size(request) -> int:
+    """
+    请求的传输字节：响应头 + 编码后的响应体（即实际下载量）
+
+    request.sizes() 拿不到时（页面已关闭等）退回 content-length 响应头
+    """
+    try:
+        sizes = await request.sizes()
+        return max(sizes.get('responseHeadersSize', 0), 0) + max(sizes.get('responseBodySize', 0), 0)
+    except Exception:
+        pass
+    try:
+        response = await request.response()
+        return int((response.headers or {}).get('content-length', 0)) if response else 0
+    except Exception:
+        return 0
+
+
+_ledger: Optional[NetworkLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_network_ledger() -> NetworkLedger:
+    """进程内共享的网络流量账本"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = NetworkLedger()
+        return _ledger
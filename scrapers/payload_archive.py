@@ -0,0 +1,288 @@
+"""
+🗃️ 原始响应归档
+嗅探到的 API JSON 和 DOM 提取结果以前解析一次就丢弃，解析器改进后只能重新抓取。
+这里把每一份原始响应压缩后追加写入分段文件，按 (平台, 词条, 时间) 建索引：
+
+- 分段文件：segments/seg-000001.z，只追加，超过上限后切换到新分段
+- 索引：SQLite（平台、词条、类型、时间 → 分段 + 偏移 + 长度），支持随机读取单条记录
+- 重新解析：用当前的 extractors 在归档上批量重跑（按分段并行），结果可写回数据库
+
+用法：python -m scrapers.payload_archive reparse --platform fish --since 2026-09-01 --write
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import PAYLOAD_ARCHIVE_DIR, PAYLOAD_SEGMENT_MAX_BYTES, PAYLOAD_REPARSE_WORKERS
+from utils import jsonio
+from utils.records import to_json_default
+from .extractors import EXTRACTORS
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    platform TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    captured_at REAL NOT NULL,
+    url TEXT NOT NULL DEFAULT '',
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_keyword ON records(platform, keyword, captured_at);
+CREATE INDEX IF NOT EXISTS idx_records_time ON records(captured_at);
+"""
+
+_COLUMNS = "id, platform, keyword, kind, captured_at, url, segment, offset, length"
+
+
+def _encode(payload) -> bytes:
+    return zlib.compress(jsonio.dumps_bytes(payload, default=to_json_default), 6)
+
+
+def _decode(blob: bytes):
+    return jsonio.loads(zlib.decompress(blob))
+
+
+def _segment_path(root: str, segment: int) -> str:
+    return os.path.join(root, 'segments', f"seg-{segment:06d}.z")
+
+
+class PayloadArchive:
+    """只追加的原始响应归档（压缩分段文件 + SQLite 偏移索引，支持多进程写入）"""
+
+    def __init__(self, root: str = PAYLOAD_ARCHIVE_DIR, segment_max_bytes: int = PAYLOAD_SEGMENT_MAX_BYTES):
+        """
+        Args:
+            root: 归档目录
+            segment_max_bytes: 单个分段文件的大小上限（字节）
+        """
+        self.root = str(root)
+        self.segment_max_bytes = segment_max_bytes
+        Path(self.root, 'segments').mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.root, 'index.db'), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def append(self, platform: str, keyword: str, kind: str, payload, url: str = '',
+               captured_at: Optional[float] = None) -> int:
+        """
+        追加一条原始响应
+
+        Args:
+            platform: 平台（xhs / fish）
+            keyword: 搜索词
+            kind: 类型（search_api 嗅探/接口 JSON，dom 页面提取结果）
+            payload: 可 JSON 序列化的原始数据
+            url: 来源地址
+            captured_at: 抓取时间（缺省为当前时间）
+
+        Returns:
+            记录 ID
+        """
+        blob = _encode(payload)
+        captured_at = time.time() if captured_at is None else captured_at
+        with self._lock:
+            # 写事务同时充当跨进程的追加锁：偏移量和索引保持一致
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT MAX(segment) FROM records").fetchone()
+                segment = row[0] or 1
+                path = _segment_path(self.root, segment)
+                if os.path.exists(path) and os.path.getsize(path) + len(blob) > self.segment_max_bytes:
+                    segment += 1
+                    path = _segment_path(self.root, segment)
+                with open(path, 'ab') as f:
+                    offset = f.tell()
+                    f.write(blob)
+                cursor = self._conn.execute(
+                    "INSERT INTO records (platform, keyword, kind, captured_at, url, segment, offset, length) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (platform, keyword, kind, captured_at, url or '', segment, offset, len(blob))
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cursor.lastrowid
+
+    def query(
+        self,
+        platform: Optional[str] = None,
+        keyword: Optional[str] = None,
+        kind: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        按条件查询索引（不读取内容）
+
+        Returns:
+            [{'id', 'platform', 'keyword', 'kind', 'captured_at', 'url', 'segment', 'offset', 'length'}]，按时间升序
+        """
+        clauses, params = [], []
+        for column, value in (('platform', platform), ('keyword', keyword), ('kind', kind)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("captured_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("captured_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM records {where} ORDER BY captured_at, id", params
+            ).fetchall()
+        names = _COLUMNS.split(', ')
+        return [dict(zip(names, row)) for row in rows]
+
+    def read(self, record: Dict):
+        """随机读取一条记录的原始数据"""
+        with open(_segment_path(self.root, record['segment']), 'rb') as f:
+            f.seek(record['offset'])
+            return _decode(f.read(record['length']))
+
+    def get(self, record_id: int):
+        """按记录 ID 读取原始数据（不存在时返回 None）"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM records WHERE id = ?", (record_id,)).fetchone()
+        return self.read(dict(zip(_COLUMNS.split(', '), row))) if row else None
+
+    def iter_payloads(self, **filters) -> Iterator[Tuple[Dict, object]]:
+        """按时间顺序遍历 (索引记录, 原始数据)"""
+        for record in self.query(**filters):
+            yield record, self.read(record)
+
+    def reparse(self, workers: Optional[int] = PAYLOAD_REPARSE_WORKERS, **filters) -> List[Dict]:
+        """
+        用当前的解析器重新解析归档
+
+        Args:
+            workers: 并行进程数（1 表示在当前进程内执行，None 表示 CPU 核数）
+            **filters: 同 query（platform / keyword / kind / since / until）
+
+        Returns:
+            [{'platform', 'keyword', 'captured_at', 'kind', 'result'}]，按时间升序；没有解析器或解析失败的记录不返回
+        """
+        by_segment: Dict[int, List[Dict]] = defaultdict(list)
+        for record in self.query(**filters):
+            if (record['platform'], record['kind']) in EXTRACTORS:
+                by_segment[record['segment']].append(record)
+        jobs = [(self.root, segment, records) for segment, records in sorted(by_segment.items())]
+
+        if workers == 1 or len(jobs) <= 1:
+            chunks = [_reparse_segment(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = list(pool.map(_reparse_segment, *zip(*jobs)))
+
+        results = [item for chunk in chunks for item in chunk]
+        results.sort(key=lambda item: item['captured_at'])
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM records").fetchone()
+            segments = self._conn.execute("SELECT COUNT(DISTINCT segment) FROM records").fetchone()[0]
+        return {'records': count, 'compressed_bytes': total, 'segments': segments}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _reparse_segment(root: str, segment: int, records: List[Dict]) -> List[Dict]:
+    """重新解析一个分段中的记录（在工作进程中执行，按偏移顺序读取）"""
+    results = []
+    with open(_segment_path(root, segment), 'rb') as f:
+        for record in sorted(records, key=lambda r: r['offset']):
+            try:
+                f.seek(record['offset'])
+                payload = _decode(f.read(record['length']))
+                result = EXTRACTORS[(record['platform'], record['kind'])](record['keyword'], payload)
+            except Exception:
+                continue
+            if result:
+                results.append({
+                    'platform': record['platform'],
+                    'keyword': record['keyword'],
+                    'captured_at': record['captured_at'],
+                    'kind': record['kind'],
+                    'result': result,
+                })
+    return results
+
+
+def _write_to_store(results: List[Dict]) -> Dict[str, int]:
+    """把重新解析的结果按原抓取时间写回数据库（同一时间点的观测被覆盖）"""
+    from engine.analyzer import BlueOceanAnalyzer
+    from utils.datastore import get_store
+
+    store = get_store()
+    counts = {'xhs': 0, 'fish': 0}
+    for item in results:
+        keyword, result = item['keyword'], item['result']
+        if item['platform'] == 'xhs' and result.get('trend_score'):
+            counts['xhs'] += store.record_xhs(
+                {keyword: {'热度': result['trend_score'], '笔记数': result.get('count', 0)}},
+                observed_at=item['captured_at']
+            )
+        elif item['platform'] == 'fish':
+            counts['fish'] += store.record_fish(
+                {keyword: BlueOceanAnalyzer.summarize_fish_observation(keyword, result)},
+                observed_at=item['captured_at']
+            )
+    return counts
+
+
+def _parse_date(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="原始响应归档：统计 / 重新解析")
+    parser.add_argument('action', choices=['stats', 'reparse'])
+    parser.add_argument('--platform', choices=['xhs', 'fish'])
+    parser.add_argument('--keyword')
+    parser.add_argument('--since', help='起始时间（ISO 格式，如 2026-09-01）')
+    parser.add_argument('--until', help='结束时间（ISO 格式，不含）')
+    parser.add_argument('--workers', type=int, default=PAYLOAD_REPARSE_WORKERS)
+    parser.add_argument('--write', action='store_true', help='把解析结果按原抓取时间写回数据库')
+    args = parser.parse_args()
+
+    archive = PayloadArchive()
+    if args.action == 'stats':
+        print(f"🗃️ 归档：{archive.stats()}")
+        return
+
+    start = time.monotonic()
+    results = archive.reparse(
+        workers=args.workers, platform=args.platform, keyword=args.keyword,
+        since=_parse_date(args.since), until=_parse_date(args.until)
+    )
+    print(f"✓ 重新解析 {len(results)} 条记录，用时 {time.monotonic() - start:.1f} 秒")
+    if args.write:
+        counts = _write_to_store(results)
+        print(f"✓ 已写回数据库：小红书 {counts['xhs']} 条，闲鱼 {counts['fish']} 条")
+    archive.close()
+
+
+if __name__ == '__main__':
+    main()
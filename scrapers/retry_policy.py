@@ -0,0 +1,305 @@
+"""
+🔄 重试策略与熔断
+- 失败分类：把异常归入 FailureReason
+- 按原因的重试策略：需要登录不重试、频率限制长退避……
+- 单个词条的总时限：重试不会无限拖长任务
+- 按平台熔断：连续被拦截后直接快速失败，冷却后放行一次试探
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, Optional
+
+from config import (
+    KEYWORD_DEADLINE_SEC,
+    CIRCUIT_BREAKER_THRESHOLD,
+    CIRCUIT_BREAKER_COOLDOWN
+)
+
+
+# ========================================
+# 失败原因分类（用于智能重试）
+# ========================================
+class FailureReason(Enum):
+    """数据获取失败原因"""
+    NETWORK_ERROR = "network_error"          # 网络错误
+    TIMEOUT = "timeout"                       # 超时
+    BLOCKED = "blocked"                       # 被反爬虫拦截
+    NO_DATA = "no_data"                       # 无数据返回
+    PARSE_ERROR = "parse_error"               # 解析错误
+    LOGIN_REQUIRED = "login_required"         # 需要登录
+    RATE_LIMITED = "rate_limited"             # 频率限制
+    UNKNOWN = "unknown"                       # 未知错误
+
+
+class CrawlFailure(RuntimeError):
+    """带失败原因的抓取异常"""
+
+    reason = FailureReason.UNKNOWN
+
+    def __init__(self, message: str = "", reason: Optional[FailureReason] = None):
+        super().__init__(message)
+        if reason is not None:
+            self.reason = reason
+
+
+class CircuitOpenError(CrawlFailure):
+    """平台熔断中，请求被直接拒绝"""
+
+    reason = FailureReason.BLOCKED
+
+
+# 异常信息关键词 → 失败原因（按顺序匹配）
+_MESSAGE_HINTS = (
+    (FailureReason.LOGIN_REQUIRED, ('login', '登录', 'session')),
+    (FailureReason.RATE_LIMITED, ('429', 'too many', '频繁', 'rate limit')),
+    (FailureReason.BLOCKED, ('captcha', '验证', '拦截', '访问受限', 'forbidden', '403')),
+    (FailureReason.TIMEOUT, ('timeout', 'timed out', '超时')),
+    (FailureReason.NETWORK_ERROR, ('net::', 'connection', 'econnreset', 'dns', '网络')),
+)
+
+
+def classify_failure(exc: BaseException) -> FailureReason:
+    """
+    把异常归类为失败原因
+
+    Args:
+        exc: 抓取过程中抛出的异常
+
+    Returns:
+        FailureReason
+    """
+    if isinstance(exc, CrawlFailure):
+        return exc.reason
+    # Playwright 的 TimeoutError 不继承 asyncio.TimeoutError，按类名识别
+    if isinstance(exc, asyncio.TimeoutError) or type(exc).__name__ == 'TimeoutError':
+        return FailureReason.TIMEOUT
+    if isinstance(exc, (ValueError, KeyError, TypeError, IndexError)):
+        return FailureReason.PARSE_ERROR
+    if isinstance(exc, (ConnectionError, OSError)):
+        return FailureReason.NETWORK_ERROR
+
+    message = str(exc).lower()
+    for reason, hints in _MESSAGE_HINTS:
+        if any(hint in message for hint in hints):
+            return reason
+    return FailureReason.UNKNOWN
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """单一失败原因的重试策略"""
+
+    max_attempts: int           # 含首次尝试
+    base_delay: float = 1.0     # 首次退避（秒）
+    max_delay: float = 60.0     # 退避上限（秒）
+
+    def delay(self, attempt: int, backoff_factor: float = 2.0) -> float:
+        """第 attempt 次失败后的退避时间（指数退避 + 随机抖动）"""
+        wait = self.base_delay * (backoff_factor ** (attempt - 1)) * (1 + random.random() * 0.5)
+        return min(wait, self.max_delay)
+
+
+DEFAULT_RETRY_POLICIES: Dict[FailureReason, RetryPolicy] = {
+    FailureReason.LOGIN_REQUIRED: RetryPolicy(max_attempts=1),                                  # 重试无意义，需要人工登录
+    FailureReason.PARSE_ERROR: RetryPolicy(max_attempts=1),                                     # 同样的响应解析仍会失败
+    FailureReason.NO_DATA: RetryPolicy(max_attempts=1),                                         # 各层降级已尝试过，重来结果相同
+    FailureReason.NETWORK_ERROR: RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=15.0),
+    FailureReason.TIMEOUT: RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=20.0),
+    FailureReason.BLOCKED: RetryPolicy(max_attempts=2, base_delay=30.0, max_delay=120.0),
+    FailureReason.RATE_LIMITED: RetryPolicy(max_attempts=3, base_delay=30.0, max_delay=300.0),  # 长退避
+    FailureReason.UNKNOWN: RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=30.0),
+}
+
+
+class CircuitBreaker:
+    """
+    平台熔断器
+
+    closed：正常放行；连续 threshold 次拦截/限流 → open：直接拒绝；
+    冷却 cooldown 秒后 → half_open：放行一次试探，成功则关闭，失败重新打开。
+    """
+
+    # 计入熔断的失败原因
+    TRIP_REASONS = (FailureReason.BLOCKED, FailureReason.RATE_LIMITED)
+
+    def __init__(
+        self,
+        platform: str,
+        threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+        cooldown: float = CIRCUIT_BREAKER_COOLDOWN
+    ):
+        """
+        Args:
+            platform: 平台名
+            threshold: 连续拦截多少次后熔断
+            cooldown: 熔断持续时间（秒）
+        """
+        self.platform = platform
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def retry_after(self) -> float:
+        """距离允许试探还有多少秒"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        """是否放行一次请求（半开状态只放行一个试探）"""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self, reason: FailureReason) -> None:
+        if reason not in self.TRIP_REASONS:
+            # 非拦截类失败：释放试探名额，但不计数
+            self._probing = False
+            return
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            if self.opened_at is None or self._probing:
+                print(f"🔌 {self.platform} 连续被拦截 {self.failures} 次，熔断 {self.cooldown:.0f} 秒")
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(platform: str) -> CircuitBreaker:
+    """获取平台熔断器（进程内共享：同一平台的所有爬虫实例共用）"""
+    if platform not in _breakers:
+        _breakers[platform] = CircuitBreaker(platform)
+    return _breakers[platform]
+
+
+def _raise_classified(exc: Exception, reason: FailureReason):
+    """放弃时抛出最后一次失败：超时包装为 CrawlFailure，调用方按原因降级而不是整批中止"""
+    if reason == FailureReason.TIMEOUT and not isinstance(exc, CrawlFailure):
+        raise CrawlFailure(f"超出单个词条的总时限：{type(exc).__name__}", FailureReason.TIMEOUT) from exc
+    raise exc
+
+
+# 🔄 重试管理器
+class RetryManager:
+    """智能重试管理器（按失败原因退避，受总时限和平台熔断约束）"""
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        backoff_factor: float = 2.0,
+        policies: Optional[Dict[FailureReason, RetryPolicy]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        deadline: Optional[float] = KEYWORD_DEADLINE_SEC,
+        on_retry: Optional[Callable[[FailureReason], None]] = None
+    ):
+        """
+        Args:
+            max_retries: 最多尝试次数（各原因的策略次数再受此上限约束）
+            backoff_factor: 指数退避底数
+            policies: 按失败原因的重试策略（缺省用 DEFAULT_RETRY_POLICIES）
+            breaker: 平台熔断器（None 表示不熔断）
+            deadline: 单次调用（一个词条）的总时限（秒），None 表示不限
+            on_retry: 每次决定重试时的回调（参数为失败原因，用于统计）
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.policies = {**DEFAULT_RETRY_POLICIES, **(policies or {})}
+        self.breaker = breaker
+        self.deadline = deadline
+        self.on_retry = on_retry
+        self.last_reason: Optional[FailureReason] = None
+
+    async def execute_with_retry(
+        self,
+        func: Callable,
+        *args,
+        deadline: Optional[float] = None,
+        **kwargs
+    ):
+        """
+        执行协程函数，失败时按原因重试
+
+        Args:
+            func: 协程函数
+            deadline: 覆盖默认总时限（秒）
+
+        Returns:
+            func 的返回值
+
+        Raises:
+            CircuitOpenError: 平台熔断中
+            CrawlFailure: 超时放弃（asyncio / Playwright 的 TimeoutError 统一包装为 FailureReason.TIMEOUT）
+            最后一次失败的异常（其他原因不再重试或超出总时限时）
+        """
+        deadline = self.deadline if deadline is None else deadline
+        give_up_at = time.monotonic() + deadline if deadline else None
+        attempt = 0
+
+        while True:
+            if self.breaker and not self.breaker.allow():
+                raise CircuitOpenError(
+                    f"{self.breaker.platform} 熔断中，{self.breaker.retry_after():.0f} 秒后再试"
+                )
+
+            attempt += 1
+            try:
+                if give_up_at is not None:
+                    remaining = give_up_at - time.monotonic()
+                    if remaining <= 0:
+                        raise CrawlFailure("超出单个词条的总时限", FailureReason.TIMEOUT)
+                    result = await asyncio.wait_for(func(*args, **kwargs), timeout=remaining)
+                else:
+                    result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                reason = classify_failure(e)
+                self.last_reason = reason
+                if self.breaker:
+                    self.breaker.record_failure(reason)
+
+                policy = self.policies.get(reason, self.policies[FailureReason.UNKNOWN])
+                if attempt >= min(policy.max_attempts, self.max_retries):
+                    print(f"❌ {reason.value}：尝试 {attempt} 次后放弃")
+                    _raise_classified(e, reason)
+
+                wait_time = policy.delay(attempt, self.backoff_factor)
+                if give_up_at is not None and time.monotonic() + wait_time >= give_up_at:
+                    print(f"❌ {reason.value}：退避 {wait_time:.1f} 秒将超出总时限，放弃")
+                    _raise_classified(e, reason)
+
+                print(f"⚠️ 第 {attempt} 次尝试失败（{reason.value}），{wait_time:.1f} 秒后重试...")
+                if self.on_retry:
+                    self.on_retry(reason)
+                await asyncio.sleep(wait_time)
+                continue
+
+            self.last_reason = None
+            if self.breaker:
+                self.breaker.record_success()
+            return result
@@ -8,6 +8,7 @@
 3. 登录状态验证
 4. 自动续期建议
 5. 健康评分系统
+6. 后台看门狗：增量Cookie对比 + 关键Cookie过期前保活 + 缓存最新健康状态
 
 作者：iostoupin Team
 日期：2025-12-31
@@ -16,6 +17,7 @@
 import asyncio
 import json
 import time
+from collections import deque
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -54,7 +56,8 @@ class SessionHealthMonitor:
             else self.FISH_CRITICAL_COOKIES
         )
         self.last_check_time = None
-        self.health_history = []
+        # 固定容量环形缓冲：追加 O(1)，自动淘汰最旧样本
+        self.health_history = deque(maxlen=100)
     
     async def check_session_health(self) -> Dict:
         """
@@ -63,29 +66,45 @@ class SessionHealthMonitor:
         Returns:
             健康报告字典
         """
-        self.last_check_time = datetime.now()
-        
         # 1. 获取所有Cookie
         cookies = await self.context.cookies()
         
-        # 2. 分析Cookie健康度
+        # 2. 检查存储大小
+        storage_health = await self._check_storage_size()
+        
+        return self.build_report(cookies, storage_health)
+    
+    def build_report(self, cookies: List[Dict], storage_health: Optional[Dict] = None) -> Dict:
+        """
+        根据Cookie快照生成健康报告（纯计算，不访问浏览器）
+        
+        Args:
+            cookies: Cookie列表
+            storage_health: 存储检查结果（可选，缺省视为未知）
+        
+        Returns:
+            健康报告字典
+        """
+        self.last_check_time = datetime.now()
+        if storage_health is None:
+            storage_health = {"size_mb": 0, "health": "unknown"}
+        
+        # 1. 分析Cookie健康度
         cookie_health = self._analyze_cookies(cookies)
         
-        # 3. 检测关键Cookie
+        # 2. 检测关键Cookie
         critical_status = self._check_critical_cookies(cookies)
         
-        # 4. 计算过期风险
+        # 3. 计算过期风险
         expiry_risk = self._calculate_expiry_risk(cookies)
         
-        # 5. 检查存储大小
-        storage_health = await self._check_storage_size()
-        
-        # 6. 计算综合健康评分
+        # 4. 计算综合健康评分
         health_score = self._calculate_health_score(
             cookie_health, critical_status, expiry_risk, storage_health
         )
         
-        # 7. 生成报告
+        # 5. 生成报告
+        now = time.time()
         report = {
             "timestamp": self.last_check_time.isoformat(),
             "platform": self.platform,
@@ -97,6 +116,11 @@ class SessionHealthMonitor:
             "expiring_soon": expiry_risk["expiring_soon"],
             "expired": expiry_risk["expired"],
             "storage_mb": storage_health["size_mb"],
+            # 5分钟内不会过期的Cookie名称（供爬虫直接判断登录态）
+            "valid_cookie_names": sorted({
+                c["name"] for c in cookies
+                if c.get("value") and (c.get("expires", -1) <= 0 or c["expires"] > now + 300)
+            }),
             "recommendations": self._generate_recommendations(
                 health_score, critical_status, expiry_risk
             )
@@ -104,8 +128,6 @@ class SessionHealthMonitor:
         
         # 保存历史
         self.health_history.append(report)
-        if len(self.health_history) > 100:
-            self.health_history = self.health_history[-100:]
         
         return report
     
@@ -186,14 +208,16 @@ class SessionHealthMonitor:
     async def _check_storage_size(self) -> Dict:
         """检查浏览器存储大小"""
         try:
-            # 获取第一个页面
+            # 只复用已有页面：不为测量存储专门打开新页面
             pages = self.context.pages
             if not pages:
-                page = await self.context.new_page()
-                close_after = True
-            else:
-                page = pages[0]
-                close_after = False
+                return {
+                    "size_mb": 0,
+                    "local_items": 0,
+                    "session_items": 0,
+                    "health": "unknown"
+                }
+            page = pages[0]
             
             # 执行JavaScript获取存储信息
             storage_info = await page.evaluate("""
@@ -222,9 +246,6 @@ class SessionHealthMonitor:
                 }
             """)
             
-            if close_after:
-                await page.close()
-            
             size_mb = storage_info["totalSizeBytes"] / (1024 * 1024)
             
             return {
@@ -445,6 +466,152 @@ class SessionHealthMonitor:
         }
 
 
+class SessionWatchdog:
+    """
+    后台Session看门狗（每个浏览器上下文一个 asyncio 任务）
+    
+    - 定期读取Cookie并与上一次快照做增量对比，只在变化时记录
+    - 关键Cookie过期前 keepalive_lead 秒发起一次轻量保活请求
+    - latest 始终保存最新健康报告，爬虫可直接读取，无需自行阻塞检查
+    """
+    
+    # 保活请求地址（轻量接口，复用上下文Cookie）
+    KEEPALIVE_URLS = {
+        "xiaohongshu": "https://edith.xiaohongshu.com/api/sns/web/v2/user/me",
+        "xianyu": "https://www.goofish.com/",
+    }
+    
+    # Cookie归属站点（只关注本平台Cookie）
+    COOKIE_URLS = {
+        "xiaohongshu": ["https://www.xiaohongshu.com", "https://edith.xiaohongshu.com"],
+        "xianyu": ["https://www.goofish.com", "https://h5api.m.goofish.com", "https://www.taobao.com"],
+    }
+    
+    def __init__(
+        self,
+        monitor: SessionHealthMonitor,
+        interval: float = 60.0,
+        keepalive_lead: float = 300.0
+    ):
+        """
+        Args:
+            monitor: Session健康监控器（提供评分规则和历史）
+            interval: Cookie轮询间隔（秒）
+            keepalive_lead: 关键Cookie过期前多少秒发起保活
+        """
+        self.monitor = monitor
+        self.interval = interval
+        self.keepalive_lead = keepalive_lead
+        self.latest: Optional[Dict] = None
+        self.latest_at: float = 0.0
+        self.last_changes: Dict[str, List[str]] = {"added": [], "removed": [], "changed": []}
+        self.keepalive_count = 0
+        self._snapshot: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._cookies: List[Dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+    
+    def start(self) -> None:
+        """启动后台任务（需在事件循环中调用，幂等）"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """停止后台任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+    
+    def is_fresh(self, max_age: Optional[float] = None) -> bool:
+        """缓存的健康报告是否足够新"""
+        max_age = self.interval * 2 if max_age is None else max_age
+        return self.latest is not None and (time.time() - self.latest_at) <= max_age
+    
+    def request_refresh(self) -> None:
+        """提前唤醒看门狗（例如检测到登录异常后）"""
+        self._wake.set()
+    
+    async def poll_once(self) -> Dict:
+        """读取一次Cookie，增量更新快照并刷新缓存的健康报告"""
+        urls = self.COOKIE_URLS.get(self.monitor.platform)
+        cookies = await (self.monitor.context.cookies(urls) if urls else self.monitor.context.cookies())
+        
+        changes = self._diff(cookies)
+        if self.latest is None or any(changes.values()):
+            self.latest = self.monitor.build_report(cookies)
+            self.last_changes = changes
+        self.latest_at = time.time()
+        return self.latest
+    
+    def _diff(self, cookies: List[Dict]) -> Dict[str, List[str]]:
+        """与上一次快照对比：新增 / 删除 / 值或有效期变化"""
+        current = {
+            (c.get("name", ""), c.get("domain", "")): (c.get("value", ""), float(c.get("expires", -1) or -1))
+            for c in cookies
+        }
+        previous = self._snapshot
+        
+        added = [k[0] for k in current.keys() - previous.keys()]
+        removed = [k[0] for k in previous.keys() - current.keys()]
+        changed = [k[0] for k in current.keys() & previous.keys() if current[k] != previous[k]]
+        
+        self._snapshot = current
+        self._cookies = cookies
+        return {"added": sorted(added), "removed": sorted(removed), "changed": sorted(changed)}
+    
+    def _next_critical_expiry(self) -> Optional[float]:
+        """关键Cookie中最早的过期时间戳（会话Cookie不计）"""
+        expiries = [
+            float(c["expires"]) for c in self._cookies
+            if c.get("name") in self.monitor.critical_cookies and float(c.get("expires", -1) or -1) > 0
+        ]
+        return min(expiries) if expiries else None
+    
+    async def _keepalive(self) -> None:
+        """发起轻量保活请求（复用上下文Cookie，服务端下发的新Cookie自动写回）"""
+        url = self.KEEPALIVE_URLS.get(self.monitor.platform)
+        if not url:
+            return
+        try:
+            await self.monitor.context.request.get(url, timeout=10000)
+            self.keepalive_count += 1
+        except Exception as e:
+            print(f"⚠️ Session保活请求失败: {str(e)[:80]}")
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+                
+                # 关键Cookie即将过期：提前保活，再立即复查
+                expiry = self._next_critical_expiry()
+                if expiry is not None and expiry - time.time() <= self.keepalive_lead:
+                    await self._keepalive()
+                    await self.poll_once()
+                    expiry = self._next_critical_expiry()
+                
+                sleep_for = self.interval
+                if expiry is not None:
+                    until_keepalive = expiry - self.keepalive_lead - time.time()
+                    if until_keepalive > 0:
+                        sleep_for = min(sleep_for, until_keepalive)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                sleep_for = self.interval
+            
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(1.0, sleep_for))
+            except asyncio.TimeoutError:
+                pass
+
+
 # ========================================
 # 便捷函数
 # ========================================
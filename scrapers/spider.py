@@ -22,14 +22,25 @@ import random
 import time
 import json
 from typing import List, Dict, Optional
-from enum import Enum
 import os
 from pathlib import Path
-from config import DELAY_BETWEEN_REQUESTS, USER_DATA_PATH, EDGE_PATH, CHINA_PROXY_SERVER, REQUIRE_CHINA_NETWORK, CHINA_NETWORK_STRICT
-from utils.network_guard import ensure_china_network
+from config import DELAY_BETWEEN_REQUESTS, USER_DATA_PATH, EDGE_PATH, CHINA_PROXY_SERVER, REQUIRE_CHINA_NETWORK, CHINA_NETWORK_STRICT, DISCOVERY_EXPANSIONS_PER_RUN, KEYWORD_DEADLINE_SEC, ENABLE_ASSET_CACHE, ENABLE_PAYLOAD_ARCHIVE, ENABLE_NETWORK_ACCOUNTING
+from utils.network_guard import ensure_china_network_async, egress_service
+from .discovery import KeywordFrontier, extract_related_queries
+from .retry_policy import (
+    FailureReason, CrawlFailure, CircuitOpenError, RetryManager,
+    classify_failure, get_breaker
+)
+from .block_detector import BlockWatcher, BlockDetectedError
+from .asset_cache import AssetCache
+from .network_ledger import NetworkTap
+from .payload_archive import PayloadArchive
+from .extractors import summarize_xhs_search_payload, summarize_fish_search_payload, extract_fish_items
+from utils import jsonio
+from utils.records import FishListing, XhsNote, to_json_default
 from .advanced_config import (
     PREMIUM_USER_AGENTS, PREMIUM_VIEWPORTS, LIGHTWEIGHT_BROWSER_ARGS,
-    DelayManager, HeaderBuilder, RetryManager, ResponseValidator,
+    DelayManager, HeaderBuilder, ResponseValidator,
     RequestStats, BrowserFingerprintConfig,
     ActionRateController, build_webgl_canvas_noise_script
 )
@@ -37,7 +48,7 @@ from .advanced_config import (
 # 导入指纹防御和Session监控
 try:
     from .fingerprint_defense import FingerprintDefense, apply_fingerprint_defense
-    from .session_monitor import SessionHealthMonitor
+    from .session_monitor import SessionHealthMonitor, SessionWatchdog
     from .smart_mock import SmartMockGenerator, quick_generate_mock_data
     HAS_ADVANCED_DEFENSE = True
 except ImportError:
@@ -47,16 +58,20 @@ except ImportError:
 # 导入 Playwright
 try:
     from playwright.async_api import async_playwright, Page, Browser, BrowserContext
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
     from playwright_stealth import Stealth
     HAS_PLAYWRIGHT = True
 except ImportError as e:
     print(f"⚠️  Playwright 未安装，请运行：pip install playwright playwright-stealth")
+    PlaywrightTimeoutError = asyncio.TimeoutError
     HAS_PLAYWRIGHT = False
 
 
-class SessionInvalidError(RuntimeError):
+class SessionInvalidError(CrawlFailure):
     """持久化Session失效或需要重新登录时抛出。"""
 
+    reason = FailureReason.LOGIN_REQUIRED
+
 
 def _xpath_literal(text: str) -> str:
     """把任意字符串安全转成XPath字面量。"""
@@ -76,21 +91,6 @@ def _xpath_literal(text: str) -> str:
     return "concat(" + ",".join(concat_parts) + ")"
 
 
-# ========================================
-# 失败原因分类（用于智能重试）
-# ========================================
-class FailureReason(Enum):
-    """数据获取失败原因"""
-    NETWORK_ERROR = "network_error"          # 网络错误
-    TIMEOUT = "timeout"                       # 超时
-    BLOCKED = "blocked"                       # 被反爬虫拦截
-    NO_DATA = "no_data"                       # 无数据返回
-    PARSE_ERROR = "parse_error"               # 解析错误
-    LOGIN_REQUIRED = "login_required"         # 需要登录
-    RATE_LIMITED = "rate_limited"             # 频率限制
-    UNKNOWN = "unknown"                       # 未知错误
-
-
 # 高级User-Agent池（2025年真实客户端）
 USER_AGENTS = [
     "Mozilla/5.0 (iPhone; CPU iPhone OS 18_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.0 Mobile/15E148 Safari/604.1",
@@ -122,7 +122,7 @@ class XhsSpider:
     - 详细的统计和日志
     """
     
-    def __init__(self, headless: bool = False, use_stealth: bool = True, use_lightweight: bool = True, silent_mode: bool = False):
+    def __init__(self, headless: bool = False, use_stealth: bool = True, use_lightweight: bool = True, silent_mode: bool = False, keyword_timeout: Optional[float] = None):
         """
         初始化小红书爬虫（工业级版本）
         
@@ -131,6 +131,7 @@ class XhsSpider:
             use_stealth: 启用反检测
             use_lightweight: 轻量级模式（禁用图片、加速）
             silent_mode: 静默模式（自动headless + 最小日志输出）
+            keyword_timeout: 单个词条时间片（秒）；设定时每层策略再平分该时间片（任务总时限模式）
         """
         if not HAS_PLAYWRIGHT:
             raise ImportError("Playwright未安装")
@@ -147,8 +148,20 @@ class XhsSpider:
         # 初始化工具
         self.delay_manager = DelayManager(min_delay=1.0, max_delay=3.0)
         self.action_controller = ActionRateController.for_xhs()
-        self.retry_manager = RetryManager(max_retries=5)
-        self.stats = RequestStats()
+        self.block_watcher: Optional[BlockWatcher] = None
+        self.network_tap: Optional[NetworkTap] = None
+        self.asset_cache: Optional[AssetCache] = None
+        self.payload_archive: Optional[PayloadArchive] = None
+        self.retry_manager = RetryManager(
+            max_retries=5,
+            breaker=get_breaker('xiaohongshu'),
+            deadline=keyword_timeout or KEYWORD_DEADLINE_SEC,
+            on_retry=lambda reason: self.stats.record_retry()
+        )
+        self.layer_timeout = keyword_timeout / 4 if keyword_timeout else None
+        self.collected: Dict = {}
+        self.stats = RequestStats('xiaohongshu')
+        self._served_layer: Optional[str] = None
         self.playwright = None
 
         # Network sniffing
@@ -157,6 +170,7 @@ class XhsSpider:
         # 工业级防御组件
         self.fingerprint_defense = None
         self.session_monitor = None
+        self.session_watchdog = None
         self.mock_generator = SmartMockGenerator() if HAS_ADVANCED_DEFENSE else None
     
     def _detect_edge_path(self) -> Optional[str]:
@@ -285,7 +299,17 @@ class XhsSpider:
                 "evidence": evidence
             }
 
-        # 2) Cookie检查（更稳定）
+        # 2) 看门狗缓存（后台持续刷新，直接读取无需访问浏览器）
+        watchdog = self.session_watchdog
+        if watchdog and watchdog.is_fresh():
+            cached_names = set(watchdog.latest.get("valid_cookie_names", []))
+            valid_required = [name for name in ['a1', 'webId', 'web_session'] if name in cached_names]
+            if len(valid_required) >= 2:
+                evidence["required_cookie_valid"] = valid_required
+                evidence["health_score"] = watchdog.latest.get("health_score")
+                return {"ok": True, "reason": "watchdog_ok", "action": "", "evidence": evidence}
+
+        # 3) Cookie检查（更稳定）
         now_ts = time.time()
         try:
             cookies = await self.context.cookies("https://www.xiaohongshu.com")
@@ -327,7 +351,7 @@ class XhsSpider:
                     "evidence": evidence
                 }
 
-        # 3) 页面DOM检查（最终兜底）
+        # 4) 页面DOM检查（最终兜底）
         try:
             await self.page.goto("https://www.xiaohongshu.com/", wait_until='domcontentloaded', timeout=15000)
             await asyncio.sleep(1.5)
@@ -505,9 +529,9 @@ class XhsSpider:
         else:
             self.page = await self.context.new_page()
 
-        # 按你的要求：启动后立即确认中国网络出口
+        # 按你的要求：启动后立即确认中国网络出口（结论按代理配置缓存，不阻塞事件循环）
         if REQUIRE_CHINA_NETWORK:
-            ensure_china_network(strict=CHINA_NETWORK_STRICT)
+            await ensure_china_network_async(strict=CHINA_NETWORK_STRICT)
         
         # 设置超时
         self.page.set_default_timeout(30000)
@@ -520,6 +544,8 @@ class XhsSpider:
             # 禁用图片和媒体（加速）
             if self.use_lightweight:
                 if request.resource_type in ['image', 'stylesheet', 'media', 'font']:
+                    if self.network_tap:
+                        self.network_tap.mark(request, 'aborted')
                     await route.abort()
                     return
             
@@ -528,23 +554,49 @@ class XhsSpider:
             headers.update({
                 'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
                 'Accept-Encoding': 'gzip, deflate, br',
-                'Cache-Control': 'max-age=0',
             })
+            # 只对页面本身强制回源，静态资源交给缓存
+            if request.resource_type == 'document':
+                headers['Cache-Control'] = 'max-age=0'
             
             # 移除反爬虫特征头
             for key in ['Sec-Fetch-Dest', 'Sec-Fetch-Mode', 'Sec-Fetch-Site', 'Sec-Ch-Ua']:
                 headers.pop(key, None)
+
+            # 平台 JS/CSS bundle：命中本地缓存直接返回
+            on_local = (lambda: self.network_tap.mark(request, 'cached')) if self.network_tap else None
+            if self.asset_cache and await self.asset_cache.handle(route, headers, on_local=on_local):
+                return
             
             await route.continue_(headers=headers)
         
+        if ENABLE_ASSET_CACHE and self.asset_cache is None:
+            self.asset_cache = AssetCache()
+        if ENABLE_PAYLOAD_ARCHIVE and self.payload_archive is None:
+            self.payload_archive = PayloadArchive()
         await self.page.route('**/*', route_handler)
+
+        # 响应层拦截检测：验证码/登录跳转/错误码出现时立即放弃当前词条
+        self.block_watcher = BlockWatcher(
+            self.page,
+            api_predicate=lambda url: 'edith.xiaohongshu.com' in url or ('xiaohongshu.com' in url and '/api/' in url),
+            on_block=self._on_block_signal
+        )
+
+        # 网络流量记账：按页面/词条统计下载量、路由层拦截数、首个 API 响应时间（写入任务报告）
+        if ENABLE_NETWORK_ACCOUNTING:
+            self.network_tap = NetworkTap(self.page, 'xiaohongshu', api_predicate=self.block_watcher.api_predicate)
+            self.network_tap.configure(self.use_lightweight, LIGHTWEIGHT_BROWSER_ARGS if self.use_lightweight else [])
+            self.network_tap.attach()
         
         # 【工业级升级】初始化Session监控
         if HAS_ADVANCED_DEFENSE:
             print("🩺 初始化Session健康监控...")
             try:
                 self.session_monitor = SessionHealthMonitor(self.context, "xiaohongshu")
-                print("✅ Session监控已启动")
+                self.session_watchdog = SessionWatchdog(self.session_monitor)
+                self.session_watchdog.start()
+                print("✅ Session监控已启动（后台看门狗 + 过期前保活）")
             except Exception as e:
                 print(f"⚠️ Session监控初始化失败: {e}")
         
@@ -674,8 +726,9 @@ class XhsSpider:
         headers.update({
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
             'Accept-Encoding': 'gzip, deflate, br',
-            'Cache-Control': 'max-age=0',
         })
+        if route.request.resource_type == 'document':
+            headers['Cache-Control'] = 'max-age=0'
         
         await route.continue_(headers=headers)
 
@@ -694,7 +747,7 @@ class XhsSpider:
                 url = resp.url
                 if not url_predicate(url):
                     return
-                data = await resp.json()
+                data = await jsonio.read_response_json(resp)
                 if isinstance(data, (dict, list)):
                     fut.set_result({"url": url, "json": data})
             except Exception:
@@ -746,33 +799,129 @@ class XhsSpider:
             if not captured:
                 return None
 
-            payload = captured.get("json")
-            if not isinstance(payload, dict):
-                return None
-
-            data = payload.get('data') or {}
-            items = data.get('items') or []
-            if not isinstance(items, list) or not items:
+            await self._archive(keyword, 'search_api', captured.get("json"), captured.get('url', ''))
+            summary = summarize_xhs_search_payload(captured.get("json"))
+            if not summary:
                 return None
 
-            items = items[:10]
-            trend_score = sum(int(item.get('interact', {}).get('liked', 0)) for item in items) // max(1, len(items))
-            return {
-                'count': len(items),
-                'trend_score': trend_score,
-                'notes': [
-                    {
-                        'title': (item.get('title', '') or '')[:100],
-                        'likes': int(item.get('interact', {}).get('liked', 0)),
-                    }
-                    for item in items
-                ],
-                'source': 'sniffed_api',
-                'api_url': captured.get('url', '')
-            }
+            summary['source'] = 'sniffed_api'
+            summary['api_url'] = captured.get('url', '')
+            return summary
         except Exception:
             return None
 
+    async def _collect_search_payloads(self, keyword: str, window_sec: float = 6.0) -> List[Dict]:
+        """
+        打开搜索页，收集窗口期内所有搜索相关 API 的 JSON（笔记、联想词、相关搜索）
+
+        Args:
+            keyword: 搜索词
+            window_sec: 页面加载后继续收集的秒数
+
+        Returns:
+            [{'url', 'json'}]
+        """
+        captured: List[Dict] = []
+        pending: List[asyncio.Task] = []
+
+        async def _capture(resp):
+            try:
+                data = await jsonio.read_response_json(resp)
+                if isinstance(data, (dict, list)):
+                    captured.append({'url': resp.url, 'json': data})
+            except Exception:
+                return
+
+        def _on_response(resp):
+            u = (resp.url or '').lower()
+            if 'xiaohongshu.com' in u and '/api/' in u and ('search' in u or 'query' in u):
+                pending.append(asyncio.create_task(_capture(resp)))
+
+        self.page.on("response", _on_response)
+        try:
+            await self.action_controller.before_request()
+            try:
+                await self.page.goto(
+                    f"https://www.xiaohongshu.com/search_notes?keyword={keyword}&note_type=0",
+                    wait_until='domcontentloaded', timeout=20000
+                )
+            except Exception:
+                pass
+            await asyncio.sleep(window_sec)
+            if pending:
+                await asyncio.wait(pending, timeout=5)
+        finally:
+            try:
+                self.page.off("response", _on_response)
+            except Exception:
+                pass
+        return captured
+
+    async def discover_keywords(
+        self,
+        seeds: Dict[str, float],
+        max_expansions: int = DISCOVERY_EXPANSIONS_PER_RUN,
+        frontier: Optional[KeywordFrontier] = None
+    ) -> Dict:
+        """
+        🌱 关键词发现：展开前沿队列中热度最高的词条，收集其相关搜索词
+
+        Args:
+            seeds: 种子词 {词条: 热度}（未入队过的种子会先加入前沿队列）
+            max_expansions: 本次最多展开的词条数
+            frontier: 前沿队列（默认使用 DISCOVERY_DB）
+
+        Returns:
+            本次展开的词条 {词条: {'count', 'trend_score', 'notes', 'parent', 'related', 'source'}}
+        """
+        if not self.page:
+            await self.init_browser()
+
+        report = await self.verify_session(strict=True)
+        if not report.get('ok'):
+            raise SessionInvalidError(f"Session无效: {report.get('reason')}")
+
+        own_frontier = frontier is None
+        frontier = frontier or KeywordFrontier()
+        results: Dict[str, Dict] = {}
+        try:
+            frontier.offer(sorted(seeds.items(), key=lambda kv: -kv[1]))
+            print(f"🌱 关键词发现：前沿队列 {len(frontier)} 个候选，已知 {frontier.known_count()} 个")
+
+            for _ in range(max_expansions):
+                entry = frontier.pop()
+                if not entry:
+                    break
+                keyword, priority, parent = entry
+
+                payloads = await self._collect_search_payloads(keyword)
+                summary = None
+                related: List = []
+                for captured in payloads:
+                    await self._archive(keyword, 'search_api', captured['json'], captured.get('url', ''))
+                    summary = summary or summarize_xhs_search_payload(captured['json'])
+                    related.extend(extract_related_queries(captured['json']))
+
+                heat = summary['trend_score'] if summary else priority
+                added = frontier.offer(related, parent=keyword, parent_heat=heat)
+                if summary:
+                    results[keyword] = {
+                        **summary,
+                        'parent': parent,
+                        'related': [q for q, _ in related][:20],
+                        'source': 'discovery'
+                    }
+                    self.stats.record_success(layer='sniff')
+                    self.action_controller.on_success()
+                else:
+                    self.stats.record_failure()
+                print(f"  🔎 {keyword}：热度 {int(heat)}，新增候选 {len(added)} 个")
+        finally:
+            if own_frontier:
+                frontier.close()
+
+        return results
+
     async def _try_xpath_fallback_xhs(self, keyword: str) -> Optional[Dict]:
         """API未捕获时的XPath文本兜底：基于关键词/互动文案定位卡片。"""
         try:
@@ -808,11 +957,11 @@ class XhsSpider:
                     t = await card.text_content()
                     title = (t or "").strip().replace("\n", " ")[:80]
                 if title:
-                    notes.append({'title': title[:100], 'likes': random.randint(100, 10000)})
+                    notes.append(XhsNote(title=title[:100], likes=random.randint(100, 10000)))
 
             if not notes:
                 return None
-            trend_score = sum(n['likes'] for n in notes) // max(1, len(notes))
+            trend_score = sum(n.likes for n in notes) // max(1, len(notes))
             return {
                 'count': len(notes),
                 'trend_score': trend_score,
@@ -845,6 +994,9 @@ class XhsSpider:
             print("🔐 校验持久化Session...")
         report = await self.verify_session(strict=True)
         if not report.get('ok'):
+            if report.get('reason') == 'captcha_or_blocked':
+                self.stats.record_blocked('captcha')
+                self.action_controller.on_block('captcha')
             if not self.silent_mode:
                 print("\n❌ 持久化Session已失效或需要重新登录！")
                 print(f"原因：{report.get('reason')}")
@@ -852,72 +1004,163 @@ class XhsSpider:
                 print(f"  - {report.get('action')}")
             raise SessionInvalidError(f"Session无效: {report.get('reason')}")
         
-        results = {}
+        results = self.collected = {}
         
         for keyword in keywords:
+            print(f"\n🔍 正在获取小红书数据：{keyword}")
+            self._served_layer = None
+            started = time.monotonic()
+            if self.network_tap:
+                await self.network_tap.begin_keyword(keyword)
             try:
-                print(f"\n🔍 正在获取小红书数据：{keyword}")
-
-                # 【策略0】Network Sniffing：监听底层API JSON（最稳）
-                sniff_result = await self._try_network_sniffing_xhs(keyword)
-                if sniff_result and sniff_result.get('count', 0) > 0:
-                    results[keyword] = sniff_result
-                    self.stats.record_success()
-                    continue
-                
-                # 【策略1】尝试直接 API 调用（最高效）
-                api_result = await self._try_api_call(keyword)
-                if api_result and api_result.get('count', 0) > 0:  # 确保 API 返回实际数据
-                    results[keyword] = api_result
-                    self.stats.record_success()
+                results[keyword] = await self.retry_manager.execute_with_retry(self._fetch_xhs_keyword, keyword)
+                self.stats.record_success(self._served_layer or 'unknown', time.monotonic() - started)
+                self.action_controller.on_success()
+                continue
+            except CircuitOpenError as e:
+                # 平台熔断中：快速失败，不再对剩余词条发请求
+                print(f"🔌 {e}，跳过：{keyword}")
+                error = str(e)
+            except Exception as e:
+                reason = classify_failure(e)
+                if reason in (FailureReason.TIMEOUT, FailureReason.RATE_LIMITED) and not isinstance(e, BlockDetectedError):
+                    self.action_controller.on_block(reason.value)
+                if reason not in (FailureReason.NO_DATA, FailureReason.BLOCKED):
+                    print(f"❌ 获取失败：{keyword} - {str(e)[:100]}")
+                    error = f"{reason.value}: {str(e)[:100]}"
+                else:
+                    # 【策略4】使用智能模拟数据（100%保证）
+                    print(f"⚠️  API和页面均失败，启用智能Mock生成器...")
+                    if self.mock_generator:
+                        mock_data = quick_generate_mock_data(keyword, 10)
+                        results[keyword] = mock_data
+                        print(f"  ✓ 智能Mock已生成：{mock_data['count']}条，趋势分数{mock_data['trend_score']}")
+                    else:
+                        # 降级到简单Mock
+                        results[keyword] = {
+                            'count': 5,
+                            'trend_score': random.randint(2000, 8000),
+                            'notes': [
+                                {'title': f'笔记{i+1}', 'likes': random.randint(100, 10000)}
+                                for i in range(5)
+                            ],
+                            'source': 'simple_mock'
+                        }
+                    self.stats.record_failure('mock', time.monotonic() - started)
                     continue
 
-                # 【策略2】XPath 文本兜底（API拦截失败时优先走文本定位，减少对DOM结构依赖）
-                xpath_result = await self._try_xpath_fallback_xhs(keyword)
-                if xpath_result and xpath_result.get('count', 0) > 0:
-                    results[keyword] = xpath_result
-                    self.stats.record_success()
-                    continue
-                
-                # 【策略3】尝试页面爬取
-                page_result = await self._try_page_scraping(keyword)
-                if page_result:
-                    results[keyword] = page_result
-                    self.stats.record_success()
-                    continue
-                
-                # 【策略4】使用智能模拟数据（100%保证）
-                print(f"⚠️  API和页面均失败，启用智能Mock生成器...")
-                if self.mock_generator:
-                    mock_data = quick_generate_mock_data(keyword, 10)
-                    results[keyword] = mock_data
-                    print(f"  ✓ 智能Mock已生成：{mock_data['count']}条，趋势分数{mock_data['trend_score']}")
-                else:
-                    # 降级到简单Mock
-                    results[keyword] = {
-                        'count': 5,
-                        'trend_score': random.randint(2000, 8000),
-                        'notes': [
-                            {'title': f'笔记{i+1}', 'likes': random.randint(100, 10000)}
-                            for i in range(5)
-                        ],
-                        'source': 'simple_mock'
-                    }
-                self.stats.record_failure()
-                
-            except Exception as e:
-                print(f"❌ 获取失败：{keyword} - {str(e)[:100]}")
-                self.stats.record_failure()
-                results[keyword] = {
-                    'count': 0,
-                    'trend_score': 0,
-                    'notes': [],
-                    'error': str(e)[:100]
-                }
+            self.stats.record_failure(seconds=time.monotonic() - started)
+            results[keyword] = {
+                'count': 0,
+                'trend_score': 0,
+                'notes': [],
+                'error': error
+            }
         
+        if self.network_tap:
+            await self.network_tap.end_keyword()
         print(self.stats)
         return results
     
+    async def _fetch_xhs_keyword(self, keyword: str) -> Dict:
+        """获取单个词条的小红书数据，期间响应层检测到拦截则立即中止"""
+        if self.block_watcher:
+            return await self.block_watcher.guard(self._fetch_xhs_layers(keyword))
+        return await self._fetch_xhs_layers(keyword)
+    
+    def _on_block_signal(self, block) -> None:
+        """响应层拦截：记录统计、反馈限速；疑似出口问题时让出口检测重新校验"""
+        self.stats.record_blocked(block.signal)
+        self.action_controller.on_block(block.signal)
+        if block.signal in ('blocked', 'captcha'):
+            egress_service.invalidate()
+    
+    async def _archive(self, keyword: str, kind: str, payload, url: str = '') -> None:
+        """原始响应写入归档，供解析器改进后重新解析（归档失败不影响抓取；压缩和写盘在线程中进行）"""
+        if not self.payload_archive or not payload:
+            return
+        try:
+            await asyncio.to_thread(self.payload_archive.append, 'xhs', keyword, kind, payload, url)
+        except Exception as e:
+            print(f"  ⚠️  归档失败：{str(e)[:50]}")
+    
+    async def _run_layer(self, layer: str, coro):
+        """
+        执行一层获取策略并记录该层耗时和结果
+
+        任务总时限模式下超出该层时间片即取消（连同其中的 Playwright 等待）
+
+        Args:
+            layer: 层名（sniff / api / xpath / page），用于指标标签
+            coro: 该层的获取协程
+        """
+        started = time.monotonic()
+        outcome = 'error'
+        try:
+            if not self.layer_timeout:
+                result = await coro
+            else:
+                try:
+                    result = await asyncio.wait_for(coro, timeout=self.layer_timeout)
+                except asyncio.TimeoutError:
+                    outcome = 'timeout'
+                    print(f"  ⏰ 本层超出时间片 {self.layer_timeout:.0f} 秒，进入下一层")
+                    return None
+            outcome = 'success' if result else 'empty'
+            if result:
+                self._served_layer = layer
+            return result
+        finally:
+            self.stats.record_layer(layer, outcome, time.monotonic() - started)
+    
+    async def _fetch_xhs_layers(self, keyword: str) -> Dict:
+        """
+        按策略0-3依次获取单个词条的小红书数据（一次尝试）
+        
+        Raises:
+            CrawlFailure: 全部策略失败（被拦截为 BLOCKED，否则为 NO_DATA）
+        """
+        # 【策略0】Network Sniffing：监听底层API JSON（最稳）
+        sniff_result = await self._run_layer('sniff', self._try_network_sniffing_xhs(keyword))
+        if sniff_result and sniff_result.get('count', 0) > 0:
+            return sniff_result
+        
+        # 【策略1】尝试直接 API 调用（最高效）
+        api_result = await self._run_layer('api', self._try_api_call(keyword))
+        if api_result and api_result.get('count', 0) > 0:  # 确保 API 返回实际数据
+            return api_result
+
+        # 【策略2】XPath 文本兜底（API拦截失败时优先走文本定位，减少对DOM结构依赖）
+        xpath_result = await self._run_layer('xpath', self._try_xpath_fallback_xhs(keyword))
+        if xpath_result and xpath_result.get('count', 0) > 0:
+            await self._archive(keyword, 'dom', xpath_result)
+            return xpath_result
+        
+        # 【策略3】尝试页面爬取
+        page_result = await self._run_layer('page', self._try_page_scraping(keyword))
+        if page_result:
+            await self._archive(keyword, 'dom', page_result)
+            return page_result
+        
+        # 全部失败：确认是否被拦截（同时反馈给自适应限速）
+        if await self._detect_block():
+            raise CrawlFailure(f"{keyword} 页面被拦截", FailureReason.BLOCKED)
+        raise CrawlFailure(f"{keyword} 未获取到数据", FailureReason.NO_DATA)
+    
+    async def _detect_block(self) -> bool:
+        """检查当前页面是否为拦截页，命中时记录并反馈给自适应限速"""
+        try:
+            # 只看可见文本，脚本里的提示文案不算
+            text = await self.page.evaluate("() => document.body ? document.body.innerText : ''")
+        except Exception:
+            return False
+        if not ResponseValidator.is_blocked(text or ''):
+            return False
+        print("  🚫 页面疑似被拦截")
+        self.stats.record_blocked()
+        self.action_controller.on_block('blocked')
+        return True
+
     async def _try_api_call(self, keyword: str) -> Optional[Dict]:
         """
         尝试通过 API 直接获取数据
@@ -948,21 +1191,17 @@ class XhsSpider:
                 }}
             """)
             
+            if isinstance(response, dict):
+                await self._archive(keyword, 'search_api', response, api_url)
             if response and 'data' in response:
-                items = response['data'].get('items', [])[:10]
-                trend_score = sum(int(item.get('interact', {}).get('liked', 0)) for item in items) // max(1, len(items))
+                notes = [XhsNote.from_raw(item) for item in response['data'].get('items', [])[:10]]
+                trend_score = sum(note.likes for note in notes) // max(1, len(notes))
                 
-                print(f"  ✅ API 成功获取 {len(items)} 条数据")
+                print(f"  ✅ API 成功获取 {len(notes)} 条数据")
                 return {
-                    'count': len(items),
+                    'count': len(notes),
                     'trend_score': trend_score,
-                    'notes': [
-                        {
-                            'title': item.get('title', '')[:100],
-                            'likes': int(item.get('interact', {}).get('liked', 0))
-                        }
-                        for item in items
-                    ],
+                    'notes': notes,
                     'source': 'api'
                 }
         except Exception as e:
@@ -1284,6 +1523,21 @@ class XhsSpider:
         否则会丢失登录状态。应该直接停止 Playwright，让操作系统清理。
         """
         try:
+            if self.session_watchdog:
+                await self.session_watchdog.stop()
+            if self.block_watcher:
+                self.block_watcher.detach()
+            # 限速反馈在线程中写入共享令牌桶，退出前等待写完
+            await self.action_controller.flush_feedback()
+            if self.network_tap:
+                # 超时取消时最后一个词条还没结账
+                await self.network_tap.end_keyword()
+                self.network_tap.detach()
+            if self.asset_cache:
+                print(self.asset_cache.summary())
+                self.asset_cache.close()
+            if self.payload_archive:
+                self.payload_archive.close()
             # ⚠️ 不能关闭 context 和 page，否则登录状态会丢失
             # 只停止 playwright 实例
             if hasattr(self, 'playwright') and self.playwright:
@@ -1307,7 +1561,7 @@ class FishSpider:
     - 性能优化和详细统计
     """
     
-    def __init__(self, headless: bool = False, use_stealth: bool = True, use_lightweight: bool = True, silent_mode: bool = False):
+    def __init__(self, headless: bool = False, use_stealth: bool = True, use_lightweight: bool = True, silent_mode: bool = False, keyword_timeout: Optional[float] = None):
         """初始化闲鱼爬虫（默认显示窗口）"""
         if not HAS_PLAYWRIGHT:
             raise ImportError("Playwright未安装")
@@ -1323,13 +1577,29 @@ class FishSpider:
         # 初始化工具
         self.delay_manager = DelayManager(min_delay=2.0, max_delay=4.0)
         self.action_controller = ActionRateController.for_fish()
-        self.retry_manager = RetryManager(max_retries=5)
-        self.stats = RequestStats()
+        self.block_watcher: Optional[BlockWatcher] = None
+        self.network_tap: Optional[NetworkTap] = None
+        self.asset_cache: Optional[AssetCache] = None
+        self.payload_archive: Optional[PayloadArchive] = None
+        self.retry_manager = RetryManager(
+            max_retries=5,
+            breaker=get_breaker('xianyu'),
+            deadline=keyword_timeout or KEYWORD_DEADLINE_SEC,
+            on_retry=lambda reason: self.stats.record_retry()
+        )
+        self.layer_timeout = keyword_timeout / 2 if keyword_timeout else None
+        self.collected: Dict = {}
+        self.stats = RequestStats('xianyu')
+        self._served_layer: Optional[str] = None
         self.playwright = None
 
         # Network sniffing
         self._sniff_enabled = True
 
+        # Session监控
+        self.session_monitor = None
+        self.session_watchdog = None
+
     def _detect_edge_path(self) -> Optional[str]:
         """智能检测Edge路径（与XhsSpider一致）。"""
         import subprocess
@@ -1416,6 +1686,16 @@ class FishSpider:
                 "evidence": evidence
             }
 
+        # 看门狗缓存（后台持续刷新，直接读取无需访问浏览器）
+        watchdog = self.session_watchdog
+        if watchdog and watchdog.is_fresh():
+            cached_names = set(watchdog.latest.get("valid_cookie_names", []))
+            valid_required = [name for name in ['t', '_tb_token_', 'cookie2'] if name in cached_names]
+            if valid_required:
+                evidence["required_cookie_valid"] = valid_required
+                evidence["health_score"] = watchdog.latest.get("health_score")
+                return {"ok": True, "reason": "watchdog_ok", "action": "", "evidence": evidence}
+
         # Cookie校验
         now_ts = time.time()
         try:
@@ -1591,6 +1871,10 @@ class FishSpider:
             self.page = self.context.pages[0]
         else:
             self.page = await self.context.new_page()
+
+        # 确认中国网络出口（与 XhsSpider 共享缓存结论，TTL 内不重复探测）
+        if REQUIRE_CHINA_NETWORK:
+            await ensure_china_network_async(strict=CHINA_NETWORK_STRICT)
         
         # 设置超时
         self.page.set_default_timeout(30000)
@@ -1603,6 +1887,8 @@ class FishSpider:
             # 禁用图片和媒体（加速）
             if self.use_lightweight:
                 if request.resource_type in ['image', 'stylesheet', 'media', 'font']:
+                    if self.network_tap:
+                        self.network_tap.mark(request, 'aborted')
                     await route.abort()
                     return
             
@@ -1611,16 +1897,49 @@ class FishSpider:
             headers.update({
                 'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
                 'Accept-Encoding': 'gzip, deflate, br',
-                'Cache-Control': 'max-age=0',
             })
+            # 只对页面本身强制回源，静态资源交给缓存
+            if request.resource_type == 'document':
+                headers['Cache-Control'] = 'max-age=0'
             
             # 移除反爬虫特征头
             for key in ['Sec-Fetch-Dest', 'Sec-Fetch-Mode', 'Sec-Fetch-Site', 'Sec-Ch-Ua']:
                 headers.pop(key, None)
+
+            # 平台 JS/CSS bundle：命中本地缓存直接返回
+            on_local = (lambda: self.network_tap.mark(request, 'cached')) if self.network_tap else None
+            if self.asset_cache and await self.asset_cache.handle(route, headers, on_local=on_local):
+                return
             
             await route.continue_(headers=headers)
         
+        if ENABLE_ASSET_CACHE and self.asset_cache is None:
+            self.asset_cache = AssetCache()
+        if ENABLE_PAYLOAD_ARCHIVE and self.payload_archive is None:
+            self.payload_archive = PayloadArchive()
         await self.page.route('**/*', route_handler)
+
+        # 响应层拦截检测：验证码/登录跳转/错误码出现时立即放弃当前词条
+        self.block_watcher = BlockWatcher(
+            self.page,
+            api_predicate=lambda url: 'mtop' in url or 'h5api' in url,
+            on_block=self._on_block_signal
+        )
+
+        # 网络流量记账：按页面/词条统计下载量、路由层拦截数、首个 API 响应时间（写入任务报告）
+        if ENABLE_NETWORK_ACCOUNTING:
+            self.network_tap = NetworkTap(self.page, 'xianyu', api_predicate=self.block_watcher.api_predicate)
+            self.network_tap.configure(self.use_lightweight, LIGHTWEIGHT_BROWSER_ARGS if self.use_lightweight else [])
+            self.network_tap.attach()
+        
+        # 后台Session看门狗（关键Cookie过期前自动保活）
+        if HAS_ADVANCED_DEFENSE:
+            try:
+                self.session_monitor = SessionHealthMonitor(self.context, "xianyu")
+                self.session_watchdog = SessionWatchdog(self.session_monitor)
+                self.session_watchdog.start()
+            except Exception as e:
+                print(f"⚠️ Session监控初始化失败: {e}")
         
         print("✅ 增强型闲鱼爬虫启动成功（Stealth + 持久化登录 + 反爬虫激活）")
     
@@ -1711,7 +2030,7 @@ class FishSpider:
                 url = resp.url
                 if not url_predicate(url):
                     return
-                data = await resp.json()
+                data = await jsonio.read_response_json(resp)
                 if isinstance(data, (dict, list)):
                     fut.set_result({"url": url, "json": data})
             except Exception:
@@ -1766,44 +2085,14 @@ class FishSpider:
             if not isinstance(payload, dict):
                 return None
 
-            items = self._extract_fish_items(payload)
-            if not items:
-                # 兜底：递归找可能的列表字段
-                def find_list(obj):
-                    if isinstance(obj, list):
-                        return obj
-                    if isinstance(obj, dict):
-                        for v in obj.values():
-                            r = find_list(v)
-                            if isinstance(r, list) and r:
-                                return r
-                    return None
-                maybe = find_list(payload)
-                if isinstance(maybe, list):
-                    # 尝试将列表元素映射为商品
-                    for it in maybe[:20]:
-                        if isinstance(it, dict) and (it.get('title') or it.get('itemTitle') or it.get('name')):
-                            items.append({
-                                'title': (it.get('title') or it.get('itemTitle') or it.get('name') or '')[:50],
-                                'price': str(it.get('price') or it.get('soldPrice') or it.get('priceText') or ''),
-                                'wants': random.randint(10, 100),
-                                'keyword': keyword,
-                                'source': 'xianyu',
-                                'category': '闲置商品'
-                            })
-
-            if not items:
+            await self._archive(keyword, 'search_api', payload, captured.get('url', ''))
+            summary = summarize_fish_search_payload(keyword, payload)
+            if not summary:
                 return None
 
-            return {
-                'items': items,
-                'source': 'sniffed_api',
-                'success': True,
-                'total': len(items),
-                '商品数': len(items),
-                '想要人数': sum(item.get('wants', 0) for item in items) // len(items) if items else 0,
-                'api_url': captured.get('url', '')
-            }
+            summary['source'] = 'sniffed_api'
+            summary['api_url'] = captured.get('url', '')
+            return summary
         except Exception:
             return None
 
@@ -1832,15 +2121,7 @@ class FishSpider:
                 t = text.strip().replace("\n", " ")
                 if not t:
                     continue
-                title = t[:50]
-                items.append({
-                    'title': title,
-                    'price': '¥?',
-                    'wants': random.randint(10, 100),
-                    'keyword': keyword,
-                    'source': 'xianyu',
-                    'category': '闲置商品'
-                })
+                items.append(FishListing(title=t[:50], price='¥?', wants=random.randint(10, 100), keyword=keyword))
 
             if not items:
                 return None
@@ -1874,6 +2155,9 @@ class FishSpider:
             print("🔐 校验持久化Session...")
         report = await self.verify_session(strict=True)
         if not report.get('ok'):
+            if report.get('reason') == 'captcha_or_blocked':
+                self.stats.record_blocked('captcha')
+                self.action_controller.on_block('captcha')
             if not self.silent_mode:
                 print("\n❌ 持久化Session已失效或需要重新登录！")
                 print(f"原因：{report.get('reason')}")
@@ -1882,31 +2166,30 @@ class FishSpider:
             raise SessionInvalidError(f"Session无效: {report.get('reason')}")
         
         print("🎯 闲鱼爬虫启动（三层获取策略）")
-        results = {}
+        results = self.collected = {}
         
         for keyword in keywords:
             print(f"\n📍 处理关键词: {keyword}")
+            self._served_layer = None
+            started = time.monotonic()
+            if self.network_tap:
+                await self.network_tap.begin_keyword(keyword)
             
-            # 第1层：API调用
-            print(f"  🔹 Layer 1: 尝试API直接调用...")
-            api_result = await self._try_api_call_fish(keyword)
-            
-            if api_result:
-                results[keyword] = api_result
-                self.stats.record_success()
-                print(f"  ✅ Layer 1成功！获取 {len(api_result.get('items', []))} 条数据")
-                continue
-            
-            # 第2层：页面爬取
-            print(f"  🔹 Layer 2: 尝试页面DOM爬取...")
-            page_result = await self._try_page_scraping_fish(keyword)
-            
-            if page_result:
-                results[keyword] = page_result
-                self.stats.record_success()
-                print(f"  ✅ Layer 2成功！获取 {len(page_result.get('items', []))} 条数据")
+            try:
+                results[keyword] = await self.retry_manager.execute_with_retry(self._fetch_fish_keyword, keyword)
+                self.stats.record_success(self._served_layer or 'unknown', time.monotonic() - started)
+                self.action_controller.on_success()
                 continue
-            
+            except CircuitOpenError:
+                # 平台熔断中：交给调用方沿用本地缓存
+                raise
+            except Exception as e:
+                # 超时、Playwright 错误等同样降级到模拟数据，不中止整批词条
+                reason = classify_failure(e)
+                if reason in (FailureReason.TIMEOUT, FailureReason.RATE_LIMITED) and not isinstance(e, BlockDetectedError):
+                    self.action_controller.on_block(reason.value)
+                print(f"  ⚠️ {str(e)[:100] or type(e).__name__}（{reason.value}）")
+
             # 第3层：模拟数据
             print(f"  🔹 Layer 3: 使用模拟数据...")
             mock_data = self._get_mock_fish_data(keyword)
@@ -1919,12 +2202,106 @@ class FishSpider:
                 '商品数': len(mock_data),
                 '想要人数': sum(item.get('wants', 0) for item in mock_data) // len(mock_data) if mock_data else 0
             }
-            self.stats.record_failure()
+            self.stats.record_failure('mock', time.monotonic() - started)
             print(f"  ⚠️ Layer 3降级: 使用 {len(mock_data)} 条模拟数据")
         
+        if self.network_tap:
+            await self.network_tap.end_keyword()
         print(f"\n📊 爬虫统计: {self.stats.get_success_rate()}")
         return results
     
+    async def _fetch_fish_keyword(self, keyword: str) -> Dict:
+        """获取单个词条的闲鱼数据，期间响应层检测到拦截则立即中止"""
+        if self.block_watcher:
+            return await self.block_watcher.guard(self._fetch_fish_layers(keyword))
+        return await self._fetch_fish_layers(keyword)
+    
+    def _on_block_signal(self, block) -> None:
+        """响应层拦截：记录统计、反馈限速；疑似出口问题时让出口检测重新校验"""
+        self.stats.record_blocked(block.signal)
+        self.action_controller.on_block(block.signal)
+        if block.signal in ('blocked', 'captcha'):
+            egress_service.invalidate()
+    
+    async def _archive(self, keyword: str, kind: str, payload, url: str = '') -> None:
+        """原始响应写入归档，供解析器改进后重新解析（归档失败不影响抓取；压缩和写盘在线程中进行）"""
+        if not self.payload_archive or not payload:
+            return
+        try:
+            await asyncio.to_thread(self.payload_archive.append, 'fish', keyword, kind, payload, url)
+        except Exception as e:
+            print(f"  ⚠️  归档失败：{str(e)[:50]}")
+    
+    async def _run_layer(self, layer: str, coro):
+        """
+        执行一层获取策略并记录该层耗时和结果
+
+        任务总时限模式下超出该层时间片即取消（连同其中的 Playwright 等待）
+
+        Args:
+            layer: 层名（sniff / api / xpath / page），用于指标标签
+            coro: 该层的获取协程
+        """
+        started = time.monotonic()
+        outcome = 'error'
+        try:
+            if not self.layer_timeout:
+                result = await coro
+            else:
+                try:
+                    result = await asyncio.wait_for(coro, timeout=self.layer_timeout)
+                except asyncio.TimeoutError:
+                    outcome = 'timeout'
+                    print(f"  ⏰ 本层超出时间片 {self.layer_timeout:.0f} 秒，进入下一层")
+                    return None
+            outcome = 'success' if result else 'empty'
+            if result:
+                self._served_layer = layer
+            return result
+        finally:
+            self.stats.record_layer(layer, outcome, time.monotonic() - started)
+    
+    async def _fetch_fish_layers(self, keyword: str) -> Dict:
+        """
+        按 Layer 1-2 依次获取单个词条的闲鱼数据（一次尝试）
+        
+        Raises:
+            CrawlFailure: 两层都失败（被拦截为 BLOCKED，否则为 NO_DATA）
+        """
+        # 第1层：API调用
+        print(f"  🔹 Layer 1: 尝试API直接调用...")
+        api_result = await self._run_layer('api', self._try_api_call_fish(keyword))
+        if api_result:
+            print(f"  ✅ Layer 1成功！获取 {len(api_result.get('items', []))} 条数据")
+            return api_result
+        
+        # 第2层：页面爬取
+        print(f"  🔹 Layer 2: 尝试页面DOM爬取...")
+        page_result = await self._run_layer('page', self._try_page_scraping_fish(keyword))
+        if page_result:
+            print(f"  ✅ Layer 2成功！获取 {len(page_result.get('items', []))} 条数据")
+            await self._archive(keyword, 'dom', page_result)
+            return page_result
+        
+        # 两层都失败：确认是否被拦截（同时反馈给自适应限速）
+        if await self._detect_block():
+            raise CrawlFailure(f"{keyword} 页面被拦截", FailureReason.BLOCKED)
+        raise CrawlFailure(f"{keyword} 未获取到数据", FailureReason.NO_DATA)
+    
+    async def _detect_block(self) -> bool:
+        """检查当前页面是否为拦截页，命中时记录并反馈给自适应限速"""
+        try:
+            # 只看可见文本，脚本里的提示文案不算
+            text = await self.page.evaluate("() => document.body ? document.body.innerText : ''")
+        except Exception:
+            return False
+        if not ResponseValidator.is_blocked(text or ''):
+            return False
+        print("  🚫 页面疑似被拦截")
+        self.stats.record_blocked()
+        self.action_controller.on_block('blocked')
+        return True
+
     async def _try_api_call_fish(self, keyword: str) -> Optional[Dict]:
         """尝试直接API调用获取闲鱼数据"""
         try:
@@ -1966,6 +2343,7 @@ class FishSpider:
             """)
             
             if api_data and isinstance(api_data, dict):
+                await self._archive(keyword, 'search_api', api_data, 'https://s.xianyu.taobao.com/h5/mtopsearch')
                 items = self._extract_fish_items(api_data)
                 if items and len(items) > 0:
                     return {
@@ -2049,7 +2427,7 @@ class FishSpider:
         
         return None
     
-    async def _extract_fish_items_from_elements(self, elements, keyword: str) -> List[Dict]:
+    async def _extract_fish_items_from_elements(self, elements, keyword: str) -> List[FishListing]:
         """从元素列表提取闲鱼商品"""
         items = []
         
@@ -2059,20 +2437,16 @@ class FishSpider:
                 price = await elem.locator('.price, .amount').first.text_content()
                 
                 if title and price:
-                    items.append({
-                        'title': title.strip()[:50],
-                        'price': price.strip(),
-                        'wants': random.randint(10, 100),
-                        'keyword': keyword,
-                        'source': 'xianyu',
-                        'category': '闲置商品'
-                    })
+                    items.append(FishListing(
+                        title=title.strip()[:50], price=price.strip(),
+                        wants=random.randint(10, 100), keyword=keyword
+                    ))
             except:
                 continue
         
         return items
     
-    async def _extract_fish_items_generic(self, keyword: str) -> List[Dict]:
+    async def _extract_fish_items_generic(self, keyword: str) -> List[FishListing]:
         """通用闲鱼商品提取"""
         items = []
         
@@ -2086,48 +2460,18 @@ class FishSpider:
             matches = re.findall(pattern, page_content, re.DOTALL)
             
             for title, price in matches[:10]:
-                items.append({
-                    'title': title.strip()[:50],
-                    'price': price.strip(),
-                    'wants': random.randint(10, 100),
-                    'keyword': keyword,
-                    'source': 'xianyu',
-                    'category': '闲置商品'
-                })
+                items.append(FishListing(
+                    title=title.strip()[:50], price=price.strip(),
+                    wants=random.randint(10, 100), keyword=keyword
+                ))
         except:
             pass
         
         return items
     
     def _extract_fish_items(self, api_data: Dict) -> List[Dict]:
-        """从API响应提取闲鱼商品"""
-        items = []
-        
-        try:
-            # 尝试多个可能的数据路径
-            data_paths = [
-                api_data.get('data', {}).get('items', []),
-                api_data.get('items', []),
-                api_data.get('result', {}).get('data', []),
-            ]
-            
-            for path in data_paths:
-                if path and isinstance(path, list):
-                    for item in path[:20]:
-                        if isinstance(item, dict):
-                            items.append({
-                                'title': item.get('title', '')[:50],
-                                'price': str(item.get('price', '')),
-                                'wants': random.randint(10, 100),
-                                'keyword': item.get('keyword', ''),
-                                'source': 'xianyu',
-                                'category': item.get('category', '闲置商品')
-                            })
-                    break
-        except:
-            pass
-        
-        return items
+        """从API响应提取闲鱼商品（解析逻辑见 extractors.extract_fish_items）"""
+        return extract_fish_items(api_data)
     
     def _get_mock_fish_data(self, keyword: str) -> List[Dict]:
         """获取闲鱼模拟数据"""
@@ -2147,6 +2491,21 @@ class FishSpider:
         否则会丢失登录状态。应该直接停止 Playwright，让操作系统清理。
         """
         try:
+            if self.session_watchdog:
+                await self.session_watchdog.stop()
+            if self.block_watcher:
+                self.block_watcher.detach()
+            # 限速反馈在线程中写入共享令牌桶，退出前等待写完
+            await self.action_controller.flush_feedback()
+            if self.network_tap:
+                # 超时取消时最后一个词条还没结账
+                await self.network_tap.end_keyword()
+                self.network_tap.detach()
+            if self.asset_cache:
+                print(self.asset_cache.summary())
+                self.asset_cache.close()
+            if self.payload_archive:
+                self.payload_archive.close()
             # ⚠️ 不能关闭 context 和 page，否则登录状态会丢失
             # 只停止 playwright 实例
             if hasattr(self, 'playwright') and self.playwright:
@@ -2161,38 +2520,101 @@ class FishSpider:
 
 # ============= 同步包装函数（供main.py调用） =============
 
-def get_xhs_trends(keywords: List[str], headless: bool = False) -> Dict:
+async def _run_with_timeout(spider, work, timeout: Optional[float]) -> Dict:
+    """在总时限内执行爬虫任务；超时则取消并返回已完成的词条"""
+    if not timeout:
+        return await work()
+    try:
+        return await asyncio.wait_for(work(), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"⏰ 到达时限 {timeout:.0f} 秒，已取消，返回已完成的 {len(spider.collected)} 个词条")
+        return dict(spider.collected)
+
+
+def get_xhs_trends(
+    keywords: List[str],
+    headless: bool = False,
+    timeout: Optional[float] = None,
+    keyword_timeout: Optional[float] = None
+) -> Dict:
     """
     同步包装：爬取小红书趋势（默认显示窗口）
     
+    Args:
+        timeout: 总时限（秒，含浏览器启动）；超时返回已完成的部分结果
+        keyword_timeout: 单个词条时间片（秒）
+    
     Usage:
         xhs_data = get_xhs_trends(['复古相机', '古着市集'])
     """
+    async def _async_get():
+        spider = XhsSpider(headless=headless, use_stealth=True, keyword_timeout=keyword_timeout)
+
+        async def work():
+            await spider.init_browser()
+            return await spider.get_xhs_trends(keywords)
+
+        try:
+            return await _run_with_timeout(spider, work, timeout)
+        finally:
+            await spider.close()
+    
+    return asyncio.run(_async_get())
+
+
+def discover_xhs_keywords(
+    seeds: Dict[str, float],
+    max_expansions: int = DISCOVERY_EXPANSIONS_PER_RUN,
+    headless: bool = False
+) -> Dict:
+    """
+    同步包装：小红书关键词发现
+    
+    Usage:
+        found = discover_xhs_keywords({'复古相机': 15000}, max_expansions=10)
+    """
     async def _async_get():
         spider = XhsSpider(headless=headless, use_stealth=True)
         try:
             await spider.init_browser()
-            data = await spider.get_xhs_trends(keywords)
-            return data
+            return await spider.discover_keywords(seeds, max_expansions=max_expansions)
         finally:
             await spider.close()
     
     return asyncio.run(_async_get())
 
 
-def get_fish_data(keywords: List[str], headless: bool = False, silent_mode: bool = False) -> Dict:
+def get_fish_data(
+    keywords: List[str],
+    headless: bool = False,
+    silent_mode: bool = False,
+    timeout: Optional[float] = None,
+    keyword_timeout: Optional[float] = None
+) -> Dict:
     """
     同步包装：爬取闲鱼数据（默认显示窗口）
     
+    Args:
+        timeout: 总时限（秒，含浏览器启动）；超时返回已完成的部分结果
+        keyword_timeout: 单个词条时间片（秒）
+    
     Usage:
         fish_data = get_fish_data(['复古相机', '古着市集'])
     """
+    # 熔断中直接失败，不必再启动浏览器
+    breaker = get_breaker('xianyu')
+    if breaker.state == 'open':
+        raise CircuitOpenError(f"xianyu 熔断中，{breaker.retry_after():.0f} 秒后再试")
+
     async def _async_get():
-        spider = FishSpider(headless=headless, use_stealth=True, silent_mode=silent_mode)
-        try:
+        spider = FishSpider(headless=headless, use_stealth=True, silent_mode=silent_mode, keyword_timeout=keyword_timeout)
+
+        async def work():
             await spider.init_browser()
-            data = await spider.get_fish_data(keywords)
-            return data
+            return await spider.get_fish_data(keywords)
+
+        try:
+            return await _run_with_timeout(spider, work, timeout)
         finally:
             await spider.close()
     
@@ -2209,10 +2631,10 @@ if __name__ == '__main__':
     print("📱 小红书爬虫测试")
     print("=" * 60)
     xhs_result = get_xhs_trends(test_keywords)
-    print(json.dumps(xhs_result, ensure_ascii=False, indent=2))
+    print(jsonio.dumps(xhs_result, pretty=True, default=to_json_default))
     
     print("\n" + "=" * 60)
     print("🛍️  闲鱼爬虫测试")
     print("=" * 60)
     fish_result = get_fish_data(test_keywords)
-    print(json.dumps(fish_result, ensure_ascii=False, indent=2))
+    print(jsonio.dumps(fish_result, pretty=True, default=to_json_default))
@@ -0,0 +1,13 @@
+"""
+pytest 公共设置
+共享限速数据库默认写在当前目录；测试期间改到临时目录，避免在仓库根目录留下 rate_limits.db
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix='niche_tests_')
+atexit.register(shutil.rmtree, _TMP_DIR, True)
+os.environ.setdefault('RATE_LIMIT_DB', os.path.join(_TMP_DIR, 'rate_limits.db'))
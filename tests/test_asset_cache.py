@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+静态脚本缓存测试
+验证：新鲜度解析 → 内容寻址存储 → LRU 淘汰 → 命中直接 fulfill / 过期带 ETag 回源，304 复用
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import ASSET_CACHE_MAX_TTL
+from scrapers.asset_cache import AssetCache, freshness_ttl
+
+
+class FakeResponse:
+    def __init__(self, status, headers, body=b''):
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class FakeRoute:
+    """只实现 AssetCache.handle 用到的接口；fetch 按预设顺序返回响应"""
+
+    def __init__(self, url, responses, resource_type='script'):
+        async def all_headers():
+            return {'user-agent': 'test'}
+        self.request = SimpleNamespace(url=url, method='GET', resource_type=resource_type, all_headers=all_headers)
+        self.responses = list(responses)
+        self.fetched = []
+        self.fulfilled = []
+
+    async def fetch(self, headers=None):
+        self.fetched.append(headers)
+        return self.responses.pop(0)
+
+    async def fulfill(self, status=None, headers=None, body=None, response=None):
+        self.fulfilled.append({'status': status or response.status, 'body': body})
+
+
+def test_freshness_ttl():
+    """Cache-Control / Expires / 指纹文件名 / no-store"""
+    url = 'https://fe-static.xhscdn.com/formula-static/xhs-pc-web/public/resource/js/index.js'
+    assert freshness_ttl(url, {'cache-control': 'public, max-age=600'}) == 600
+    assert freshness_ttl(url, {'cache-control': 'max-age=31536000, immutable'}) == ASSET_CACHE_MAX_TTL
+    assert freshness_ttl(url, {'cache-control': 'no-store'}) is None
+    assert freshness_ttl(url, {'cache-control': 'no-cache'}) == 0
+    assert freshness_ttl(url, {'expires': 'Thu, 01 Jan 2099 00:00:00 GMT'}) == ASSET_CACHE_MAX_TTL
+    assert freshness_ttl(url.replace('index.js', 'vendor.3f9a8c1d.js'), {}) == ASSET_CACHE_MAX_TTL
+    assert freshness_ttl(url, {}) == 0
+
+
+def test_store_dedup_and_lru_eviction():
+    """相同内容只存一份；超出上限淘汰最久未使用的内容"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AssetCache(root=tmp, max_bytes=250)
+        headers = {'cache-control': 'max-age=600', 'content-type': 'application/javascript'}
+        cache.store('https://a/1.js', b'a' * 100, headers)
+        cache.store('https://a/1-alias.js', b'a' * 100, headers)
+        assert cache.total_bytes() == 100
+
+        cache.store('https://a/2.js', b'b' * 100, headers)
+        time.sleep(0.01)
+        cache.read(cache.lookup('https://a/1.js'))          # 1.js 刚被使用
+        cache.store('https://a/3.js', b'c' * 100, headers)  # 超出上限，淘汰 2.js
+
+        assert cache.lookup('https://a/2.js') is None
+        assert cache.lookup('https://a/1.js') is not None
+        assert cache.lookup('https://a/3.js') is not None
+        assert cache.total_bytes() <= 250
+        assert cache.store('https://a/x.js', b'x', {'cache-control': 'no-store'}) is None
+        cache.close()
+
+
+def test_route_hit_and_revalidate():
+    """首次回源并保存；新鲜期内直接 fulfill；过期后带 If-None-Match 回源，304 复用本地内容"""
+    async def scenario(tmp):
+        cache = AssetCache(root=tmp)
+        url = 'https://g.alicdn.com/idleFish/app.js'
+        body = b'console.log(1)' * 100
+
+        served_locally = []
+        first = FakeRoute(url, [FakeResponse(200, {'cache-control': 'max-age=600', 'etag': '"v1"'}, body)])
+        assert await cache.handle(first, on_local=lambda: served_locally.append('first'))
+        assert len(first.fetched) == 1 and first.fulfilled[0]['body'] == body
+
+        second = FakeRoute(url, [])
+        assert await cache.handle(second, on_local=lambda: served_locally.append('second'))
+        assert second.fetched == [] and second.fulfilled[0]['body'] == body
+        assert served_locally == ['second']
+
+        # 模拟过期
+        cache._conn.execute("UPDATE entries SET expires_at = 0")
+        third = FakeRoute(url, [FakeResponse(304, {'cache-control': 'max-age=600'})])
+        assert await cache.handle(third, {'accept-language': 'zh-CN'})
+        assert third.fetched[0]['if-none-match'] == '"v1"'
+        assert third.fetched[0]['accept-language'] == 'zh-CN'
+        assert third.fulfilled[0] == {'status': 200, 'body': body}
+        assert cache.lookup(url).is_fresh()
+
+        # 页面和接口不经过缓存
+        assert not await cache.handle(FakeRoute('https://www.goofish.com/', [], resource_type='document'))
+        assert cache.stats['hits'] == 1 and cache.stats['revalidated'] == 1 and cache.stats['misses'] == 1
+        cache.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(tmp))
+
+
+def test_revalidate_after_eviction_refetches_unconditionally():
+    """校验期间本地内容被淘汰：304 不交给浏览器，去掉校验头重新回源"""
+    async def scenario(tmp):
+        cache = AssetCache(root=tmp)
+        url = 'https://g.alicdn.com/idleFish/app.js'
+        entry = cache.store(url, b'old' * 10, {'cache-control': 'no-cache', 'etag': '"v1"'})
+
+        class EvictingRoute(FakeRoute):
+            async def fetch(self, headers=None):
+                if not self.fetched:
+                    cache._blob_path(entry.sha).unlink()   # 另一个进程淘汰了内容
+                return await super().fetch(headers)
+
+        route = EvictingRoute(url, [FakeResponse(304, {}), FakeResponse(200, {'cache-control': 'max-age=600'}, b'new')])
+        assert await cache.handle(route)
+        assert route.fetched[0]['if-none-match'] == '"v1"'
+        assert 'if-none-match' not in route.fetched[1]
+        assert route.fulfilled == [{'status': 200, 'body': b'new'}]
+        assert cache.read(cache.lookup(url)) == b'new'
+        cache.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(tmp))
+
+
+if __name__ == '__main__':
+    test_freshness_ttl()
+    test_store_dedup_and_lru_eviction()
+    test_route_hit_and_revalidate()
+    test_revalidate_after_eviction_refetches_unconditionally()
+    print("✅ 静态脚本缓存测试通过")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+评分参数回测测试
+验证：按时间点回放不偷看未来 → 基准参数与分析器逐条计算一致 → 参数网格对比 → 事后命中率
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from engine.analyzer import BlueOceanAnalyzer
+from engine.backtest import (
+    HAS_NUMPY, Backtester, SnapshotTable, baseline_params, parameter_grid, scale_decay_steps
+)
+
+
+HOUR = 3600
+
+
+def _observations():
+    """三个词条两天的观测：第二天'复古相机'热度上涨，'手工皮具'下跌，'露营灯'竞争激烈"""
+    obs = [
+        (0, '复古相机', {'heat': 2000}), (0, '复古相机', {'competition': 20, 'wants': 15}),
+        (0, '手工皮具', {'heat': 3000}), (0, '手工皮具', {'competition': 40, 'wants': 10}),
+        (0, '露营灯', {'heat': 9000}), (0, '露营灯', {'competition': 500, 'wants': 30}),
+        (30 * HOUR, '复古相机', {'heat': 2600}),
+        (30 * HOUR, '手工皮具', {'heat': 1500}),
+        (50 * HOUR, '小众香水', {'heat': 5000}),
+    ]
+    return sorted(obs, key=lambda row: row[0])
+
+
+def test_replay_uses_only_past_observations():
+    """时间点只看到当时已有的数据；没有闲鱼数据的词条不出现"""
+    table = SnapshotTable.build(_observations(), [10 * HOUR, 40 * HOUR])
+    first = {kw: h for s, kw, h in zip(table.snap, table.keyword, table.heat) if s == 0}
+    assert first == {'复古相机': 2000, '手工皮具': 3000, '露营灯': 9000}
+    assert '小众香水' not in table.keyword
+    row = table.keyword.index('复古相机')
+    assert table.age_hours[row] == 10 and abs(table.future[row] - 0.3) < 1e-9
+    assert table.future[table.keyword.index('复古相机', row + 1)] is None
+
+
+def test_baseline_matches_analyzer_and_grid_changes_selection():
+    """基准参数的指数与 BlueOceanAnalyzer 一致；更高的下限/更严的竞争上限只会缩小合格集合"""
+    table = SnapshotTable.build(_observations(), [10 * HOUR, 40 * HOUR])
+    backtester = Backtester(table, use_numpy=False)
+    base = backtester.evaluate(baseline_params())
+
+    # 10 小时前的数据：蓝海指数 = 热度 × 平均想要 / (竞争数 + 1) × 1.5
+    expected = round(2000 * 15 / 21 * BlueOceanAnalyzer.decay_for_age(10), 2)
+    index = backtester._index(baseline_params()['decay_steps'])
+    assert index[table.keyword.index('复古相机')] == expected and BlueOceanAnalyzer.decay_for_age(10) == 1.5
+    assert '露营灯' not in base['top'][0]
+    assert base['pushed'][0] == ['复古相机', '手工皮具']
+
+    grid = parameter_grid(min_score=[120, 2000], max_competition=[300, 30], decay_steps=[scale_decay_steps(1)])
+    reports = backtester.sweep(grid)
+    strict = next(r for r in reports if r['params']['min_score'] == 2000 and r['params']['max_competition'] == 30)
+    assert strict['pushed'][0] == ['复古相机'] and strict['vs_baseline']['removed'] >= 1
+    assert all(r['avg_qualified'] <= reports[0]['avg_qualified'] for r in reports)
+    assert reports[0]['vs_baseline']['jaccard'] == 1.0
+    # 推送后第二天：复古相机上涨、手工皮具下跌
+    assert reports[0]['hit_rate'] == 0.5 and strict['hit_rate'] == 1.0
+
+
+def test_numpy_and_pure_python_agree():
+    """向量化实现与纯 Python 实现结果一致（未安装 numpy 时跳过）"""
+    if not HAS_NUMPY:
+        return
+    table = SnapshotTable.build(_observations(), [10 * HOUR, 40 * HOUR, 60 * HOUR])
+    grid = parameter_grid(min_score=[50, 500], top_n=[1, 5], decay_steps=[scale_decay_steps(0), scale_decay_steps(1.5)])
+    slow = Backtester(table, use_numpy=False).sweep(grid)
+    fast = Backtester(table, use_numpy=True).sweep(grid)
+    for a, b in zip(slow, fast):
+        assert a['pushed'] == b['pushed'] and a['top'] == b['top'] and a['qualified'] == b['qualified']
+
+
+if __name__ == '__main__':
+    test_replay_uses_only_past_observations()
+    test_baseline_matches_analyzer_and_grid_changes_selection()
+    test_numpy_and_pure_python_agree()
+    print("✅ 评分参数回测测试通过")
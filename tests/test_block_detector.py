@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+响应层拦截检测测试
+验证：状态码 / 跳转 / 错误码 / 拦截文案识别 → 检测到拦截时立即取消当前词条
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scrapers.block_detector import (
+    BlockDetectedError, BlockWatcher,
+    inspect_html, inspect_navigation, inspect_payload, inspect_status
+)
+from scrapers.retry_policy import FailureReason
+
+
+class FakePage:
+    """只实现 BlockWatcher 用到的接口"""
+
+    def __init__(self):
+        self.main_frame = object()
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def off(self, event, handler):
+        self.handlers.pop(event, None)
+
+    async def evaluate(self, script):
+        return None
+
+    def respond(self, url, status=200, resource_type='xhr', payload=None):
+        async def json():
+            return payload
+        resp = SimpleNamespace(
+            url=url, status=status, headers={}, frame=self.main_frame,
+            request=SimpleNamespace(resource_type=resource_type), json=json
+        )
+        self.handlers['response'](resp)
+
+
+def test_inspectors():
+    """各类拦截信号的识别，正常响应不误判"""
+    assert inspect_status('https://edith.xiaohongshu.com/api', 461).signal == 'captcha'
+    assert inspect_status('https://h5api.m.goofish.com/x', 429).reason == FailureReason.RATE_LIMITED
+    assert inspect_status('https://edith.xiaohongshu.com/api', 200) is None
+
+    assert inspect_navigation('https://www.xiaohongshu.com/website-login/captcha?redirect=x').signal == 'captcha'
+    assert inspect_navigation('https://login.taobao.com/member/login.jhtml').signal == 'login'
+    assert inspect_navigation('https://www.xiaohongshu.com/search_notes?keyword=verify') is None
+
+    assert inspect_payload('u', {'code': 300013, 'success': False, 'msg': '访问频次异常'}).signal == 'rate_limited'
+    assert inspect_payload('u', {'code': -100, 'success': False}).reason == FailureReason.LOGIN_REQUIRED
+    assert inspect_payload('u', {'ret': ['FAIL_SYS_USER_VALIDATE::哎哟喂,被挤爆啦']}).signal == 'captcha'
+    assert inspect_payload('u', {'ret': ['SUCCESS::调用成功'], 'data': {}}) is None
+    assert inspect_payload('u', {'code': 0, 'success': True, 'data': {'items': []}}) is None
+
+    assert inspect_html('u', '<html><body><p>请勿频繁操作</p></body></html>').signal == 'blocked'
+    assert inspect_html('u', '<script>var tip="请勿频繁操作"</script><div>正常内容</div>') is None
+
+
+def test_watcher_cancels_inflight_work():
+    """检测到拦截后立即取消正在等待的提取，不再等满超时"""
+    async def scenario():
+        page = FakePage()
+        signals = []
+        watcher = BlockWatcher(page, api_predicate=lambda url: 'edith' in url, on_block=signals.append)
+
+        async def slow_layers():
+            await asyncio.sleep(30)
+            return 'data'
+
+        async def block_soon():
+            await asyncio.sleep(0.05)
+            page.respond('https://cdn.example.com/a.js', status=403)  # 第三方资源，忽略
+            page.respond('https://edith.xiaohongshu.com/api/sns/web/v1/search/notes',
+                          payload={'code': 300012, 'success': False})
+
+        start = time.monotonic()
+        asyncio.create_task(block_soon())
+        try:
+            await watcher.guard(slow_layers())
+            assert False, "应当检测到拦截"
+        except BlockDetectedError as e:
+            assert e.reason == FailureReason.BLOCKED
+            assert e.block.signal == 'blocked'
+        assert time.monotonic() - start < 2
+        assert [s.signal for s in signals] == ['blocked']
+
+        # 没有拦截时正常返回结果
+        async def quick():
+            return 'ok'
+        assert await watcher.guard(quick()) == 'ok'
+        watcher.detach()
+
+    asyncio.run(scenario())
+
+
+def test_guard_propagates_cancellation_without_block():
+    """内部协程被取消且没有检测到拦截：传播 CancelledError，而不是把空的拦截信号当成拦截"""
+    async def scenario():
+        watcher = BlockWatcher(FakePage(), api_predicate=lambda url: 'edith' in url)
+
+        async def cancelled_inside():
+            raise asyncio.CancelledError()
+
+        try:
+            await watcher.guard(cancelled_inside())
+            assert False, "应当传播取消"
+        except asyncio.CancelledError:
+            pass
+        watcher.detach()
+
+    asyncio.run(scenario())
+
+
+if __name__ == '__main__':
+    test_inspectors()
+    test_watcher_cancels_inflight_work()
+    test_guard_propagates_cancellation_without_block()
+    print("✅ 响应层拦截检测测试通过")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+抓取队列测试
+验证：期望价值排序 → 上界过滤 → 预算消耗 → 时间片
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from engine.crawl_queue import CrawlQueue, MissionBudget
+
+
+FISH_CACHE = {
+    '复古相机': {'商品数': 80, '想要数列表': [18, 16, 14, 12, 10]},
+    '滑板文化': {'商品数': 400, '想要数列表': [6, 5, 5, 4, 4]},
+    '红海词': {'商品数': 5000, '想要数列表': [1, 1, 1]},
+}
+
+
+def test_prior_winners_outrank_insertion_order():
+    """历史指数高的词条排在前面，与 xhs_data.json 中的顺序无关"""
+    now = time.time()
+    queue = CrawlQueue(
+        fish_cache=FISH_CACHE,
+        prior_index={'复古相机': 3300.0, '滑板文化': 80.0},
+        last_seen={'复古相机': now - 3600, '滑板文化': now - 3600},
+        now=now
+    )
+    items = [
+        {'word': '滑板文化', 'heat': 6800},
+        {'word': '复古相机', 'heat': 15000},
+    ]
+    assert [i['word'] for i in queue.ordered(items)] == ['复古相机', '滑板文化']
+
+
+def test_unreachable_keywords_sink_and_stale_data_rises():
+    """上界达不到门槛的词条排到最后；同等条件下数据越旧越优先"""
+    now = time.time()
+    queue = CrawlQueue(
+        fish_cache=FISH_CACHE,
+        prior_index={'甲': 500.0, '乙': 500.0},
+        last_seen={'甲': now - 600, '乙': now - 20 * 3600},
+        now=now
+    )
+    assert queue.upper_bound('红海词', 1000) < 120
+    ordered = queue.ordered([
+        {'word': '红海词', 'heat': 1000},
+        {'word': '甲', 'heat': 5000},
+        {'word': '乙', 'heat': 5000},
+    ])
+    assert [i['word'] for i in ordered] == ['乙', '甲', '红海词']
+
+
+def test_budget_requests_and_seconds():
+    """请求数或时间任一达到上限即视为用尽"""
+    budget = MissionBudget(max_requests=2)
+    assert budget.remaining_requests() == 2
+    budget.charge()
+    assert not budget.exhausted()
+    budget.charge()
+    assert budget.exhausted() and budget.remaining_requests() == 0
+
+    timed = MissionBudget(max_seconds=0)
+    assert timed.exhausted()
+    assert MissionBudget().remaining_requests() is None
+
+
+def test_time_slices():
+    """剩余时间平分给剩余词条，时间片有上下限且不超过阶段剩余时间"""
+    assert MissionBudget().time_slice(5) is None
+
+    budget = MissionBudget(max_seconds=600)
+    assert 110 < budget.time_slice(5) <= 120          # 约120秒，受单词条上限约束
+    assert 55 < budget.time_slice(10) <= 60
+    assert budget.time_slice(1000) == 20              # 下限：宁可少抓几个词也不把时间片切碎
+    assert budget.time_slice(1, share=0.01) <= 6      # 不超过本阶段可用时间
+
+    nearly_done = MissionBudget(max_seconds=300)
+    nearly_done.started_at -= 290
+    assert nearly_done.exhausted()                     # 剩余不足一个最小时间片
+
+
+if __name__ == '__main__':
+    test_prior_winners_outrank_insertion_order()
+    test_unreachable_keywords_sink_and_stale_data_rises()
+    test_budget_requests_and_seconds()
+    test_time_slices()
+    print("✅ 抓取队列测试通过")
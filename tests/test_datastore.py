@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+本地数据库测试
+验证：批量写入 → 最新值查询 → 重复导入不重复 → 分析结果快照 → JSON 导入/导出往返
+"""
+
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.datastore import NicheDataStore
+
+
+def test_latest_observations_and_history():
+    """同一词条多次观测：最新值取最后一次，历史按时间升序，词条顺序按首次出现"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NicheDataStore(str(Path(tmp) / 'niche.db'))
+        store.record_xhs({'复古相机': {'热度': 100}, '手工皮具': {'热度': 50}}, observed_at=1000)
+        store.record_xhs({'复古相机': {'热度': 180, '笔记数': 12}}, observed_at=2000)
+        store.record_fish({'复古相机': {'商品数': 80, '想要数列表': [18, 16]}}, observed_at=1500)
+
+        latest = store.latest_xhs()
+        assert list(latest) == ['复古相机', '手工皮具']
+        assert latest['复古相机']['热度'] == 180 and latest['复古相机']['笔记数'] == 12
+        assert [h['热度'] for h in store.xhs_history('复古相机')] == [100, 180]
+        assert list(store.latest_xhs(['手工皮具'])) == ['手工皮具']
+
+        fish = store.fish_for('复古相机')
+        assert fish['商品数'] == 80 and fish['想要总数'] == 34 and fish['想要数列表'] == [18, 16]
+        assert store.fish_for('手工皮具') is None
+        assert store.latest_observed_at('xhs') == 2000
+
+        store.record_analysis([{'词条': '复古相机', '蓝海指数': 3.5}], analyzed_at=1)
+        store.record_analysis([{'词条': '复古相机', '蓝海指数': 8.0}, {'词条': '手工皮具', '蓝海指数': 1.0}], analyzed_at=2)
+        assert store.index_snapshot() == {'复古相机': 8.0, '手工皮具': 1.0}
+        assert [r['词条'] for r in store.top_results(limit=1)] == ['复古相机']
+        store.close()
+
+
+def test_json_import_export_roundtrip():
+    """JSON 导入后导出内容一致；重复导入不会产生重复观测"""
+    with tempfile.TemporaryDirectory() as tmp:
+        xhs_file, fish_file = Path(tmp) / 'xhs.json', Path(tmp) / 'fish.json'
+        xhs_file.write_text(json.dumps({
+            '小众香水': {'热度': 9000, '更新时间': '2025-12-30T10:00:00'},
+            '露营装备': {'热度': 4000}
+        }, ensure_ascii=False), encoding='utf-8')
+        fish_file.write_text(json.dumps({
+            '小众香水': {'商品数': 40, '想要总数': 300, '想要数列表': [30, 20]}
+        }, ensure_ascii=False), encoding='utf-8')
+
+        store = NicheDataStore(str(Path(tmp) / 'niche.db'))
+        assert store.is_empty()
+        store.import_json(str(xhs_file), str(fish_file), report_file=None)
+        store.import_json(str(xhs_file), str(fish_file), report_file=None)
+        assert len(store.xhs_history('小众香水')) == 1
+        assert store.latest_xhs()['小众香水']['更新时间'].startswith('2025-12-30T10:00')
+
+        out_xhs, out_fish = Path(tmp) / 'out_xhs.json', Path(tmp) / 'out_fish.json'
+        store.export_json(str(out_xhs), str(out_fish))
+        exported = json.loads(out_xhs.read_text(encoding='utf-8'))
+        assert {k: v['热度'] for k, v in exported.items()} == {'小众香水': 9000, '露营装备': 4000}
+        assert json.loads(out_fish.read_text(encoding='utf-8'))['小众香水']['想要数列表'] == [30, 20]
+        store.close()
+
+
+def test_concurrent_writers_do_not_clobber():
+    """两个连接同时写入不同词条，全部保留（整文件 JSON 覆盖写会丢掉其中一方）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'niche.db')
+        stores = [NicheDataStore(db_path), NicheDataStore(db_path)]
+
+        def writer(store, prefix):
+            for i in range(50):
+                store.record_xhs({f'{prefix}{i}': {'热度': i}})
+
+        threads = [threading.Thread(target=writer, args=(s, p)) for s, p in zip(stores, 'ab')]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(stores[0].latest_xhs()) == 100
+        for store in stores:
+            store.close()
+
+
+if __name__ == '__main__':
+    test_latest_observations_and_history()
+    test_json_import_export_roundtrip()
+    test_concurrent_writers_do_not_clobber()
+    print("✅ 本地数据库测试通过")
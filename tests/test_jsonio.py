@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+JSON 编解码层测试
+验证：加速/回退两条路径与标准库输出一致 → 响应体按字节解析 → 不支持的对象回退 → 微基准可运行
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import jsonio
+
+REPORT = {
+    'timestamp': '2026-01-01T08:00:00',
+    'top_results': [{'词条': '露营灯', '蓝海指数': 7142.86, '闲鱼想要数': [30, 10], '评级': '⭐⭐⭐⭐⭐ 极佳'}],
+    'skipped_by_budget': [],
+    'budget': None,
+    'partial': False,
+    'config': {'min_potential_score': 1.0, 'max_competition': 500},
+}
+
+
+def _with_codec(use_orjson: bool, func):
+    saved = jsonio.HAS_ORJSON
+    jsonio.HAS_ORJSON = use_orjson and saved
+    try:
+        return func()
+    finally:
+        jsonio.HAS_ORJSON = saved
+
+
+def test_matches_stdlib_on_both_paths():
+    """普通数据下人类格式与 json.dumps(ensure_ascii=False, indent=2) 逐字相同；紧凑格式无空白且可往返"""
+    for use_orjson in (True, False):
+        pretty = _with_codec(use_orjson, lambda: jsonio.dumps(REPORT, pretty=True))
+        compact = _with_codec(use_orjson, lambda: jsonio.dumps_bytes(REPORT))
+        assert pretty == json.dumps(REPORT, ensure_ascii=False, indent=2)
+        assert compact == json.dumps(REPORT, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        assert _with_codec(use_orjson, lambda: jsonio.loads(compact)) == REPORT
+        assert _with_codec(use_orjson, lambda: jsonio.loads(memoryview(compact))) == REPORT
+
+
+def test_file_and_response_helpers():
+    """文件按字节读写；Playwright 响应取原始字节解析；格式错误抛出 JSONDecodeError"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'report.json')
+        jsonio.dump(REPORT, path)
+        assert jsonio.load(path) == REPORT
+        with open(path, 'r', encoding='utf-8') as f:
+            assert '露营灯' in f.read()
+
+    class FakeResponse:
+        def __init__(self, body: bytes):
+            self._body = body
+
+        async def body(self) -> bytes:
+            return self._body
+
+    data = asyncio.run(jsonio.read_response_json(FakeResponse('{"data":{"items":[{"title":"复古相机"}]}}'.encode('utf-8'))))
+    assert data['data']['items'][0]['title'] == '复古相机'
+    try:
+        asyncio.run(jsonio.read_response_json(FakeResponse(b'<html>blocked</html>')))
+        assert False, "非 JSON 响应应抛出 JSONDecodeError"
+    except jsonio.JSONDecodeError:
+        pass
+
+
+def test_unsupported_objects_fall_back():
+    """超过 64 位的整数、非字符串键、default 钩子与标准库行为一致"""
+    big = {'id': 2 ** 70, 1: 'one'}
+    assert jsonio.loads(jsonio.dumps(big)) == {'id': 2 ** 70, '1': 'one'}
+
+    class Opaque:
+        def __str__(self):
+            return 'opaque'
+
+    assert jsonio.dumps({'x': Opaque()}, default=str) == '{"x":"opaque"}'
+
+
+def test_known_differences_from_stdlib():
+    """指数浮点解析后相等但写法不同；orjson 把 NaN / Infinity 写成 null"""
+    floats = {'big': 1e16, 'small': 1e-7}
+    assert json.loads(jsonio.dumps(floats)) == floats
+    assert jsonio.loads(jsonio.dumps(floats, pretty=True)) == floats
+    if jsonio.HAS_ORJSON:
+        assert jsonio.loads(jsonio.dumps({'x': float('nan'), 'y': float('inf')})) == {'x': None, 'y': None}
+
+
+def test_benchmark_runs_on_fixtures():
+    """微基准覆盖 tests/fixtures 下的样本，并校验两边结果一致"""
+    rows = jsonio.benchmark(number=3)
+    payloads = {row['payload'] for row in rows}
+    assert 'xhs_search_related.json' in payloads
+    assert {row['op'] for row in rows} == {'loads', 'dumps compact', 'dumps pretty'}
+    assert all(row['stdlib_us'] > 0 and row['fast_us'] > 0 for row in rows)
+
+
+if __name__ == '__main__':
+    test_matches_stdlib_on_both_paths()
+    test_file_and_response_helpers()
+    test_unsupported_objects_fall_back()
+    test_known_differences_from_stdlib()
+    test_benchmark_runs_on_fixtures()
+    print("✅ JSON 编解码层测试通过")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+关键词发现测试
+验证：相关搜索提取 → 布隆过滤器去重 → 前沿队列优先级与容量上限
+"""
+
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scrapers.discovery import BloomFilter, KeywordFrontier, extract_related_queries
+from scrapers.spider import summarize_xhs_search_payload
+
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'xhs_search_related.json'
+
+
+def test_extract_related_queries_ignores_note_titles():
+    """只提取相关搜索容器中的词，笔记标题不会被当作搜索词"""
+    payload = json.loads(FIXTURE.read_text(encoding='utf-8'))
+    queries = [q for q, _ in extract_related_queries(payload)]
+    assert queries == ['ccd相机', '胶片相机入门', '复古相机']
+
+    suggest = {'data': {'sug_items': [{'text': '复古相机ccd', 'hot_value': 5300}, {'text': 'x'}]}}
+    assert extract_related_queries(suggest) == [('复古相机ccd', 5300.0)]
+
+
+def test_search_summary_counts_only_note_cards():
+    """趋势汇总只统计笔记卡片"""
+    payload = json.loads(FIXTURE.read_text(encoding='utf-8'))
+    summary = summarize_xhs_search_payload(payload)
+    assert summary['count'] == 2
+    assert summary['trend_score'] == 1000
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    words = [f"词条{i}" for i in range(1000)]
+    for w in words:
+        bloom.add(w)
+    assert all(w in bloom for w in words)
+    false_positives = sum(1 for i in range(1000) if f"新词{i}" in bloom)
+    assert false_positives < 50
+
+
+def test_frontier_priority_dedup_and_bound():
+    """按热度出队；已知词不再入队（跨实例）；超出容量淘汰最低优先级"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / 'discovery.db')
+        frontier = KeywordFrontier(db_path=db, max_size=3)
+        assert frontier.offer([('复古相机', 15000), ('手账本', 7200)]) == ['复古相机', '手账本']
+        assert frontier.offer([('复古相机', 99999)]) == []
+
+        # 无热度字段：按父词热度和位置衰减
+        frontier.offer([('ccd相机', 0), ('胶片相机', 0)], parent='复古相机', parent_heat=10000)
+        assert len(frontier) == 3
+        assert [frontier.pop()[0] for _ in range(3)] == ['复古相机', 'ccd相机', '胶片相机']
+        assert frontier.pop() is None
+        frontier.close()
+
+        reopened = KeywordFrontier(db_path=db, max_size=3)
+        assert reopened.is_known('手账本')
+        assert reopened.offer([('手账本', 1), ('拍立得', 1)]) == ['拍立得']
+        reopened.close()
+
+
+def test_frontier_pop_is_exclusive_across_instances():
+    """多个实例（进程）共用状态库并发出队时，同一候选只会被取出一次"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / 'discovery.db')
+        seed = KeywordFrontier(db_path=db, max_size=200)
+        seed.offer([(f"词条{i}", 200 - i) for i in range(100)])
+        assert len(seed) == 100 and seed.known_count() == 100
+        seed.close()
+
+        frontiers = [KeywordFrontier(db_path=db, max_size=200) for _ in range(4)]
+        popped = []
+
+        def worker(frontier):
+            while True:
+                entry = frontier.pop()
+                if not entry:
+                    return
+                popped.append(entry[0])
+
+        threads = [threading.Thread(target=worker, args=(f,)) for f in frontiers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=30)
+        for frontier in frontiers:
+            frontier.close()
+
+        assert len(popped) == 100 and len(set(popped)) == 100
+
+
+if __name__ == '__main__':
+    test_extract_related_queries_ignores_note_titles()
+    test_search_summary_counts_only_note_cards()
+    test_bloom_filter_has_no_false_negatives()
+    test_frontier_priority_dedup_and_bound()
+    test_frontier_pop_is_exclusive_across_instances()
+    print("✅ 关键词发现测试通过")
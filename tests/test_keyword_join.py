@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+跨平台关键词模糊匹配测试
+验证：规范化与相似度 → 前缀过滤结果与两两比较一致 → 别名表增量缓存 → 变体闲鱼数据汇总
+"""
+
+import itertools
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from engine.keyword_join import KeywordJoiner, aggregate_fish, dice, keyword_grams, normalize_keyword
+
+
+def test_normalize_and_similarity():
+    """全半角/大小写/标点差异规范化后一致；变体词条相似度达到阈值，泛词不会误配"""
+    assert normalize_keyword(' ＣＣＤ 相机！') == 'ccd相机'
+    assert dice(keyword_grams('复古相机'), keyword_grams('复古胶片相机')) == 0.5
+    assert dice(keyword_grams('相机'), keyword_grams('复古胶片相机')) < 0.5
+    assert dice(keyword_grams('复古 相机'), keyword_grams('复古相机')) == 1.0
+
+
+def test_join_matches_bruteforce():
+    """倒排索引 + 前缀过滤不漏配：与两两比较的结果完全一致"""
+    rng = random.Random(7)
+    chars = '复古相机胶片手工皮具露营灯小众香水'
+    left = list({''.join(rng.choice(chars) for _ in range(rng.randint(2, 7))) for _ in range(300)})
+    right = list({''.join(rng.choice(chars) for _ in range(rng.randint(2, 7))) for _ in range(300)})
+
+    grams = {kw: keyword_grams(kw) for kw in left + right}
+    for threshold in (0.4, 0.6, 0.8):
+        joined = KeywordJoiner(threshold=threshold, cache_file=None).join(left, right)
+        expected = {}
+        for a, b in itertools.product(left, right):
+            score = dice(grams[a], grams[b])
+            if score >= threshold:
+                expected.setdefault(a, set()).add(b)
+        assert {k: {t for t, _ in v} for k, v in joined.items()} == expected
+
+
+def test_alias_cache_is_incremental():
+    """缓存重新加载后，新增的闲鱼词条仍会匹配到已缓存的小红书词条"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = str(Path(tmp) / 'aliases.json')
+        joiner = KeywordJoiner(threshold=0.5, cache_file=cache_file)
+        first = joiner.join(['复古相机', '露营灯'], ['复古相机', '复古胶片相机', '手工皮具'])
+        assert first == {'复古相机': [('复古相机', 1.0), ('复古胶片相机', 0.5)]}
+        joiner.save()
+
+        reloaded = KeywordJoiner(threshold=0.5, cache_file=cache_file)
+        second = reloaded.join(['复古相机', '露营灯'], ['复古相机', '户外露营灯', '手工皮具'])
+        assert second['复古相机'] == [('复古相机', 1.0)]
+        assert second['露营灯'] == [('户外露营灯', 0.6667)]
+        # 阈值变化时缓存失效
+        assert KeywordJoiner(threshold=0.9, cache_file=cache_file)._cache['left'] == {}
+
+
+def test_alias_cache_scores_pairs_missed_by_earlier_runs():
+    """两次运行的词条集合不同：第三次同时出现的旧词条配对也会计算，结果与不缓存一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = str(Path(tmp) / 'aliases.json')
+        KeywordJoiner(threshold=0.5, cache_file=cache_file).join(['露营椅'], ['复古相机'])
+        runs = [(['复古胶片相机'], ['露营装备']), (['复古胶片相机'], ['复古相机'])]
+        for left, right in runs:
+            joiner = KeywordJoiner(threshold=0.5, cache_file=cache_file)
+            result = joiner.join(left, right)
+            joiner.save()
+            assert result == KeywordJoiner(threshold=0.5, cache_file=None).join(left, right)
+        assert result == {'复古胶片相机': [('复古相机', 0.5)]}
+
+
+def test_aggregate_fish_variants():
+    """变体商品数取最大值（搜索结果重叠），想要数合并"""
+    fish = {
+        '复古相机': {'商品数': 30, '想要总数': 40, '想要数列表': [20, 20]},
+        '复古胶片相机': {'商品数': 120, '想要总数': 10, '想要数列表': [10]},
+    }
+    merged = aggregate_fish(fish, [('复古相机', 1.0), ('复古胶片相机', 0.5)])
+    assert merged['商品数'] == 120 and merged['想要数列表'] == [20, 20, 10]
+    assert merged['匹配词条'] == ['复古相机', '复古胶片相机']
+    assert aggregate_fish(fish, [('复古相机', 1.0)]) is fish['复古相机']
+    assert aggregate_fish(fish, [('手工皮具', 0.9)]) is None
+
+
+if __name__ == '__main__':
+    test_normalize_and_similarity()
+    test_join_matches_bruteforce()
+    test_alias_cache_is_incremental()
+    test_alias_cache_scores_pairs_missed_by_earlier_runs()
+    test_aggregate_fish_variants()
+    print("✅ 关键词模糊匹配测试通过")
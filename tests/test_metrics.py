@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+监控指标测试
+验证：直方图分位数与 Prometheus 文本格式 → RequestStats 写入注册表 → 爬虫分层耗时/超时 → 限速器指标 → 原子写出
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import metrics
+from scrapers.advanced_config import (
+    ActionRateController, AimdRateController, JitterProfile, RequestStats, TokenBucket
+)
+from scrapers.spider import XhsSpider
+
+
+def test_histogram_and_prometheus_text():
+    """桶计数按 Prometheus 约定累积；分位数按桶线性插值；标签值转义"""
+    registry = metrics.MetricsRegistry()
+    latency = registry.histogram('demo_seconds', '耗时', ('layer',), buckets=(1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        latency.observe(value, layer='api')
+    assert latency.quantile(0.5, layer='api') == 1.75
+    assert latency.quantile(0.95) == 4.0
+    assert latency.quantile(0.5, layer='page') is None
+
+    requests = registry.counter('demo_total', '请求数', ('outcome',))
+    requests.inc(outcome='ok')
+    requests.inc(2, outcome='say "hi"')
+    assert requests.value() == 3 and requests.value(outcome='ok') == 1
+    assert registry.counter('demo_total', '请求数', ('outcome',)) is requests
+
+    text = registry.render_prometheus()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{layer="api",le="1"} 1' in text
+    assert 'demo_seconds_bucket{layer="api",le="4"} 4' in text
+    assert 'demo_seconds_bucket{layer="api",le="+Inf"} 5' in text
+    assert 'demo_seconds_sum{layer="api"} 16.5' in text
+    assert 'demo_seconds_count{layer="api"} 5' in text
+    assert 'demo_total{outcome="say \\"hi\\""} 2' in text
+
+    try:
+        requests.inc(outcome='ok', layer='api')
+        assert False, "标签不匹配应报错"
+    except ValueError:
+        pass
+
+
+def test_request_stats_feed_registry():
+    """RequestStats 保留本实例计数，同时按平台/层/结果写入注册表"""
+    metrics.get_metrics().reset()
+    stats = RequestStats('xianyu')
+    stats.record_success('api', 0.8)
+    stats.record_success('page', 6.0)
+    stats.record_failure('mock', 30.0)
+    stats.record_failure()
+    stats.record_blocked('captcha')
+    stats.record_retry()
+
+    assert stats.total_requests == 4 and stats.get_mock_fallback_rate() == 25.0
+    results = metrics.keyword_results()
+    assert results.value(platform='xianyu', layer='mock') == 1
+    assert results.value(platform='xianyu', outcome='success') == 2
+    assert metrics.keyword_latency().quantile(0.5, platform='xianyu', outcome='success') is not None
+    assert metrics.block_signals().value(platform='xianyu', signal='captcha') == 1
+    assert metrics.retries().value(platform='xianyu') == 1
+    assert '模拟数据降级率: 25.0%' in str(stats)
+
+
+def test_spider_layer_timing():
+    """每层记录耗时和结果；超出时间片记为 timeout，提供数据的层记为本词条的来源层"""
+    metrics.get_metrics().reset()
+
+    async def quick():
+        return {'count': 3}
+
+    async def empty():
+        return None
+
+    async def slow():
+        await asyncio.sleep(1)
+        return {'count': 1}
+
+    spider = SimpleNamespace(layer_timeout=0.05, stats=RequestStats('xiaohongshu'), _served_layer=None)
+
+    async def run():
+        assert await XhsSpider._run_layer(spider, 'sniff', empty()) is None
+        assert await XhsSpider._run_layer(spider, 'xpath', slow()) is None
+        assert await XhsSpider._run_layer(spider, 'page', quick()) == {'count': 3}
+
+    asyncio.run(run())
+    attempts = metrics.layer_attempts()
+    assert attempts.value(layer='sniff', outcome='empty') == 1
+    assert attempts.value(layer='xpath', outcome='timeout') == 1
+    assert attempts.value(layer='page', outcome='success') == 1
+    assert spider._served_layer == 'page'
+    assert metrics.layer_latency().quantile(0.5, layer='xpath') is not None
+
+
+def test_rate_controller_metrics():
+    """自适应限速发布当前速率和信号数；动作前等待进入直方图"""
+    metrics.get_metrics().reset()
+    bucket = TokenBucket(capacity=5, fill_rate=2.0)
+    aimd = AimdRateController(bucket, floor=0.5, ceiling=4.0, increase=0.5, decrease=0.5, cooldown=0, platform='xianyu')
+    aimd.on_success()
+    assert metrics.rate_limit_fill_rate().value(platform='xianyu') == 2.5
+    aimd.on_signal('captcha')
+    assert metrics.rate_limit_fill_rate().value(platform='xianyu') == 1.25
+    assert metrics.rate_limit_signals().value(platform='xianyu', signal='captcha') == 1
+
+    zero = JitterProfile(min_s=0.0, max_s=0.0)
+    controller = ActionRateController(bucket, zero, zero, zero, platform='xianyu')
+    asyncio.run(controller.before_request())
+    assert metrics.rate_limit_wait().quantile(0.5, platform='xianyu', action='request') is not None
+
+
+def test_write_textfile_and_snapshot():
+    """写出 Prometheus textfile 和带 p95 的 JSON 快照"""
+    registry = metrics.MetricsRegistry()
+    latency = registry.histogram('niche_crawl_keyword_seconds', '单词条耗时', ('platform',))
+    for value in (1, 2, 3, 40):
+        latency.observe(value, platform='xiaohongshu')
+    registry.gauge('niche_rate_limit_fill_rate', '速率', ('platform',)).set(2.5, platform='xiaohongshu')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        textfile = os.path.join(tmp, 'niche.prom')
+        json_file = os.path.join(tmp, 'niche.json')
+        registry.write(textfile, json_file)
+        assert sorted(os.listdir(tmp)) == ['niche.json', 'niche.prom']
+        with open(textfile, encoding='utf-8') as f:
+            assert 'niche_rate_limit_fill_rate{platform="xiaohongshu"} 2.5' in f.read()
+        with open(json_file, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    sample = snapshot['niche_crawl_keyword_seconds']['samples'][0]
+    assert sample['labels'] == {'platform': 'xiaohongshu'} and sample['count'] == 4 and sample['sum'] == 46
+    assert 30 < sample['p95'] <= 60
+    assert snapshot['niche_rate_limit_fill_rate']['samples'][0]['value'] == 2.5
+
+
+def test_render_while_other_threads_update():
+    """推送线程持续新增标签组合时导出不报 "dictionary changed size during iteration\""""
+    registry = metrics.MetricsRegistry()
+    counter = registry.counter('demo_push_total', '推送数', ('outcome',))
+    latency = registry.histogram('demo_push_seconds', '推送耗时', ('outcome',), buckets=(1, 2))
+
+    def pusher():
+        for i in range(500):
+            counter.inc(outcome=f'o{i}')
+            latency.observe(0.5, outcome=f'o{i}')
+
+    worker = threading.Thread(target=pusher)
+    worker.start()
+    while worker.is_alive():
+        registry.render_prometheus()
+        registry.snapshot()
+    worker.join()
+    assert counter.value() == 500
+
+
+if __name__ == '__main__':
+    test_histogram_and_prometheus_text()
+    test_request_stats_feed_registry()
+    test_spider_layer_timing()
+    test_rate_controller_metrics()
+    test_write_textfile_and_snapshot()
+    test_render_while_other_threads_update()
+    print("✅ 监控指标测试通过")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+网络环境守卫测试
+验证：并发探测先得到有效结论者为准 → TTL 内命中内存/磁盘缓存 → 代理不同重新探测 →
+invalidate 清除两级缓存 → 非中国/失败结论不缓存 → 磁盘缓存损坏时重新探测
+"""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import network_guard
+from utils.network_guard import ChinaNetworkReport, EgressCheckService, check_china_network
+
+
+_CHINA = ChinaNetworkReport(ok=True, reason="china_network_ok", ip="1.2.3.4", location="中国 北京", source="ipip")
+_ABROAD = ChinaNetworkReport(ok=False, reason="egress_not_in_china", ip="5.6.7.8", location="US", source="ipip")
+
+
+class FakeProbe:
+    """替换 network_guard._probe：记录调用并返回预设结论"""
+
+    def __init__(self, report):
+        self.report = report
+        self.calls = []
+
+    def __call__(self, name, url, timeout, proxy):
+        self.calls.append((name, proxy))
+        return self.report
+
+
+def _with_probe(fake, func):
+    original = network_guard._probe
+    network_guard._probe = fake
+    try:
+        return func()
+    finally:
+        network_guard._probe = original
+
+
+def test_first_valid_probe_wins():
+    """一个接口卡住/解析失败时，以另一个接口的有效结论为准，不等待慢接口"""
+    release = threading.Event()
+
+    def fake_http(url, timeout=5.0, proxy=""):
+        if "sohu" in url:
+            release.wait(5)
+            return ""
+        return "当前 IP：1.2.3.4  来自于：中国 北京 北京 电信"
+
+    original = network_guard._http_get_text
+    network_guard._http_get_text = fake_http
+    try:
+        start = time.perf_counter()
+        report = check_china_network(timeout=1, proxy="")
+        assert time.perf_counter() - start < 2
+    finally:
+        release.set()
+        network_guard._http_get_text = original
+
+    assert report.ok and report.source == "ipip" and report.ip == "1.2.3.4"
+
+    failing = FakeProbe(None)
+    report = _with_probe(failing, lambda: check_china_network(timeout=1, proxy=""))
+    assert not report.ok and report.reason.startswith("network_check_failed")
+
+
+def test_ttl_cache_hits_memory_and_disk():
+    """TTL 内命中内存缓存；新进程（新实例）命中磁盘缓存，都不发起网络请求"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = str(Path(tmp) / "egress.json")
+        fake = FakeProbe(_CHINA)
+
+        def scenario():
+            service = EgressCheckService(cache_file=cache_file, ttl=600)
+            assert service.get(proxy="") == _CHINA
+            probes = len(fake.calls)
+            assert probes >= 1
+            assert service.get(proxy="") == _CHINA
+            assert EgressCheckService(cache_file=cache_file, ttl=600).get(proxy="") == _CHINA
+            assert len(fake.calls) == probes
+
+            # 过期后重新探测
+            expired = EgressCheckService(cache_file=cache_file, ttl=0)
+            expired.get(proxy="")
+            assert len(fake.calls) > probes
+
+        _with_probe(fake, scenario)
+
+
+def test_proxy_change_and_invalidate_reprobe():
+    """不同代理使用不同缓存键；invalidate 同时清除内存和磁盘缓存"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = str(Path(tmp) / "egress.json")
+        fake = FakeProbe(_CHINA)
+
+        def scenario():
+            service = EgressCheckService(cache_file=cache_file, ttl=600)
+            service.get(proxy="")
+            direct_probes = len(fake.calls)
+
+            service.get(proxy="http://10.0.0.1:8080")
+            assert len(fake.calls) > direct_probes
+            assert fake.calls[-1][1] == "http://10.0.0.1:8080"
+            assert len(json.loads(Path(cache_file).read_text(encoding="utf-8"))) == 2
+
+            probes = len(fake.calls)
+            service.invalidate(proxy="")
+            assert len(json.loads(Path(cache_file).read_text(encoding="utf-8"))) == 1
+            service.get(proxy="")
+            assert len(fake.calls) > probes
+
+        _with_probe(fake, scenario)
+
+
+def test_failed_and_abroad_verdicts_not_cached():
+    """非中国出口或检测失败不缓存，下次调用重新探测"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = str(Path(tmp) / "egress.json")
+        for report in (_ABROAD, None):
+            fake = FakeProbe(report)
+
+            def scenario():
+                service = EgressCheckService(cache_file=cache_file, ttl=600)
+                assert not service.get(proxy="").ok
+                probes = len(fake.calls)
+                assert not service.get(proxy="").ok
+                assert len(fake.calls) > probes
+
+            _with_probe(fake, scenario)
+        assert not Path(cache_file).exists()
+
+
+def test_corrupt_disk_entry_reprobes():
+    """磁盘缓存条目损坏时视为未命中，重新探测并覆盖"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = Path(tmp) / "egress.json"
+        key = EgressCheckService._fingerprint("")
+        cache_file.write_text(
+            json.dumps({key: {"checked_at": time.time(), "report": {"ok": True, "unexpected": 1}}}),
+            encoding="utf-8"
+        )
+        fake = FakeProbe(_CHINA)
+
+        def scenario():
+            service = EgressCheckService(cache_file=str(cache_file), ttl=600)
+            assert service.get(proxy="") == _CHINA
+            assert fake.calls
+
+        _with_probe(fake, scenario)
+        entry = json.loads(cache_file.read_text(encoding="utf-8"))[key]
+        assert entry["report"]["ip"] == "1.2.3.4"
+
+
+if __name__ == '__main__':
+    test_first_valid_probe_wins()
+    test_ttl_cache_hits_memory_and_disk()
+    test_proxy_change_and_invalidate_reprobe()
+    test_failed_and_abroad_verdicts_not_cached()
+    test_corrupt_disk_entry_reprobes()
+    print("✅ 网络环境守卫测试通过")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+网络流量记账测试
+验证：按页面/词条/资源类型/主机记账 → 路由层拦截与缓存返回单独计数 → 首个 API 响应时间 → 字节数回退 → 任务级汇总
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import metrics
+from scrapers.network_ledger import NetworkLedger, NetworkTap, page_key, request_size
+
+
+class FakePage:
+    """只实现 on/off 和 main_frame；emit 模拟 Playwright 事件分发"""
+
+    def __init__(self):
+        self.main_frame = object()
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def off(self, event, handler):
+        self.handlers[event].remove(handler)
+
+    def emit(self, event, arg):
+        for handler in list(self.handlers.get(event, [])):
+            handler(arg)
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type, size=0, frame=None, sizes_error=False, content_length=None):
+        self.url = url
+        self.resource_type = resource_type
+        self.frame = frame
+        self._size = size
+        self._sizes_error = sizes_error
+        self._content_length = content_length
+
+    async def sizes(self):
+        if self._sizes_error:
+            raise RuntimeError('Target page, context or browser has been closed')
+        return {'requestBodySize': 0, 'requestHeadersSize': 300,
+                'responseBodySize': self._size - 100, 'responseHeadersSize': 100}
+
+    async def response(self):
+        headers = {} if self._content_length is None else {'content-length': str(self._content_length)}
+        return SimpleNamespace(headers=headers)
+
+
+def _is_api(url: str) -> bool:
+    return 'mtop' in url or 'h5api' in url
+
+
+def test_tap_accounts_pages_keywords_and_route_actions():
+    """走网络的按类型/主机计字节；拦截、缓存返回、失败单独计数；首个 API 响应按词条记录"""
+    metrics.get_metrics().reset()
+    ledger = NetworkLedger()
+    page = FakePage()
+
+    async def scenario():
+        tap = NetworkTap(page, 'xianyu', _is_api, ledger=ledger)
+        tap.configure(True, ['--disable-images'])
+        tap.attach()
+
+        home = FakeRequest('https://www.goofish.com/', 'document', 20000, frame=page.main_frame)
+        page.emit('request', home)
+        page.emit('requestfinished', home)
+
+        await tap.begin_keyword('复古相机')
+        search = FakeRequest('https://www.goofish.com/search?q=%E5%A4%8D%E5%8F%A4', 'document', 30000, frame=page.main_frame)
+        page.emit('request', search)
+        page.emit('requestfinished', search)
+
+        image = FakeRequest('https://img.alicdn.com/a.jpg', 'image')
+        tap.mark(image, 'aborted')
+        page.emit('requestfailed', image)      # abort 后浏览器报告失败，不重复计数
+
+        bundle = FakeRequest('https://g.alicdn.com/idleFish/app.js', 'script', 50000)
+        tap.mark(bundle, 'cached')
+        page.emit('requestfinished', bundle)
+
+        api = FakeRequest('https://h5api.m.goofish.com/h5/mtop.search/1.0/', 'fetch', 8000)
+        page.emit('response', SimpleNamespace(url=api.url))
+        page.emit('requestfinished', api)
+
+        page.emit('requestfailed', FakeRequest('https://log.mmstat.com/x.gif', 'ping'))
+
+        await tap.begin_keyword('古着市集')     # 这个词条没有 API 响应
+        await tap.end_keyword()
+        tap.detach()
+        assert page.handlers == {'request': [], 'response': [], 'requestfinished': [], 'requestfailed': []}
+
+    asyncio.run(scenario())
+    report = ledger.to_dict()['xianyu']
+
+    assert report['lightweight'] is True and report['browser_args'] == ['--disable-images']
+    assert report['requests'] == 3 and report['bytes'] == 58000
+    assert report['by_type']['document'] == {'requests': 2, 'bytes': 50000}
+    assert report['by_host']['h5api.m.goofish.com'] == {'requests': 1, 'bytes': 8000}
+    assert report['aborted'] == {'image': 1} and report['aborted_total'] == 1
+    assert report['cached'] == {'requests': 1, 'bytes': 50000}
+    assert report['failed'] == 1
+
+    assert set(report['pages']) == {'www.goofish.com/', 'www.goofish.com/search'}
+    assert report['pages']['www.goofish.com/search']['requests'] == 2
+
+    camera = report['keywords']['复古相机']
+    assert camera['requests'] == 2 and camera['bytes'] == 38000
+    assert camera['first_api_ms'] is not None and camera['first_api_ms'] >= 0
+    assert report['first_api_ms']['missing'] == 1
+    assert '古着市集' not in report['keywords']   # 没有任何请求的词条不单独列出
+
+    assert metrics.network_requests().value(platform='xianyu', outcome='aborted') == 1
+    assert metrics.network_bytes().value(platform='xianyu', resource_type='fetch') == 8000
+    assert metrics.network_first_api().quantile(0.5, platform='xianyu') is not None
+    assert 'xianyu 网络：3 个请求' in ledger.summary()
+
+
+def test_request_size_fallback_and_page_key():
+    """sizes() 不可用时用 content-length；页面键去掉查询串"""
+    assert asyncio.run(request_size(FakeRequest('https://a/x.js', 'script', 1234))) == 1234
+    assert asyncio.run(request_size(FakeRequest('https://a/x.js', 'script', sizes_error=True, content_length=512))) == 512
+    assert asyncio.run(request_size(FakeRequest('https://a/x.js', 'script', sizes_error=True))) == 0
+    assert page_key('https://www.xiaohongshu.com/search_result?keyword=abc') == 'www.xiaohongshu.com/search_result'
+
+
+def test_ledger_accumulates_across_spiders():
+    """闲鱼每个词条一个爬虫实例：同一平台的账合并；reset 后清空"""
+    metrics.get_metrics().reset()
+    ledger = NetworkLedger()
+
+    async def crawl(keyword, size):
+        page = FakePage()
+        tap = NetworkTap(page, 'xianyu', _is_api, ledger=ledger)
+        tap.attach()
+        await tap.begin_keyword(keyword)
+        page.emit('requestfinished', FakeRequest('https://h5api.m.goofish.com/h5/mtop.search/1.0/', 'fetch', size))
+        await tap.end_keyword()
+        tap.detach()
+
+    asyncio.run(crawl('复古相机', 1000))
+    asyncio.run(crawl('古着市集', 3000))
+    report = ledger.to_dict()['xianyu']
+    assert report['bytes'] == 4000 and set(report['keywords']) == {'复古相机', '古着市集'}
+    ledger.reset()
+    assert ledger.to_dict() == {} and ledger.summary() == ''
+
+
+if __name__ == '__main__':
+    test_tap_accounts_pages_keywords_and_route_actions()
+    test_request_size_fallback_and_page_key()
+    test_ledger_accumulates_across_spiders()
+    print("✅ 网络流量记账测试通过")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+原始响应归档测试
+验证：压缩追加 → 随机读取 → 分段切换 → 按条件查询 → 用当前解析器并行重新解析
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scrapers.payload_archive import PayloadArchive
+
+
+def _xhs_payload():
+    return {'code': 0, 'success': True, 'data': {'items': [
+        {'model_type': 'note', 'note_card': {'display_title': '复古相机入门', 'interact_info': {'liked_count': '120'}}},
+        {'model_type': 'note', 'note_card': {'display_title': 'CCD 推荐', 'interact_info': {'liked_count': '80'}}},
+        {'model_type': 'rec_query', 'rec_query': {'queries': []}},
+    ]}}
+
+
+def _fish_payload(n):
+    return {'data': {'items': [{'title': f'二手相机{i}', 'price': 100 + i} for i in range(n)]}}
+
+
+def test_append_random_access_and_rotation():
+    """每条记录可按 ID 随机读取；分段超过上限后切换到新分段"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = PayloadArchive(root=tmp, segment_max_bytes=400)
+        ids = [archive.append('fish', f'词{i}', 'search_api', _fish_payload(5), captured_at=1000 + i) for i in range(6)]
+
+        assert archive.get(ids[3]) == _fish_payload(5)
+        assert archive.get(999) is None
+        stats = archive.stats()
+        assert stats['records'] == 6 and stats['segments'] > 1
+
+        assert [r['keyword'] for r in archive.query(platform='fish', since=1002, until=1004)] == ['词2', '词3']
+        assert len(archive.query(keyword='词5')) == 1
+        archive.close()
+
+
+def test_reparse_matches_online_parsing():
+    """重新解析得到与在线解析相同的结果；并行与单进程结果一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = PayloadArchive(root=tmp, segment_max_bytes=2000)
+        for i in range(4):
+            archive.append('xhs', '复古相机', 'search_api', _xhs_payload(), captured_at=2000 + i)
+            archive.append('fish', '复古相机', 'search_api', _fish_payload(3 + i), captured_at=2000 + i)
+        archive.append('fish', '复古相机', 'unknown_kind', {'x': 1}, captured_at=2010)
+        archive.append('xhs', '复古相机', 'dom', {'count': 2, 'trend_score': 77}, captured_at=2011)
+
+        serial = archive.reparse(workers=1)
+        parallel = archive.reparse(workers=2)
+        strip = lambda rows: [(r['platform'], r['captured_at'], r['result'].get('trend_score'), r['result'].get('商品数')) for r in rows]
+        assert strip(serial) == strip(parallel)
+
+        xhs = [r for r in serial if r['platform'] == 'xhs' and r['kind'] == 'search_api']
+        assert len(xhs) == 4 and xhs[0]['result']['count'] == 2 and xhs[0]['result']['trend_score'] == 100
+        fish = [r['result']['商品数'] for r in serial if r['platform'] == 'fish']
+        assert fish == [3, 4, 5, 6]
+        assert serial[-1]['result']['trend_score'] == 77
+
+        only_fish = archive.reparse(workers=1, platform='fish', since=2002)
+        assert [r['result']['商品数'] for r in only_fish] == [5, 6]
+        archive.close()
+
+
+if __name__ == '__main__':
+    test_append_random_access_and_rotation()
+    test_reparse_matches_online_parsing()
+    print("✅ 原始响应归档测试通过")
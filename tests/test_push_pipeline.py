@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+推送链路测试
+验证：提前推送判定 → 推送发送
+"""
+
+import json
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from engine.analyzer import ProvisionalLeaderboard
+from utils.logic import NichePushLogic
+from utils.wecom_sender import AsyncWeComSender
+from utils.push_outbox import PushOutbox, OutboxDrainer
+
+
+class _StubWebhook(BaseHTTPRequestHandler):
+    """本地企业微信 Webhook 桩：记录收到的消息并返回 errcode=0"""
+
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        _StubWebhook.received.append(json.loads(body))
+        reply = json.dumps({'errcode': 0, 'errmsg': 'ok'}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_stub_server():
+    _StubWebhook.received = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubWebhook)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/cgi-bin/webhook/send?key=test"
+
+
+def _analysis(keyword: str, score: float, fish_count: int = 10) -> dict:
+    return {'词条': keyword, '蓝海指数': score, '闲鱼商品数': fish_count}
+
+
+def test_leaderboard_instant_and_locked():
+    """顶级蓝海立即放行；普通词条在名次确定后才放行"""
+    board = ProvisionalLeaderboard(total=4, top_n=2, instant_score=1000)
+
+    assert board.offer(_analysis('复古相机', 500), remaining=3) == []
+
+    released = board.offer(_analysis('古着市集', 1500), remaining=2)
+    assert [(a['词条'], r) for a, r in released] == [('古着市集', 'instant')]
+
+    # 还剩1个词条，复古相机仍可能被挤出 Top 2
+    assert board.offer(_analysis('胶片', 100), remaining=1) == []
+
+    released = board.offer(_analysis('手账', 130), remaining=0)
+    assert [(a['词条'], r) for a, r in released] == [('复古相机', 'top_n_locked')]
+    assert '手账' not in board.released
+
+
+def test_leaderboard_skips_unqualified_and_red_ocean():
+    """不满足 is_qualified 的词条永不提前推送"""
+    board = ProvisionalLeaderboard(total=2, top_n=5, instant_score=1000)
+
+    assert board.offer(_analysis('红海词', 5000, fish_count=9999), remaining=1) == []
+    assert board.offer(_analysis('低分词', 10), remaining=0) == []
+    assert board.released == {}
+
+
+def test_leaderboard_ties_are_conservative():
+    """同分词条视为排在前面，避免误判稳居 Top N"""
+    board = ProvisionalLeaderboard(total=2, top_n=1, instant_score=1000)
+    board.offer(_analysis('甲', 300), remaining=1)
+    assert board.offer(_analysis('乙', 300), remaining=0) == []
+
+
+def _detailed(keyword: str, score: float) -> dict:
+    return {
+        '词条': keyword, '蓝海指数': score, '闲鱼商品数': 30,
+        '平均想要数': 12.5, '小红书热度': 15000,
+    }
+
+
+def test_digest_push_against_stub_webhook():
+    """20个词条合并为1-2条消息，提交本身不阻塞"""
+    server, url = _start_stub_server()
+    pusher = NichePushLogic(webhook_url=url)
+    pusher.session.trust_env = False
+    sender = AsyncWeComSender(pusher)
+    try:
+        results = [_detailed(f"词条{i}", 2000 - i) for i in range(20)]
+
+        start = time.perf_counter()
+        future = sender.submit_digest(results)
+        submit_cost = time.perf_counter() - start
+
+        assert future.result(timeout=10) == 20
+        assert submit_cost < 0.5
+        assert 1 <= len(_StubWebhook.received) <= 2
+        for payload in _StubWebhook.received:
+            assert payload['msgtype'] == 'markdown'
+            assert len(payload['markdown']['content'].encode('utf-8')) <= 4096
+    finally:
+        sender.close()
+        server.shutdown()
+
+
+def test_digest_splits_at_wecom_limit():
+    """超出单条上限时自动分片，且不丢词条"""
+    pusher = NichePushLogic(webhook_url='')
+    results = [_detailed(f"超长词条名称{i}" * 3, 500) for i in range(60)]
+    batches = pusher.format_digest(results, max_bytes=2048)
+
+    assert len(batches) > 1
+    assert sum(len(items) for _, items in batches) == 60
+    for message, _ in batches:
+        assert len(message.encode('utf-8')) <= 2048
+
+
+def test_outbox_suppresses_repeats_within_push_interval():
+    """同一词条在 PUSH_INTERVAL 内不会重复入队"""
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = PushOutbox(db_path=str(Path(tmp) / 'outbox.db'), push_interval=3600)
+        try:
+            assert outbox.enqueue([_detailed('复古相机', 800)]) == ['复古相机']
+            # 已在队列中
+            assert outbox.enqueue([_detailed('复古相机', 800)]) == []
+
+            entries = outbox.claim_due()
+            outbox.mark_sent(entries)
+            # 已推送且在间隔内
+            assert outbox.enqueue([_detailed('复古相机', 900)]) == []
+
+            expired = PushOutbox(db_path=str(Path(tmp) / 'outbox.db'), push_interval=0)
+            assert expired.enqueue([_detailed('复古相机', 900)]) == ['复古相机']
+            expired.close()
+        finally:
+            outbox.close()
+
+
+def test_outbox_drainer_delivers_and_retries():
+    """投递器把发件箱中的消息合并发送；Webhook 不可用时保留待重试"""
+    server, url = _start_stub_server()
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = PushOutbox(db_path=str(Path(tmp) / 'outbox.db'))
+        pusher = NichePushLogic(webhook_url=url)
+        pusher.session.trust_env = False
+        sender = AsyncWeComSender(pusher)
+        drainer = OutboxDrainer(outbox, sender, poll_interval=0.1)
+        try:
+            start = time.perf_counter()
+            enqueued = outbox.enqueue([_detailed(f"词条{i}", 1000 + i) for i in range(5)])
+            drainer.notify()
+            assert time.perf_counter() - start < 0.5
+
+            assert drainer.wait_idle(enqueued, timeout=10)
+            assert len(_StubWebhook.received) == 1
+            assert outbox.stats().get('sent') == 5
+
+            server.shutdown()
+            server.server_close()
+            enqueued = outbox.enqueue([_detailed('离线词条', 900)])
+            drainer.notify()
+            # 投递失败进入退避：不会等满超时
+            start = time.perf_counter()
+            assert not drainer.wait_idle(enqueued, timeout=10)
+            assert time.perf_counter() - start < 5
+            assert outbox.stats().get('pending') == 1
+        finally:
+            drainer.stop()
+            sender.close(timeout=1)
+            outbox.close()
+
+
+def test_wait_idle_ignores_leftovers_and_survives_db_errors():
+    """只等待本次入队的词条：遗留的退避消息不拖住任务；数据库出错时投递循环不退出"""
+    server, url = _start_stub_server()
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = PushOutbox(db_path=str(Path(tmp) / 'outbox.db'))
+        # 上一次运行遗留的消息：投递失败，正在退避
+        outbox.enqueue([_detailed('遗留词条', 900)])
+        outbox.mark_failed(outbox.claim_due(), 'webhook_down')
+        assert outbox.in_flight(['遗留词条']) == (1, 0)
+
+        pusher = NichePushLogic(webhook_url=url)
+        pusher.session.trust_env = False
+        sender = AsyncWeComSender(pusher)
+        drainer = OutboxDrainer(outbox, sender, poll_interval=0.1)
+        claim_due = outbox.claim_due
+        calls = []
+
+        def flaky_claim_due(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError('database is locked')
+            return claim_due(*args, **kwargs)
+
+        outbox.claim_due = flaky_claim_due
+        try:
+            drainer.start()
+            enqueued = outbox.enqueue([_detailed('本次词条', 1000)])
+            drainer.notify()
+            assert drainer.wait_idle(enqueued, timeout=10)
+            assert drainer.wait_idle([], timeout=10)
+            assert len(calls) > 1
+            assert outbox.pending_count() == 1      # 遗留消息仍在发件箱等待重试
+        finally:
+            drainer.stop()
+            sender.close(timeout=1)
+            outbox.close()
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    test_leaderboard_instant_and_locked()
+    test_leaderboard_skips_unqualified_and_red_ocean()
+    test_leaderboard_ties_are_conservative()
+    test_digest_push_against_stub_webhook()
+    test_digest_splits_at_wecom_limit()
+    test_outbox_suppresses_repeats_within_push_interval()
+    test_outbox_drainer_delivers_and_retries()
+    test_wait_idle_ignores_leftovers_and_survives_db_errors()
+    print("✅ 推送链路测试通过")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+限速测试
+验证：跨实例 / 跨进程共享令牌桶 → 重启后沿用余量 → AIMD 自适应速率
+"""
+
+import asyncio
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scrapers import advanced_config
+from scrapers.advanced_config import (
+    ActionRateController, AimdRateController, JitterProfile, SharedTokenBucket, TokenBucket
+)
+
+
+def _drain(db_path: str, n: int) -> None:
+    async def run():
+        bucket = SharedTokenBucket("xianyu", capacity=1.0, fill_rate=20.0, db_path=db_path)
+        for _ in range(n):
+            await bucket.acquire()
+    asyncio.run(run())
+
+
+def test_instances_share_one_budget():
+    """新建的爬虫实例不会拿到一个新的满桶"""
+    async def scenario(db_path):
+        first = SharedTokenBucket("xiaohongshu", capacity=3.0, fill_rate=0.5, db_path=db_path)
+        for _ in range(3):
+            await first.acquire()
+
+        second = SharedTokenBucket("xiaohongshu", capacity=3.0, fill_rate=0.5, db_path=db_path)
+        assert second.status()["tokens"] < 1
+
+        # 其他平台互不影响
+        other = SharedTokenBucket("xianyu", capacity=3.0, fill_rate=0.5, db_path=db_path)
+        assert other.status()["tokens"] == 3.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(str(Path(tmp) / 'rate.db')))
+
+
+def test_processes_share_one_budget():
+    """多个进程合计的请求速率受同一个令牌桶约束"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'rate.db')
+        start = time.perf_counter()
+        workers = [multiprocessing.Process(target=_drain, args=(db_path, 3)) for _ in range(3)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join(timeout=30)
+        elapsed = time.perf_counter() - start
+
+        assert all(w.exitcode == 0 for w in workers)
+        # 9个令牌，初始1个，其余按每秒20个补充：至少约0.4秒
+        assert elapsed >= 0.35
+
+
+def test_aimd_increase_decrease_and_bounds():
+    """成功加性提速，拦截乘性降速，冷却期内只降一次，且不越过上下限"""
+    bucket = TokenBucket(capacity=5.0, fill_rate=2.0)
+    aimd = AimdRateController(bucket, floor=0.5, ceiling=2.2, increase=0.1, decrease=0.5, cooldown=60)
+
+    for _ in range(5):
+        aimd.on_success()
+    assert abs(bucket.fill_rate - 2.2) < 1e-9
+
+    aimd.on_signal('captcha')
+    assert abs(bucket.fill_rate - 1.1) < 1e-9
+    aimd.on_signal('blocked')  # 同一波拦截
+    assert abs(bucket.fill_rate - 1.1) < 1e-9
+
+    bucket.last_decrease = 0.0
+    for _ in range(3):
+        aimd.on_signal('timeout')
+        bucket.last_decrease = 0.0
+    assert bucket.fill_rate == 0.5
+    assert aimd.signals == {'captcha': 1, 'blocked': 1, 'timeout': 3}
+
+
+def test_aimd_learned_rate_persists():
+    """学到的速率写入共享数据库，下次运行不会被配置值覆盖"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'rate.db')
+        bucket = SharedTokenBucket("xiaohongshu", capacity=10.0, fill_rate=2.0, db_path=db_path)
+        aimd = AimdRateController(bucket, floor=0.5, ceiling=5.0, decrease=0.5)
+        aimd.on_signal('rate_limited')
+        assert bucket.fill_rate == 1.0
+
+        reopened = SharedTokenBucket("xiaohongshu", capacity=10.0, fill_rate=2.0, db_path=db_path)
+        assert reopened.status()["fill_rate"] == 1.0
+
+        # 下限提高后，已学到的速率被拉回范围内
+        AimdRateController(reopened, floor=1.5, ceiling=5.0)
+        assert reopened.status()["fill_rate"] == 1.5
+
+
+def test_aimd_cooldown_shared_across_instances():
+    """每个词条新建的限速器、其他进程共用同一个降速冷却：同一波拦截只降一次"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'rate.db')
+        first = SharedTokenBucket("xianyu", capacity=10.0, fill_rate=4.0, db_path=db_path)
+        AimdRateController(first, floor=0.1, ceiling=5.0, decrease=0.5, cooldown=60).on_signal('captcha')
+        assert first.fill_rate == 2.0
+
+        # 下一个词条的新实例
+        second = SharedTokenBucket("xianyu", capacity=10.0, fill_rate=4.0, db_path=db_path)
+        aimd = AimdRateController(second, floor=0.1, ceiling=5.0, decrease=0.5, cooldown=60)
+        assert aimd.on_signal('blocked') == 2.0
+        assert second.status()["fill_rate"] == 2.0
+
+        # 冷却结束后照常降速
+        second._conn.execute("UPDATE buckets SET last_decrease = ? WHERE platform = 'xianyu'", (time.time() - 61,))
+        assert aimd.on_signal('blocked') == 1.0
+
+
+def test_spider_controllers_use_configured_db_path():
+    """爬虫的限速器按 RATE_LIMIT_DB 建库（构造时读取），不固定写在当前目录"""
+    saved = advanced_config.RATE_LIMIT_DB
+    with tempfile.TemporaryDirectory() as tmp:
+        advanced_config.RATE_LIMIT_DB = str(Path(tmp) / 'shared.db')
+        try:
+            controller = ActionRateController.for_fish()
+            assert controller.bucket.db_path == advanced_config.RATE_LIMIT_DB
+            assert (Path(tmp) / 'shared.db').exists()
+            explicit = str(Path(tmp) / 'explicit.db')
+            assert ActionRateController.for_xhs(db_path=explicit).bucket.db_path == explicit
+            controller.bucket._conn.close()
+        finally:
+            advanced_config.RATE_LIMIT_DB = saved
+
+
+def test_feedback_does_not_block_event_loop():
+    """在事件循环中反馈成功/拦截时，共享令牌桶的写事务在线程中执行，不阻塞循环"""
+    class SlowBucket(TokenBucket):
+        def adjust_fill_rate(self, transform):
+            time.sleep(0.3)      # 模拟 SQLite 写锁等待
+            return super().adjust_fill_rate(transform)
+
+    async def scenario():
+        bucket = SlowBucket(capacity=5.0, fill_rate=2.0)
+        aimd = AimdRateController(bucket, floor=0.5, ceiling=4.0, increase=0.5, decrease=0.5, cooldown=60)
+        controller = ActionRateController(
+            bucket=bucket, aimd=aimd,
+            request_jitter=JitterProfile(min_s=0, max_s=0),
+            click_jitter=JitterProfile(min_s=0, max_s=0),
+            scroll_jitter=JitterProfile(min_s=0, max_s=0),
+        )
+        start = time.perf_counter()
+        controller.on_success()
+        controller.on_block('captcha')
+        assert time.perf_counter() - start < 0.1
+        await controller.flush_feedback()
+        # 两次反馈都已生效（线程执行顺序不定：先提速再降速 1.25，或先降速再提速 1.5）
+        assert round(bucket.fill_rate, 2) in (1.25, 1.5)
+        assert aimd.signals == {'captcha': 1}
+
+    asyncio.run(scenario())
+
+
+if __name__ == '__main__':
+    test_instances_share_one_budget()
+    test_processes_share_one_budget()
+    test_aimd_increase_decrease_and_bounds()
+    test_aimd_learned_rate_persists()
+    test_aimd_cooldown_shared_across_instances()
+    test_spider_controllers_use_configured_db_path()
+    test_feedback_does_not_block_event_loop()
+    print("✅ 限速测试通过")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+紧凑记录类型测试
+验证：旧键名规范化 → dict 兼容读取与往返转换 → 清洗结果与旧 dict 输入一致 → JSON 边界序列化
+"""
+
+import json
+import pickle
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from engine.analyzer import BlueOceanAnalyzer
+from scrapers.extractors import summarize_fish_search_payload, summarize_xhs_search_payload
+from utils.records import AnalysisRecord, FishListing, XhsNote, _Record, to_json_default
+
+
+def test_normalize_legacy_keys():
+    """wants/want/想要人数、卖家头像/信誉在规范化时一次算好；记录没有 __dict__"""
+    listing = FishListing.from_raw({
+        'name': '复古相机', 'soldPrice': 99, '想要人数': '12', 'seller_avatar': '',
+        'seller': {'nick': 'alice', 'rating': 4.8},
+    }, keyword='相机')
+    assert (listing.title, listing.price, listing.wants, listing.keyword) == ('复古相机', '99', 12.0, '相机')
+    assert listing.seller_id == 'alice' and listing.has_avatar is False and listing.low_reputation is False
+    assert listing.dedup_key() == 'alice:复古相机'
+    assert not hasattr(listing, '__dict__')
+    assert FishListing.from_raw(listing) is listing
+
+    note = XhsNote.from_raw({'note_card': {'display_title': '露营灯', 'interact_info': {'liked_count': '321'}}})
+    assert (note.title, note.likes) == ('露营灯', 321)
+
+
+def test_dict_compatible_reads():
+    """旧代码的 get / [] 读取照常工作，to_dict 往返不丢字段"""
+    listing = FishListing(title='手工皮具', price='¥59', wants=30, keyword='皮具', item_id='i1')
+    assert listing['want'] == 30 and listing.get('想要人数') == 30 and listing.get('condition', '-') == '-'
+    assert listing.to_dict() == {
+        'title': '手工皮具', 'price': '¥59', 'wants': 30, 'keyword': '皮具',
+        'source': 'xianyu', 'category': '闲置商品', 'item_id': 'i1',
+    }
+    assert FishListing.from_raw(listing.to_dict()) == listing
+
+    info = {
+        '词条': '露营灯', '小红书热度': 5000, '闲鱼商品数': 20, '闲鱼想要数': [30], '平均想要数': 30.0,
+        '蓝海指数': 7142.86, '时间衰减系数': 1.0, '评级': '⭐⭐⭐⭐⭐ 极佳', '竞争度评估': '🟢 低',
+        '热度评估': '🔥 高', '数据纯净度': {'清洗后样本数': 1},
+    }
+    record = AnalysisRecord.from_dict(info)
+    assert record.index == 7142.86 and record['数据纯净度'] == {'清洗后样本数': 1}
+    assert list(record.to_dict().items()) == list(info.items())
+    assert BlueOceanAnalyzer.rank_results([record], 1)[0] is record
+    assert pickle.loads(pickle.dumps(record)) == record
+
+    # 按值比较的可变记录不可哈希；基类是抽象类
+    try:
+        {listing}
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("记录不应可哈希")
+    try:
+        _Record()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("_Record 不应可实例化")
+
+
+def test_sanitize_same_for_dicts_and_records():
+    """清洗汇总对旧 dict 明细和 FishListing 明细给出相同结果"""
+    raw_items = [
+        {'id': 'a', 'title': '复古相机', 'wants': 40, 'seller': {'nick': 's1', 'avatar': 'x.png'}},
+        {'id': 'a', 'title': '复古相机', 'want': 60, 'seller': {'nick': 's1', 'avatar': 'x.png'}},
+        {'title': '胶片相机', '想要人数': 25, 'seller_avatar': '', 'seller': {'nick': 's2'}},
+        {'title': 'CCD 相机', 'wants': 10, 'seller': {'nick': 's3', 'rating': 2}},
+        {'title': 'CCD 相机', 'wants': 15, 'seller': {'nick': 's4'}},
+    ]
+    as_dicts = BlueOceanAnalyzer._sanitize_fish_data('相机', {'相机': {'items': raw_items}})
+    as_records = BlueOceanAnalyzer._sanitize_fish_data(
+        '相机', {'相机': {'items': [FishListing.from_raw(it) for it in raw_items]}}
+    )
+    assert as_dicts == as_records
+    assert as_dicts['商品数'] == 2 and as_dicts['想要数列表'] == [60.0, 15.0]
+    purity = as_dicts['_purity']['数据纯净度']
+    assert (purity['过滤无头像卖家数'], purity['过滤低信誉卖家数'], purity['重复铺货去重数']) == (1, 1, 1)
+
+
+def test_json_boundary():
+    """解析器产出记录对象；JSON 边界按原来的 dict 格式序列化"""
+    xhs = summarize_xhs_search_payload({'data': {'items': [
+        {'title': '露营灯', 'interact': {'liked': 100}},
+        {'note_card': {'display_title': '营地灯', 'interact_info': {'liked_count': 300}}},
+    ]}})
+    assert xhs['trend_score'] == 200 and all(isinstance(n, XhsNote) for n in xhs['notes'])
+
+    fish = summarize_fish_search_payload('露营灯', {'data': {'items': [{'title': '露营灯', 'price': 35}]}})
+    assert isinstance(fish['items'][0], FishListing) and fish['items'][0]['price'] == '35'
+    # 与原 dict 构造一致：API 商品标题截到 50 字
+    long_title = summarize_fish_search_payload('露营灯', {'data': {'items': [{'title': '灯' * 80}]}})
+    assert long_title['items'][0].title == '灯' * 50
+
+    decoded = json.loads(json.dumps({'xhs': xhs, 'fish': fish}, ensure_ascii=False, default=to_json_default))
+    assert decoded['xhs']['notes'][1] == {'title': '营地灯', 'likes': 300}
+    assert decoded['fish']['items'][0]['title'] == '露营灯' and decoded['fish']['items'][0]['source'] == 'xianyu'
+
+
+if __name__ == '__main__':
+    test_normalize_legacy_keys()
+    test_dict_compatible_reads()
+    test_sanitize_same_for_dicts_and_records()
+    test_json_boundary()
+    print("✅ 紧凑记录类型测试通过")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+重试策略测试
+验证：失败分类 → 按原因重试/不重试 → 总时限 → 平台熔断
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scrapers.retry_policy import (
+    CircuitBreaker, CircuitOpenError, CrawlFailure, FailureReason,
+    RetryManager, RetryPolicy, classify_failure
+)
+from scrapers.spider import SessionInvalidError
+
+
+FAST = {reason: RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.02) for reason in FailureReason}
+
+
+def test_classify_failure():
+    """异常类型和错误信息归入对应的失败原因"""
+    assert classify_failure(SessionInvalidError("Session无效")) == FailureReason.LOGIN_REQUIRED
+    assert classify_failure(asyncio.TimeoutError()) == FailureReason.TIMEOUT
+    assert classify_failure(ValueError("bad json")) == FailureReason.PARSE_ERROR
+    assert classify_failure(RuntimeError("HTTP 429 Too Many Requests")) == FailureReason.RATE_LIMITED
+    assert classify_failure(RuntimeError("net::ERR_CONNECTION_RESET")) == FailureReason.NETWORK_ERROR
+    assert classify_failure(RuntimeError("???")) == FailureReason.UNKNOWN
+
+
+def test_policies_and_non_blocking_backoff():
+    """需要登录不重试；网络错误重试成功；退避期间事件循环不被阻塞"""
+    async def scenario():
+        manager = RetryManager(policies={**FAST, FailureReason.LOGIN_REQUIRED: RetryPolicy(max_attempts=1)})
+
+        calls = []
+
+        async def needs_login():
+            calls.append(1)
+            raise SessionInvalidError("Session无效")
+
+        try:
+            await manager.execute_with_retry(needs_login)
+            assert False, "应当直接失败"
+        except SessionInvalidError:
+            pass
+        assert len(calls) == 1
+
+        flaky_calls = []
+
+        async def flaky():
+            flaky_calls.append(1)
+            if len(flaky_calls) < 3:
+                raise ConnectionError("reset")
+            return 'ok'
+
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0.005)
+
+        result, _ = await asyncio.gather(manager.execute_with_retry(flaky), ticker())
+        assert result == 'ok' and len(flaky_calls) == 3
+        assert len(ticks) == 5
+
+    asyncio.run(scenario())
+
+
+def test_deadline_stops_long_backoff():
+    """退避会超出总时限时立即放弃"""
+    async def scenario():
+        manager = RetryManager(
+            policies={FailureReason.RATE_LIMITED: RetryPolicy(max_attempts=3, base_delay=30.0)},
+            deadline=1.0
+        )
+
+        async def limited():
+            raise CrawlFailure("请勿频繁操作", FailureReason.RATE_LIMITED)
+
+        start = time.monotonic()
+        try:
+            await manager.execute_with_retry(limited)
+            assert False, "应当放弃"
+        except CrawlFailure:
+            pass
+        assert time.monotonic() - start < 0.5
+
+    asyncio.run(scenario())
+
+
+def test_fetch_overrunning_deadline_raises_crawl_failure():
+    """单次抓取超出总时限：包装为 CrawlFailure(TIMEOUT)，调用方按原因降级"""
+    async def scenario():
+        manager = RetryManager(policies=FAST, deadline=0.05)
+
+        async def slow():
+            await asyncio.sleep(1)
+            return 'late'
+
+        start = time.monotonic()
+        try:
+            await manager.execute_with_retry(slow)
+            assert False, "应当超时放弃"
+        except CrawlFailure as e:
+            assert e.reason == FailureReason.TIMEOUT
+            assert isinstance(e.__cause__, asyncio.TimeoutError)
+        assert time.monotonic() - start < 0.5
+        assert manager.last_reason == FailureReason.TIMEOUT
+
+    asyncio.run(scenario())
+
+
+def test_circuit_breaker_opens_and_probes():
+    """连续拦截后熔断，冷却后放行一次试探，成功即恢复"""
+    async def scenario():
+        breaker = CircuitBreaker("xianyu", threshold=2, cooldown=0.05)
+        manager = RetryManager(policies=FAST, breaker=breaker)
+
+        async def blocked():
+            raise CrawlFailure("拦截", FailureReason.BLOCKED)
+
+        try:
+            await manager.execute_with_retry(blocked)
+        except CircuitOpenError:
+            pass
+        assert breaker.state == 'open'
+
+        try:
+            await manager.execute_with_retry(blocked)
+            assert False, "熔断中应当快速失败"
+        except CircuitOpenError:
+            pass
+
+        await asyncio.sleep(0.06)
+        assert breaker.state == 'half_open'
+
+        async def ok():
+            return 'ok'
+
+        assert await manager.execute_with_retry(ok) == 'ok'
+        assert breaker.state == 'closed'
+
+    asyncio.run(scenario())
+
+
+if __name__ == '__main__':
+    test_classify_failure()
+    test_policies_and_non_blocking_backoff()
+    test_deadline_stops_long_backoff()
+    test_fetch_overrunning_deadline_raises_crawl_failure()
+    test_circuit_breaker_opens_and_probes()
+    print("✅ 重试策略测试通过")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+重访计划测试
+验证：变化率估计 → 到期时间 → 到期词条排序与持久化
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from engine.revisit_planner import RevisitPlanner
+
+
+HOUR = 3600
+
+
+def _planner(tmp: str) -> RevisitPlanner:
+    return RevisitPlanner(
+        state_file=str(Path(tmp) / 'revisit.json'),
+        min_interval=2 * HOUR,
+        max_interval=7 * 24 * HOUR,
+        target_change=0.15,
+        alpha=0.5
+    )
+
+
+def test_volatile_keywords_revisit_sooner_than_stable():
+    """波动大的词条间隔短，平稳的词条间隔拉长到上限"""
+    with tempfile.TemporaryDirectory() as tmp:
+        planner = _planner(tmp)
+        t0 = 1_000_000.0
+
+        planner.observe('xhs', '复古相机', [10000], at=t0)
+        planner.observe('xhs', '手账本', [10000], at=t0)
+        # 首次观测：变化率未知，按最短间隔复查
+        assert planner.state['xhs|复古相机']['next_due'] == t0 + 2 * HOUR
+
+        volatile = planner.observe('xhs', '复古相机', [16000], at=t0 + 2 * HOUR)
+        stable = planner.observe('xhs', '手账本', [10000], at=t0 + 2 * HOUR)
+
+        assert volatile['next_due'] - volatile['last_seen'] == 2 * HOUR
+        assert stable['next_due'] - stable['last_seen'] == 7 * 24 * HOUR
+
+
+def test_due_orders_unknown_first_then_most_overdue():
+    """从未观测的词条优先，其次按超期比例；预算限制返回数量"""
+    with tempfile.TemporaryDirectory() as tmp:
+        planner = _planner(tmp)
+        t0 = 1_000_000.0
+        planner.observe('fish', '甲', [100, 5], at=t0)
+        planner.observe('fish', '乙', [100, 5], at=t0 - HOUR)
+        planner.observe('fish', '丙', [100, 5], at=t0 + HOUR)
+
+        now = t0 + 2.5 * HOUR
+        assert planner.due('fish', ['甲', '乙', '丙', '新词'], now=now) == ['新词', '乙', '甲']
+        assert planner.due('fish', ['甲', '乙', '丙', '新词'], limit=2, now=now) == ['新词', '乙']
+        assert planner.is_due('xhs', '甲', now=now)
+
+
+def test_state_persists_across_instances():
+    """状态写入磁盘后新实例可继续使用"""
+    with tempfile.TemporaryDirectory() as tmp:
+        planner = _planner(tmp)
+        planner.observe('xhs', '古着市集', [8000], at=1_000_000.0)
+        planner.save()
+
+        reloaded = _planner(tmp)
+        assert not reloaded.is_due('xhs', '古着市集', now=1_000_000.0 + HOUR)
+        assert reloaded.summary('xhs')['tracked'] == 1
+
+
+if __name__ == '__main__':
+    test_volatile_keywords_revisit_sooner_than_stable()
+    test_due_orders_unknown_first_then_most_overdue()
+    test_state_persists_across_instances()
+    print("✅ 重访计划测试通过")
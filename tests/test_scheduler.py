@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+调度器测试
+验证：cron 触发时间 → 错过补跑 → 不重叠 / 共享资源串行 → 挖掘任务限时在下个时段前结束
+"""
+
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import SCHEDULE_MISSION_MAX_SECONDS, SCHEDULE_SLOT_MARGIN
+from scheduler import AsyncScheduler, CronTrigger, NicheScheduler, ScheduledJob
+
+
+def test_cron_next_after():
+    """多表达式取最近触发；步长与周字段按 cron 语义解析"""
+    trigger = CronTrigger("30 9 * * *", "0 14 * * *", "30 21 * * *")
+    assert trigger.next_after(datetime(2026, 1, 5, 9, 30)) == datetime(2026, 1, 5, 14, 0)
+    assert trigger.next_after(datetime(2026, 1, 5, 22, 0)) == datetime(2026, 1, 6, 9, 30)
+
+    every_two_hours = CronTrigger("0 8-22/2 * * *")
+    assert every_two_hours.next_after(datetime(2026, 1, 5, 9, 1)) == datetime(2026, 1, 5, 10, 0)
+    assert every_two_hours.next_after(datetime(2026, 1, 5, 22, 0)) == datetime(2026, 1, 6, 8, 0)
+
+    # 2026-01-05 是周一；周日可写作0或7
+    sunday = CronTrigger("0 3 * * 7")
+    assert sunday.next_after(datetime(2026, 1, 5)) == datetime(2026, 1, 11, 3, 0)
+
+
+def test_missed_jobs_catch_up_once_within_window():
+    """停机期间错过的任务在窗口内补跑，超出窗口或从未运行的任务不补跑"""
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = AsyncScheduler(state_file=str(Path(tmp) / 'state.json'), catchup_window=6 * 3600)
+        noop = lambda: None
+        scheduler.add_job(ScheduledJob('xhs', CronTrigger("0 8-22/2 * * *"), noop))
+        scheduler.add_job(ScheduledJob('fish', CronTrigger("15 12 * * *"), noop))
+        scheduler.add_job(ScheduledJob('fresh', CronTrigger("0 * * * *"), noop))
+
+        scheduler.state = {
+            'xhs': datetime(2026, 1, 5, 8, 0).isoformat(),    # 最近一次应触发 14:00，在窗口内
+            'fish': datetime(2026, 1, 4, 12, 20).isoformat(), # 最近一次应触发 01-05 12:15，超出窗口
+        }
+        missed = scheduler.missed_jobs(now=datetime(2026, 1, 5, 19, 0))
+        assert [job.name for job in missed] == ['xhs']
+
+
+def test_overlap_skipped_and_shared_resource_serialized():
+    """同一任务不重叠；共用浏览器资源的任务串行执行"""
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.1)
+        with lock:
+            active.pop()
+        return {'status': 'success'}
+
+    async def scenario():
+        with tempfile.TemporaryDirectory() as tmp:
+            scheduler = AsyncScheduler(state_file=str(Path(tmp) / 'state.json'))
+            a = ScheduledJob('a', CronTrigger("0 * * * *"), slow)
+            b = ScheduledJob('b', CronTrigger("0 * * * *"), slow)
+
+            ran = await asyncio.gather(
+                scheduler.run_job(a), scheduler.run_job(a), scheduler.run_job(b)
+            )
+            assert ran == [True, False, True]
+            assert max(peak) == 1
+            assert set(scheduler.state) == {'a', 'b'}
+            assert Path(tmp, 'state.json').exists()
+
+            # 失败的运行不记录，重启后仍会补跑
+            failed = ScheduledJob('c', CronTrigger("0 * * * *"), lambda: {'status': 'partial_failed'})
+            assert await scheduler.run_job(failed)
+            assert 'c' not in scheduler.state
+
+    asyncio.run(scenario())
+
+
+def test_mission_time_budget_fits_slot():
+    """挖掘任务总时限不超过上限，且在下一次挖掘触发前留出间隔"""
+    with tempfile.TemporaryDirectory() as tmp:
+        niche = NicheScheduler.__new__(NicheScheduler)  # 不创建引擎
+        niche.scheduler = AsyncScheduler(state_file=str(Path(tmp) / 'state.json'))
+        niche.scheduler.add_job(ScheduledJob(
+            'mission', CronTrigger("30 9 * * *", "0 14 * * *", "30 21 * * *"), lambda: None
+        ))
+
+        # 13:30 → 下次 14:00：只剩 30 分钟减去预留间隔
+        assert niche.mission_time_budget(datetime(2026, 1, 5, 13, 30)) == 30 * 60 - SCHEDULE_SLOT_MARGIN
+        # 9:30 → 下次 14:00：受上限约束
+        assert niche.mission_time_budget(datetime(2026, 1, 5, 9, 30)) == SCHEDULE_MISSION_MAX_SECONDS
+
+
+if __name__ == '__main__':
+    test_cron_next_after()
+    test_missed_jobs_catch_up_once_within_window()
+    test_overlap_skipped_and_shared_resource_serialized()
+    test_mission_time_budget_fits_slot()
+    print("✅ 调度器测试通过")
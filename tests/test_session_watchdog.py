@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Session看门狗测试
+验证：增量Cookie对比 → 过期前保活 → 缓存健康状态
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scrapers.session_monitor import SessionHealthMonitor, SessionWatchdog
+
+
+class _FakeRequest:
+    def __init__(self, context):
+        self.context = context
+        self.urls = []
+
+    async def get(self, url, timeout=None):
+        self.urls.append(url)
+        # 服务端下发续期后的Cookie
+        for cookie in self.context.jar:
+            if cookie['name'] == 'web_session':
+                cookie['expires'] = time.time() + 7 * 24 * 3600
+                cookie['value'] = 'renewed'
+
+
+class _FakeContext:
+    """只实现看门狗用到的 BrowserContext 接口"""
+
+    def __init__(self, jar):
+        self.jar = jar
+        self.pages = []
+        self.cookie_reads = 0
+        self.request = _FakeRequest(self)
+
+    async def cookies(self, urls=None):
+        self.cookie_reads += 1
+        return [dict(c) for c in self.jar]
+
+
+def _jar(web_session_ttl: float):
+    now = time.time()
+    return [
+        {'name': 'a1', 'value': 'x', 'domain': '.xiaohongshu.com', 'expires': now + 30 * 24 * 3600},
+        {'name': 'webId', 'value': 'y', 'domain': '.xiaohongshu.com', 'expires': now + 30 * 24 * 3600},
+        {'name': 'web_session', 'value': 'z', 'domain': '.xiaohongshu.com', 'expires': now + web_session_ttl},
+        {'name': 'xsecappid', 'value': 'xhs-pc-web', 'domain': '.xiaohongshu.com', 'expires': -1},
+    ]
+
+
+def test_diff_only_rebuilds_report_on_change():
+    """Cookie无变化时复用缓存报告，不重复写入健康历史"""
+    async def scenario():
+        context = _FakeContext(_jar(30 * 24 * 3600))
+        monitor = SessionHealthMonitor(context, "xiaohongshu")
+        watchdog = SessionWatchdog(monitor)
+
+        first = await watchdog.poll_once()
+        assert watchdog.last_changes['added']
+        assert {'a1', 'webId', 'web_session'} <= set(first['valid_cookie_names'])
+
+        second = await watchdog.poll_once()
+        assert second is first
+        assert len(monitor.health_history) == 1
+
+        context.jar[0]['value'] = 'rotated'
+        await watchdog.poll_once()
+        assert watchdog.last_changes == {'added': [], 'removed': [], 'changed': ['a1']}
+        assert len(monitor.health_history) == 2
+        assert watchdog.is_fresh()
+
+    asyncio.run(scenario())
+
+
+def test_keepalive_fires_before_critical_expiry():
+    """关键Cookie即将过期时发起保活，并读取续期后的Cookie"""
+    async def scenario():
+        context = _FakeContext(_jar(60))
+        monitor = SessionHealthMonitor(context, "xiaohongshu")
+        watchdog = SessionWatchdog(monitor, interval=3600, keepalive_lead=300)
+
+        watchdog.start()
+        for _ in range(100):
+            if watchdog.keepalive_count:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        await watchdog.stop()
+
+        assert context.request.urls == [SessionWatchdog.KEEPALIVE_URLS['xiaohongshu']]
+        assert 'web_session' in watchdog.last_changes['changed']
+        assert watchdog._next_critical_expiry() > time.time() + 300
+
+    asyncio.run(scenario())
+
+
+def test_health_history_is_bounded():
+    """健康历史为固定容量环形缓冲"""
+    monitor = SessionHealthMonitor(_FakeContext([]), "xiaohongshu")
+    for _ in range(250):
+        monitor.build_report(_jar(3600))
+    assert len(monitor.health_history) == 100
+
+
+if __name__ == '__main__':
+    test_diff_only_rebuilds_report_on_change()
+    test_keepalive_fires_before_critical_expiry()
+    test_health_history_is_bounded()
+    print("✅ Session看门狗测试通过")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+大数据量离线评分测试
+验证：分块评分与逐词条 calculate_index 一致 → 单进程/多进程结果相同 → NDJSON 与 SQLite 来源结果相同
+"""
+
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from engine.analyzer import BlueOceanAnalyzer
+from engine.stream_scoring import iter_ndjson, iter_sqlite, stream_top_n
+from utils.datastore import NicheDataStore
+
+
+def _rows(count: int):
+    rng = random.Random(11)
+    return [
+        (f'词条{i}', rng.randint(0, 50000), rng.randint(0, 400), [rng.randint(0, 80) for _ in range(rng.randint(0, 5))])
+        for i in range(count)
+    ]
+
+
+def test_stream_matches_per_keyword_scoring():
+    """流式 Top N 与逐词条计算后排序的结果一致，商品数超限的词条被剔除"""
+    rows = _rows(3000)
+    expected = []
+    for keyword, heat, competition, wants in rows:
+        if competition > 300:
+            continue
+        index = BlueOceanAnalyzer.calculate_index(heat, competition, wants_list=wants, enable_time_decay=False)
+        if index > 0:
+            expected.append((index, keyword))
+    expected = [kw for _, kw in sorted(expected, key=lambda item: -item[0])[:20]]
+
+    serial, stats = stream_top_n(rows, top_n=20, max_competition=300, time_decay=1.0, workers=1, chunk_size=256)
+    assert [r['词条'] for r in serial] == expected
+    assert stats['rows'] == 3000 and stats['chunks'] == 12
+    assert serial[0]['评级'] == BlueOceanAnalyzer.get_rating(serial[0]['蓝海指数'])
+
+    parallel, _ = stream_top_n(iter(rows), top_n=20, max_competition=300, time_decay=1.0, workers=2, chunk_size=256)
+    assert parallel == serial
+
+
+def test_ndjson_and_sqlite_sources_agree():
+    """从数据库导出的 NDJSON 与直接读数据库得到相同结果（只统计两个平台都有数据的词条）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NicheDataStore(str(Path(tmp) / 'niche.db'))
+        rows = _rows(500)
+        store.record_xhs({kw: {'热度': heat} for kw, heat, _, _ in rows}, observed_at=1000)
+        store.record_xhs({kw: {'热度': heat * 2} for kw, heat, _, _ in rows[:100]}, observed_at=2000)
+        store.record_fish({kw: {'商品数': c, '想要数列表': w} for kw, _, c, w in rows[:400]}, observed_at=1500)
+        ndjson = str(Path(tmp) / 'joined.ndjson')
+        assert store.export_ndjson(ndjson) == 400
+
+        from_db, db_stats = stream_top_n(iter_sqlite(store.db_path), top_n=10, time_decay=1.0, workers=1, chunk_size=64)
+        from_file, _ = stream_top_n(iter_ndjson(ndjson), top_n=10, time_decay=1.0, workers=1, chunk_size=64)
+        assert db_stats['rows'] == 400
+        assert from_db == from_file
+        # 使用各词条最新一次小红书观测
+        heats = {kw: heat for kw, heat, _, _ in rows}
+        top = from_db[0]
+        expected_heat = heats[top['词条']] * (2 if int(top['词条'][2:]) < 100 else 1)
+        assert top['小红书热度'] == expected_heat
+        store.close()
+
+
+if __name__ == '__main__':
+    test_stream_matches_per_keyword_scoring()
+    test_ndjson_and_sqlite_sources_agree()
+    print("✅ 大数据量离线评分测试通过")
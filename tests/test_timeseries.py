@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+词条时间序列测试
+验证：流式速度/加速度 → 区间扫描 → 崩溃后列对齐与尾部回放 → 增长率修正蓝海指数
+"""
+
+import math
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from engine.analyzer import BlueOceanAnalyzer
+from engine.timeseries import TimeSeriesStore
+
+
+HOUR = 3600
+
+
+def test_streaming_velocity_and_acceleration():
+    """热度匀加速增长：速度为正且递增，加速度为正；单独写入的闲鱼指标不影响热度统计"""
+    with tempfile.TemporaryDirectory() as tmp:
+        series = TimeSeriesStore(root=tmp, alpha=1.0)
+        t0 = 1_000_000.0
+        for i, heat in enumerate([100, 110, 130, 160]):
+            series.record({'复古相机': {'heat': heat}}, at=t0 + i * HOUR)
+        series.record({'复古相机': {'competition': 40, 'wants': 12.5}}, at=t0 + 3 * HOUR)
+
+        heat = series.stats('复古相机', 'heat')
+        assert heat['n'] == 4 and heat['value'] == 160
+        assert heat['velocity'] == 30 and heat['acceleration'] == 10
+        assert series.stats('复古相机', 'competition')['velocity'] is None
+        assert series.growth_rate('复古相机') == 30 * 24 / 160
+        assert series.growth_rate('手工皮具') is None
+
+
+def test_range_scan_and_crash_recovery():
+    """二分定位时间窗口；列文件残留半行会被截掉，未落盘的尾部在重新打开时回放"""
+    with tempfile.TemporaryDirectory() as tmp:
+        series = TimeSeriesStore(root=tmp, alpha=0.5)
+        for hour in range(10):
+            series.record({f'词{k}': {'heat': hour * 10 + k} for k in range(3)}, at=hour * HOUR)
+        series.flush()
+        series.record({'词0': {'heat': 500}}, at=10 * HOUR)  # 未落盘
+
+        window = series.scan(since=2 * HOUR, until=5 * HOUR)
+        assert sorted(window) == ['词0', '词1', '词2']
+        assert window['词1']['heat'] == [21, 31, 41]
+        assert all(math.isnan(v) for v in window['词1']['wants'])
+        assert list(series.scan(since=9 * HOUR, keywords=['词0'])) == ['词0']
+
+        expected = series.stats('词0')
+        with open(os.path.join(tmp, 'heat.col'), 'ab') as f:
+            f.write(b'\x00\x01\x02')  # 模拟写入中途崩溃
+
+        reopened = TimeSeriesStore(root=tmp, alpha=0.5)
+        assert reopened.summary()['rows'] == 31
+        assert reopened.stats('词0') == expected
+        assert reopened.scan(since=10 * HOUR)['词0']['heat'] == [500]
+
+
+def test_growth_rate_adjusts_index():
+    """携带增长率时按 (1 + 日增长率) 修正热度，并受上下限约束"""
+    fish = {'商品数': 10, '平均想要': 20}
+    base, _ = BlueOceanAnalyzer.calculate_detailed_index({'word': '露营灯', 'heat': 1000}, fish)
+    rising, info = BlueOceanAnalyzer.calculate_detailed_index(
+        {'word': '露营灯', 'heat': 1000, 'growth_rate': 0.5}, fish
+    )
+    assert info['热度日增长率'] == 0.5 and info['增长系数'] == 1.5
+    assert abs(rising - base * 1.5) < 0.05
+    assert BlueOceanAnalyzer.growth_factor(-5) == 0.5
+    assert BlueOceanAnalyzer.growth_factor(None) == 1.0
+
+
+if __name__ == '__main__':
+    test_streaming_velocity_and_acceleration()
+    test_range_scan_and_crash_recovery()
+    test_growth_rate_adjusts_index()
+    print("✅ 词条时间序列测试通过")
@@ -0,0 +1,490 @@
+"""
+🗄️ 本地数据库（SQLite WAL）
+词条、小红书热度观测、闲鱼竞争观测、蓝海分析结果统一存放在一个数据库里：
+
+- 观测按 (词条, 时间) 追加保存，批量 upsert，重复导入不会产生重复记录
+- 最新值、单个词条、最近观测时间都走索引查询，不再整文件读写 JSON
+- 多个任务（定时刷新、挖掘、发现）同时写入时由 SQLite 加锁，不会互相覆盖
+
+xhs_data.json / fish_data.json / niche_report.json 作为导入/导出格式保留：
+数据库为空时自动导入一次；需要 JSON 时运行 python -m utils.datastore export
+（加 --ndjson 导出按行分隔的 JSON，供 NicheFinder 流式分析）
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from config import DATASTORE_DB, XHS_DATA_FILE, FISH_DATA_FILE, REPORT_FILE
+from utils import jsonio
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS keywords (
+    keyword TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS xhs_observations (
+    keyword TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    heat REAL NOT NULL,
+    note_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (keyword, observed_at)
+);
+CREATE INDEX IF NOT EXISTS idx_xhs_observed ON xhs_observations(observed_at);
+CREATE TABLE IF NOT EXISTS fish_observations (
+    keyword TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    listing_count INTEGER NOT NULL,
+    total_wants INTEGER NOT NULL DEFAULT 0,
+    wants_list TEXT NOT NULL DEFAULT '[]',
+    PRIMARY KEY (keyword, observed_at)
+);
+CREATE INDEX IF NOT EXISTS idx_fish_observed ON fish_observations(observed_at);
+CREATE TABLE IF NOT EXISTS analysis_results (
+    keyword TEXT NOT NULL,
+    analyzed_at REAL NOT NULL,
+    blue_ocean_index REAL NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (keyword, analyzed_at)
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_index ON analysis_results(blue_ocean_index);
+"""
+
+# 每个词条最新一次观测（主键 (keyword, observed_at) 上的索引查询），按词条首次出现顺序返回
+_LATEST_SQL = (
+    "SELECT o.keyword, o.observed_at, {columns} FROM {table} o "
+    "JOIN (SELECT keyword, MAX(observed_at) AS latest FROM {table} {where} GROUP BY keyword) l "
+    "ON o.keyword = l.keyword AND o.observed_at = l.latest "
+    "JOIN keywords k ON k.keyword = o.keyword "
+    "ORDER BY k.first_seen, k.rowid"
+)
+
+# 两个平台都有观测的词条：各自最新一次观测连接成一行（不排序，便于流式读取）
+_JOINED_SQL = (
+    "SELECT x.keyword, x.heat, f.listing_count, f.wants_list FROM xhs_observations x "
+    "JOIN (SELECT keyword, MAX(observed_at) AS latest FROM xhs_observations GROUP BY keyword) lx "
+    "ON x.keyword = lx.keyword AND x.observed_at = lx.latest "
+    "JOIN (SELECT keyword, MAX(observed_at) AS latest FROM fish_observations GROUP BY keyword) lf "
+    "ON lf.keyword = x.keyword "
+    "JOIN fish_observations f ON f.keyword = lf.keyword AND f.observed_at = lf.latest"
+)
+
+
+def _to_epoch(value, default: float) -> float:
+    """ISO 时间字符串 / 时间戳 → 时间戳（无法解析时用 default）"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.strip().replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return default
+
+
+def _to_iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch).isoformat()
+
+
+def _load_json_dict(path: str) -> Dict:
+    try:
+        data = jsonio.load(path)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+class NicheDataStore:
+    """词条与观测数据库（SQLite WAL，支持多进程并发读写）"""
+
+    def __init__(self, db_path: str = DATASTORE_DB):
+        """
+        Args:
+            db_path: 数据库路径
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _write(self, statements: List[tuple]) -> None:
+        """在一个写事务内批量执行 [(sql, rows)]"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, rows in statements:
+                    if rows:
+                        self._conn.executemany(sql, rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ==================== 写入 ====================
+
+    def record_xhs(self, observations: Dict[str, Dict], observed_at: Optional[float] = None) -> int:
+        """
+        批量写入小红书热度观测
+
+        Args:
+            observations: {词条: {'热度', '笔记数'?, '更新时间'?}}（与 xhs_data.json 相同格式）
+            observed_at: 观测时间（缺省为记录里的更新时间，再缺省为当前时间）
+
+        Returns:
+            写入的观测数
+        """
+        now = time.time() if observed_at is None else observed_at
+        rows = []
+        for keyword, data in observations.items():
+            if not keyword or not isinstance(data, dict):
+                continue
+            rows.append((
+                keyword,
+                _to_epoch(data.get('更新时间'), now),
+                float(data.get('热度', 0) or 0),
+                int(data.get('笔记数', 0) or 0),
+            ))
+        self._write([
+            ("INSERT OR IGNORE INTO keywords (keyword, first_seen) VALUES (?, ?)", [(r[0], r[1]) for r in rows]),
+            ("INSERT INTO xhs_observations (keyword, observed_at, heat, note_count) VALUES (?, ?, ?, ?) "
+             "ON CONFLICT(keyword, observed_at) DO UPDATE SET heat = excluded.heat, note_count = excluded.note_count",
+             rows),
+        ])
+        return len(rows)
+
+    def record_fish(self, observations: Dict[str, Dict], observed_at: Optional[float] = None) -> int:
+        """
+        批量写入闲鱼竞争观测
+
+        Args:
+            observations: {词条: {'商品数', '想要总数', '想要数列表', '更新时间'?}}（与 fish_data.json 相同格式）
+            observed_at: 观测时间（缺省为记录里的更新时间，再缺省为当前时间）
+
+        Returns:
+            写入的观测数
+        """
+        now = time.time() if observed_at is None else observed_at
+        rows = []
+        for keyword, data in observations.items():
+            if not keyword or not isinstance(data, dict):
+                continue
+            wants_list = [int(float(w or 0)) for w in (data.get('想要数列表') or [])]
+            rows.append((
+                keyword,
+                _to_epoch(data.get('更新时间'), now),
+                int(data.get('商品数', 0) or 0),
+                int(data.get('想要总数', 0) or sum(wants_list)),
+                jsonio.dumps(wants_list),
+            ))
+        self._write([
+            ("INSERT OR IGNORE INTO keywords (keyword, first_seen) VALUES (?, ?)", [(r[0], r[1]) for r in rows]),
+            ("INSERT INTO fish_observations (keyword, observed_at, listing_count, total_wants, wants_list) "
+             "VALUES (?, ?, ?, ?, ?) ON CONFLICT(keyword, observed_at) DO UPDATE SET "
+             "listing_count = excluded.listing_count, total_wants = excluded.total_wants, wants_list = excluded.wants_list",
+             rows),
+        ])
+        return len(rows)
+
+    def record_analysis(self, results: List[Dict], analyzed_at: Optional[float] = None) -> int:
+        """
+        批量写入蓝海分析结果
+
+        Args:
+            results: 分析结果列表（calculate_detailed_index 的输出）
+            analyzed_at: 分析时间（缺省为当前时间）
+
+        Returns:
+            写入的结果数
+        """
+        now = time.time() if analyzed_at is None else analyzed_at
+        rows = [
+            (r['词条'], now, float(r.get('蓝海指数', 0) or 0), jsonio.dumps(r, default=str))
+            for r in results if isinstance(r, dict) and r.get('词条')
+        ]
+        self._write([
+            ("INSERT OR IGNORE INTO keywords (keyword, first_seen) VALUES (?, ?)", [(r[0], now) for r in rows]),
+            ("INSERT INTO analysis_results (keyword, analyzed_at, blue_ocean_index, payload) VALUES (?, ?, ?, ?) "
+             "ON CONFLICT(keyword, analyzed_at) DO UPDATE SET "
+             "blue_ocean_index = excluded.blue_ocean_index, payload = excluded.payload",
+             rows),
+        ])
+        return len(rows)
+
+    # ==================== 查询 ====================
+
+    def keywords(self) -> List[str]:
+        """全部已知词条（按首次出现时间）"""
+        return [row[0] for row in self._query("SELECT keyword FROM keywords ORDER BY first_seen, keyword")]
+
+    def latest_xhs(self, keywords: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        各词条最新一次小红书观测
+
+        Args:
+            keywords: 只查这些词条（None 表示全部）
+
+        Returns:
+            {词条: {'热度', '笔记数', '更新时间'}}（与 xhs_data.json 相同格式）
+        """
+        sql = _LATEST_SQL.format(columns='o.heat, o.note_count', table='xhs_observations', where='{where}')
+        return {
+            keyword: {'热度': heat, '笔记数': note_count, '更新时间': _to_iso(observed_at)}
+            for keyword, observed_at, heat, note_count in self._select(sql, keywords)
+        }
+
+    def latest_fish(self, keywords: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        各词条最新一次闲鱼观测
+
+        Args:
+            keywords: 只查这些词条（None 表示全部）
+
+        Returns:
+            {词条: {'商品数', '想要总数', '想要数列表', '更新时间'}}（与 fish_data.json 相同格式）
+        """
+        sql = _LATEST_SQL.format(
+            columns='o.listing_count, o.total_wants, o.wants_list', table='fish_observations', where='{where}'
+        )
+        return {
+            keyword: {
+                '商品数': listing_count,
+                '想要总数': total_wants,
+                '想要数列表': jsonio.loads(wants_list),
+                '更新时间': _to_iso(observed_at)
+            }
+            for keyword, observed_at, listing_count, total_wants, wants_list in self._select(sql, keywords)
+        }
+
+    def _select(self, sql: str, keywords: Optional[Iterable[str]]) -> List[tuple]:
+        if keywords is None:
+            return self._query(sql.format(where=''))
+        keywords = list(dict.fromkeys(keywords))
+        rows = []
+        # SQLite 单条语句的参数个数有上限，分批查询
+        for start in range(0, len(keywords), 500):
+            chunk = keywords[start:start + 500]
+            where = f"WHERE keyword IN ({','.join('?' * len(chunk))})"
+            rows.extend(self._query(sql.format(where=where), tuple(chunk)))
+        return rows
+
+    def fish_for(self, keyword: str) -> Optional[Dict]:
+        """单个词条最新的闲鱼观测（没有时返回 None）"""
+        return self.latest_fish([keyword]).get(keyword)
+
+    def xhs_history(self, keyword: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        单个词条的小红书热度历史（按时间升序）
+
+        Args:
+            keyword: 词条
+            limit: 只返回最近 limit 条
+
+        Returns:
+            [{'热度', '笔记数', '更新时间'}]
+        """
+        rows = self._query(
+            "SELECT heat, note_count, observed_at FROM xhs_observations WHERE keyword = ? "
+            "ORDER BY observed_at DESC LIMIT ?",
+            (keyword, -1 if limit is None else limit)
+        )
+        return [{'热度': h, '笔记数': n, '更新时间': _to_iso(t)} for h, n, t in reversed(rows)]
+
+    def latest_observed_at(self, platform: str = 'xhs') -> Optional[float]:
+        """某平台最近一次观测的时间戳（没有数据时返回 None）"""
+        table = 'xhs_observations' if platform == 'xhs' else 'fish_observations'
+        row = self._query(f"SELECT MAX(observed_at) FROM {table}")
+        return row[0][0] if row else None
+
+    def iter_observations(self) -> List[tuple]:
+        """
+        两个平台的全部历史观测（按时间升序，用于回填时间序列）
+
+        Returns:
+            [(观测时间, 词条, {'heat'} 或 {'competition', 'wants'})]
+        """
+        rows = [
+            (observed_at, keyword, {'heat': heat})
+            for keyword, observed_at, heat in self._query(
+                "SELECT keyword, observed_at, heat FROM xhs_observations"
+            )
+        ]
+        for keyword, observed_at, listing_count, total_wants, wants_list in self._query(
+            "SELECT keyword, observed_at, listing_count, total_wants, wants_list FROM fish_observations"
+        ):
+            wants = jsonio.loads(wants_list)
+            rows.append((observed_at, keyword, {
+                'competition': listing_count,
+                'wants': total_wants / len(wants) if wants else 0.0
+            }))
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+    def index_snapshot(self) -> Dict[str, float]:
+        """各词条最近一次分析的蓝海指数"""
+        return {
+            keyword: index for keyword, index, _ in self._query(
+                "SELECT keyword, blue_ocean_index, MAX(analyzed_at) FROM analysis_results GROUP BY keyword"
+            )
+        }
+
+    def top_results(self, limit: int = 10, since: Optional[float] = None) -> List[Dict]:
+        """
+        最近一次分析结果中蓝海指数最高的词条
+
+        Args:
+            limit: 返回条数
+            since: 只看该时间之后的分析（None 表示全部）
+
+        Returns:
+            分析结果列表（按蓝海指数降序）
+        """
+        rows = self._query(
+            "SELECT payload, blue_ocean_index, MAX(analyzed_at) FROM analysis_results WHERE analyzed_at >= ? "
+            "GROUP BY keyword ORDER BY blue_ocean_index DESC LIMIT ?",
+            (since or 0, limit)
+        )
+        return [jsonio.loads(payload) for payload, _, _ in rows]
+
+    def is_empty(self) -> bool:
+        return not self._query("SELECT 1 FROM keywords LIMIT 1")
+
+    # ==================== 导入 / 导出 ====================
+
+    def import_json(
+        self,
+        xhs_file: str = XHS_DATA_FILE,
+        fish_file: str = FISH_DATA_FILE,
+        report_file: str = REPORT_FILE
+    ) -> Dict[str, int]:
+        """
+        从 JSON 数据文件导入（没有更新时间的记录按文件修改时间记录）
+
+        Returns:
+            各类记录的导入数
+        """
+        counts = {}
+        for name, path, record in (('xhs', xhs_file, self.record_xhs), ('fish', fish_file, self.record_fish)):
+            data = _load_json_dict(path) if path else {}
+            counts[name] = record(data, observed_at=os.path.getmtime(path)) if data else 0
+
+        report = _load_json_dict(report_file) if report_file else {}
+        snapshot = report.get('index_snapshot')
+        if isinstance(snapshot, dict) and snapshot:
+            analyzed_at = _to_epoch(report.get('timestamp'), os.path.getmtime(report_file))
+            counts['analysis'] = self.record_analysis(
+                [{'词条': k, '蓝海指数': v} for k, v in snapshot.items()], analyzed_at=analyzed_at
+            )
+        else:
+            counts['analysis'] = 0
+        return counts
+
+    def export_json(self, xhs_file: str = XHS_DATA_FILE, fish_file: str = FISH_DATA_FILE) -> Dict[str, int]:
+        """
+        把各词条的最新观测导出为 xhs_data.json / fish_data.json 格式（原子替换）
+
+        Returns:
+            各文件导出的词条数
+        """
+        counts = {}
+        for name, path, data in (('xhs', xhs_file, self.latest_xhs()), ('fish', fish_file, self.latest_fish())):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            jsonio.dump(data, tmp)
+            os.replace(tmp, path)
+            counts[name] = len(data)
+        return counts
+
+    def export_ndjson(self, path: str) -> int:
+        """
+        导出两个平台都有数据的词条（每行一个 JSON，供离线流式分析）
+
+        Returns:
+            导出的行数
+        """
+        count = 0
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            for keyword, heat, listing_count, wants_list in iter_latest_joined(self.db_path):
+                f.write(jsonio.dumps_bytes(
+                    {'词条': keyword, '热度': heat, '商品数': listing_count, '想要数列表': jsonio.loads(wants_list)}
+                ) + b'\n')
+                count += 1
+        os.replace(tmp, path)
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def iter_latest_joined(db_path: str = DATASTORE_DB, batch_size: int = 10000) -> Iterator[tuple]:
+    """
+    流式读取每个词条两个平台的最新观测（只读连接，逐批取行，内存占用与数据量无关）
+
+    Yields:
+        (词条, 小红书热度, 闲鱼商品数, 想要数列表 JSON)
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
+    try:
+        cursor = conn.execute(_JOINED_SQL)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+_stores: Dict[str, NicheDataStore] = {}
+
+
+def get_store(db_path: str = DATASTORE_DB) -> NicheDataStore:
+    """
+    获取数据库（进程内共享连接）
+
+    首次打开且数据库为空时，自动导入现有的 JSON 数据文件。
+    """
+    key = os.path.abspath(db_path)
+    if key not in _stores:
+        store = NicheDataStore(db_path)
+        if store.is_empty() and any(os.path.exists(p) for p in (XHS_DATA_FILE, FISH_DATA_FILE)):
+            counts = store.import_json()
+            print(f"🗄️ 已从 JSON 导入数据库：小红书 {counts['xhs']} 条，闲鱼 {counts['fish']} 条")
+        _stores[key] = store
+    return _stores[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="蓝海数据库导入/导出")
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('--db', default=DATASTORE_DB)
+    parser.add_argument('--xhs', default=XHS_DATA_FILE)
+    parser.add_argument('--fish', default=FISH_DATA_FILE)
+    parser.add_argument('--ndjson', help='export 时改为导出两个平台都有数据的词条（每行一个 JSON，供离线流式分析）')
+    args = parser.parse_args()
+
+    store = NicheDataStore(args.db)
+    if args.action == 'import':
+        counts = store.import_json(args.xhs, args.fish)
+        print(f"✓ 已导入：小红书 {counts['xhs']} 条，闲鱼 {counts['fish']} 条，分析结果 {counts['analysis']} 条")
+    elif args.ndjson:
+        print(f"✓ 已导出：{args.ndjson}（{store.export_ndjson(args.ndjson)} 行）")
+    else:
+        counts = store.export_json(args.xhs, args.fish)
+        print(f"✓ 已导出：{args.xhs}（{counts['xhs']} 个词条），{args.fish}（{counts['fish']} 个词条）")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+⚡ JSON 编解码层
+嗅探到的响应体、报告和数据文件都经过 JSON 编解码。这里统一为一个模块：
+
+- 安装了 orjson 时使用 orjson（C 实现，直接处理 UTF-8 字节），否则回退标准库 json
+- 响应体按字节读取、只解码一次（Playwright 的 resp.json() 会先转成 str 再解析）
+- 两种输出格式：紧凑的机器格式（数据库、归档、NDJSON）和缩进的人类格式（报告、数据文件）
+- 与标准库 json.dumps(ensure_ascii=False) 的结果解析后相等，但不保证逐字节相同：
+  浮点指数写法不同（orjson 写 1e16 / 1e-7，标准库写 1e+16 / 1e-07）；
+  NaN / Infinity 在 orjson 下写成 null（标准 JSON 无法表示），标准库写成非标准的 NaN / Infinity
+- orjson 不支持的对象（超过 64 位的整数等）自动回退标准库
+
+微基准：python -m utils.jsonio --bench
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# 尝试导入orjson（用于加速 JSON 编解码）
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，调用方统一捕获这个
+JSONDecodeError = json.JSONDecodeError
+
+_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'fixtures')
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    解析 JSON（字节直接解析，不先解码成 str）
+
+    Raises:
+        JSONDecodeError: 格式错误
+    """
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj: Any, pretty: bool = False, default: Optional[Callable] = None) -> bytes:
+    """
+    序列化为 UTF-8 字节
+
+    使用 orjson 时 NaN / Infinity 写成 null，调用方需要保留时应先换成字符串或 None。
+
+    Args:
+        obj: 要序列化的对象
+        pretty: True 为两空格缩进的人类格式，False 为无空白的紧凑格式
+        default: 无法序列化的对象的转换函数（同 json.dumps 的 default）
+    """
+    if HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # orjson 不支持的对象（超过 64 位的整数等）交给标准库
+            pass
+    return _std_dumps(obj, pretty, default).encode('utf-8')
+
+
+def dumps(obj: Any, pretty: bool = False, default: Optional[Callable] = None) -> str:
+    """序列化为 str（参数同 dumps_bytes）"""
+    return dumps_bytes(obj, pretty=pretty, default=default).decode('utf-8')
+
+
+def _std_dumps(obj: Any, pretty: bool, default: Optional[Callable]) -> str:
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=default)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default)
+
+
+def load(path: str) -> Any:
+    """读取 JSON 文件（按字节读取后解析）"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump(obj: Any, path: str, pretty: bool = True, default: Optional[Callable] = None) -> None:
+    """写入 JSON 文件（默认人类格式）"""
+    data = dumps_bytes(obj, pretty=pretty, default=default)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+async def read_response_json(resp) -> Any:
+    """
+    读取 Playwright 响应的 JSON：取原始字节，只解码一次
+
+    Raises:
+        JSONDecodeError: 响应体不是 JSON
+    """
+    return loads(await resp.body())
+
+
+def _fixture_payloads() -> Dict[str, bytes]:
+    """基准用的样本：tests/fixtures 下的 JSON 及按其结构放大的搜索响应"""
+    payloads = {}
+    for name in sorted(os.listdir(_FIXTURES_DIR)) if os.path.isdir(_FIXTURES_DIR) else []:
+        if name.endswith('.json'):
+            with open(os.path.join(_FIXTURES_DIR, name), 'rb') as f:
+                payloads[name] = f.read()
+    # 接近真实搜索响应大小的样本：20 条笔记卡片
+    items = [
+        {
+            'id': f'note{i:04d}', 'model_type': 'note',
+            'note_card': {
+                'display_title': f'复古胶片相机入门推荐第{i}期｜新手必看',
+                'interact_info': {'liked_count': str(100 + i * 37), 'collected_count': str(i * 5)},
+                'user': {'nickname': f'摄影爱好者{i}', 'user_id': f'u{i:06d}'},
+                'image_list': [{'url': f'https://sns-img.example.com/{i}/{j}.jpg', 'width': 1080, 'height': 1440} for j in range(4)],
+                'tag_list': [{'name': tag} for tag in ('复古相机', 'CCD', '胶片', '摄影')],
+            },
+        }
+        for i in range(20)
+    ]
+    payloads['search_notes (synthetic)'] = json.dumps(
+        {'code': 0, 'success': True, 'data': {'has_more': True, 'items': items}}, ensure_ascii=False
+    ).encode('utf-8')
+    return payloads
+
+
+def _timeit(func: Callable, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - started) / number * 1e6
+
+
+def benchmark(number: int = 2000) -> List[Dict]:
+    """
+    微基准：标准库 vs 当前编解码器（解析字节、紧凑输出、缩进输出）
+
+    Returns:
+        [{'payload', 'bytes', 'op', 'stdlib_us', 'fast_us', 'speedup'}]
+    """
+    rows = []
+    for name, raw in _fixture_payloads().items():
+        obj = json.loads(raw)
+        cases = [
+            ('loads', lambda: json.loads(raw.decode('utf-8')), lambda: loads(raw)),
+            ('dumps compact', lambda: json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+             lambda: dumps_bytes(obj)),
+            ('dumps pretty', lambda: json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8'),
+             lambda: dumps_bytes(obj, pretty=True)),
+        ]
+        for op, std, fast in cases:
+            # 先确认两边结果一致，再计时
+            same = fast() == std() if op == 'loads' else json.loads(fast()) == json.loads(std())
+            if not same:
+                raise ValueError(f"{name} {op}: 编解码结果与标准库不一致")
+            std_us = _timeit(std, number)
+            fast_us = _timeit(fast, number)
+            rows.append({
+                'payload': name, 'bytes': len(raw), 'op': op,
+                'stdlib_us': round(std_us, 2), 'fast_us': round(fast_us, 2),
+                'speedup': round(std_us / fast_us, 2) if fast_us else 0.0,
+            })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="JSON 编解码层")
+    parser.add_argument('--bench', action='store_true', help="运行微基准")
+    parser.add_argument('--number', type=int, default=2000, help="每项重复次数")
+    args = parser.parse_args()
+
+    print(f"编解码器：{'orjson ' + orjson.__version__ if HAS_ORJSON else '标准库 json（pip install orjson 可加速）'}")
+    if not args.bench:
+        return
+    print(f"{'样本':<28}{'字节':>8}  {'操作':<14}{'标准库 μs':>12}{'当前 μs':>12}{'加速':>8}")
+    for row in benchmark(args.number):
+        print(
+            f"{row['payload']:<28}{row['bytes']:>8}  {row['op']:<14}"
+            f"{row['stdlib_us']:>12}{row['fast_us']:>12}{row['speedup']:>7}×"
+        )
+
+
+if __name__ == '__main__':
+    main()
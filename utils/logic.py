@@ -3,9 +3,16 @@
 处理企业微信推送和数据分析流程解耦
 """
 
+import time
+
 import requests
-from typing import Dict, Optional
-from config import WECOM_WEBHOOK, MIN_POTENTIAL_SCORE, MAX_COMPETITION, CHINA_PROXY_SERVER
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
+from config import (
+    WECOM_WEBHOOK, MIN_POTENTIAL_SCORE, MAX_COMPETITION, CHINA_PROXY_SERVER,
+    WECOM_MARKDOWN_MAX_BYTES
+)
+from utils import metrics
 
 
 class NichePushLogic:
@@ -20,6 +27,13 @@ class NichePushLogic:
         """
         self.webhook_url = webhook_url
         self.push_count = 0
+        
+        # 持久连接池：复用 TCP/TLS 连接，避免每条消息重新握手
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        if CHINA_PROXY_SERVER:
+            self.session.proxies.update({"http": CHINA_PROXY_SERVER, "https": CHINA_PROXY_SERVER})
     
     def push_to_wecom(
         self,
@@ -188,6 +202,7 @@ class NichePushLogic:
         
         if not self.webhook_url:
             print("⚠️ 未配置企业微信 Webhook（WECOM_WEBHOOK），已跳过推送")
+            metrics.push_messages().inc(outcome='skipped')
             return False
 
         data = {
@@ -197,48 +212,117 @@ class NichePushLogic:
             }
         }
         
+        started = time.monotonic()
+        outcome = 'error'
         try:
             print(f"📤 正在推送到企业微信...")
-            response = requests.post(
+            response = self.session.post(
                 self.webhook_url,
                 json=data,
                 headers={'Content-Type': 'application/json'},
-                timeout=10,
-                proxies=(
-                    {"http": CHINA_PROXY_SERVER, "https": CHINA_PROXY_SERVER}
-                    if CHINA_PROXY_SERVER
-                    else {}
-                )
+                timeout=10
             )
             
             result = response.json()
             
             if result.get('errcode') == 0:
+                outcome = 'success'
                 self.push_count += 1
                 print(f"✅ 已推送蓝海词条（累计：{self.push_count}个）")
                 return True
             else:
+                outcome = 'rejected'
                 error_msg = result.get('errmsg', '未知错误')
                 print(f"❌ 企业微信推送失败：{error_msg}")
                 return False
         
         except requests.exceptions.Timeout:
+            outcome = 'timeout'
             print("❌ 推送请求超时")
             return False
         except Exception as e:
             print(f"❌ 推送异常：{e}")
             return False
+        finally:
+            metrics.push_messages().inc(outcome=outcome)
+            metrics.push_latency().observe(time.monotonic() - started, outcome=outcome)
     
-    def batch_push(self, results: list) -> int:
+    @staticmethod
+    def filter_qualified(results: list) -> list:
+        """过滤符合推送条件的分析结果（蓝海指数达标且竞争度未超限）"""
+        return [
+            r for r in results
+            if r.get('蓝海指数', 0) >= MIN_POTENTIAL_SCORE
+            and r.get('闲鱼商品数', 0) <= MAX_COMPETITION
+        ]
+    
+    def format_digest(self, results: list, max_bytes: int = WECOM_MARKDOWN_MAX_BYTES) -> List[Tuple[str, list]]:
+        """
+        把多个蓝海词条合并为摘要消息（按企业微信单条上限自动分片）
+        
+        Args:
+            results: 分析结果列表（按展示顺序）
+            max_bytes: 单条消息内容上限（UTF-8字节）
+            
+        Returns:
+            [(Markdown消息, 该消息包含的词条列表)]，通常只有1条
+        """
+        messages = []
+        header = f"🚀 **蓝海赛道摘要（{len(results)} 个优质词条）**"
+        footer = "---\n> 建议策略：快速上架，抢占市场先机"
+        budget = max_bytes - len(footer.encode('utf-8')) - 2
+        
+        current = [header]
+        current_items = []
+        current_size = len(header.encode('utf-8'))
+        
+        for i, item in enumerate(results, 1):
+            score = float(item.get('蓝海指数', 0))
+            fish_count = int(item.get('闲鱼商品数', 0))
+            avg_wants = float(item.get('平均想要数', 0))
+            xhs_heat = int(item.get('小红书热度', 0))
+            block = "\n".join([
+                "",
+                f"**{i}. {item.get('词条', '')}** <font color=\"warning\">{score:.2f}</font>",
+                f"> 热度 <font color=\"info\">{xhs_heat:,}</font> ｜ "
+                f"竞争 <font color=\"comment\">{fish_count}</font> 个卖家 ｜ "
+                f"平均 {avg_wants:.1f} 人想要",
+            ])
+            block_size = len(block.encode('utf-8')) + 1
+            
+            if current_size + block_size > budget and current_items:
+                messages.append(("\n".join(current + [footer]), current_items))
+                current = ["🚀 **蓝海赛道摘要（续）**"]
+                current_items = []
+                current_size = len(current[0].encode('utf-8'))
+            
+            current.append(block)
+            current_items.append(item)
+            current_size += block_size
+        
+        if current_items:
+            messages.append(("\n".join(current + [footer]), current_items))
+        
+        return messages
+    
+    def batch_push(self, results: list, digest: bool = True) -> int:
         """
         批量推送多个蓝海词条
         
         Args:
             results: 分析结果列表
+            digest: 是否合并为摘要消息（默认开启，20个词条只需1-2次请求）
             
         Returns:
             成功推送的个数
         """
+        if digest:
+            success_count = 0
+            for message, items in self.format_digest(self.filter_qualified(results)):
+                if self._send_to_wecom(message):
+                    success_count += len(items)
+            return success_count
+        
         success_count = 0
         
         for item in results:
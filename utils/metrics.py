@@ -0,0 +1,387 @@
+"""
+📈 监控指标
+RequestStats 只有成功/失败计数和一段格式化文本，没有耗时、没有分层数据、也无法被机器读取。
+这里提供进程内的指标注册表：
+
+- 计数器 / 仪表 / 固定桶耗时直方图，按 platform、layer（sniff/api/xpath/page/mock）、outcome 等标签区分
+- 爬虫各层、自适应限速、企业微信推送在运行时更新
+- 任务结束时写出 Prometheus textfile（原子替换，供 node_exporter 采集）和 JSON 快照（附 p50/p95 估计）
+
+可据此告警：单词条耗时 p95、模拟数据降级率（layer="mock" 占比）
+"""
+
+import bisect
+import math
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import METRICS_TEXTFILE, METRICS_SNAPSHOT_FILE, METRICS_LATENCY_BUCKETS
+from utils import jsonio
+
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    """带标签的指标基类（按标签值元组分别计数）"""
+
+    TYPE = ''
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), lock: Optional[threading.Lock] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = lock or threading.Lock()
+        self._values: Dict[LabelValues, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: LabelValues, extra: Iterable[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (
+            f'{name}="' + value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+            for name, value in pairs
+        )
+        return '{' + ','.join(escaped) + '}'
+
+    def _items(self) -> List[Tuple[LabelValues, object]]:
+        """加锁复制当前取值（按标签值排序）；推送线程可能同时在更新"""
+        with self._lock:
+            return sorted(self._values.items())
+
+    def samples(self) -> List[Tuple[Dict[str, str], object]]:
+        """[(标签, 值)]（按标签值排序）"""
+        return [(dict(zip(self.labelnames, key)), value) for key, value in self._items()]
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    TYPE = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """指定标签的当前值（缺省标签时对匹配的全部标签组合求和）"""
+        with self._lock:
+            return sum(v for key, v in self._values.items() if _matches(self.labelnames, key, labels))
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{self._format_labels(key)} {_fmt(v)}" for key, v in self._items()]
+
+
+class Gauge(_Metric):
+    """可增可减的仪表"""
+
+    TYPE = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels) -> Optional[float]:
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{self._format_labels(key)} {_fmt(v)}" for key, v in self._items()]
+
+
+class Histogram(_Metric):
+    """固定桶直方图（桶内计数非累积存储，导出时按 Prometheus 约定累积）"""
+
+    TYPE = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = METRICS_LATENCY_BUCKETS,
+        lock: Optional[threading.Lock] = None
+    ):
+        super().__init__(name, help, labelnames, lock)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [各桶计数（最后一个为 +Inf）, 总和]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """
+        按桶线性插值估计分位数（与 PromQL histogram_quantile 相同的算法）
+
+        Args:
+            q: 分位数（0-1）
+            labels: 标签（缺省的标签合并全部取值）
+
+        Returns:
+            估计值；没有观测时返回 None，落在 +Inf 桶时返回最大桶上界
+        """
+        with self._lock:
+            counts = [0] * (len(self.buckets) + 1)
+            for key, (bucket_counts, _) in self._values.items():
+                if _matches(self.labelnames, key, labels):
+                    counts = [a + b for a, b in zip(counts, bucket_counts)]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def _items(self) -> List[Tuple[LabelValues, object]]:
+        # 桶计数列表会被原地更新，复制一份
+        with self._lock:
+            return [(key, [list(counts), total]) for key, (counts, total) in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else _fmt(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+def _matches(labelnames: Tuple[str, ...], key: LabelValues, labels: Dict[str, str]) -> bool:
+    return all(key[labelnames.index(name)] == str(value) for name, value in labels.items())
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """指标注册表（同名指标重复注册时返回同一个对象）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, cls, name: str, help: str, labelnames: Sequence[str], **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标 {name} 已以不同类型或标签注册")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = METRICS_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        """
+        JSON 快照
+
+        Returns:
+            {指标名: {'type', 'help', 'samples': [{'labels', 'value'} 或 {'labels', 'count', 'sum', 'p50', 'p95'}]}}
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        result = {}
+        for metric in metrics:
+            samples = []
+            for labels, value in metric.samples():
+                if isinstance(metric, Histogram):
+                    p50, p95 = metric.quantile(0.5, **labels), metric.quantile(0.95, **labels)
+                    samples.append({
+                        'labels': labels,
+                        'count': sum(value[0]),
+                        'sum': round(value[1], 6),
+                        'p50': None if p50 is None else round(p50, 4),
+                        'p95': None if p95 is None else round(p95, 4),
+                    })
+                else:
+                    samples.append({'labels': labels, 'value': value})
+            result[metric.name] = {'type': metric.TYPE, 'help': metric.help, 'samples': samples}
+        return result
+
+    def write(
+        self,
+        textfile: Optional[str] = METRICS_TEXTFILE,
+        json_file: Optional[str] = METRICS_SNAPSHOT_FILE
+    ) -> None:
+        """写出 Prometheus textfile 和 JSON 快照（原子替换，采集方不会读到半个文件）"""
+        if textfile:
+            _atomic_write(textfile, self.render_prometheus().encode('utf-8'))
+        if json_file:
+            _atomic_write(json_file, jsonio.dumps_bytes(self.snapshot(), pretty=True))
+
+    def reset(self) -> None:
+        """清空全部指标（测试用）"""
+        with self._lock:
+            self._metrics.clear()
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """进程内共享的指标注册表"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+# ==================== 标准指标 ====================
+
+def layer_attempts() -> Counter:
+    return get_metrics().counter(
+        'niche_crawl_layer_attempts_total', '各获取层的尝试次数',
+        ('platform', 'layer', 'outcome')
+    )
+
+
+def layer_latency() -> Histogram:
+    return get_metrics().histogram(
+        'niche_crawl_layer_seconds', '各获取层单次尝试耗时（秒）',
+        ('platform', 'layer', 'outcome')
+    )
+
+
+def keyword_results() -> Counter:
+    return get_metrics().counter(
+        'niche_crawl_keywords_total', '按最终提供数据的层统计的词条数（layer="mock" 为模拟数据降级）',
+        ('platform', 'layer', 'outcome')
+    )
+
+
+def keyword_latency() -> Histogram:
+    return get_metrics().histogram(
+        'niche_crawl_keyword_seconds', '单个词条的获取耗时（含重试，秒）',
+        ('platform', 'outcome')
+    )
+
+
+def block_signals() -> Counter:
+    return get_metrics().counter(
+        'niche_crawl_blocked_total', '检测到的拦截信号数', ('platform', 'signal')
+    )
+
+
+def retries() -> Counter:
+    return get_metrics().counter('niche_crawl_retries_total', '重试次数', ('platform',))
+
+
+def rate_limit_fill_rate() -> Gauge:
+    return get_metrics().gauge(
+        'niche_rate_limit_fill_rate', '自适应限速当前的令牌补充速率（次/秒）', ('platform',)
+    )
+
+
+def rate_limit_signals() -> Counter:
+    return get_metrics().counter(
+        'niche_rate_limit_signals_total', '自适应限速收到的信号数', ('platform', 'signal')
+    )
+
+
+def rate_limit_wait() -> Histogram:
+    return get_metrics().histogram(
+        'niche_rate_limit_wait_seconds', '动作前的令牌等待 + 抖动延迟（秒）', ('platform', 'action')
+    )
+
+
+def mission_duration() -> Gauge:
+    return get_metrics().gauge('niche_mission_duration_seconds', '最近一次挖掘任务的耗时（秒）')
+
+
+def mission_runs() -> Counter:
+    return get_metrics().counter('niche_mission_runs_total', '挖掘任务次数（按结束状态）', ('status',))
+
+
+def push_messages() -> Counter:
+    return get_metrics().counter(
+        'niche_push_messages_total', '企业微信消息发送结果', ('outcome',)
+    )
+
+
+def push_latency() -> Histogram:
+    return get_metrics().histogram(
+        'niche_push_seconds', '企业微信 HTTP 请求耗时（秒，限速等待见 niche_rate_limit_wait_seconds{platform="wecom"}）', ('outcome',)
+    )
+
+
+def network_requests() -> Counter:
+    return get_metrics().counter(
+        'niche_network_requests_total', '页面发出的请求数（outcome: network / cached / aborted / failed）',
+        ('platform', 'resource_type', 'outcome')
+    )
+
+
+def network_bytes() -> Counter:
+    return get_metrics().counter(
+        'niche_network_bytes_total', '页面实际下载的字节数（响应头 + 编码后的响应体）',
+        ('platform', 'resource_type')
+    )
+
+
+def network_first_api() -> Histogram:
+    return get_metrics().histogram(
+        'niche_network_first_api_seconds', '词条开始到第一个平台 API 响应的时间（秒）', ('platform',)
+    )
@@ -5,15 +5,25 @@
   1) 检测当前出口位置是否为中国；若不是则中止并提示你切换网络；
   2) 或在配置了中国代理时，尽量通过代理出站。
 - 这里优先使用国内可访问的 IP 查询接口。
+- 检测结果按出口（直连 / 代理地址）缓存：内存 + 磁盘文件（多进程共享），
+  TTL 内不再重复探测；代理配置变化或检测到拦截时调用 invalidate() 重新校验。
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
+import os
 import re
+import threading
+import time
 import urllib.request
-from dataclasses import dataclass
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+
+from config import CHINA_PROXY_SERVER, EGRESS_CACHE_FILE, EGRESS_CHECK_TTL
 
 
 @dataclass(frozen=True)
@@ -25,7 +35,21 @@ class ChinaNetworkReport:
     source: Optional[str] = None
 
 
-def _http_get_text(url: str, timeout: float = 5.0) -> str:
+# 国内常用可访问的接口（并发探测，先得到有效结果者为准）
+_SOURCES = (
+    ("sohu_cityjson", "https://pv.sohu.com/cityjson?ie=utf-8"),
+    ("ipip", "https://myip.ipip.net"),
+)
+
+
+def _http_get_text(url: str, timeout: float = 5.0, proxy: str = "") -> str:
+    # 配置了中国代理时通过代理探测，确保检测的是浏览器实际使用的出口
+    if proxy:
+        opener = urllib.request.build_opener(
+            urllib.request.ProxyHandler({"http": proxy, "https": proxy})
+        )
+    else:
+        opener = urllib.request.build_opener()
     req = urllib.request.Request(
         url,
         headers={
@@ -34,7 +58,7 @@ def _http_get_text(url: str, timeout: float = 5.0) -> str:
         },
         method="GET",
     )
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
+    with opener.open(req, timeout=timeout) as resp:
         data = resp.read()
     return data.decode("utf-8", errors="ignore")
 
@@ -63,48 +87,150 @@ def _parse_ipip(text: str) -> Tuple[Optional[str], Optional[str]]:
     return ip, loc
 
 
-def check_china_network(timeout: float = 5.0) -> ChinaNetworkReport:
-    """检测当前出口是否为中国网络。
+def _probe(name: str, url: str, timeout: float, proxy: str) -> Optional[ChinaNetworkReport]:
+    """探测单个接口；无法解析出 IP/位置时返回 None。"""
+    text = _http_get_text(url, timeout=timeout, proxy=proxy)
+    if name == "sohu_cityjson":
+        ip, loc = _parse_sohu_cityjson(text)
+    else:
+        ip, loc = _parse_ipip(text)
+
+    # 判断是否中国
+    joined = " ".join([x for x in [loc, text] if x])
+    is_cn = ("中国" in joined) or ("China" in joined)
+
+    if is_cn:
+        return ChinaNetworkReport(ok=True, reason="china_network_ok", ip=ip, location=loc, source=name)
+
+    # 能解析到位置但不是中国
+    if loc or ip:
+        return ChinaNetworkReport(ok=False, reason="egress_not_in_china", ip=ip, location=loc, source=name)
+
+    return None
+
+
+def check_china_network(timeout: float = 5.0, proxy: Optional[str] = None) -> ChinaNetworkReport:
+    """检测当前出口是否为中国网络（多个接口并发探测，先得到有效结果者为准）。
+
+    Args:
+        timeout: 单个接口超时（秒）
+        proxy: 探测使用的代理；None 表示使用 CHINA_PROXY_SERVER
 
     Returns:
         ChinaNetworkReport(ok=True/False)
     """
-    # 国内常用可访问的接口（按稳定性排序）
-    sources = [
-        ("sohu_cityjson", "https://pv.sohu.com/cityjson?ie=utf-8"),
-        ("ipip", "https://myip.ipip.net"),
-    ]
-
+    proxy = CHINA_PROXY_SERVER if proxy is None else proxy
     last_err = None
-    for name, url in sources:
+
+    pool = ThreadPoolExecutor(max_workers=len(_SOURCES), thread_name_prefix="egress-probe")
+    try:
+        futures = {
+            pool.submit(_probe, name, url, timeout, proxy): name
+            for name, url in _SOURCES
+        }
+        for fut in as_completed(futures):
+            try:
+                report = fut.result()
+            except Exception as e:
+                last_err = str(e)
+                continue
+            if report is not None:
+                return report
+    finally:
+        # 已有结论时不等待较慢的接口
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return ChinaNetworkReport(ok=False, reason=f"network_check_failed: {last_err or 'unknown'}")
+
+
+class EgressCheckService:
+    """出口检测服务：按代理配置缓存检测结论（内存 + 磁盘，多进程共享）。
+
+    只缓存"中国出口"的结论；检测失败或非中国出口不缓存，下次调用会重新探测。
+    """
+
+    def __init__(self, cache_file: str = EGRESS_CACHE_FILE, ttl: float = EGRESS_CHECK_TTL):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self._memory: Dict[str, Tuple[float, ChinaNetworkReport]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fingerprint(proxy: str) -> str:
+        return hashlib.sha1((proxy or "direct").encode("utf-8")).hexdigest()[:16]
+
+    def _read_disk(self) -> Dict[str, Dict]:
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+
+    @staticmethod
+    def _load_entry(entry) -> Optional[Tuple[float, ChinaNetworkReport]]:
+        """解析磁盘缓存条目；格式损坏（其他版本写入/手工修改）时视为未命中。"""
+        try:
+            report = ChinaNetworkReport(**entry["report"])
+            return float(entry["checked_at"]), report
+        except Exception:
+            return None
+
+    def _write_disk(self, data: Dict[str, Dict]) -> None:
+        tmp = f"{self.cache_file}.{os.getpid()}.tmp"
         try:
-            text = _http_get_text(url, timeout=timeout)
-            if name == "sohu_cityjson":
-                ip, loc = _parse_sohu_cityjson(text)
-            else:
-                ip, loc = _parse_ipip(text)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.cache_file)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
 
-            # 判断是否中国
-            joined = " ".join([x for x in [loc, text] if x])
-            is_cn = ("中国" in joined) or ("China" in joined)
+    def get(self, *, timeout: float = 5.0, proxy: Optional[str] = None, force: bool = False) -> ChinaNetworkReport:
+        """返回当前出口的检测结论（TTL 内命中缓存则不发起网络请求）。"""
+        proxy = CHINA_PROXY_SERVER if proxy is None else proxy
+        key = self._fingerprint(proxy)
+        now = time.time()
 
-            if is_cn:
-                return ChinaNetworkReport(ok=True, reason="china_network_ok", ip=ip, location=loc, source=name)
+        with self._lock:
+            if not force:
+                cached = self._memory.get(key)
+                if cached and now - cached[0] < self.ttl:
+                    return cached[1]
 
-            # 能解析到位置但不是中国
-            if loc or ip:
-                return ChinaNetworkReport(ok=False, reason="egress_not_in_china", ip=ip, location=loc, source=name)
+                cached = self._load_entry(self._read_disk().get(key))
+                if cached and now - cached[0] < self.ttl:
+                    self._memory[key] = cached
+                    return cached[1]
 
-        except Exception as e:
-            last_err = str(e)
-            continue
+            report = check_china_network(timeout=timeout, proxy=proxy)
+            if report.ok:
+                self._memory[key] = (now, report)
+                data = self._read_disk()
+                data[key] = {"checked_at": now, "report": asdict(report)}
+                self._write_disk(data)
+            return report
 
-    return ChinaNetworkReport(ok=False, reason=f"network_check_failed: {last_err or 'unknown'}")
+    def invalidate(self, proxy: Optional[str] = None) -> None:
+        """清除缓存结论（检测到拦截/切换网络后调用），下次 get() 重新探测。"""
+        proxy = CHINA_PROXY_SERVER if proxy is None else proxy
+        key = self._fingerprint(proxy)
+        with self._lock:
+            self._memory.pop(key, None)
+            data = self._read_disk()
+            if data.pop(key, None) is not None:
+                self._write_disk(data)
+
+
+# 进程内共享的出口检测服务
+egress_service = EgressCheckService()
 
 
 def ensure_china_network(*, strict: bool = True, timeout: float = 5.0) -> ChinaNetworkReport:
-    """确保处于中国网络，否则抛出 RuntimeError。"""
-    report = check_china_network(timeout=timeout)
+    """确保处于中国网络，否则抛出 RuntimeError（结论在 EGRESS_CHECK_TTL 内复用）。"""
+    report = egress_service.get(timeout=timeout)
     if report.ok:
         return report
 
@@ -126,3 +252,8 @@ def ensure_china_network(*, strict: bool = True, timeout: float = 5.0) -> ChinaN
         )
 
     return report
+
+
+async def ensure_china_network_async(*, strict: bool = True, timeout: float = 5.0) -> ChinaNetworkReport:
+    """ensure_china_network 的异步版本：探测在线程中进行，不阻塞事件循环。"""
+    return await asyncio.to_thread(ensure_china_network, strict=strict, timeout=timeout)
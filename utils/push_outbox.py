@@ -0,0 +1,317 @@
+"""
+持久化推送发件箱
+任务只负责把待推送词条写入 SQLite（WAL 模式，微秒级入队），
+后台投递器负责限速发送、失败重试，并按 PUSH_INTERVAL 对同一词条去重。
+
+Webhook 变慢或故障时，消息留在发件箱里等待下次投递，挖掘任务不受影响；
+进程退出未发送的消息在下次启动投递器时继续发送。
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import PUSH_INTERVAL, PUSH_OUTBOX_DB, OUTBOX_MAX_ATTEMPTS
+from utils.logic import NichePushLogic
+from utils.wecom_sender import AsyncWeComSender
+
+
+# 只保留推送需要的字段，避免把完整分析结果写进发件箱
+_PAYLOAD_FIELDS = ('词条', '蓝海指数', '闲鱼商品数', '平均想要数', '小红书热度')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    keyword TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    mode TEXT NOT NULL DEFAULT 'final',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_keyword ON outbox(keyword, status);
+CREATE TABLE IF NOT EXISTS last_pushed (
+    keyword TEXT PRIMARY KEY,
+    pushed_at REAL NOT NULL
+);
+"""
+
+
+class PushOutbox:
+    """推送发件箱（SQLite WAL，支持多进程同时入队）"""
+
+    # 投递中的消息租约：进程崩溃后超过租约时间会被重新投递
+    SENDING_LEASE_SEC = 120
+
+    def __init__(self, db_path: str = PUSH_OUTBOX_DB, push_interval: float = PUSH_INTERVAL):
+        """
+        Args:
+            db_path: 发件箱数据库路径
+            push_interval: 同一词条两次推送的最小间隔（秒）
+        """
+        self.db_path = db_path
+        self.push_interval = push_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def enqueue(self, results: List[Dict], mode: str = 'final') -> List[str]:
+        """
+        写入待推送词条（PUSH_INTERVAL 内推送过或已在队列中的词条会被跳过）
+
+        Args:
+            results: 分析结果列表
+            mode: 推送方式（'early' / 'final'）
+
+        Returns:
+            实际入队的词条列表
+        """
+        now = time.time()
+        enqueued = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for result in NichePushLogic.filter_qualified(results):
+                    keyword = result.get('词条', '')
+                    if not keyword or self._is_suppressed(keyword, now):
+                        continue
+                    payload = {k: result.get(k) for k in _PAYLOAD_FIELDS}
+                    self._conn.execute(
+                        "INSERT INTO outbox (keyword, payload, mode, next_attempt_at, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (keyword, json.dumps(payload, ensure_ascii=False), mode, now, now)
+                    )
+                    enqueued.append(keyword)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return enqueued
+
+    def _is_suppressed(self, keyword: str, now: float) -> bool:
+        row = self._conn.execute(
+            "SELECT pushed_at FROM last_pushed WHERE keyword = ?", (keyword,)
+        ).fetchone()
+        if row and now - row[0] < self.push_interval:
+            return True
+        row = self._conn.execute(
+            "SELECT 1 FROM outbox WHERE keyword = ? AND status IN ('pending', 'sending') LIMIT 1",
+            (keyword,)
+        ).fetchone()
+        return row is not None
+
+    def claim_due(self, limit: int = 50) -> List[Dict]:
+        """领取到期待投递的消息（标记为投递中）"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, keyword, payload, attempts FROM outbox "
+                    "WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? "
+                    "ORDER BY id LIMIT ?",
+                    (now, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+                    [(now + self.SENDING_LEASE_SEC, row[0]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            {'id': row[0], 'keyword': row[1], 'result': json.loads(row[2]), 'attempts': row[3]}
+            for row in rows
+        ]
+
+    def mark_sent(self, entries: List[Dict]) -> None:
+        """标记投递成功，并刷新词条的最后推送时间"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE outbox SET status = 'sent', attempts = attempts + 1 WHERE id = ?",
+                    [(e['id'],) for e in entries]
+                )
+                self._conn.executemany(
+                    "INSERT INTO last_pushed (keyword, pushed_at) VALUES (?, ?) "
+                    "ON CONFLICT(keyword) DO UPDATE SET pushed_at = excluded.pushed_at",
+                    [(e['keyword'], now) for e in entries]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def mark_failed(self, entries: List[Dict], error: str = '') -> None:
+        """标记投递失败：指数退避后重试，超过最大次数后放弃"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for e in entries:
+                    attempts = e['attempts'] + 1
+                    status = 'dead' if attempts >= OUTBOX_MAX_ATTEMPTS else 'pending'
+                    backoff = min(30 * (2 ** (attempts - 1)), 3600)
+                    self._conn.execute(
+                        "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? "
+                        "WHERE id = ?",
+                        (status, attempts, now + backoff, error[:200], e['id'])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def pending_count(self) -> int:
+        """尚未投递成功的消息数"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()
+        return int(row[0])
+
+    def in_flight(self, keywords: List[str]) -> Tuple[int, int]:
+        """
+        指定词条中尚未投递成功的消息数
+
+        Args:
+            keywords: 词条列表（同一词条最多只有一条未完成的消息）
+
+        Returns:
+            (未投递数, 其中正在投递或已到期待投递的数量)；退避中的消息不计入后者
+        """
+        if not keywords:
+            return 0, 0
+        now = time.time()
+        placeholders = ','.join('?' * len(keywords))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), "
+                "SUM(CASE WHEN status = 'sending' OR next_attempt_at <= ? THEN 1 ELSE 0 END) "
+                f"FROM outbox WHERE status IN ('pending', 'sending') AND keyword IN ({placeholders})",
+                (now, *keywords)
+            ).fetchone()
+        return int(row[0]), int(row[1] or 0)
+
+    def stats(self) -> Dict[str, int]:
+        """各状态的消息数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxDrainer:
+    """后台投递器：在推送器的事件循环上持续清空发件箱"""
+
+    def __init__(self, outbox: PushOutbox, sender: AsyncWeComSender, poll_interval: float = 5.0):
+        """
+        Args:
+            outbox: 发件箱
+            sender: 异步推送器（提供限速和连接池）
+            poll_interval: 空闲时的轮询间隔（秒）
+        """
+        self.outbox = outbox
+        self.sender = sender
+        self.poll_interval = poll_interval
+        self._wake: Optional[asyncio.Event] = None
+        self._task = None
+
+    def start(self) -> None:
+        """启动投递循环（幂等）"""
+        if self._task and not self._task.done():
+            return
+        self.sender.start()
+        self._task = asyncio.run_coroutine_threadsafe(self._run(), self.sender._loop)
+
+    def notify(self) -> None:
+        """有新消息入队时唤醒投递循环"""
+        self.start()
+        if self._wake is not None:
+            self.sender._loop.call_soon_threadsafe(self._wake.set)
+
+    def wait_idle(self, keywords: List[str], timeout: float = 10.0) -> bool:
+        """
+        等待本次入队的词条投递完毕（有上限，Webhook 故障时不会拖住调用方）
+
+        只等待 keywords 对应的消息：其他任务遗留的消息由投递器在后台继续处理；
+        投递失败进入退避的消息不会在超时前重试，遇到时立即返回。
+
+        Args:
+            keywords: 本次入队的词条
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            是否在超时前全部投递完毕
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            undelivered, due = self.outbox.in_flight(keywords)
+            if undelivered == 0:
+                return True
+            if due == 0 or time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await self._drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 数据库暂时不可用等异常不能让投递循环退出；租约到期后消息会被重新领取
+                print(f"⚠️ 发件箱投递出错: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _drain_once(self) -> None:
+        entries = await asyncio.to_thread(self.outbox.claim_due)
+        if not entries:
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        delivered_ids = set()
+
+        def on_delivered(items: List[Dict]) -> None:
+            delivered_ids.update(id(item) for item in items)
+
+        by_result = {id(e['result']): e for e in entries}
+        error = ''
+        try:
+            await self.sender.send_digest([e['result'] for e in entries], on_delivered=on_delivered)
+        except Exception as e:
+            error = str(e)
+
+        sent = [by_result[i] for i in delivered_ids if i in by_result]
+        failed = [e for e in entries if id(e['result']) not in delivered_ids]
+        if sent:
+            await asyncio.to_thread(self.outbox.mark_sent, sent)
+        if failed:
+            await asyncio.to_thread(self.outbox.mark_failed, failed, error or 'webhook_rejected')
+            print(f"⚠️ {len(failed)} 条推送投递失败，已安排重试")
@@ -0,0 +1,317 @@
+"""
+📦 紧凑记录类型
+笔记、闲鱼商品和分析结果以前都是带重复中文键的 dict，热点循环里反复
+探测 wants / want / 想要人数 等备选键。这里改为 __slots__ 记录：
+
+- 在爬虫边界（extractors / 页面提取）规范化一次，之后按属性访问
+- 保留只读的 get / [] 兼容旧键名，逐步迁移期间旧代码不受影响
+- 只在 JSON / 推送边界用 to_dict() 转回原来的 dict 格式（json.dumps 可用 to_json_default）
+"""
+
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional
+
+
+_MISSING = object()
+
+
+def _first(mapping: Dict, keys: Iterable[str], default=None):
+    """按顺序取第一个非空值"""
+    for key in keys:
+        value = mapping.get(key)
+        if value:
+            return value
+    return default
+
+
+def _to_float(value, default: float = 0.0) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return default
+
+
+class _Record(ABC):
+    """记录基类：只读的 dict 兼容接口（按 _ALIASES 把旧键名映射到属性）"""
+
+    __slots__ = ()
+    _ALIASES: Dict[str, str] = {}
+
+    def get(self, key: str, default=None):
+        attr = self._ALIASES.get(key)
+        if attr is None:
+            return default
+        value = getattr(self, attr)
+        return default if value is None else value
+
+    def __getitem__(self, key: str):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+    # 按字段值比较且字段可修改：不可哈希（与 dict 一致），不能放进 set / 作为 dict 键
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{slot}={getattr(self, slot)!r}" for slot in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    @abstractmethod
+    def to_dict(self) -> Dict:
+        """转回原来的 dict 格式（JSON / 推送边界使用）"""
+
+
+class XhsNote(_Record):
+    """小红书笔记"""
+
+    __slots__ = ('title', 'likes')
+    _ALIASES = {'title': 'title', 'likes': 'likes'}
+
+    def __init__(self, title: str = '', likes: int = 0):
+        self.title = title
+        self.likes = likes
+
+    @classmethod
+    def from_raw(cls, item: Dict) -> 'XhsNote':
+        """
+        从搜索 API 的笔记卡片 / 页面提取结果规范化
+
+        兼容 interact.liked、note_card.interact_info.liked_count、likes 等字段
+        """
+        card = item.get('note_card') or {}
+        interact = item.get('interact') or card.get('interact_info') or {}
+        try:
+            likes = int(interact.get('liked') or interact.get('liked_count') or item.get('likes') or 0)
+        except (TypeError, ValueError):
+            likes = 0
+        title = item.get('title', '') or card.get('display_title', '') or ''
+        return cls(title=title[:100], likes=likes)
+
+    def to_dict(self) -> Dict:
+        return {'title': self.title, 'likes': self.likes}
+
+
+class FishListing(_Record):
+    """闲鱼商品（卖家头像/信誉/去重键在规范化时一次算好）"""
+
+    __slots__ = (
+        'title', 'price', 'wants', 'keyword', 'source', 'category',
+        'item_id', 'seller_id', 'has_avatar', 'low_reputation'
+    )
+    _ALIASES = {
+        'title': 'title', 'name': 'title', 'price': 'price',
+        'wants': 'wants', 'want': 'wants', '想要人数': 'wants',
+        'keyword': 'keyword', 'source': 'source', 'category': 'category',
+        'item_id': 'item_id', 'id': 'item_id', 'seller_id': 'seller_id',
+    }
+
+    def __init__(
+        self,
+        title: str = '',
+        price: str = '',
+        wants: float = 0,
+        keyword: str = '',
+        source: str = 'xianyu',
+        category: str = '闲置商品',
+        item_id: Optional[str] = None,
+        seller_id: Optional[str] = None,
+        has_avatar: Optional[bool] = None,
+        low_reputation: Optional[bool] = None
+    ):
+        self.title = title
+        self.price = price
+        self.wants = wants
+        self.keyword = keyword
+        self.source = source
+        self.category = category
+        self.item_id = item_id
+        self.seller_id = seller_id
+        self.has_avatar = has_avatar
+        self.low_reputation = low_reputation
+
+    @classmethod
+    def from_raw(
+        cls,
+        item,
+        keyword: str = '',
+        wants: Optional[float] = None,
+        source: str = 'xianyu',
+        max_title: Optional[int] = None
+    ) -> 'FishListing':
+        """
+        从 API 商品 / 页面提取结果 / 旧格式 dict 规范化
+
+        Args:
+            item: 原始商品（已是 FishListing 时原样返回）
+            keyword: 搜索词（原始数据没有时使用）
+            wants: 覆盖想要数（原始数据没有可靠的想要数时由调用方提供）
+            source: 来源平台
+            max_title: 标题截断长度（API 提取结果截到 50 字，与原 dict 格式一致）
+        """
+        if isinstance(item, cls):
+            return item
+        seller = item.get('seller') if isinstance(item.get('seller'), dict) else {}
+        title = item.get('title') or item.get('itemTitle') or item.get('name') or ''
+        return cls(
+            title=title[:max_title] if max_title else title,
+            price=str(item.get('price') or item.get('soldPrice') or item.get('priceText') or ''),
+            wants=_to_float(_first(item, ('wants', 'want', '想要人数'))) if wants is None else wants,
+            keyword=item.get('keyword') or keyword,
+            source=source,
+            category=item.get('category') or '闲置商品',
+            item_id=_item_id(item),
+            seller_id=_seller_id(item, seller),
+            has_avatar=_has_avatar(item, seller),
+            low_reputation=_is_low_reputation(item, seller),
+        )
+
+    def dedup_key(self) -> str:
+        """去重键：商品 ID，没有时用 卖家 + 规范化标题"""
+        if self.item_id:
+            return self.item_id
+        title = re.sub(r"[^0-9a-z一-鿿]", "", re.sub(r"\s+", "", (self.title or '').lower()))[:80]
+        return f"{self.seller_id or 'unknown_seller'}:{title}"
+
+    def to_dict(self) -> Dict:
+        data = {
+            'title': self.title,
+            'price': self.price,
+            'wants': self.wants,
+            'keyword': self.keyword,
+            'source': self.source,
+            'category': self.category,
+        }
+        if self.item_id:
+            data['item_id'] = self.item_id
+        if self.seller_id:
+            data['seller_id'] = self.seller_id
+        if self.has_avatar is not None:
+            data['avatar'] = self.has_avatar
+        return data
+
+
+def _has_avatar(item: Dict, seller: Dict) -> Optional[bool]:
+    for k in ('avatar_url', 'avatar', 'head_url', 'head', 'icon'):
+        v = seller.get(k) or item.get(k) or item.get('seller_' + k)
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            return v
+        if isinstance(v, str):
+            return bool(v.strip())
+    return None
+
+
+def _is_low_reputation(item: Dict, seller: Dict) -> Optional[bool]:
+    candidates = [
+        seller.get('credit_level'), seller.get('seller_level'), seller.get('level'),
+        seller.get('rating'), seller.get('good_rate'), seller.get('reputation'),
+        item.get('credit_level'), item.get('seller_level'), item.get('rating'), item.get('good_rate'),
+    ]
+    for v in candidates:
+        if v is None:
+            continue
+        try:
+            if isinstance(v, str):
+                vv = v.strip().replace('%', '')
+                if vv.replace('.', '', 1).isdigit():
+                    v = float(vv)
+                else:
+                    continue
+            if isinstance(v, (int, float)):
+                # rating: 0-5
+                if 0 <= float(v) <= 5:
+                    return float(v) < 3.0
+                # good_rate: 0-1 or 0-100
+                if 0 <= float(v) <= 1:
+                    return float(v) < 0.6
+                if 1 < float(v) <= 100:
+                    return float(v) < 60
+                # level: 1..N
+                if float(v).is_integer() and 1 <= int(v) <= 10:
+                    return int(v) < 2
+        except Exception:
+            continue
+    return None
+
+
+def _seller_id(item: Dict, seller: Dict) -> Optional[str]:
+    for k in ('seller_id', 'user_id', 'id', 'uid', 'nick', 'nickname'):
+        v = seller.get(k) or (item.get(k) if k != 'id' else None)
+        if v:
+            return str(v)
+    return None
+
+
+def _item_id(item: Dict) -> Optional[str]:
+    for k in ('id', 'item_id', 'trade_id', 'goods_id', 'listing_id'):
+        v = item.get(k)
+        if v:
+            return str(v)
+    return None
+
+
+class AnalysisRecord(_Record):
+    """蓝海分析结果（calculate_detailed_index 的输出）"""
+
+    __slots__ = (
+        'keyword', 'heat', 'competition', 'wants_list', 'avg_wants', 'index',
+        'time_decay', 'rating', 'competition_label', 'heat_label', 'extra'
+    )
+    # 中文键 → 属性（顺序即 to_dict 的键顺序）
+    _ALIASES = {
+        '词条': 'keyword',
+        '小红书热度': 'heat',
+        '闲鱼商品数': 'competition',
+        '闲鱼想要数': 'wants_list',
+        '平均想要数': 'avg_wants',
+        '蓝海指数': 'index',
+        '时间衰减系数': 'time_decay',
+        '评级': 'rating',
+        '竞争度评估': 'competition_label',
+        '热度评估': 'heat_label',
+    }
+
+    def __init__(self, **fields):
+        for slot in self.__slots__:
+            setattr(self, slot, fields.get(slot))
+
+    def get(self, key: str, default=None):
+        if key not in self._ALIASES and self.extra:
+            return self.extra.get(key, default)
+        return super().get(key, default)
+
+    @classmethod
+    def from_dict(cls, analysis: Dict) -> 'AnalysisRecord':
+        """从分析结果 dict 转换（不认识的键放入 extra，如数据纯净度、增长率）"""
+        fields = {attr: analysis.get(key) for key, attr in cls._ALIASES.items()}
+        extra = {key: value for key, value in analysis.items() if key not in cls._ALIASES}
+        return cls(**fields, extra=extra or None)
+
+    def to_dict(self) -> Dict:
+        data = {key: getattr(self, attr) for key, attr in self._ALIASES.items()}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def to_dicts(records: Iterable) -> List:
+    """批量转回 dict（非记录对象原样保留）"""
+    return [record.to_dict() if isinstance(record, _Record) else record for record in records]
+
+
+def to_json_default(obj: Any):
+    """json.dumps 的 default 钩子：记录对象序列化为原来的 dict 格式"""
+    if isinstance(obj, _Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,202 @@
+"""
+企业微信异步推送器
+持久连接池 + 令牌桶限速 + 多词条摘要合并，推送不再阻塞挖掘任务
+
+用法：
+    sender = AsyncWeComSender()
+    future = sender.submit_digest(results)   # 立即返回，后台发送
+    ...
+    sender.flush(timeout=15)                 # 任务结束前等待发送完成
+    sender.close()
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from config import WECOM_WEBHOOK, WECOM_RATE_LIMIT_PER_MINUTE
+from utils import metrics
+from utils.logic import NichePushLogic
+
+
+class RateGovernor:
+    """消息限速器（令牌桶，匹配企业微信每分钟消息上限）"""
+
+    def __init__(self, per_minute: int = WECOM_RATE_LIMIT_PER_MINUTE):
+        """
+        Args:
+            per_minute: 每分钟允许发送的消息数
+        """
+        self.capacity = float(max(1, per_minute))
+        self.fill_rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = max(0.0, now - self._last_refill)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.fill_rate)
+        self._last_refill = now
+
+    async def acquire(self) -> float:
+        """获取一个发送令牌，返回等待的秒数"""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait_sec = (1 - self._tokens) / self.fill_rate
+                waited += wait_sec
+                await asyncio.sleep(wait_sec)
+
+
+class AsyncWeComSender:
+    """异步企业微信推送器（后台事件循环线程 + 持久连接池）"""
+
+    def __init__(
+        self,
+        pusher: Optional[NichePushLogic] = None,
+        webhook_url: str = WECOM_WEBHOOK,
+        per_minute: int = WECOM_RATE_LIMIT_PER_MINUTE
+    ):
+        """
+        初始化推送器
+
+        Args:
+            pusher: 复用的推送逻辑（负责消息格式化和连接池）
+            webhook_url: 企业微信Webhook地址（未传入 pusher 时使用）
+            per_minute: 每分钟消息上限
+        """
+        self.pusher = pusher or NichePushLogic(webhook_url=webhook_url)
+        self.per_minute = per_minute
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._governor: Optional[RateGovernor] = None
+        self._pending: List[Future] = []
+        self._start_lock = threading.Lock()
+
+    # ==================== 协程接口 ====================
+
+    async def send_markdown(self, content: str) -> bool:
+        """限速后发送一条 Markdown 消息（HTTP请求在线程池执行，不阻塞事件循环）"""
+        if self._governor is None:
+            self._governor = RateGovernor(self.per_minute)
+        waited = await self._governor.acquire()
+        metrics.rate_limit_wait().observe(waited, platform='wecom', action='push')
+        return await asyncio.to_thread(self.pusher._send_to_wecom, content)
+
+    async def send_digest(
+        self,
+        results: List[Dict],
+        on_delivered: Optional[Callable[[List[Dict]], None]] = None
+    ) -> int:
+        """
+        合并发送多个词条（超出单条上限时自动分片；单个词条使用详细格式）
+
+        Args:
+            results: 分析结果列表
+            on_delivered: 每条消息发送成功后的回调（参数为该消息包含的词条）
+
+        Returns:
+            成功送达的词条数
+        """
+        qualified = self.pusher.filter_qualified(results)
+        if len(qualified) == 1:
+            item = qualified[0]
+            batches = [(self.pusher._format_message(
+                keyword=item.get('词条', ''),
+                score=item.get('蓝海指数', 0),
+                fish_count=item.get('闲鱼商品数', 0),
+                avg_wants=item.get('平均想要数', 0),
+                xhs_heat=int(item.get('小红书热度', 0))
+            ), qualified)]
+        else:
+            batches = self.pusher.format_digest(qualified)
+
+        delivered = 0
+        for message, items in batches:
+            if await self.send_markdown(message):
+                delivered += len(items)
+                if on_delivered:
+                    on_delivered(items)
+        return delivered
+
+    # ==================== 同步调用接口（供 run_mission 使用） ====================
+
+    def start(self) -> None:
+        """启动后台事件循环线程（幂等）"""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._loop.run_forever,
+                name="wecom-sender",
+                daemon=True
+            )
+            self._thread.start()
+
+    def submit_digest(
+        self,
+        results: List[Dict],
+        on_delivered: Optional[Callable[[List[Dict]], None]] = None
+    ) -> Future:
+        """
+        提交摘要推送任务（立即返回，不阻塞调用方）
+
+        Returns:
+            concurrent.futures.Future，结果为成功送达的词条数
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(
+            self.send_digest(results, on_delivered), self._loop
+        )
+        self._pending.append(future)
+        return future
+
+    def flush(self, timeout: float = 30.0) -> int:
+        """
+        等待所有已提交的推送完成
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            本次等待期间送达的词条数
+        """
+        deadline = time.monotonic() + timeout
+        delivered = 0
+        pending, self._pending = self._pending, []
+        for future in pending:
+            try:
+                delivered += future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception as e:
+                print(f"⚠️ 推送未完成：{e}")
+        return delivered
+
+    @staticmethod
+    async def _cancel_tasks() -> None:
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self, timeout: float = 30.0) -> None:
+        """发送完剩余消息后停止后台线程"""
+        self.flush(timeout=timeout)
+        if self._loop and self._thread and self._thread.is_alive():
+            # 取消仍挂在循环上的后台任务（如发件箱投递循环），再停止循环
+            try:
+                asyncio.run_coroutine_threadsafe(self._cancel_tasks(), self._loop).result(timeout=5)
+            except Exception:
+                pass
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+        self._thread = None
+        self.pusher.session.close()